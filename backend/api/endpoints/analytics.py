@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
@@ -14,6 +14,7 @@ from ..schemas.analytics import (
     CrmMedicoAlertasResponse, CrmRaioXResponse,
     EvolucaoMensalGtinResponse, GtinDetalhamentoMensalResponse, RepassesResponse,
     SociosResponse, IntegrityAlertsResponse, NetworkResponse,
+    TeiaVizinhancaResponse, TeiaFarmaciasSocioComumResponse, TeiaComponenteResponse,
     CnpjBootstrapResponse,
     GeograficoOrigemUfResponse,
     GeograficoBenchmarkResponse,
@@ -25,6 +26,7 @@ from ..schemas.analytics import (
     NotaTecnicaPrepareResponse,
 )
 from ..services.analytics import AnalyticsService
+from ..utils.columnar import columnar_format, columnar_response
 from fastapi.responses import StreamingResponse
 from loguru import logger
 from request_logging import FrontendPerformanceEvent, log_frontend_performance
@@ -215,6 +217,24 @@ def get_teia_batch_level4(
         data_fim=data_fim,
     )
 
+@router.get("/cnpj/{cnpj}/network/vizinhanca", response_model=TeiaVizinhancaResponse)
+def get_teia_vizinhanca(
+    cnpj: str,
+    max_saltos: int = Query(2, ge=1, le=4),
+):
+    """Retorna os CPFs/CNPJs a até `max_saltos` vínculos societários do CNPJ (teia nacional)."""
+    return AnalyticsService.get_teia_vizinhanca(cnpj, max_saltos=max_saltos)
+
+@router.get("/cnpj/{cnpj}/network/farmacias-socio-comum", response_model=TeiaFarmaciasSocioComumResponse)
+def get_teia_farmacias_socio_comum(cnpj: str):
+    """Retorna as outras farmácias que dividem ao menos um sócio com o CNPJ."""
+    return AnalyticsService.get_teia_farmacias_socio_comum(cnpj)
+
+@router.get("/cnpj/{cnpj}/network/componente", response_model=TeiaComponenteResponse)
+def get_teia_componente(cnpj: str):
+    """Retorna o tamanho da componente societária do CNPJ e as farmácias que a compõem."""
+    return AnalyticsService.get_teia_componente(cnpj)
+
 
 
 @router.get("/resumo", response_model=AnalyticsResponse)
@@ -523,6 +543,8 @@ def get_regional_benchmarking(
 
 @router.get("/regional-benchmarking-animation", response_model=RegionalAnimationResponse)
 def get_regional_benchmarking_animation(
+    request: Request,
+    response: Response,
     uf: Optional[str] = Query(None, description="Sigla do Estado (ex: 'SC')"),
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
@@ -531,7 +553,16 @@ def get_regional_benchmarking_animation(
     """
     Retorna todos os trimestres do período em uma única chamada.
     Usado pela animação do scatter de posicionamento regional — evita N round-trips.
+    Aceita resposta colunar via header Accept (ver `api.utils.columnar`).
     """
+    media_type = columnar_format(request, response)
+    if media_type:
+        return columnar_response(
+            AnalyticsService.get_regional_benchmarking_animation_columnar(
+                uf=uf, data_inicio=data_inicio, data_fim=data_fim, regiao_id=regiao_id
+            ),
+            media_type,
+        )
     return AnalyticsService.get_regional_benchmarking_animation(
         uf=uf, 
         data_inicio=data_inicio, 
@@ -562,11 +593,19 @@ def get_crm_medico_alertas(
 
 @router.get("/cnpj/{cnpj}/crm/timeline-dataset", response_model=CrmTimelineDatasetResponse)
 def get_crm_timeline_dataset(
+    request: Request,
+    response: Response,
     cnpj: str,
     data_inicio: Optional[str] = Query(None, description="Inicio do periodo (YYYY-MM-DD ou YYYY-MM)"),
     data_fim:    Optional[str] = Query(None, description="Fim do periodo (YYYY-MM-DD ou YYYY-MM)"),
 ):
-    """Retorna o dataset semantico da linha do tempo CRM, agrupado por dia."""
+    """Retorna o dataset semantico da linha do tempo CRM, agrupado por dia (ou colunar via Accept)."""
+    media_type = columnar_format(request, response)
+    if media_type:
+        return columnar_response(
+            AnalyticsService.get_crm_timeline_dataset_columnar(cnpj, data_inicio=data_inicio, data_fim=data_fim),
+            media_type,
+        )
     return AnalyticsService.get_crm_timeline_dataset(cnpj, data_inicio=data_inicio, data_fim=data_fim)
 
 
@@ -632,6 +671,8 @@ def get_indicadores_analise(
 
 @router.get("/indicadores-analise/cnpjs", response_model=IndicadorCnpjPageResponse)
 def get_indicadores_analise_cnpjs(
+    request: Request,
+    response: Response,
     indicador: str = Query(..., description="Chave do indicador (ex: 'percentual_nao_comprovacao', 'teto')"),
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
@@ -665,19 +706,22 @@ def get_indicadores_analise_cnpjs(
     sort_field: str = Query("val_sem_comp"),
     sort_order: str = Query("desc"),
 ):
-    """Retorna uma pagina server-side da tabela de CNPJs de /indicadores."""
+    """Retorna uma pagina server-side da tabela de CNPJs de /indicadores (ou colunar via Accept)."""
     if regiao_saude and regiao_saude != "Todos":
         raise HTTPException(status_code=400, detail="Use regiao_id para filtros regionais; regiao_saude textual e apenas label.")
     if municipio and municipio != "Todos":
         raise HTTPException(status_code=400, detail="Use id_ibge7 para filtros municipais; municipio textual e apenas label.")
-    return AnalyticsService.get_indicadores_analise_cnpjs(
+    media_type = columnar_format(request, response)
+    result = AnalyticsService.get_indicadores_analise_cnpjs(
         indicador, data_inicio, data_fim, uf, regiao_saude, municipio,
         situacao_rf, conexao_ms, porte_empresa, grande_rede, cnpj_raiz, estabelecimento, unidade_pf,
         perc_min=perc_min, perc_max=perc_max, val_min=val_min, regiao_id=regiao_id,
         id_ibge7=id_ibge7, par_teia=par_teia, socio_beneficio=socio_beneficio, socio_esocial=socio_esocial, cnae_incompativel=cnae_incompativel, socio_idade_atipica=socio_idade_atipica, socio_falecido=socio_falecido, dispersao_uf_sem_fronteira=dispersao_uf_sem_fronteira, dispersao_uf_sem_fronteira_limite=dispersao_uf_sem_fronteira_limite, page=page, page_size=page_size,
         sort_field=sort_field, sort_order=sort_order,
-        volume_atipico=volume_atipico, volume_atipico_limite=volume_atipico_limite
+        volume_atipico=volume_atipico, volume_atipico_limite=volume_atipico_limite,
+        columnar=media_type is not None,
     )
+    return columnar_response(result, media_type) if media_type else result
 
 
 @router.get("/cnpj/{cnpj}/movimentacao", response_model=MovimentacaoResponse)
@@ -695,12 +739,22 @@ def get_movimentacao(
     """
     return AnalyticsService.get_movimentacao_data(cnpj, engine, check_cache=check_cache)
 @router.get("/cnpj-lookup")
-def get_cnpj_lookup():
-    """Retorna lista slim [{cnpj, razao_social}] para autocomplete no frontend."""
-    return AnalyticsService.get_cnpj_lookup()
+def get_cnpj_lookup(
+    q: Optional[str] = Query(None, description="Texto digitado (CNPJ, razão social ou município). Sem q, retorna a lista completa."),
+    limit: int = Query(40, ge=1, le=200, description="Máximo de sugestões quando q é informado."),
+):
+    """Autocomplete de estabelecimentos: top-`limit` [{cnpj, razao_social, municipio, uf}] para `q`.
+
+    Sem `q`, mantém o comportamento antigo (lista slim completa da rede).
+    """
+    if q is None:
+        return AnalyticsService.get_cnpj_lookup()
+    return AnalyticsService.search_cnpj_lookup(q, limit)
 
 @router.get("/metric-percentiles-animation", response_model=PercentilesAnimationResponse)
 def get_metric_percentiles_animation(
+    request: Request,
+    response: Response,
     scope: str = Query(..., description="Escopo: 'regiao', 'uf' ou 'brasil'"),
     uf: Optional[str] = Query(None),
     regiao_id: Optional[str] = Query(None),
@@ -709,6 +763,12 @@ def get_metric_percentiles_animation(
     data_fim: Optional[date] = Query(None),
 ):
     """Retorna percentis por janela de 2 meses para animação da curva de risco — uma única chamada."""
+    media_type = columnar_format(request, response)
+    if media_type:
+        return columnar_response(
+            AnalyticsService.get_metric_percentiles_animation_columnar(scope, uf, regiao_id, metric, data_inicio, data_fim),
+            media_type,
+        )
     return AnalyticsService.get_metric_percentiles_animation(scope, uf, regiao_id, metric, data_inicio, data_fim)
 
 
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from database import get_db, engine
-from data_cache import refresh_cache, get_cache_status
+from data_cache import refresh_cache, get_cache_status, evict_global_frames
+from cache_manager import cnpj_single_flight_stats
+from conditional_get import conditional_get_stats
+from response_compression import compression_stats
+from request_pools import request_pool_stats
+from ..services.analytics.result_cache import result_cache_stats
 
 router = APIRouter()
 
@@ -18,3 +23,33 @@ def refresh(background_tasks: BackgroundTasks):
     # Dispara o processamento em background para não travar a requisição HTTP
     background_tasks.add_task(refresh_cache, engine)
     return {"status": "started", "message": "Sincronização iniciada em segundo plano."}
+
+@router.post("/evict")
+def evict():
+    """Descarta da memoria os modulos globais sob demanda (modos lazy/mmap)."""
+    return {"evicted": evict_global_frames()}
+
+@router.get("/analytics-stats")
+def analytics_stats():
+    """Uso, acertos e coalescencia dos caches de resultados analiticos."""
+    return result_cache_stats()
+
+@router.get("/cnpj-single-flight")
+def cnpj_single_flight():
+    """Producoes por CNPJ executadas, pedidos coalescidos e tempo poupado."""
+    return cnpj_single_flight_stats()
+
+@router.get("/http-etag")
+def http_etag():
+    """Respostas 304 e completas por rota com ETag (ver `cache_registry.ENDPOINT_CACHE_DEPENDENCIES`)."""
+    return conditional_get_stats()
+
+@router.get("/compression")
+def compression():
+    """Razao de compressao e CPU gasto por rota (ver `response_compression`)."""
+    return compression_stats()
+
+@router.get("/request-pools")
+def request_pools():
+    """Fila, espera, execucao e rejeicoes (503) por classe de execucao da API."""
+    return request_pool_stats()
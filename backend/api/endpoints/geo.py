@@ -1,29 +1,41 @@
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Query, Request, Response
 from ..schemas.geo import LocalidadesResponseSchema, EstabelecimentosGeoResponseSchema
 from ..services.geo import GeoService
+from ..utils.columnar import columnar_format, columnar_response
 
 router = APIRouter()
 
 @router.get("/localidades", response_model=LocalidadesResponseSchema)
-def get_localidades(db: Session = Depends(get_db)):
+def get_localidades():
     """
     Retorna a hierarquia completa UF > Região de Saúde > Município
     para alimentar os filtros em cascata do frontend.
     """
-    return GeoService.get_localidades(db)
+    return Response(GeoService.get_localidades_body(), media_type="application/json")
 
 @router.get("/estabelecimentos", response_model=EstabelecimentosGeoResponseSchema)
 def get_estabelecimentos_geo(
+    request: Request,
+    response: Response,
     data_inicio: Optional[date] = Query(None),
     data_fim: Optional[date] = Query(None),
 ):
     """
     Retorna lat/lon + score de risco de todos os estabelecimentos geocodificados.
     Usado para plotar pontos no mapa interativo e no PDF.
+    Aceita resposta colunar via header Accept (ver `api.utils.columnar`).
     """
-    return GeoService.get_estabelecimentos_geo(data_inicio=data_inicio, data_fim=data_fim)
+    media_type = columnar_format(request, response)
+    if media_type:
+        return columnar_response(
+            GeoService.get_estabelecimentos_geo_columnar(data_inicio=data_inicio, data_fim=data_fim),
+            media_type,
+        )
+    return Response(
+        GeoService.get_estabelecimentos_geo_body(data_inicio=data_inicio, data_fim=data_fim),
+        media_type="application/json",
+        headers={"Vary": "Accept"},
+    )
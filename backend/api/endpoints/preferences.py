@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from typing import Any
 
+from cache_prefetch import schedule_watchlist_prefetch
+from database import engine
+
 from ..schemas.preferences import (
     FiltersPayload,
     MetodologiaPayload,
@@ -76,9 +79,11 @@ def save_filters(payload: FiltersPayload):
 
 @router.put("/watchlist", response_model=PreferencesSchema)
 def save_watchlist(payload: WatchlistPayload):
-    return PreferencesService.update_watchlist(
+    preferences = PreferencesService.update_watchlist(
         [item.model_dump() for item in payload.interesse]
     )
+    schedule_watchlist_prefetch(engine, "watchlist")
+    return preferences
 
 
 @router.put("/ui", response_model=PreferencesSchema)
@@ -794,6 +794,35 @@ class NetworkResponse(BaseModel):
     summary: Optional[NetworkSummarySchema] = None
     query_time_ms: Optional[float] = None
 
+class TeiaIndiceNodeSchema(BaseModel):
+    id: str                   # CPF/CNPJ como gravado nas fontes da teia
+    saltos: Optional[int] = None
+    is_empresa: bool = False
+    is_alvo: bool = False
+    is_farmacia_fp: bool = False
+
+class TeiaVizinhancaResponse(BaseModel):
+    cnpj: str
+    max_saltos: int
+    nodes: List[TeiaIndiceNodeSchema]
+    query_time_ms: Optional[float] = None
+
+class TeiaFarmaciaSocioComumSchema(BaseModel):
+    cnpj: str
+    socios_em_comum: List[str]
+
+class TeiaFarmaciasSocioComumResponse(BaseModel):
+    cnpj: str
+    farmacias: List[TeiaFarmaciaSocioComumSchema]
+    query_time_ms: Optional[float] = None
+
+class TeiaComponenteResponse(BaseModel):
+    cnpj: str
+    total_nos: int = 0
+    total_empresas: int = 0
+    farmacias: List[TeiaIndiceNodeSchema]
+    query_time_ms: Optional[float] = None
+
 
 # ── Memória de Cálculo — Movimentação por GTIN ──────────
 class MovimentacaoRowSchema(BaseModel):
@@ -13,6 +13,7 @@ from .crm import (
     get_crm_medico_alertas,
     get_crm_raio_x,
     get_crm_timeline_dataset,
+    get_crm_timeline_dataset_columnar,
 )
 from .dashboard import (
     get_dashboard_data,
@@ -32,6 +33,9 @@ from .network import (
     get_teia_grafo_nivel4_expansao,
     get_teia_grafo_nivel3_full,
     get_teia_grafo_nivel4_full,
+    get_teia_vizinhanca,
+    get_teia_farmacias_socio_comum,
+    get_teia_componente,
 )
 from .financeiro import (
     get_evolucao_financeira,
@@ -56,9 +60,12 @@ from .regional import (
     get_cnpj_lookup,
     get_metric_percentiles,
     get_metric_percentiles_animation,
+    get_metric_percentiles_animation_columnar,
     get_regional_benchmarking,
     get_regional_benchmarking_animation,
+    get_regional_benchmarking_animation_columnar,
 )
+from .cnpj_lookup import search_cnpj_lookup
 from .nota_tecnica import generate_nota_tecnica
 from .nota_tecnica_readiness import get_nota_tecnica_readiness, get_relatorio_pdf_readiness
 from .nota_tecnica_prepare import prepare_nota_tecnica_cnpj, prepare_relatorio_pdf_cnpj
@@ -95,9 +102,11 @@ class AnalyticsService:
     get_fator_risco_data = staticmethod(get_fator_risco_data)
     get_regional_benchmarking = staticmethod(get_regional_benchmarking)
     get_regional_benchmarking_animation = staticmethod(get_regional_benchmarking_animation)
+    get_regional_benchmarking_animation_columnar = staticmethod(get_regional_benchmarking_animation_columnar)
     get_crm_data = staticmethod(get_crm_data)
     get_crm_medico_alertas = staticmethod(get_crm_medico_alertas)
     get_crm_timeline_dataset = staticmethod(get_crm_timeline_dataset)
+    get_crm_timeline_dataset_columnar = staticmethod(get_crm_timeline_dataset_columnar)
     sync_crm_raiox_tx = staticmethod(sync_crm_raiox_tx)
     get_crm_raio_x = staticmethod(get_crm_raio_x)
     get_dados_farmacia = staticmethod(get_dados_farmacia)
@@ -111,10 +120,15 @@ class AnalyticsService:
     get_teia_grafo_nivel4_expansao = staticmethod(get_teia_grafo_nivel4_expansao)
     get_teia_grafo_nivel3_full = staticmethod(get_teia_grafo_nivel3_full)
     get_teia_grafo_nivel4_full = staticmethod(get_teia_grafo_nivel4_full)
+    get_teia_vizinhanca = staticmethod(get_teia_vizinhanca)
+    get_teia_farmacias_socio_comum = staticmethod(get_teia_farmacias_socio_comum)
+    get_teia_componente = staticmethod(get_teia_componente)
     sync_network = staticmethod(sync_network)
     get_metric_percentiles = staticmethod(get_metric_percentiles)
     get_metric_percentiles_animation = staticmethod(get_metric_percentiles_animation)
+    get_metric_percentiles_animation_columnar = staticmethod(get_metric_percentiles_animation_columnar)
     get_cnpj_lookup = staticmethod(get_cnpj_lookup)
+    search_cnpj_lookup = staticmethod(search_cnpj_lookup)
     generate_nota_tecnica = staticmethod(generate_nota_tecnica)
     get_nota_tecnica_readiness = staticmethod(get_nota_tecnica_readiness)
     prepare_nota_tecnica_cnpj = staticmethod(prepare_nota_tecnica_cnpj)
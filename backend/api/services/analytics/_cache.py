@@ -21,7 +21,10 @@ from cache_files import (
     TEIA_GRAFO_NIVEL3_NODES_PARQUET,
     TEIA_GRAFO_NIVEL4_EDGES_PARQUET,
     TEIA_GRAFO_NIVEL4_NODES_PARQUET,
+    TEIA_GRAFO_MANIFEST_JSON,
+    TEIA_GRAFO_CACHE_VERSION,
 )
+from cache_manager import cnpj_single_flight
 from data_cache import (
     get_df, get_rede_df, get_localidades_df,
     get_df_bench_crm_regiao, get_df_bench_crm_br, get_df_dados_farmacia,
@@ -30,6 +33,8 @@ from data_cache import (
     scan_teia_fonte_nivel4, get_df_dados_par, get_cache_dir
 )
 
+from .teia_index import get_teia_index, teia_index_enabled
+
 from ...schemas.analytics import (
     AnalyticsKPISchema,
     ResultadoSentinelaUFSchema,
@@ -128,18 +133,111 @@ def _get_cnpj_cache_dir(cnpj: str) -> str:
         _known_cnpj_dirs.add(cnpj_dir)
     return cnpj_dir
 
-def sync_network(cnpj: str) -> None:
-    """Sincroniza o cache Parquet da Teia Societária para um CNPJ usando fontes Parquet.
+# -----------------------------------------------------------------------------
+# Manifesto da teia por CNPJ
+# -----------------------------------------------------------------------------
+# Globais de que a teia deriva: se qualquer um mudar, a teia e regerada.
+_TEIA_SOURCE_CACHE_KEYS = (
+    "dados_farmacia",
+    "dados_farmacia_cnaes_secundarios",
+    "dados_socios",
+    "dados_par",
+    "teia_fonte_nivel2",
+    "teia_fonte_nivel3",
+    "teia_fonte_nivel4",
+)
+_TEIA_GRAFO_FILENAMES = (
+    TEIA_GRAFO_NIVEL2_NODES_PARQUET,
+    TEIA_GRAFO_NIVEL2_EDGES_PARQUET,
+    TEIA_GRAFO_NIVEL3_NODES_PARQUET,
+    TEIA_GRAFO_NIVEL3_EDGES_PARQUET,
+    TEIA_GRAFO_NIVEL4_NODES_PARQUET,
+    TEIA_GRAFO_NIVEL4_EDGES_PARQUET,
+)
+# cnpj_dir -> (geracao do cache, (mtime_ns, tamanho) do manifesto) ja validados.
+_teia_manifest_memo: dict[str, tuple[int, tuple[int, int]]] = {}
 
-    Fontes:
-      - dados_farmacia (parquet): para o nó raiz (PJ_ALVO)
-      - dados_socios (parquet): para o Nível 1 (Sócios da farmácia)
-      - teia_fonte_nivel2 (parquet): para o Nível 2 (Outras empresas dos sócios)
-      - teia_fonte_nivel3 (parquet): para o Nível 3 (Sócios das outras empresas - expansão)
-      - teia_fonte_nivel4 (parquet): para o Nível 4 (Empresas dos sócios de N3)
+
+def _file_fingerprint(path: str) -> list[int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _teia_source_fingerprints() -> dict[str, list[int] | None]:
+    from cache_registry import get_global_parquet_files_by_key
+
+    filenames = get_global_parquet_files_by_key()
+    return {
+        key: _file_fingerprint(os.path.join(get_cache_dir(), filenames[key]))
+        for key in _TEIA_SOURCE_CACHE_KEYS
+    }
+
+
+def _write_teia_manifest(cnpj_dir: str) -> None:
+    """Registra versao, fontes e impressoes digitais dos seis arquivos da teia."""
+    manifest = {
+        "cache_key": "teia_grafo",
+        "version": TEIA_GRAFO_CACHE_VERSION,
+        "classification_version": COMPANY_CLASSIFICATION_VERSION,
+        "sources": _teia_source_fingerprints(),
+        "files": {
+            filename: _file_fingerprint(os.path.join(cnpj_dir, filename))
+            for filename in _TEIA_GRAFO_FILENAMES
+        },
+    }
+    manifest_path = os.path.join(cnpj_dir, TEIA_GRAFO_MANIFEST_JSON)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle)
+    os.replace(tmp_path, manifest_path)
+
+
+def _teia_manifest_valid(cnpj_dir: str) -> bool:
+    """Caminho quente: um stat do manifesto enquanto a geracao do cache nao muda.
+
+    Na primeira consulta de cada geracao (ou com o manifesto reescrito), le o
+    JSON e confere versao, arquivos da teia e globais de origem.
     """
-    import time
-    cnpj_dir = _get_cnpj_cache_dir(cnpj)
+    from data_cache import get_cache_generation
+
+    manifest_path = os.path.join(cnpj_dir, TEIA_GRAFO_MANIFEST_JSON)
+    manifest_stat = _file_fingerprint(manifest_path)
+    if manifest_stat is None:
+        _teia_manifest_memo.pop(cnpj_dir, None)
+        return False
+    generation = get_cache_generation()
+    memo_key = (generation, tuple(manifest_stat))
+    if _teia_manifest_memo.get(cnpj_dir) == memo_key:
+        return True
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return False
+    valid = (
+        manifest.get("cache_key") == "teia_grafo"
+        and manifest.get("version") == TEIA_GRAFO_CACHE_VERSION
+        and manifest.get("classification_version") == COMPANY_CLASSIFICATION_VERSION
+        and manifest.get("files") == {
+            filename: _file_fingerprint(os.path.join(cnpj_dir, filename))
+            for filename in _TEIA_GRAFO_FILENAMES
+        }
+        and None not in manifest["files"].values()
+        and manifest.get("sources") == _teia_source_fingerprints()
+    )
+    if valid:
+        _teia_manifest_memo[cnpj_dir] = memo_key
+    else:
+        _teia_manifest_memo.pop(cnpj_dir, None)
+    return valid
+
+
+def _teia_legacy_cache_valid(cnpj_dir: str) -> bool:
+    """Validacao de teias geradas antes do manifesto (schema + mtime das fontes)."""
     N2_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_NODES_PARQUET)
     N2_EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_EDGES_PARQUET)
     N3_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_NODES_PARQUET)
@@ -147,7 +245,6 @@ def sync_network(cnpj: str) -> None:
     N4_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_NODES_PARQUET)
     N4_EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_EDGES_PARQUET)
 
-    # Cache hit: se os arquivos existem e são válidos, assume sucesso
     if all(os.path.exists(p) for p in [N2_NODES_PATH, N2_EDGES_PATH, N3_NODES_PATH, N3_EDGES_PATH, N4_NODES_PATH, N4_EDGES_PATH]):
         try:
             def has_required_columns(path: str, columns: set[str]) -> bool:
@@ -207,9 +304,70 @@ def sync_network(cnpj: str) -> None:
                 if par_mtime > graph_mtime:
                     raise ValueError("teia anterior ao cache PAR")
 
-            return
+            return True
         except Exception:
-            pass
+            return False
+    return False
+
+
+def _read_teia_fonte(name: str, scan, column: str, keys: list) -> pl.DataFrame:
+    """Linhas de `name` com `column` em `keys`, na ordem do arquivo.
+
+    Usa o indice nacional da teia (le so os row groups com as chaves); sem o
+    indice (desligado, ainda em montagem, sem pyarrow, fonte trocada ou acima
+    do orcamento de memoria) volta ao filtro por scan.
+    """
+    if teia_index_enabled():
+        try:
+            index = get_teia_index()
+            df = index.read_source_rows(name, keys) if index is not None else None
+        except Exception as exc:
+            print(f"[AVISO] Indice da teia indisponivel ({exc}); usando scan de {name}.")
+            df = None
+        if df is not None:
+            return df
+    return scan().filter(pl.col(column).is_in(keys)).collect()
+
+
+def sync_network(cnpj: str) -> None:
+    """Sincroniza o cache Parquet da Teia Societária para um CNPJ usando fontes Parquet.
+
+    Cache hit: o manifesto `teia_grafo_manifest.json` confere com os arquivos
+    e com os globais de origem (ver `_teia_manifest_valid`). Caso contrario, a
+    teia e regerada por `_produce_network`.
+    """
+    if _teia_manifest_valid(_get_cnpj_cache_dir(cnpj)):
+        return
+    _produce_network(cnpj)
+
+
+@cnpj_single_flight("teia_grafo")
+def _produce_network(cnpj: str) -> None:
+    """Gera a Teia Societária de um CNPJ a partir das fontes Parquet.
+
+    Fontes:
+      - dados_farmacia (parquet): para o nó raiz (PJ_ALVO)
+      - dados_socios (parquet): para o Nível 1 (Sócios da farmácia)
+      - teia_fonte_nivel2 (parquet): para o Nível 2 (Outras empresas dos sócios)
+      - teia_fonte_nivel3 (parquet): para o Nível 3 (Sócios das outras empresas - expansão)
+      - teia_fonte_nivel4 (parquet): para o Nível 4 (Empresas dos sócios de N3)
+    """
+    import time
+    cnpj_dir = _get_cnpj_cache_dir(cnpj)
+    N2_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_NODES_PARQUET)
+    N2_EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_EDGES_PARQUET)
+    N3_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_NODES_PARQUET)
+    N3_EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_EDGES_PARQUET)
+    N4_NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_NODES_PARQUET)
+    N4_EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_EDGES_PARQUET)
+
+    # Outro pedido pode ter gerado a teia enquanto este esperava; teias antigas,
+    # sem manifesto, ganham um ao passar na validacao anterior.
+    if _teia_manifest_valid(cnpj_dir):
+        return
+    if _teia_legacy_cache_valid(cnpj_dir):
+        _write_teia_manifest(cnpj_dir)
+        return
 
     try:
         print(f"[SYNC] Gerando Teia Societaria (Parquet Source) para {cnpj}...")
@@ -408,10 +566,8 @@ def sync_network(cnpj: str) -> None:
 
         cnpjs_externos = []
         if cpfs_socios:
-            df_ext_filtered = (
-                scan_teia_fonte_nivel2()
-                .filter(pl.col("cpf_cnpj_socio").is_in(cpfs_socios))
-                .collect()
+            df_ext_filtered = _read_teia_fonte(
+                "teia_fonte_nivel2", scan_teia_fonte_nivel2, "cpf_cnpj_socio", cpfs_socios
             )
             participacoes = df_ext_filtered.to_dicts()
             print(f"   -> Nivel 2: Encontradas {len(participacoes)} participacoes para {len(cpfs_socios)} socios.")
@@ -476,10 +632,8 @@ def sync_network(cnpj: str) -> None:
         if cnpjs_externos:
             # Filtra sócios de todas as empresas irmãs mapeadas
             cnpjs_externos_unicos = list(set(cnpjs_externos))
-            df_exp_filtered = (
-                scan_teia_fonte_nivel3()
-                .filter(pl.col("cnpj_empresa").is_in(cnpjs_externos_unicos))
-                .collect()
+            df_exp_filtered = _read_teia_fonte(
+                "teia_fonte_nivel3", scan_teia_fonte_nivel3, "cnpj_empresa", cnpjs_externos_unicos
             )
             print(f"   -> Nivel 3: Encontrados {df_exp_filtered.height} vinculos de socios para {len(cnpjs_externos_unicos)} empresas N2.")
             
@@ -608,10 +762,8 @@ def sync_network(cnpj: str) -> None:
         
         print(f"   -> Nivel 4: Disparando busca para {len(cpfs_n3_trigger)} CPFs do Nivel 3...")
         if cpfs_n3_trigger:
-            df_n4_filtered = (
-                scan_teia_fonte_nivel4()
-                .filter(pl.col("cpf_cnpj_socio").is_in(cpfs_n3_trigger))
-                .collect()
+            df_n4_filtered = _read_teia_fonte(
+                "teia_fonte_nivel4", scan_teia_fonte_nivel4, "cpf_cnpj_socio", cpfs_n3_trigger
             )
             print(f"   -> Nivel 4: Encontradas {df_n4_filtered.height} empresas de expansao.")
             
@@ -694,6 +846,8 @@ def sync_network(cnpj: str) -> None:
         
         pl.DataFrame(n4_edges if n4_edges else [], schema=edge_schema).unique(subset=["id"], keep="first").write_parquet(N4_EDGES_PATH, compression="zstd")
 
+        _write_teia_manifest(cnpj_dir)
+
         ms = (time.perf_counter() - t0) * 1000
         print(f"Teia Completa (+Expansao) salva para {cnpj} ({ms:.1f}ms)")
 
@@ -0,0 +1,40 @@
+"""Busca textual de estabelecimentos (CNPJ, razao social, nome fantasia).
+
+O texto normalizado (sem acentos, minusculo) de cada CNPJ do perfil e
+calculado uma vez por geracao do cache; cada busca apenas filtra essa coluna
+com `str.contains` vetorizado e aplica as chaves encontradas ao frame da tela.
+"""
+
+from __future__ import annotations
+
+import polars as pl
+
+from data_cache import get_df_perfil_estabelecimento
+
+from ...utils.text_search import apply_token_search, build_search_index
+from .result_cache import ResultCache
+
+
+ESTABELECIMENTO_SEARCH_COLUMNS = ("cnpj", "razao_social", "nome_fantasia")
+
+_SEARCH_INDEX_CACHE = ResultCache(
+    "busca_estabelecimento",
+    ttl_seconds=24 * 3600,
+    max_entries=1,
+)
+
+
+def get_estabelecimento_search_index() -> pl.DataFrame:
+    """Frame (id_cnpj, texto normalizado) do perfil, montado uma vez por geracao."""
+    return _SEARCH_INDEX_CACHE.get_or_compute(
+        "perfil",
+        lambda: build_search_index(get_df_perfil_estabelecimento(), ESTABELECIMENTO_SEARCH_COLUMNS),
+    )
+
+
+def apply_estabelecimento_search(df: pl.DataFrame, query: str | None) -> pl.DataFrame:
+    """Filtra `df` (derivado do perfil, com id_cnpj) pela busca de estabelecimento."""
+    if not query or not query.strip() or df.is_empty():
+        return df
+    index = get_estabelecimento_search_index() if "id_cnpj" in df.columns else None
+    return apply_token_search(df, query, ESTABELECIMENTO_SEARCH_COLUMNS, index=index)
@@ -0,0 +1,195 @@
+"""Autocomplete de estabelecimentos no servidor (`/cnpj-lookup?q=`).
+
+Em vez de enviar a rede inteira para o navegador filtrar, o indice abaixo e
+montado uma vez por geracao do cache a partir de `get_rede_df()` e responde
+so os `limit` melhores resultados. Estruturas:
+
+- lista ordenada de palavras normalizadas (razao social, municipio e os
+  digitos do CNPJ) com a linha de origem: cada token da consulta vira um
+  intervalo por busca binaria (`bisect`) e os tokens sao combinados com E;
+- razoes sociais normalizadas ordenadas, para destacar nomes que comecam
+  exatamente pela consulta;
+- vocabulario para a tolerancia a erros de digitacao (distancia de edicao 1)
+  quando um token nao casa com nenhum prefixo.
+
+Ordenacao: nome comecando pela consulta (ou CNPJ pelo prefixo digitado),
+depois todos os tokens como prefixo de palavra, depois CNPJ contendo os
+digitos, por ultimo as correspondencias aproximadas; dentro de cada faixa,
+nomes mais curtos e ordem alfabetica.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import re
+
+import numpy as np
+import polars as pl
+
+from data_cache import get_rede_df
+
+from ...utils.text_search import normalize_search_expr, normalize_search_text
+from .result_cache import ResultCache
+
+
+DEFAULT_LIMIT = 40
+MAX_LIMIT = 200
+MIN_QUERY_LENGTH = 2
+# Tokens menores que isso nao recebem correcao aproximada (ruido demais).
+_FUZZY_MIN_LENGTH = 4
+_FUZZY_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+_NUMERIC_SUBSTRING_MIN = 4
+_PREFIX_END = "\U0010ffff"
+
+_TIER_NAME_PREFIX = 0
+_TIER_TOKENS = 1
+_TIER_CNPJ_SUBSTRING = 2
+_TIER_FUZZY = 3
+_NO_MATCH = 9
+
+
+def _edits1(word: str) -> set[str]:
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in _FUZZY_ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in _FUZZY_ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class CnpjLookupIndex:
+    """Indice de prefixos sobre razao social, municipio e CNPJ da rede."""
+
+    def __init__(self, df: pl.DataFrame):
+        base = (
+            df.select(["cnpj", "razao_social", "municipio", "uf"])
+            .unique(subset=["cnpj"])
+            .sort(["razao_social", "cnpj"], nulls_last=True)
+            .with_columns([
+                normalize_search_expr(pl.col("razao_social")).alias("_nome"),
+                normalize_search_expr(pl.col("municipio")).alias("_municipio"),
+                pl.col("cnpj").cast(pl.Utf8).fill_null("").str.replace_all(r"\D", "").alias("_digitos"),
+            ])
+            .with_row_index("_row")
+        )
+        self.size = base.height
+        self._cnpj = base["cnpj"].to_list()
+        self._razao_social = base["razao_social"].to_list()
+        self._municipio = base["municipio"].to_list()
+        self._uf = base["uf"].to_list()
+        self._digits = base["_digitos"]
+        self._name_length = base["_nome"].str.len_chars().cast(pl.Int64).to_numpy()
+
+        names = base.select(["_nome", "_row"]).sort("_nome")
+        self._names = names["_nome"].to_list()
+        self._name_rows = names["_row"].cast(pl.Int32).to_numpy()
+
+        postings = (
+            pl.concat([
+                base.select(["_row", pl.col("_nome").str.split(" ").alias("_palavra")]),
+                base.select(["_row", pl.col("_municipio").str.split(" ").alias("_palavra")]),
+                base.select(["_row", pl.concat_list(pl.col("_digitos")).alias("_palavra")]),
+            ])
+            .explode("_palavra")
+            .filter(pl.col("_palavra").str.len_chars() > 0)
+            .unique()
+            .sort(["_palavra", "_row"])
+        )
+        self._words = postings["_palavra"].to_list()
+        self._word_rows = postings["_row"].cast(pl.Int32).to_numpy()
+        self._vocabulary = frozenset(self._words)
+        self.nbytes = int(
+            base.estimated_size()
+            + names.estimated_size()
+            + postings.estimated_size()
+            + self._name_length.nbytes
+        )
+
+    def _range(self, sorted_values: list[str], prefix: str, exact: bool = False) -> tuple[int, int]:
+        lo = bisect_left(sorted_values, prefix)
+        hi = bisect_left(sorted_values, prefix + ("\x00" if exact else _PREFIX_END), lo)
+        return lo, hi
+
+    def _prefix_rows(self, token: str) -> np.ndarray:
+        lo, hi = self._range(self._words, token)
+        return self._word_rows[lo:hi]
+
+    def _fuzzy_rows(self, token: str) -> np.ndarray:
+        if len(token) < _FUZZY_MIN_LENGTH:
+            return self._word_rows[:0]
+        rows = []
+        for candidate in _edits1(token) & self._vocabulary:
+            lo, hi = self._range(self._words, candidate, exact=True)
+            rows.append(self._word_rows[lo:hi])
+        return np.concatenate(rows) if rows else self._word_rows[:0]
+
+    def search(self, query: str | None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        normalized = normalize_search_text(query)
+        if len(normalized) < MIN_QUERY_LENGTH or not self.size:
+            return []
+        digits = re.sub(r"\D", "", normalized)
+        numeric = bool(digits) and not re.search(r"[^\d\s./-]", normalized)
+        tokens = [digits] if numeric else normalized.split(" ")
+
+        matched = np.ones(self.size, dtype=bool)
+        fuzzy = False
+        for token in tokens:
+            rows = self._prefix_rows(token)
+            if not rows.size:
+                rows = self._fuzzy_rows(token)
+                fuzzy = True
+            token_mask = np.zeros(self.size, dtype=bool)
+            token_mask[rows] = True
+            matched &= token_mask
+
+        tier = np.full(self.size, _NO_MATCH, dtype=np.int64)
+        tier[matched] = _TIER_FUZZY if fuzzy else _TIER_TOKENS
+        if numeric:
+            tier[self._prefix_rows(digits)] = _TIER_NAME_PREFIX
+            # Busca por trecho do CNPJ so quando os prefixos nao bastam (varre a rede).
+            if len(digits) >= _NUMERIC_SUBSTRING_MIN and np.count_nonzero(tier < _NO_MATCH) < limit:
+                contains = self._digits.str.contains(digits, literal=True).to_numpy()
+                tier[contains & (tier == _NO_MATCH)] = _TIER_CNPJ_SUBSTRING
+        else:
+            lo, hi = self._range(self._names, normalized)
+            tier[self._name_rows[lo:hi]] = _TIER_NAME_PREFIX
+
+        candidates = np.flatnonzero(tier < _NO_MATCH)
+        if not candidates.size:
+            return []
+        # Linhas ja estao em ordem alfabetica: o indice desempata.
+        rank = (tier[candidates] << 42) + (self._name_length[candidates] << 21) + candidates
+        if candidates.size > limit:
+            top = np.argpartition(rank, limit - 1)[:limit]
+            candidates, rank = candidates[top], rank[top]
+        return [
+            {
+                "cnpj": self._cnpj[row],
+                "razao_social": self._razao_social[row],
+                "municipio": self._municipio[row],
+                "uf": self._uf[row],
+            }
+            for row in candidates[np.argsort(rank, kind="stable")].tolist()
+        ]
+
+
+_LOOKUP_INDEX_CACHE = ResultCache(
+    "cnpj_lookup",
+    ttl_seconds=24 * 3600,
+    max_entries=1,
+    sizer=lambda index: index.nbytes,
+)
+
+
+def get_cnpj_lookup_index() -> CnpjLookupIndex:
+    """Indice da geracao atual, montado no primeiro uso."""
+    return _LOOKUP_INDEX_CACHE.get_or_compute("rede", lambda: CnpjLookupIndex(get_rede_df()))
+
+
+def search_cnpj_lookup(query: str | None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+    """Top-`limit` estabelecimentos para o texto digitado (CNPJ, razao social ou municipio)."""
+    try:
+        return get_cnpj_lookup_index().search(query, max(1, min(limit, MAX_LIMIT)))
+    except Exception as e:
+        print(f"⚠️ Erro ao buscar autocomplete de CNPJs: {e}")
+        return []
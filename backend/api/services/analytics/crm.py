@@ -23,6 +23,8 @@ from data_cache import (
     get_df_perfil_estabelecimento,
     get_cache_dir,
 )
+from parquet_index import read_key_slice
+from ...utils.columnar import ColumnarPayload
 from ...schemas.analytics import (
     AnalyticsKPISchema,
     ResultadoSentinelaUFSchema,
@@ -70,6 +72,7 @@ from ...schemas.analytics import (
 )
 
 from ._cache import _get_cnpj_cache_dir
+from .crm_timeline import CrmTimeline, get_crm_timeline
 from cache_producers.crm import (
     load_or_sync_crm_data,
     load_or_sync_crm_multi_alertas,
@@ -982,17 +985,6 @@ def _load_crm_unico_alertas(cnpj: str, cnpj_dir: str) -> pl.DataFrame:
     return result.df if result.df is not None else pl.DataFrame()
 
 
-def _crm_hour_alert_types(hour: dict[str, Any]) -> list[str]:
-    alert_types = []
-    if _to_int(hour.get("is_volume_horario_anomalo")) == 1:
-        alert_types.append("volume_horario")
-    if _to_int(hour.get("is_crm_unico")) == 1:
-        alert_types.append("crm_unico")
-    if _to_int(hour.get("is_crm_multiplo")) == 1:
-        alert_types.append("crm_multiplo")
-    return alert_types
-
-
 def _filter_crm_date_range(df: pl.DataFrame, date_col: str, data_inicio: str | None, data_fim: str | None) -> pl.DataFrame:
     if df.is_empty():
         return df
@@ -1010,72 +1002,8 @@ def _sum_timing(*values: float | None) -> float | None:
     return total or None
 
 
-def _build_timeline_hours_by_date(df: pl.DataFrame) -> dict[str, list[dict[str, Any]]]:
-    activity: dict[tuple[str, int], dict[str, Any]] = {}
-    dates: set[str] = set()
-    for r in df.iter_rows(named=True):
-        dt = str(r["dt_janela"])[:10]
-        hour = _to_int(r.get("hr_janela"))
-        activity[(dt, hour)] = r
-        dates.add(dt)
-
-    hours_by_date: dict[str, list[dict[str, Any]]] = {}
-    for dt in sorted(dates):
-        day_hours = []
-        for hour in range(24):
-            row = activity.get((dt, hour))
-            item = {
-                "dt_janela": dt,
-                "hr_janela": hour,
-                "nu_prescricoes": _to_int(row.get("nu_prescricoes")) if row else 0,
-                "nu_crms_diferentes": _to_int(row.get("nu_crms_diferentes")) if row else 0,
-                "mediana_hora": _to_float(row.get("mediana_hora")) if row else 0.0,
-                "is_volume_horario_anomalo": _to_int(row.get("is_volume_horario_anomalo")) if row else 0,
-                "is_crm_unico": _to_int(row.get("is_crm_unico")) if row else 0,
-                "is_crm_multiplo": _to_int(row.get("is_crm_multiplo")) if row else 0,
-            }
-            item["is_hora_com_alerta"] = 1 if (
-                item["is_volume_horario_anomalo"] == 1
-                or item["is_crm_unico"] == 1
-                or item["is_crm_multiplo"] == 1
-            ) else 0
-            item["alert_types"] = _crm_hour_alert_types(item)
-            day_hours.append(item)
-        hours_by_date[dt] = day_hours
-    return hours_by_date
-
-
-def _build_timeline_events_by_date(df_events: pl.DataFrame) -> dict[str, list[dict[str, Any]]]:
-    events_by_date: dict[str, list[dict[str, Any]]] = {}
-    if df_events.is_empty():
-        return events_by_date
-
-    for r in df_events.iter_rows(named=True):
-        dt = str(r["dt_janela"])[:10]
-        event = {
-            "dt_janela": dt,
-            "tipo": r["tipo"],
-            "hora_inicio": r["hora_inicio"],
-            "hora_fim": r["hora_fim"],
-            "minuto_inicio": _to_int(r.get("minuto_inicio")),
-            "minuto_fim": _to_int(r.get("minuto_fim")),
-            "severidade": r["severidade"],
-            "id_medico": r["id_medico"],
-            "nu_crms_distintos": r["nu_crms_distintos"],
-        }
-        events_by_date.setdefault(dt, []).append(event)
-
-    for dt, events in events_by_date.items():
-        events_by_date[dt] = sorted(events, key=lambda item: _to_int(item.get("minuto_inicio")))
-    return events_by_date
-
-
-def get_crm_timeline_dataset(
-    cnpj: str,
-    data_inicio: str | None = None,
-    data_fim: str | None = None
-) -> CrmTimelineDatasetResponse:
-    """Retorna o dataset semantico da aba Linha do tempo & Raio-X agrupado por dia."""
+def _build_crm_timeline(cnpj: str) -> CrmTimeline:
+    """Carrega (gerando se preciso) os tres Parquets da timeline e monta o artefato."""
     daily_result = load_or_sync_crm_timeline_dia(cnpj)
     if daily_result.error:
         _raise_cache_unavailable("Timeline diaria CRM", daily_result.error)
@@ -1086,86 +1014,48 @@ def get_crm_timeline_dataset(
     if events_result.error:
         _raise_cache_unavailable("Timeline de eventos CRM", events_result.error)
 
-    df_daily = daily_result.df if daily_result.df is not None else pl.DataFrame()
-    df_hourly = hourly_result.df if hourly_result.df is not None else pl.DataFrame()
-    df_events = events_result.df if events_result.df is not None else pl.DataFrame()
-
-    df_daily = _filter_crm_date_range(df_daily, "dt_janela", data_inicio, data_fim)
-    df_hourly = _filter_crm_date_range(df_hourly, "dt_janela", data_inicio, data_fim)
-    df_events = _filter_crm_date_range(df_events, "dt_janela", data_inicio, data_fim)
+    results = (daily_result, hourly_result, events_result)
+    meta = {
+        "from_cache": bool(all(result.from_cache for result in results)),
+        "daily_from_cache": bool(daily_result.from_cache),
+        "hourly_from_cache": bool(hourly_result.from_cache),
+        "read_time_ms": _sum_timing(*(result.read_time_ms for result in results)),
+        "query_time_ms": _sum_timing(*(result.query_time_ms for result in results)),
+        "save_time_ms": _sum_timing(*(result.save_time_ms for result in results)),
+    }
+    return CrmTimeline(
+        daily_result.df if daily_result.df is not None else pl.DataFrame(),
+        hourly_result.df if hourly_result.df is not None else pl.DataFrame(),
+        events_result.df if events_result.df is not None else pl.DataFrame(),
+        meta,
+    )
 
-    hours_by_date = _build_timeline_hours_by_date(df_hourly)
-    events_by_date = _build_timeline_events_by_date(df_events)
 
-    raio_x_result = sync_crm_raiox_tx(cnpj)
-    if raio_x_result.error:
-        _raise_cache_unavailable("Raio-X CRM", raio_x_result.error)
+def get_crm_timeline_dataset(
+    cnpj: str,
+    data_inicio: str | None = None,
+    data_fim: str | None = None
+) -> CrmTimelineDatasetResponse:
+    """Retorna o dataset semantico da aba Linha do tempo & Raio-X agrupado por dia."""
+    timeline, meta = get_crm_timeline(cnpj, lambda: _build_crm_timeline(cnpj))
+    days = timeline.nested_days(data_inicio, data_fim).to_dicts()
+    return CrmTimelineDatasetResponse(cnpj=cnpj, days=days, **meta)
 
-    days = []
-    for r in df_daily.iter_rows(named=True):
-        day = {
-            "dt_janela": str(r["dt_janela"])[:10],
-            "competencia": _to_int(r.get("competencia")),
-            "nu_prescricoes_dia": _to_int(r.get("nu_prescricoes_dia")),
-            "nu_crms_distintos": _to_int(r.get("nu_crms_distintos")),
-            "mediana_diaria": _to_float(r.get("mediana_diaria")),
-            "is_dia_com_volume_horario_anomalo": _to_int(r.get("is_dia_com_volume_horario_anomalo")),
-            "is_anomalo_unico": _to_int(r.get("is_anomalo_unico")),
-            "is_crm_multiplo": _to_int(r.get("is_crm_multiplo")),
-        }
-        key = str(day["dt_janela"])[:10]
-        day["is_volume_horario_anomalo"] = _to_int(day.get("is_dia_com_volume_horario_anomalo"))
-        day["is_crm_unico"] = _to_int(day.get("is_anomalo_unico"))
-        day["is_anomalo"] = 1 if (
-            day["is_volume_horario_anomalo"] == 1
-            or day["is_crm_unico"] == 1
-            or day["is_crm_multiplo"] == 1
-        ) else 0
-        day["score_crm_unico_hora"] = r.get("score_crm_unico_hora")
-        day["score_crm_unico_qtd"] = r.get("score_crm_unico_qtd")
-        day["score_crm_unico_minutos"] = r.get("score_crm_unico_minutos")
-        day["score_crm_unico_medico"] = r.get("score_crm_unico_medico")
-        day["score_crm_multiplo_hora"] = r.get("score_crm_multiplo_hora")
-        day["score_crm_multiplo_qtd"] = r.get("score_crm_multiplo_qtd")
-        day["score_crm_multiplo_minutos"] = r.get("score_crm_multiplo_minutos")
-        day["score_crm_multiplo_crms"] = r.get("score_crm_multiplo_crms")
-        day["hours"] = hours_by_date.get(key, [])
-        day["events"] = events_by_date.get(key, [])
-        days.append(day)
-
-    read_time_ms = _sum_timing(
-        daily_result.read_time_ms,
-        hourly_result.read_time_ms,
-        events_result.read_time_ms,
-        raio_x_result.read_time_ms,
-    )
-    query_time_ms = _sum_timing(
-        daily_result.query_time_ms,
-        hourly_result.query_time_ms,
-        events_result.query_time_ms,
-        raio_x_result.query_time_ms,
-    )
-    save_time_ms = _sum_timing(
-        daily_result.save_time_ms,
-        hourly_result.save_time_ms,
-        events_result.save_time_ms,
-        raio_x_result.save_time_ms,
-    )
 
-    return CrmTimelineDatasetResponse(
-        cnpj=cnpj,
-        days=days,
-        from_cache=bool(
-            daily_result.from_cache
-            and hourly_result.from_cache
-            and events_result.from_cache
-            and raio_x_result.from_cache
-        ),
-        daily_from_cache=bool(daily_result.from_cache),
-        hourly_from_cache=bool(hourly_result.from_cache),
-        read_time_ms=read_time_ms,
-        query_time_ms=query_time_ms,
-        save_time_ms=save_time_ms,
+def get_crm_timeline_dataset_columnar(
+    cnpj: str,
+    data_inicio: str | None = None,
+    data_fim: str | None = None
+) -> ColumnarPayload:
+    """Mesmo dataset de `get_crm_timeline_dataset` em tabelas `days`, `hours` e `events`.
+
+    `hours` traz as 24 horas de cada dia com atividade horaria (zeros nas
+    horas sem prescricao), como a resposta aninhada.
+    """
+    timeline, meta = get_crm_timeline(cnpj, lambda: _build_crm_timeline(cnpj))
+    return ColumnarPayload(
+        tables=timeline.tables(data_inicio, data_fim),
+        meta={"cnpj": cnpj, **meta},
     )
 
 def _format_alert_time(value) -> Optional[str]:
@@ -1191,28 +1081,35 @@ def _extract_alert_hour(value) -> Optional[int]:
     except (TypeError, ValueError):
         return None
 
-def _alert_overlaps_hour(start_value, end_value, hour: Optional[int]) -> bool:
-    if hour is None:
-        return True
-
-    target_hour = hour
-    start_hour = _extract_alert_hour(start_value)
-    end_hour = _extract_alert_hour(end_value)
-
-    if start_hour is None and end_hour is None:
-        return False
-
-    if start_hour is None:
-        start_hour = end_hour
-    if end_hour is None:
-        end_hour = start_hour
-
-    if start_hour is None or end_hour is None:
-        return False
-
-    if end_hour < start_hour:
-        return target_hour >= start_hour or target_hour <= end_hour
-    return start_hour <= target_hour <= end_hour
+def _alert_hour_expr(column: str, dtype: pl.DataType) -> pl.Expr:
+    """Versao vetorizada de `_extract_alert_hour` (hora inteira ou nulo)."""
+    if isinstance(dtype, (pl.Datetime, pl.Time)):
+        return pl.col(column).dt.hour().cast(pl.Int32)
+    text_value = pl.col(column).cast(pl.Utf8)
+    time_part = (
+        pl.when(text_value.str.contains(" ", literal=True))
+        .then(text_value.str.splitn(" ", 2).struct.field("field_1"))
+        .otherwise(text_value)
+    )
+    return time_part.str.slice(0, 2).str.strip_chars().cast(pl.Int32, strict=False)
+
+
+def _alert_overlaps_hour_expr(df: pl.DataFrame, start_column: str, end_column: str, hour: int) -> pl.Expr:
+    """Alertas cujo intervalo [inicio, fim] (em horas, podendo virar a meia-noite) cobre `hour`.
+
+    Sem uma das pontas, usa a outra; sem as duas, o alerta fica de fora.
+    """
+    start_hour = _alert_hour_expr(start_column, df.schema[start_column])
+    end_hour = _alert_hour_expr(end_column, df.schema[end_column])
+    start = pl.coalesce(start_hour, end_hour)
+    end = pl.coalesce(end_hour, start_hour)
+    target = pl.lit(hour, dtype=pl.Int32)
+    return (
+        pl.when(end < start)
+        .then((target >= start) | (target <= end))
+        .otherwise((start <= target) & (target <= end))
+        .fill_null(False)
+    )
 
 def _load_crm_multi_alertas(cnpj: str, cnpj_dir: str) -> pl.DataFrame:
     result = load_or_sync_crm_multi_alertas(cnpj)
@@ -1236,11 +1133,12 @@ def get_crm_raio_x(cnpj: str, date_str: str, hour: Optional[int] = None) -> "Crm
     try:
         import time as _time
 
-        if os.path.exists(parquet_path):
-            filter_expr = pl.col("dt_janela").cast(pl.Utf8).str.slice(0, 10) == date_str
-            if hour is not None:
-                filter_expr = filter_expr & (pl.col("hr_janela") == hour)
+        try:
+            day = date.fromisoformat(date_str[:10])
+        except ValueError:
+            day = None
 
+        if os.path.exists(parquet_path) and day is not None:
             tx_columns = [
                 "data_hora",
                 "num_autorizacao",
@@ -1248,13 +1146,20 @@ def get_crm_raio_x(cnpj: str, date_str: str, hour: Optional[int] = None) -> "Crm
                 "valor_pago",
             ]
 
+            # O Raio-X local e ordenado por (dia, hora) e indexado por dia:
+            # le so as linhas do dia; a hora filtra esse trecho em memoria.
             t0 = _time.perf_counter()
-            filtered_df = (
-                pl.scan_parquet(parquet_path)
-                .filter(filter_expr)
-                .select(tx_columns)
-                .collect()
-            )
+            day_df = read_key_slice(parquet_path, "dt_janela", day, columns=["hr_janela", *tx_columns])
+            if day_df is None:
+                day_df = (
+                    pl.scan_parquet(parquet_path)
+                    .filter(pl.col("dt_janela") == day)
+                    .select(["hr_janela", *tx_columns])
+                    .collect()
+                )
+            if hour is not None:
+                day_df = day_df.filter(pl.col("hr_janela") == hour)
+            filtered_df = day_df.select(tx_columns)
             read_time_ms = round((_time.perf_counter() - t0) * 1000, 1)
 
             if not filtered_df.is_empty():
@@ -1287,14 +1192,7 @@ def get_crm_raio_x(cnpj: str, date_str: str, hour: Optional[int] = None) -> "Crm
             day_unico = df_unico.filter(pl.col("dt_alerta").cast(pl.Utf8).str.slice(0, 10) == date_str)
             if hour is not None:
                 day_unico = day_unico.filter(
-                    pl.struct(["dt_ini_hora", "dt_fim_hora"]).map_elements(
-                        lambda r: _alert_overlaps_hour(
-                            r.get("dt_ini_hora"),
-                            r.get("dt_fim_hora"),
-                            hour,
-                        ),
-                        return_dtype=pl.Boolean,
-                    )
+                    _alert_overlaps_hour_expr(day_unico, "dt_ini_hora", "dt_fim_hora", hour)
                 )
             for r in day_unico.iter_rows(named=True):
                 ritmo_qtd = _to_int(r.get("nu_prescricoes_dia"))
@@ -1326,14 +1224,7 @@ def get_crm_raio_x(cnpj: str, date_str: str, hour: Optional[int] = None) -> "Crm
             day_multi = df_multi.filter(pl.col("dt_dia").cast(pl.Utf8).str.slice(0, 10) == date_str)
             if hour is not None:
                 day_multi = day_multi.filter(
-                    pl.struct(["dt_ini_concentracao", "dt_fim_concentracao"]).map_elements(
-                        lambda r: _alert_overlaps_hour(
-                            r.get("dt_ini_concentracao"),
-                            r.get("dt_fim_concentracao"),
-                            hour,
-                        ),
-                        return_dtype=pl.Boolean,
-                    )
+                    _alert_overlaps_hour_expr(day_multi, "dt_ini_concentracao", "dt_fim_concentracao", hour)
                 )
 
             alertas_multi = []
@@ -0,0 +1,346 @@
+"""Linha do tempo CRM pre-calculada por CNPJ, fatiada por periodo.
+
+A aba Linha do tempo & Raio-X lia a cada chamada os tres Parquets da
+timeline (dia, hora e eventos), filtrava o periodo comparando datas como
+texto, montava dicionarios por data em Python (24 horas por dia, eventos por
+minuto) e ainda percorria os dias linha a linha. Para um CNPJ com nove anos
+de movimento sao milhares de dias e dezenas de milhares de horas por clique.
+
+`CrmTimeline` monta uma vez, a partir dos tres frames completos:
+
+- as tabelas colunares `days`, `hours` (grade de 24 horas por dia com
+  atividade) e `events`, ordenadas por dt_janela;
+- `nested`: um dia por linha com as listas `hours` e `events` ja agrupadas,
+  no formato da resposta aninhada.
+
+Um periodo vira um intervalo de linhas, localizado por busca binaria nas
+datas ordenadas (`slice` do Polars, sem copia). O artefato fica em um
+`ResultCache` por CNPJ, com a chave incluindo mtime/tamanho dos Parquets
+locais e globais da timeline: um Parquet regerado monta um artefato novo.
+`SENTINELA_CRM_TIMELINE_CACHE=0` monta o artefato a cada requisicao, com o
+mesmo resultado.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+import polars as pl
+
+from cache_files import (
+    CRM_TIMELINE_DIA_GLOBAL_PARQUET,
+    CRM_TIMELINE_DIA_PARQUET,
+    CRM_TIMELINE_EVENTOS_GLOBAL_PARQUET,
+    CRM_TIMELINE_EVENTOS_PARQUET,
+    CRM_TIMELINE_HORA_GLOBAL_PARQUET,
+    CRM_TIMELINE_HORA_PARQUET,
+)
+from data_cache import get_cache_dir
+
+from ._cache import _get_cnpj_cache_dir
+from .result_cache import ResultCache
+
+
+_TIMELINE_DAY_SCORE_COLS = (
+    "score_crm_unico_hora",
+    "score_crm_unico_qtd",
+    "score_crm_unico_minutos",
+    "score_crm_unico_medico",
+    "score_crm_multiplo_hora",
+    "score_crm_multiplo_qtd",
+    "score_crm_multiplo_minutos",
+    "score_crm_multiplo_crms",
+)
+_TIMELINE_HOUR_COLS = (
+    "nu_prescricoes",
+    "nu_crms_diferentes",
+    "is_volume_horario_anomalo",
+    "is_crm_unico",
+    "is_crm_multiplo",
+)
+_EVENT_COLS = (
+    "dt_janela",
+    "tipo",
+    "hora_inicio",
+    "hora_fim",
+    "minuto_inicio",
+    "minuto_fim",
+    "severidade",
+    "id_medico",
+    "nu_crms_distintos",
+)
+_HOURS_SCHEMA = {
+    "dt_janela": pl.Utf8,
+    "hr_janela": pl.Int64,
+    **{col: pl.Int64 for col in _TIMELINE_HOUR_COLS},
+    "mediana_hora": pl.Float64,
+}
+_EVENTS_SCHEMA = {
+    "dt_janela": pl.Utf8,
+    "tipo": pl.Utf8,
+    "hora_inicio": pl.Utf8,
+    "hora_fim": pl.Utf8,
+    "minuto_inicio": pl.Int64,
+    "minuto_fim": pl.Int64,
+    "severidade": pl.Utf8,
+    "id_medico": pl.Utf8,
+    "nu_crms_distintos": pl.Int32,
+}
+# Arquivos que definem o artefato: os Parquets por CNPJ e os globais de que
+# sao derivados (um global mais novo faz o loader regerar o local).
+_LOCAL_FILES = (CRM_TIMELINE_DIA_PARQUET, CRM_TIMELINE_HORA_PARQUET, CRM_TIMELINE_EVENTOS_PARQUET)
+_GLOBAL_FILES = (
+    CRM_TIMELINE_DIA_GLOBAL_PARQUET,
+    CRM_TIMELINE_HORA_GLOBAL_PARQUET,
+    CRM_TIMELINE_EVENTOS_GLOBAL_PARQUET,
+)
+
+
+def crm_timeline_cache_enabled() -> bool:
+    return (os.getenv("SENTINELA_CRM_TIMELINE_CACHE") or "1").strip().lower() not in {"0", "false", "nao", "off"}
+
+
+def _int_col(df: pl.DataFrame, col: str) -> pl.Expr:
+    if col not in df.columns:
+        return pl.lit(0, dtype=pl.Int64).alias(col)
+    return pl.col(col).cast(pl.Int64, strict=False).fill_null(0).alias(col)
+
+
+def _float_col(df: pl.DataFrame, col: str) -> pl.Expr:
+    if col not in df.columns:
+        return pl.lit(0.0, dtype=pl.Float64).alias(col)
+    return pl.col(col).cast(pl.Float64, strict=False).fill_null(0.0).alias(col)
+
+
+def _dt_janela_col() -> pl.Expr:
+    return pl.col("dt_janela").cast(pl.Utf8).str.slice(0, 10).alias("dt_janela")
+
+
+def _timeline_date_bounds(data_inicio: str | None, data_fim: str | None) -> tuple[str | None, str | None]:
+    """Limites inclusivos em texto (YYYY-MM vira o primeiro/ultimo dia do mes)."""
+    d_ini = (data_inicio if len(data_inicio) == 10 else f"{data_inicio}-01") if data_inicio else None
+    d_fim = (data_fim if len(data_fim) == 10 else f"{data_fim}-31") if data_fim else None
+    return d_ini, d_fim
+
+
+def _days_table(df_daily: pl.DataFrame) -> pl.DataFrame:
+    if df_daily.is_empty():
+        return pl.DataFrame(schema={"dt_janela": pl.Utf8})
+    return df_daily.select([
+        _dt_janela_col(),
+        _int_col(df_daily, "competencia"),
+        _int_col(df_daily, "nu_prescricoes_dia"),
+        _int_col(df_daily, "nu_crms_distintos"),
+        _float_col(df_daily, "mediana_diaria"),
+        _int_col(df_daily, "is_dia_com_volume_horario_anomalo"),
+        _int_col(df_daily, "is_anomalo_unico"),
+        _int_col(df_daily, "is_crm_multiplo"),
+        *(
+            pl.col(col) if col in df_daily.columns else pl.lit(None).alias(col)
+            for col in _TIMELINE_DAY_SCORE_COLS
+        ),
+    ]).with_columns([
+        pl.col("is_dia_com_volume_horario_anomalo").alias("is_volume_horario_anomalo"),
+        pl.col("is_anomalo_unico").alias("is_crm_unico"),
+        (
+            (pl.col("is_dia_com_volume_horario_anomalo") == 1)
+            | (pl.col("is_anomalo_unico") == 1)
+            | (pl.col("is_crm_multiplo") == 1)
+        ).cast(pl.Int64).alias("is_anomalo"),
+    ]).sort("dt_janela", maintain_order=True)
+
+
+def _hours_table(df_hourly: pl.DataFrame, days: pl.DataFrame) -> pl.DataFrame:
+    """Grade de 24 horas para cada dia com atividade horaria (zeros nas horas vazias)."""
+    if df_hourly.is_empty():
+        hourly = pl.DataFrame(schema=_HOURS_SCHEMA)
+    else:
+        hourly = df_hourly.select([
+            _dt_janela_col(),
+            _int_col(df_hourly, "hr_janela"),
+            *(_int_col(df_hourly, col) for col in _TIMELINE_HOUR_COLS),
+            _float_col(df_hourly, "mediana_hora"),
+        ]).unique(subset=["dt_janela", "hr_janela"], keep="last", maintain_order=True)
+    grid = (
+        days.select("dt_janela")
+        .unique()
+        .join(hourly.select("dt_janela"), on="dt_janela", how="semi")
+        .join(pl.DataFrame({"hr_janela": pl.int_range(0, 24, eager=True, dtype=pl.Int64)}), how="cross")
+    )
+    hours = grid.join(hourly, on=["dt_janela", "hr_janela"], how="left").with_columns(
+        [pl.col(col).fill_null(0) for col in _TIMELINE_HOUR_COLS]
+        + [pl.col("mediana_hora").fill_null(0.0)]
+    )
+    return hours.with_columns(
+        pl.concat_list([
+            pl.when(pl.col("is_volume_horario_anomalo") == 1).then(pl.lit("volume_horario")),
+            pl.when(pl.col("is_crm_unico") == 1).then(pl.lit("crm_unico")),
+            pl.when(pl.col("is_crm_multiplo") == 1).then(pl.lit("crm_multiplo")),
+        ]).list.drop_nulls().alias("alert_types"),
+    ).with_columns(
+        (pl.col("alert_types").list.len() > 0).cast(pl.Int64).alias("is_hora_com_alerta"),
+    ).sort(["dt_janela", "hr_janela"])
+
+
+def _events_table(df_events: pl.DataFrame, days: pl.DataFrame) -> pl.DataFrame:
+    if df_events.is_empty():
+        return pl.DataFrame(schema=_EVENTS_SCHEMA)
+    return df_events.select([
+        _dt_janela_col(),
+        "tipo",
+        "hora_inicio",
+        "hora_fim",
+        _int_col(df_events, "minuto_inicio"),
+        _int_col(df_events, "minuto_fim"),
+        "severidade",
+        "id_medico",
+        "nu_crms_distintos",
+    ]).join(days.select("dt_janela").unique(), on="dt_janela", how="semi").sort(
+        ["dt_janela", "minuto_inicio"], maintain_order=True
+    )
+
+
+def _nested_days(days: pl.DataFrame, hours: pl.DataFrame, events: pl.DataFrame) -> pl.DataFrame:
+    """Um dia por linha com as listas `hours` e `events` da resposta aninhada."""
+    if days.is_empty():
+        return days
+    hours_by_day = hours.group_by("dt_janela", maintain_order=True).agg(
+        pl.struct(["dt_janela", "hr_janela", *_TIMELINE_HOUR_COLS, "mediana_hora", "is_hora_com_alerta", "alert_types"])
+        .alias("hours")
+    )
+    events_by_day = events.select(_EVENT_COLS).group_by("dt_janela", maintain_order=True).agg(
+        pl.struct(list(_EVENT_COLS)).alias("events")
+    )
+    nested = (
+        days.join(hours_by_day, on="dt_janela", how="left", maintain_order="left")
+        .join(events_by_day, on="dt_janela", how="left", maintain_order="left")
+    )
+    return nested.with_columns(
+        pl.col("hours").fill_null(pl.lit([], dtype=nested.schema["hours"])),
+        pl.col("events").fill_null(pl.lit([], dtype=nested.schema["events"])),
+    )
+
+
+class _DateIndex:
+    """Posicoes de um frame ordenado por dt_janela (nulos primeiro)."""
+
+    def __init__(self, df: pl.DataFrame):
+        column = df["dt_janela"] if "dt_janela" in df.columns else pl.Series(dtype=pl.Utf8)
+        self.nulls = column.null_count()
+        self.dates = column.drop_nulls().to_numpy().astype("U10")
+        self.height = df.height
+
+    def range(self, d_ini: str | None, d_fim: str | None) -> tuple[int, int]:
+        if d_ini is None and d_fim is None:
+            return 0, self.height
+        start = np.searchsorted(self.dates, d_ini, side="left") if d_ini is not None else 0
+        end = np.searchsorted(self.dates, d_fim, side="right") if d_fim is not None else len(self.dates)
+        return self.nulls + int(start), self.nulls + max(int(start), int(end))
+
+
+class CrmTimeline:
+    """Tabelas da timeline CRM de um CNPJ, prontas para fatiar por periodo."""
+
+    def __init__(
+        self,
+        df_daily: pl.DataFrame,
+        df_hourly: pl.DataFrame,
+        df_events: pl.DataFrame,
+        meta: dict[str, Any] | None = None,
+    ):
+        self.days = _days_table(df_daily)
+        self.hours = _hours_table(df_hourly, self.days)
+        self.events = _events_table(df_events, self.days)
+        self.nested = _nested_days(self.days, self.hours, self.events)
+        self.meta = meta or {}
+        self._indexes = {
+            "days": _DateIndex(self.days),
+            "hours": _DateIndex(self.hours),
+            "events": _DateIndex(self.events),
+        }
+
+    def _slice(self, name: str, df: pl.DataFrame, data_inicio: str | None, data_fim: str | None) -> pl.DataFrame:
+        start, end = self._indexes[name].range(*_timeline_date_bounds(data_inicio, data_fim))
+        return df.slice(start, end - start)
+
+    def tables(self, data_inicio: str | None = None, data_fim: str | None = None) -> dict[str, pl.DataFrame]:
+        """Tabelas `days`, `hours` e `events` do periodo (limites inclusivos)."""
+        return {
+            "days": self._slice("days", self.days, data_inicio, data_fim),
+            "hours": self._slice("hours", self.hours, data_inicio, data_fim),
+            "events": self._slice("events", self.events, data_inicio, data_fim),
+        }
+
+    def nested_days(self, data_inicio: str | None = None, data_fim: str | None = None) -> pl.DataFrame:
+        """Dias do periodo com as listas `hours` e `events`."""
+        return self._slice("days", self.nested, data_inicio, data_fim)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(
+            df.estimated_size()
+            for df in (self.days, self.hours, self.events, self.nested)
+        ))
+
+
+_CRM_TIMELINE_CACHE = ResultCache(
+    "crm_timeline",
+    ttl_seconds=3600,
+    max_entries=64,
+    max_mb=256,
+    sizer=lambda timeline: timeline.nbytes,
+)
+
+
+def _signature(paths: list[str]) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _timeline_key(cnpj: str) -> tuple:
+    cnpj_dir = _get_cnpj_cache_dir(cnpj)
+    paths = [os.path.join(cnpj_dir, filename) for filename in _LOCAL_FILES]
+    paths += [os.path.join(get_cache_dir(), filename) for filename in _GLOBAL_FILES]
+    return cnpj, _signature(paths)
+
+
+_CACHE_HIT_META = {
+    "from_cache": True,
+    "daily_from_cache": True,
+    "hourly_from_cache": True,
+    "read_time_ms": None,
+    "query_time_ms": None,
+    "save_time_ms": None,
+}
+
+
+def get_crm_timeline(cnpj: str, build: Callable[[], CrmTimeline]) -> tuple[CrmTimeline, dict[str, Any]]:
+    """Artefato da timeline do CNPJ + meta de cache da resposta.
+
+    `build` carrega os Parquets (gerando-os se preciso) e monta o artefato;
+    so roda quando os arquivos mudaram desde a ultima montagem.
+    """
+    if not crm_timeline_cache_enabled():
+        timeline = build()
+        return timeline, timeline.meta
+    key = _timeline_key(cnpj)
+    timeline = _CRM_TIMELINE_CACHE.get(key)
+    if timeline is not None:
+        return timeline, dict(_CACHE_HIT_META)
+    timeline = _CRM_TIMELINE_CACHE.get_or_compute(key, build)
+    # Se o build gerou ou regerou algum Parquet, a chave ja mudou: guarda o
+    # artefato tambem sob a chave atual para a proxima chamada nao remontar.
+    current_key = _timeline_key(cnpj)
+    if current_key != key:
+        _CRM_TIMELINE_CACHE.put(current_key, timeline)
+    return timeline, timeline.meta
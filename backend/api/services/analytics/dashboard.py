@@ -14,8 +14,11 @@ from data_cache import get_df, get_rede_df, get_df_bench_crm_regiao, get_df_benc
 from .alertas_alvos import build_perfil_filtrado
 from .dispersao_uf import get_dispersao_uf_sem_fronteira_id_cnpjs_df
 from .matriz_risco_dinamica import build_dynamic_matriz_risco
+from .movimentacao_cube import cnpj_period_totals
+from .indicator_rules import get_volume_atipico_aumento_minimo
+from .result_cache import ResultCache, make_filter_key
 
-from ...utils.text_search import apply_token_search
+from .busca_estabelecimento import apply_estabelecimento_search
 from ...schemas.analytics import (
     AnalyticsKPISchema,
     ProducaoSemestralPointSchema,
@@ -58,12 +61,33 @@ from ...schemas.analytics import (
     GtinDetalhamentoMensalItem,
 )
 
+_RESUMO_CACHE_TTL_SECONDS = 300
+_RESUMO_CACHE_MAX_ENTRIES = 128
+_RESUMO_CACHE_MB = 128
+
+
+# Respostas prontas do /analytics/resumo por conjunto de filtros. A chave nao
+# inclui a sessao do banco: o resumo sai inteiro dos caches globais.
+_RESUMO_CACHE = ResultCache(
+    "analytics_resumo",
+    ttl_seconds=_RESUMO_CACHE_TTL_SECONDS,
+    max_entries=_RESUMO_CACHE_MAX_ENTRIES,
+    max_mb=_RESUMO_CACHE_MB,
+)
+
+
 def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=None, perc_max=None, val_min=None, uf=None, regiao_saude=None, municipio=None, situacao_rf=None, conexao_ms=None, porte_empresa=None, grande_rede=None, cnpj_raiz=None, unidade_pf=None, razao_social=None, cnpjs: Optional[List[str]] = None, regiao_id: Optional[int] = None, id_ibge7: Optional[int] = None, volume_atipico: bool = False, volume_atipico_limite: Optional[float] = None, dispersao_uf_sem_fronteira: bool = False, dispersao_uf_sem_fronteira_limite: Optional[float] = None, par_teia: Optional[str] = None, socio_beneficio: Optional[str] = None, socio_esocial: Optional[str] = None, cnae_incompativel: bool = False, socio_idade_atipica: bool = False, socio_falecido: bool = False, estabelecimento: Optional[str] = None) -> AnalyticsResponse:
+    """Resumo analitico (KPIs, UF, municipios e CNPJs) com cache por filtros e geracao."""
+    filters = dict(data_inicio=data_inicio, data_fim=data_fim, perc_min=perc_min, perc_max=perc_max, val_min=val_min, uf=uf, regiao_saude=regiao_saude, municipio=municipio, situacao_rf=situacao_rf, conexao_ms=conexao_ms, porte_empresa=porte_empresa, grande_rede=grande_rede, cnpj_raiz=cnpj_raiz, unidade_pf=unidade_pf, razao_social=razao_social, cnpjs=cnpjs, regiao_id=regiao_id, id_ibge7=id_ibge7, volume_atipico=volume_atipico, volume_atipico_limite=volume_atipico_limite, dispersao_uf_sem_fronteira=dispersao_uf_sem_fronteira, dispersao_uf_sem_fronteira_limite=dispersao_uf_sem_fronteira_limite, par_teia=par_teia, socio_beneficio=socio_beneficio, socio_esocial=socio_esocial, cnae_incompativel=cnae_incompativel, socio_idade_atipica=socio_idade_atipica, socio_falecido=socio_falecido, estabelecimento=estabelecimento)
+    cache_key = (get_volume_atipico_aumento_minimo(), make_filter_key(**filters))
+    return _RESUMO_CACHE.get_or_compute(cache_key, lambda: _build_dashboard_data(**filters))
+
+
+def _build_dashboard_data(data_inicio=None, data_fim=None, perc_min=None, perc_max=None, val_min=None, uf=None, regiao_saude=None, municipio=None, situacao_rf=None, conexao_ms=None, porte_empresa=None, grande_rede=None, cnpj_raiz=None, unidade_pf=None, razao_social=None, cnpjs: Optional[List[str]] = None, regiao_id: Optional[int] = None, id_ibge7: Optional[int] = None, volume_atipico: bool = False, volume_atipico_limite: Optional[float] = None, dispersao_uf_sem_fronteira: bool = False, dispersao_uf_sem_fronteira_limite: Optional[float] = None, par_teia: Optional[str] = None, socio_beneficio: Optional[str] = None, socio_esocial: Optional[str] = None, cnae_incompativel: bool = False, socio_idade_atipica: bool = False, socio_falecido: bool = False, estabelecimento: Optional[str] = None) -> AnalyticsResponse:
     """
     Versão Unificada (Motor Polars): Calcula KPIs e análise por UF em tempo real.
     Garante consistência total entre as telas e alta performance via processamento em memória.
     """
-    print(f'DEBUG get_dashboard_data - cnae_incompativel: {cnae_incompativel}')
     try:
         def human_format(num):
             if num is None: return "0"
@@ -107,11 +131,9 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
         inicio = (data_inicio if data_inicio and data_inicio >= MIN_DATA else MIN_DATA) if data_inicio else MIN_DATA
         fim = data_fim if data_fim else MAX_DATA
 
-        df = get_df()
         perfil_df = get_df_perfil_estabelecimento()
 
-        # 2. Filtros cadastrais/geograficos no perfil; periodo na tabela fato.
-        mov_mask = pl.col("periodo").is_between(inicio, fim)
+        # 2. Filtros cadastrais/geograficos no perfil; periodo no cubo da tabela fato.
         perfil_mask = pl.lit(True)
         if uf and uf != 'Todos':                      perfil_mask = perfil_mask & (pl.col("uf") == uf)
         if regiao_id is not None:                     perfil_mask = perfil_mask & (pl.col("id_regiao_saude") == str(regiao_id))
@@ -133,10 +155,9 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
             perfil_mask = perfil_mask & (pl.col("cnpj").is_in(cnpjs))
 
         estabelecimento_query = estabelecimento or razao_social
-        perfil_filtrado = apply_token_search(
+        perfil_filtrado = apply_estabelecimento_search(
             perfil_df.filter(perfil_mask),
             estabelecimento_query,
-            ("cnpj", "razao_social", "nome_fantasia"),
         )
         perfil_filtrado = build_perfil_filtrado(
             perfil_filtrado,
@@ -152,9 +173,10 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
             volume_atipico_fim=fim,
             volume_atipico_limite=volume_atipico_limite,
         )
-        period_df = (
-            df.filter(mov_mask)
-            .join(perfil_filtrado.select("id_cnpj"), on="id_cnpj", how="semi")
+        # Totais do periodo por CNPJ saem do cubo de somas acumuladas; os
+        # agrupamentos abaixo operam sobre uma linha por CNPJ.
+        period_totals = cnpj_period_totals(inicio, fim).join(
+            perfil_filtrado.select("id_cnpj"), on="id_cnpj", how="semi"
         )
         if dispersao_uf_sem_fronteira:
             id_cnpjs_dispersao_df = get_dispersao_uf_sem_fronteira_id_cnpjs_df(
@@ -162,14 +184,15 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
                 fim,
                 dispersao_uf_sem_fronteira_limite,
             )
-            period_df = period_df.join(id_cnpjs_dispersao_df.select("id_cnpj"), on="id_cnpj", how="semi")
+            period_totals = period_totals.join(id_cnpjs_dispersao_df.select("id_cnpj"), on="id_cnpj", how="semi")
 
         # 3. Agregação Granular (CNPJ) para aplicação de filtros de Risco (% e Valor)
-        cnpj_agg = period_df.group_by("id_cnpj").agg([
-            pl.sum("total_vendas").alias("tv"),
-            pl.sum("total_sem_comprovacao").alias("tsc"),
-            pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("tqv"),
-            pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("tqsc"),
+        cnpj_agg = period_totals.select([
+            "id_cnpj",
+            pl.col("total_vendas").alias("tv"),
+            pl.col("total_sem_comprovacao").alias("tsc"),
+            pl.col("total_qnt_caixas_vendidas").alias("tqv"),
+            pl.col("total_qnt_caixas_sem_comprovacao").alias("tqsc"),
         ]).with_columns([
             (pl.col("tsc") / pl.when(pl.col("tv") > 0).then(pl.col("tv")).otherwise(None) * 100).fill_null(0).alias("pct")
         ])
@@ -188,22 +211,25 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
         qtd_mun = int(perfil_ok.select(pl.n_unique("no_municipio")).item() or 0)
         kpis = build_kpis(cnpj_ok.height, tv, tsc, pct, tqv, qtd_mun)
 
+        cnpj_enriched = cnpj_ok.join(perfil_ok, on="id_cnpj", how="inner")
+        breakdown_aggs = [
+            pl.n_unique("id_cnpj").alias("cnpjs"),
+            pl.sum("tv").alias("totalMov"),
+            pl.sum("tsc").alias("valSemComp"),
+            pl.sum("tqv").alias("totalQtde"),
+            pl.sum("tqsc").alias("qtdeSemComp"),
+        ]
+        perc_cols = [
+            (pl.col("valSemComp") / pl.when(pl.col("totalMov") > 0).then(pl.col("totalMov")).otherwise(None) * 100).alias("percValSemComp"),
+            (pl.col("qtdeSemComp") / pl.when(pl.col("totalQtde") > 0).then(pl.col("totalQtde")).otherwise(None) * 100).alias("percQtdeSemComp"),
+        ]
+
         # 5. Detalhamento por UF (Breakdown)
-        period_enriched = period_df.join(perfil_ok, on="id_cnpj", how="inner")
         uf_df = (
-            period_enriched
+            cnpj_enriched
             .group_by("uf")
-            .agg([
-                pl.n_unique("id_cnpj").alias("cnpjs"),
-                pl.sum("total_vendas").alias("totalMov"),
-                pl.sum("total_sem_comprovacao").alias("valSemComp"),
-                pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("totalQtde"),
-                pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("qtdeSemComp"),
-            ])
-            .with_columns([
-                (pl.col("valSemComp") / pl.when(pl.col("totalMov") > 0).then(pl.col("totalMov")).otherwise(None) * 100).alias("percValSemComp"),
-                (pl.col("qtdeSemComp") / pl.when(pl.col("totalQtde") > 0).then(pl.col("totalQtde")).otherwise(None) * 100).alias("percQtdeSemComp"),
-            ])
+            .agg(breakdown_aggs)
+            .with_columns(perc_cols)
             .sort("percValSemComp", descending=True, nulls_last=True)
         )
 
@@ -214,19 +240,10 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
 
         # 6. Agregação por Município
         muni_df = (
-            period_enriched
+            cnpj_enriched
             .group_by(["uf", "no_municipio", "id_ibge7"])
-            .agg([
-                pl.n_unique("id_cnpj").alias("cnpjs"),
-                pl.sum("total_vendas").alias("totalMov"),
-                pl.sum("total_sem_comprovacao").alias("valSemComp"),
-                pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("totalQtde"),
-                pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("qtdeSemComp"),
-            ])
-            .with_columns([
-                (pl.col("valSemComp") / pl.when(pl.col("totalMov") > 0).then(pl.col("totalMov")).otherwise(None) * 100).alias("percValSemComp"),
-                (pl.col("qtdeSemComp") / pl.when(pl.col("totalQtde") > 0).then(pl.col("totalQtde")).otherwise(None) * 100).alias("percQtdeSemComp"),
-            ])
+            .agg(breakdown_aggs)
+            .with_columns(perc_cols)
             .sort("percValSemComp", descending=True, nulls_last=True)
         )
 
@@ -237,28 +254,27 @@ def get_dashboard_data(db: Session, data_inicio=None, data_fim=None, perc_min=No
 
         # 7. Detalhamento por CNPJ (Sempre calculado)
         cnpj_df = (
-            period_enriched
-            .group_by("id_cnpj")
-            .agg([
-                pl.col("cnpj").first().alias("cnpj"),
-                pl.col("no_municipio").first().alias("municipio"),
-                pl.col("id_ibge7").first().alias("id_ibge7"),
-                pl.col("uf").first().alias("uf"),
-                pl.col("razao_social").first().alias("razao_social"),
-                pl.sum("total_vendas").alias("totalMov"),
-                pl.sum("total_sem_comprovacao").alias("valSemComp"),
-                pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("totalQtde"),
-                pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("qtdeSemComp"),
-                pl.col("is_grande_rede").first().alias("is_grande_rede"),
-                pl.col("qtd_estabelecimentos_rede").first().alias("qtd_estabelecimentos_rede"),
-                pl.col("situacao_rf").first().alias("situacao_rf"),
-                pl.col("porte_empresa").first().alias("porte_empresa"),
-                pl.col("is_conexao_ativa").first().alias("is_conexao_ativa"),
-                pl.col("is_matriz").first().fill_null(False).alias("is_matriz"),
+            cnpj_enriched
+            .select([
+                "id_cnpj",
+                "cnpj",
+                pl.col("no_municipio").alias("municipio"),
+                "id_ibge7",
+                "uf",
+                "razao_social",
+                pl.col("tv").alias("totalMov"),
+                pl.col("tsc").alias("valSemComp"),
+                pl.col("tqv").alias("totalQtde"),
+                pl.col("tqsc").alias("qtdeSemComp"),
+                "is_grande_rede",
+                "qtd_estabelecimentos_rede",
+                "situacao_rf",
+                "porte_empresa",
+                "is_conexao_ativa",
+                pl.col("is_matriz").fill_null(False),
             ])
             .with_columns([
-                (pl.col("valSemComp") / pl.when(pl.col("totalMov") > 0).then(pl.col("totalMov")).otherwise(None) * 100).alias("percValSemComp"),
-                (pl.col("qtdeSemComp") / pl.when(pl.col("totalQtde") > 0).then(pl.col("totalQtde")).otherwise(None) * 100).alias("percQtdeSemComp"),
+                *perc_cols,
                 (pl.col("municipio") + " / " + pl.col("uf")).alias("municipio_uf"),
             ])
             .sort("percValSemComp", descending=True, nulls_last=True)
@@ -337,10 +353,9 @@ def get_producao_semestral_data(db: Session, data_inicio=None, data_fim=None, pe
             perfil_mask = perfil_mask & (pl.col("cnpj").is_in(cnpjs))
 
         estabelecimento_query = estabelecimento or razao_social
-        perfil_filtrado = apply_token_search(
+        perfil_filtrado = apply_estabelecimento_search(
             perfil_df.filter(perfil_mask),
             estabelecimento_query,
-            ("cnpj", "razao_social", "nome_fantasia"),
         )
         perfil_filtrado = build_perfil_filtrado(
             perfil_filtrado,
@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 from data_cache import get_df, get_df_perfil_estabelecimento
 
 from ...schemas.analytics import FatorRiscoBucketSchema, FatorRiscoResponseSchema
-from ...utils.text_search import apply_token_search
+from .busca_estabelecimento import apply_estabelecimento_search
 from .alertas_alvos import build_perfil_filtrado
 from .dispersao_uf import get_dispersao_uf_sem_fronteira_id_cnpjs_df
 from .volume_atipico import get_volume_atipico_id_cnpjs_df
@@ -83,10 +83,9 @@ def get_fator_risco_data(
             else:
                 perfil_mask = perfil_mask & (pl.col("cnpj").str.slice(0, 8) == cnpj_raiz)
 
-        perfil_filtrado = apply_token_search(
+        perfil_filtrado = apply_estabelecimento_search(
             perfil_df.filter(perfil_mask),
             estabelecimento or razao_social,
-            ("cnpj", "razao_social", "nome_fantasia"),
         )
         perfil_filtrado = build_perfil_filtrado(
             perfil_filtrado,
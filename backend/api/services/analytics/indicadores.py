@@ -1,8 +1,6 @@
-from typing import Any, List, Literal, Optional, TypeVar
+from typing import Any, List, Literal, Optional
 from datetime import date
 import calendar
-import time
-from threading import RLock
 import polars as pl
 from sqlalchemy.orm import Session
 from sqlalchemy import text
@@ -12,7 +10,7 @@ import zlib
 import json
 import copy
 from decimal import Decimal, ROUND_HALF_UP
-from data_cache import get_df, get_rede_df, get_df_bench_crm_regiao, get_df_bench_crm_br, get_df_dados_farmacia, get_df_perfil_estabelecimento, get_cache_dir, get_cache_generation, scan_geografico_origem_uf
+from data_cache import get_df, get_rede_df, get_df_bench_crm_regiao, get_df_bench_crm_br, get_df_dados_farmacia, get_df_perfil_estabelecimento, get_cache_dir, scan_geografico_origem_uf
 from .indicator_config import (
     INDICATOR_MAPPING,
     INDICATOR_FLAGS as _INDICATOR_FLAGS,
@@ -26,8 +24,10 @@ from .matriz_risco_dinamica import (
 from .indicator_rules import CLINICA_VALOR_MINIMO_DETALHAMENTO, get_volume_atipico_aumento_minimo
 from .alertas_alvos import build_perfil_filtrado
 from .dispersao_uf import get_dispersao_uf_sem_fronteira_id_cnpjs_df
+from .result_cache import ResultCache
 from .geografico import UF_VIZINHAS, UF_BRASILEIRAS
-from ...utils.text_search import apply_token_search
+from .busca_estabelecimento import apply_estabelecimento_search
+from ...utils.columnar import ColumnarPayload
 from ...schemas.analytics import (
     AnalyticsKPISchema,
     ResultadoSentinelaUFSchema,
@@ -90,12 +90,12 @@ def _optional_float(value: object) -> float | None:
 
 
 def _apply_estabelecimento_search(df: pl.DataFrame, estabelecimento: str | None) -> pl.DataFrame:
-    return apply_token_search(df, estabelecimento, ("cnpj", "razao_social", "nome_fantasia"))
+    return apply_estabelecimento_search(df, estabelecimento)
 
 
 _INDICADOR_CACHE_TTL_SECONDS = 300
 _INDICADOR_CACHE_MAX_ENTRIES = 64
-_INDICADOR_CACHE_LOCK = RLock()
+_INDICADOR_CACHE_MB = 512
 
 _INDICADOR_VALOR_FINANCEIRO_COLS = {
     "percentual_nao_comprovacao": "valor_sem_comprovacao",
@@ -158,22 +158,20 @@ _INDICADOR_BENCHMARK_FORMATOS = {
     "crms_irregulares": "pct",
 }
 
-_INDICADOR_SCOPE_BASE_CACHE: dict[
-    tuple[object, ...],
-    tuple[float, tuple[pl.DataFrame, pl.DataFrame]],
-] = {}
-
-_INDICADOR_DATASET_CACHE: dict[tuple[object, ...], tuple[float, tuple[
-    pl.DataFrame,
-    pl.DataFrame,
-    pl.DataFrame,
-    str,
-    str,
-    str | None,
-    str,
-]]] = {}
-
-_IndicadorCachePayload = TypeVar("_IndicadorCachePayload")
+# Base filtrada por escopo (compartilhada entre indicadores) e dataset final
+# por indicador: (indicador_dataset, perfil_df, df_risco, c_val, c_mr, rr_col, score_col).
+_INDICADOR_SCOPE_BASE_CACHE = ResultCache(
+    "indicadores_escopo",
+    ttl_seconds=_INDICADOR_CACHE_TTL_SECONDS,
+    max_entries=_INDICADOR_CACHE_MAX_ENTRIES,
+    max_mb=_INDICADOR_CACHE_MB,
+)
+_INDICADOR_DATASET_CACHE = ResultCache(
+    "indicadores_dataset",
+    ttl_seconds=_INDICADOR_CACHE_TTL_SECONDS,
+    max_entries=_INDICADOR_CACHE_MAX_ENTRIES,
+    max_mb=_INDICADOR_CACHE_MB,
+)
 
 
 def _normalize_cache_text(value: object) -> str | None:
@@ -264,7 +262,6 @@ def _make_indicador_scope_base_cache_key(
     filters: dict[str, object],
 ) -> tuple[object, ...]:
     return (
-        get_cache_generation(),
         get_volume_atipico_aumento_minimo(),
         *(
             normalizer(filters.get(field_name))
@@ -279,7 +276,6 @@ def _make_indicador_dataset_cache_key(
     filters: dict[str, object],
 ) -> tuple[object, ...]:
     return (
-        get_cache_generation(),
         get_volume_atipico_aumento_minimo(),
         indicador,
         *(
@@ -289,38 +285,6 @@ def _make_indicador_dataset_cache_key(
     )
 
 
-def _prune_indicador_cache(
-    cache: dict[tuple[object, ...], tuple[float, _IndicadorCachePayload]],
-    now: float,
-    generation: int,
-) -> None:
-    expired_keys = [
-        key
-        for key, (created_at, _result) in cache.items()
-        if key[0] != generation or now - created_at > _INDICADOR_CACHE_TTL_SECONDS
-    ]
-    for key in expired_keys:
-        del cache[key]
-
-    if len(cache) <= _INDICADOR_CACHE_MAX_ENTRIES:
-        return
-
-    keys_by_age = sorted(
-        cache,
-        key=lambda key: cache[key][0],
-    )
-    overflow = len(cache) - _INDICADOR_CACHE_MAX_ENTRIES
-    for key in keys_by_age[:overflow]:
-        del cache[key]
-
-
-def _cache_generation_from_key(cache_key: tuple[object, ...]) -> int:
-    generation = cache_key[0]
-    if isinstance(generation, bool) or not isinstance(generation, int):
-        raise RuntimeError("Chave de cache de indicadores possui geracao invalida.")
-    return generation
-
-
 def _benchmark_escopo_expr() -> pl.Expr:
     return (
         pl.when(pl.col("_total_regiao_benchmark") >= MIN_REGIAO_BENCHMARK)
@@ -824,42 +788,21 @@ def _build_indicador_dataset_cached(
         indicador=indicador,
         filters=filters,
     )
-    generation = _cache_generation_from_key(dataset_cache_key)
-    now = time.monotonic()
-
-    with _INDICADOR_CACHE_LOCK:
-        _prune_indicador_cache(_INDICADOR_SCOPE_BASE_CACHE, now, generation)
-        _prune_indicador_cache(_INDICADOR_DATASET_CACHE, now, generation)
-
-        cached_dataset = _INDICADOR_DATASET_CACHE.get(dataset_cache_key)
-        if cached_dataset is not None:
-            return cached_dataset[1]
-
-        cached_scope = _INDICADOR_SCOPE_BASE_CACHE.get(scope_cache_key)
-
-    if cached_scope is not None:
-        scope_base, perfil_df = cached_scope[1]
-    else:
-        scope_base, perfil_df = _build_indicador_scope_base(**filters)
-        with _INDICADOR_CACHE_LOCK:
-            now = time.monotonic()
-            _prune_indicador_cache(_INDICADOR_SCOPE_BASE_CACHE, now, generation)
-            _INDICADOR_SCOPE_BASE_CACHE[scope_cache_key] = (now, (scope_base, perfil_df))
-
-    result = _build_indicador_dataset(
-        indicador,
-        scope_base,
-        perfil_df,
-        data_inicio=data_inicio,
-        data_fim=data_fim,
-    )
 
-    with _INDICADOR_CACHE_LOCK:
-        now = time.monotonic()
-        _prune_indicador_cache(_INDICADOR_DATASET_CACHE, now, generation)
-        _INDICADOR_DATASET_CACHE[dataset_cache_key] = (now, result)
+    def build_dataset():
+        scope_base, perfil_df = _INDICADOR_SCOPE_BASE_CACHE.get_or_compute(
+            scope_cache_key,
+            lambda: _build_indicador_scope_base(**filters),
+        )
+        return _build_indicador_dataset(
+            indicador,
+            scope_base,
+            perfil_df,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+        )
 
-    return result
+    return _INDICADOR_DATASET_CACHE.get_or_compute(dataset_cache_key, build_dataset)
 
 
 def _build_indicador_cnpj_rows(
@@ -906,6 +849,121 @@ def _build_indicador_cnpj_rows(
     return rows
 
 
+_INDICADOR_CNPJ_ROWS_SCHEMA = {
+    "cnpj": pl.Utf8,
+    "razao_social": pl.Utf8,
+    "municipio": pl.Utf8,
+    "uf": pl.Utf8,
+    "id_ibge7": pl.Int64,
+    "valor": pl.Float64,
+    "med_reg": pl.Float64,
+    "med_benchmark": pl.Float64,
+    "benchmark_escopo": pl.Utf8,
+    "risco_reg": pl.Float64,
+    "risco_benchmark": pl.Float64,
+    "status": pl.Utf8,
+    "is_matriz": pl.Boolean,
+    "is_grande_rede": pl.Boolean,
+    "qtd_estabelecimentos_rede": pl.Int64,
+    "situacao_rf": pl.Utf8,
+    "is_conexao_ativa": pl.Boolean,
+    "score_risco_final": pl.Float64,
+    "valor_movimentado": pl.Float64,
+    "val_sem_comp": pl.Float64,
+    "perc_val_sem_comp": pl.Float64,
+}
+
+
+def _indicador_cnpj_rows_schema(indicador: str | None) -> dict[str, pl.DataType]:
+    """Esquema de `_build_indicador_cnpj_rows_frame`, inclusive para pagina vazia."""
+    extra_cols = _INDICADOR_EXTRA_COLS.get(indicador, []) if indicador else []
+    extras_dtype = pl.Struct({col: pl.Float64 for col in extra_cols}) if extra_cols else pl.Null
+    return {**_INDICADOR_CNPJ_ROWS_SCHEMA, "detalhes_extras": extras_dtype}
+
+
+def _build_indicador_cnpj_rows_frame(
+    df: pl.DataFrame,
+    c_val: str,
+    c_mr: str,
+    rr_col: str | None,
+    score_col: str,
+    indicador: str | None = None,
+) -> pl.DataFrame:
+    """Versao colunar de `_build_indicador_cnpj_rows`: mesmas colunas, sem Pydantic por linha."""
+    schema = _indicador_cnpj_rows_schema(indicador)
+    if df.is_empty():
+        return pl.DataFrame(schema=schema)
+    if df.get_column("is_matriz").null_count():
+        raise ValueError("Campo obrigatorio is_matriz ausente para CNPJ em indicadores.")
+
+    def number(col: str | None) -> pl.Expr:
+        if not col or col not in df.columns:
+            return pl.lit(None, dtype=pl.Float64)
+        return pl.col(col).cast(pl.Float64, strict=False)
+
+    def optional(col: str, dtype=pl.Utf8) -> pl.Expr:
+        return (pl.col(col) if col in df.columns else pl.lit(None)).cast(dtype, strict=False)
+
+    columns = [
+        pl.col("cnpj").cast(pl.Utf8).alias("cnpj"),
+        optional("razao_social").alias("razao_social"),
+        pl.when(optional("no_municipio").fill_null("") != "")
+          .then(optional("no_municipio").str.to_titlecase())
+          .alias("municipio"),
+        optional("uf").alias("uf"),
+        optional("id_ibge7", pl.Int64).alias("id_ibge7"),
+        number(c_val).alias("valor"),
+        number(c_mr).alias("med_reg"),
+        number("med_benchmark").alias("med_benchmark"),
+        optional("benchmark_escopo").alias("benchmark_escopo"),
+        number(rr_col).alias("risco_reg"),
+        number("risco_benchmark").alias("risco_benchmark"),
+        optional("status").fill_null("SEM DADOS").alias("status"),
+        pl.col("is_matriz").cast(pl.Boolean).alias("is_matriz"),
+        optional("is_grande_rede", pl.Boolean).fill_null(False).alias("is_grande_rede"),
+        pl.col("qtd_estabelecimentos_rede").cast(pl.Int64).alias("qtd_estabelecimentos_rede"),
+        optional("situacao_rf").alias("situacao_rf"),
+        optional("is_conexao_ativa", pl.Boolean).fill_null(False).alias("is_conexao_ativa"),
+        number(score_col).alias("score_risco_final"),
+        number("total_vendas").alias("valor_movimentado"),
+        number("total_sem_comprovacao").alias("val_sem_comp"),
+        number("perc_val_sem_comp").alias("perc_val_sem_comp"),
+    ]
+    extras_dtype = schema["detalhes_extras"]
+    if isinstance(extras_dtype, pl.Struct):
+        columns.append(pl.struct([
+            number(field.name).alias(field.name) for field in extras_dtype.fields
+        ]).alias("detalhes_extras"))
+    else:
+        # Indicador sem colunas extras: a coluna existe, sempre nula.
+        columns.append(pl.lit(None, dtype=pl.Null).alias("detalhes_extras"))
+    return df.select(columns)
+
+
+def _indicador_cnpj_page_columnar(
+    indicador: str,
+    items: pl.DataFrame,
+    kpis: IndicadorKpiSummarySchema,
+    total: int,
+    page: int,
+    page_size: int,
+    sort_field: str,
+    sort_order: str,
+) -> ColumnarPayload:
+    return ColumnarPayload(
+        tables={"items": items},
+        meta={
+            "indicador": indicador,
+            "kpis": kpis.model_dump(),
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "sort_field": sort_field,
+            "sort_order": sort_order,
+        },
+    )
+
+
 def _build_status_kpis(df: pl.DataFrame) -> IndicadorKpiSummarySchema:
     if df.is_empty():
         return IndicadorKpiSummarySchema()
@@ -1502,7 +1560,13 @@ def get_indicadores_analise_cnpjs(
     page_size: int = 20,
     sort_field: str = "val_sem_comp",
     sort_order: str | int | None = "desc",
-) -> IndicadorCnpjPageResponse:
+    columnar: bool = False,
+) -> IndicadorCnpjPageResponse | ColumnarPayload:
+    """Pagina ranqueada de CNPJs do indicador.
+
+    Com `columnar=True` devolve `ColumnarPayload` (tabela `items` + metadados),
+    montado direto do frame da pagina, sem um schema Pydantic por linha.
+    """
     try:
         df_joined, _perfil_df, _df_risco, c_val, c_mr, rr_col, score_col = _build_indicador_dataset_cached(
             indicador,
@@ -1538,6 +1602,11 @@ def get_indicadores_analise_cnpjs(
         page_size = min(200, max(1, int(page_size or 20)))
 
         if df_joined.is_empty():
+            if columnar:
+                return _indicador_cnpj_page_columnar(
+                    indicador, pl.DataFrame(), IndicadorKpiSummarySchema(), 0,
+                    page, page_size, sort_field, normalized_order,
+                )
             return IndicadorCnpjPageResponse(
                 indicador=indicador,
                 items=[],
@@ -1589,6 +1658,13 @@ def get_indicadores_analise_cnpjs(
                 f"Coluna de display obrigatoria ausente para indicador '{indicador}': {display_c_val}"
             )
 
+        if columnar:
+            return _indicador_cnpj_page_columnar(
+                indicador,
+                _build_indicador_cnpj_rows_frame(df_page, display_c_val, c_mr, rr_col, score_col, indicador),
+                _build_status_kpis(df_joined),
+                total, page, page_size, sort_field, normalized_order,
+            )
         return IndicadorCnpjPageResponse(
             indicador=indicador,
             items=_build_indicador_cnpj_rows(df_page, display_c_val, c_mr, rr_col, score_col, indicador),
@@ -1,8 +1,6 @@
 from __future__ import annotations
 
-import time
 from datetime import date
-from threading import RLock
 
 import polars as pl
 
@@ -11,6 +9,7 @@ from data_cache import (
     get_df_matriz_risco,
     get_df_perfil_estabelecimento,
 )
+from .result_cache import ResultCache
 from .indicator_config import (
     INDICATOR_AGGREGATIONS as _INDICATOR_AGGREGATIONS,
     INDICATOR_FLAGS as _INDICATOR_FLAGS,
@@ -96,11 +95,20 @@ _MATRIX_COMPONENT_COLUMNS = {
 
 _DYNAMIC_CACHE_TTL_SECONDS = 300
 _DYNAMIC_CACHE_MAX_ENTRIES = 24
-_DYNAMIC_CACHE_LOCK = RLock()
-_DYNAMIC_CACHE: dict[tuple[object, ...], tuple[float, pl.DataFrame]] = {}
+_DYNAMIC_CACHE_MB = 512
+_DYNAMIC_CACHE = ResultCache(
+    "matriz_risco_dinamica",
+    ttl_seconds=_DYNAMIC_CACHE_TTL_SECONDS,
+    max_entries=_DYNAMIC_CACHE_MAX_ENTRIES,
+    max_mb=_DYNAMIC_CACHE_MB,
+)
 _ANNUAL_BENCHMARK_CACHE_TTL_SECONDS = 300
-_ANNUAL_BENCHMARK_CACHE_LOCK = RLock()
-_ANNUAL_BENCHMARK_CACHE: dict[tuple[object, ...], tuple[float, pl.DataFrame]] = {}
+# Um unico benchmark nacional por geracao; quem le recebe um clone.
+_ANNUAL_BENCHMARK_CACHE = ResultCache(
+    "matriz_benchmark_anual",
+    ttl_seconds=_ANNUAL_BENCHMARK_CACHE_TTL_SECONDS,
+    max_entries=1,
+)
 
 
 def _period_year_bounds(data_inicio: date | None, data_fim: date | None) -> tuple[int | None, int | None]:
@@ -565,13 +573,11 @@ def build_annual_indicator_benchmark_matriz(
     *,
     perfil_df: pl.DataFrame | None = None,
 ) -> pl.DataFrame:
+    generation = get_cache_generation()
     if perfil_df is None:
-        cache_key = (get_cache_generation(),)
-        now = time.monotonic()
-        with _ANNUAL_BENCHMARK_CACHE_LOCK:
-            cached = _ANNUAL_BENCHMARK_CACHE.get(cache_key)
-            if cached is not None and now - cached[0] <= _ANNUAL_BENCHMARK_CACHE_TTL_SECONDS:
-                return cached[1].clone()
+        cached = _ANNUAL_BENCHMARK_CACHE.get("nacional")
+        if cached is not None:
+            return cached.clone()
 
     matriz_raw = get_df_matriz_risco()
     matriz = matriz_raw.rename({c: c.lower() for c in matriz_raw.columns})
@@ -638,9 +644,7 @@ def build_annual_indicator_benchmark_matriz(
 
     result = enriched.with_columns(median_exprs).sort(["id_cnpj", "ano_base"])
     if perfil_df is None:
-        with _ANNUAL_BENCHMARK_CACHE_LOCK:
-            _ANNUAL_BENCHMARK_CACHE.clear()
-            _ANNUAL_BENCHMARK_CACHE[(get_cache_generation(),)] = (time.monotonic(), result.clone())
+        _ANNUAL_BENCHMARK_CACHE.put("nacional", result.clone(), generation)
     return result
 
 
@@ -655,25 +659,11 @@ def build_dynamic_matriz_risco(
 
     ano_inicio, ano_fim = _period_year_bounds(data_inicio, data_fim)
     volume_atipico_aumento_minimo = get_volume_atipico_aumento_minimo()
-    cache_key = (
-        get_cache_generation(),
-        ano_inicio,
-        ano_fim,
-        volume_atipico_aumento_minimo,
+    cache_key = (ano_inicio, ano_fim, volume_atipico_aumento_minimo)
+    return _DYNAMIC_CACHE.get_or_compute(
+        cache_key,
+        lambda: _compute_dynamic_matriz_risco(data_inicio=data_inicio, data_fim=data_fim),
     )
-    now = time.monotonic()
-    with _DYNAMIC_CACHE_LOCK:
-        cached = _DYNAMIC_CACHE.get(cache_key)
-        if cached is not None and now - cached[0] <= _DYNAMIC_CACHE_TTL_SECONDS:
-            return cached[1]
-
-    df = _compute_dynamic_matriz_risco(data_inicio=data_inicio, data_fim=data_fim)
-    with _DYNAMIC_CACHE_LOCK:
-        if len(_DYNAMIC_CACHE) >= _DYNAMIC_CACHE_MAX_ENTRIES:
-            oldest_key = min(_DYNAMIC_CACHE.items(), key=lambda item: item[1][0])[0]
-            _DYNAMIC_CACHE.pop(oldest_key, None)
-        _DYNAMIC_CACHE[cache_key] = (now, df)
-    return df
 
 
 _build_dynamic_matriz_risco = build_dynamic_matriz_risco
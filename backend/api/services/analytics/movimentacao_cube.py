@@ -0,0 +1,140 @@
+"""Cubo de somas acumuladas da movimentacao mensal por CNPJ.
+
+Resumo, mapa e percentis somam a movimentacao mensal (`get_df()`) de cada
+CNPJ dentro do periodo filtrado. Varrer a tabela fato inteira a cada
+requisicao custa centenas de ms. O cubo guarda, uma vez por geracao do
+cache, a tabela ordenada por (id_cnpj, periodo) com as somas acumuladas
+dentro de cada CNPJ. O total de um CNPJ em [inicio, fim] passa a ser a
+diferenca entre duas posicoes, localizadas por busca binaria.
+
+As somas acumuladas sao por CNPJ (e nao globais) para manter a precisao dos
+valores monetarios em float64. O cubo ocupa cerca de 40 bytes por linha da
+movimentacao; `SENTINELA_MOVIMENTACAO_CUBE=0` volta ao group_by por
+requisicao, com o mesmo resultado.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+import os
+
+import numpy as np
+import polars as pl
+
+from data_cache import get_df
+
+from .result_cache import ResultCache
+
+
+TOTAL_COLUMNS = (
+    "total_vendas",
+    "total_sem_comprovacao",
+    "total_qnt_caixas_vendidas",
+    "total_qnt_caixas_sem_comprovacao",
+)
+_INT_COLUMNS = {
+    "total_qnt_caixas_vendidas",
+    "total_qnt_caixas_sem_comprovacao",
+}
+# Chave de busca: id_cnpj * 2**20 + dias desde 1970 (cabe ate o ano 4840).
+_DAY_BITS = 20
+_MAX_DAY = (1 << _DAY_BITS) - 1
+_EPOCH = date(1970, 1, 1)
+
+
+def _day(value: date) -> int:
+    return (value - _EPOCH).days
+
+
+class MovimentacaoCube:
+    """Movimentacao mensal ordenada com somas acumuladas por CNPJ."""
+
+    def __init__(self, df: pl.DataFrame):
+        columns = list(TOTAL_COLUMNS)
+        ordered = (
+            df.select(["id_cnpj", "periodo", *columns])
+            .sort(["id_cnpj", "periodo"])
+            .with_columns([
+                pl.col(col).cast(pl.Int64 if col in _INT_COLUMNS else pl.Float64)
+                .fill_null(0).cum_sum().over("id_cnpj")
+                for col in columns
+            ])
+        )
+        self.id_dtype = df.schema["id_cnpj"]
+        ids = ordered["id_cnpj"].cast(pl.Int64).to_numpy()
+        days = ordered["periodo"].cast(pl.Date).cast(pl.Int32).to_numpy().astype(np.int64)
+        self.keys = (ids << _DAY_BITS) + days
+        self.ids, self.starts = np.unique(ids, return_index=True)
+        self.cumulative = {col: ordered[col].to_numpy() for col in columns}
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.keys, self.ids, self.starts, *self.cumulative.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def totals(self, inicio: date | None = None, fim: date | None = None) -> pl.DataFrame:
+        """Somas por CNPJ em `inicio <= periodo <= fim` (limites inclusivos).
+
+        So entram CNPJs com ao menos um mes no periodo. Colunas: id_cnpj, as
+        colunas de `TOTAL_COLUMNS`, `meses` e `ultimo_periodo`.
+        """
+        lo = _day(inicio) if inicio is not None else 0
+        hi = _day(fim) if fim is not None else _MAX_DAY
+        base = self.ids << _DAY_BITS
+        begin = np.searchsorted(self.keys, base + lo, side="left")
+        end = np.searchsorted(self.keys, base + hi, side="right")
+        present = end > begin
+        begin, end, starts = begin[present], end[present], self.starts[present]
+        has_previous = begin > starts
+        previous = np.where(has_previous, begin - 1, 0)
+        last = end - 1
+
+        data: dict[str, object] = {"id_cnpj": self.ids[present]}
+        for col, cumulative in self.cumulative.items():
+            data[col] = cumulative[last] - np.where(has_previous, cumulative[previous], 0)
+        data["meses"] = (end - begin).astype(np.int32)
+        data["ultimo_periodo"] = (self.keys[last] & _MAX_DAY).astype(np.int32)
+        return pl.DataFrame(data).with_columns(
+            pl.col("id_cnpj").cast(self.id_dtype),
+            pl.col("ultimo_periodo").cast(pl.Date),
+        )
+
+
+_CUBE_CACHE = ResultCache(
+    "movimentacao_cube",
+    ttl_seconds=24 * 3600,
+    max_entries=1,
+    sizer=lambda cube: cube.nbytes,
+)
+
+
+def movimentacao_cube_enabled() -> bool:
+    return (os.getenv("SENTINELA_MOVIMENTACAO_CUBE") or "1").strip().lower() not in {"0", "false", "nao", "off"}
+
+
+def _group_by_totals(inicio: date | None, fim: date | None) -> pl.DataFrame:
+    mask = pl.lit(True)
+    if inicio is not None:
+        mask = mask & (pl.col("periodo") >= inicio)
+    if fim is not None:
+        mask = mask & (pl.col("periodo") <= fim)
+    return get_df().filter(mask).group_by("id_cnpj").agg([
+        *(
+            pl.col(col).cast(pl.Int64 if col in _INT_COLUMNS else pl.Float64).fill_null(0).sum()
+            for col in TOTAL_COLUMNS
+        ),
+        pl.len().cast(pl.Int32).alias("meses"),
+        pl.col("periodo").max().cast(pl.Date).alias("ultimo_periodo"),
+    ])
+
+
+def get_movimentacao_cube() -> MovimentacaoCube:
+    """Cubo da geracao atual, montado no primeiro uso (uma vez por geracao)."""
+    return _CUBE_CACHE.get_or_compute("movimentacao", lambda: MovimentacaoCube(get_df()))
+
+
+def cnpj_period_totals(inicio: date | None = None, fim: date | None = None) -> pl.DataFrame:
+    """Totais da movimentacao por CNPJ no periodo (ver `MovimentacaoCube.totals`)."""
+    if not movimentacao_cube_enabled():
+        return _group_by_totals(inicio, fim)
+    return get_movimentacao_cube().totals(inicio, fim)
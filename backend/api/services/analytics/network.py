@@ -1,19 +1,24 @@
-import os
 import time
 from datetime import date
 from typing import Optional
+import numpy as np
 import polars as pl
 from data_cache import get_df, get_df_perfil_estabelecimento
-from cache_files import (
-    TEIA_GRAFO_NIVEL2_EDGES_PARQUET,
-    TEIA_GRAFO_NIVEL2_NODES_PARQUET,
-    TEIA_GRAFO_NIVEL3_EDGES_PARQUET,
-    TEIA_GRAFO_NIVEL3_NODES_PARQUET,
-    TEIA_GRAFO_NIVEL4_EDGES_PARQUET,
-    TEIA_GRAFO_NIVEL4_NODES_PARQUET,
+from ...schemas.analytics import (
+    NetworkNodeSchema,
+    NetworkEdgeSchema,
+    NetworkResponse,
+    NetworkSummarySchema,
+    NetworkLevelSummarySchema,
+    TeiaComponenteResponse,
+    TeiaFarmaciaSocioComumSchema,
+    TeiaFarmaciasSocioComumResponse,
+    TeiaIndiceNodeSchema,
+    TeiaVizinhancaResponse,
 )
-from ...schemas.analytics import NetworkNodeSchema, NetworkEdgeSchema, NetworkResponse, NetworkSummarySchema, NetworkLevelSummarySchema
-from ._cache import _get_cnpj_cache_dir, sync_network
+from ._cache import sync_network
+from .network_graph import TeiaGraph, get_teia_graph
+from .teia_index import teia_componente, teia_farmacias_com_socio_em_comum, teia_vizinhanca
 from .indicator_rules import (
     NAO_COMPROVACAO_PCT_ATENCAO,
     NAO_COMPROVACAO_PCT_CRITICO,
@@ -254,56 +259,18 @@ def _build_network_edge(row: dict) -> NetworkEdgeSchema:
     )
 
 
-def _read_parquet_or_empty(path: str) -> pl.DataFrame:
-    if not os.path.exists(path):
-        return pl.DataFrame()
-    try:
-        return pl.read_parquet(path)
-    except Exception:
-        return pl.DataFrame()
-
-
-def _level_count(df: pl.DataFrame, level: str) -> int:
-    if df.is_empty() or "network_level" not in df.columns:
-        return 0
-    return df.filter(pl.col("network_level") == level).height
-
-
-def _build_network_summary(cnpj: str) -> NetworkSummarySchema:
-    cnpj_dir = _get_cnpj_cache_dir(cnpj)
-    node_frames = [
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_NODES_PARQUET)),
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_NODES_PARQUET)),
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_NODES_PARQUET)),
-    ]
-    edge_frames = [
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_EDGES_PARQUET)),
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_EDGES_PARQUET)),
-        _read_parquet_or_empty(os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_EDGES_PARQUET)),
-    ]
-
+def _build_network_summary(graph: TeiaGraph) -> NetworkSummarySchema:
     levels = {
         level: NetworkLevelSummarySchema(
             label=label,
-            entities=sum(_level_count(df, level) for df in node_frames),
-            links=sum(_level_count(df, level) for df in edge_frames),
+            entities=graph.level_counts.get(level, (0, 0))[0],
+            links=graph.level_counts.get(level, (0, 0))[1],
         )
         for level, label in NETWORK_LEVEL_LABELS.items()
     }
-
-    node_ids = set()
-    for df in node_frames:
-        if not df.is_empty() and "id" in df.columns:
-            node_ids.update(str(v) for v in df["id"].drop_nulls().to_list())
-
-    edge_ids = set()
-    for df in edge_frames:
-        if not df.is_empty() and "id" in df.columns:
-            edge_ids.update(str(v) for v in df["id"].drop_nulls().to_list())
-
     return NetworkSummarySchema(
-        total_entities=len(node_ids),
-        total_links=len(edge_ids),
+        total_entities=graph.total_entities,
+        total_links=graph.total_links,
         levels=levels,
     )
 
@@ -325,31 +292,26 @@ def get_teia_grafo_nivel2(
     """
     t0 = time.perf_counter()
 
-    cnpj_dir    = _get_cnpj_cache_dir(cnpj)
-    NODES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_NODES_PARQUET)
-    EDGES_PATH  = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL2_EDGES_PARQUET)
-
     # ── Cache miss: gera o Parquet ────────────────────────────────────────────
     # Agora o sync_network gera 4 arquivos (nodes, edges + expansion_nodes, expansion_edges) sob o novo padrão teia_grafo_*
     sync_network(cnpj)
 
-    # ── Lê do Parquet ─────────────────────────────────────────────────────────
-    try:
-        df_nodes = pl.read_parquet(NODES_PATH)
-        df_edges = pl.read_parquet(EDGES_PATH) if os.path.exists(EDGES_PATH) else pl.DataFrame()
-    except Exception as e:
-        raise RuntimeError(f"Erro ao ler Parquet de teia para {cnpj}: {e}") from e
+    # ── Grafo em memoria (lido dos Parquets uma vez por versao dos arquivos) ──
+    graph = get_teia_graph(cnpj)
+    level = graph.level(2)
+    if not level.has_nodes:
+        raise RuntimeError(f"Erro ao ler Parquet de teia para {cnpj}: arquivo de nos ausente")
 
     # ── Reconstrói os schemas a partir dos DataFrames ─────────────────────────
-    nodes = _build_network_nodes(df_nodes, data_inicio, data_fim)
+    nodes = _build_network_nodes(level.nodes, data_inicio, data_fim)
 
-    edges = [_build_network_edge(row) for row in df_edges.iter_rows(named=True)] if not df_edges.is_empty() else []
+    edges = [_build_network_edge(row) for row in level.edges.iter_rows(named=True)] if not level.edges.is_empty() else []
 
     return NetworkResponse(
         cnpj=cnpj,
         nodes=nodes,
         edges=edges,
-        summary=_build_network_summary(cnpj),
+        summary=_build_network_summary(graph),
         query_time_ms=round((time.perf_counter() - t0) * 1000, 1),
     )
 
@@ -362,36 +324,33 @@ def get_teia_grafo_nivel3_expansao(
 ) -> NetworkResponse:
     """
     Carrega os dados de expansão (Nível 3) para um nó específico que já está na teia.
-    Lê os arquivos de expansão pré-gerados na pasta de cache do CNPJ alvo.
+    Consulta o grafo em memoria da teia do CNPJ alvo (adjacencia por `target`).
     """
     t0 = time.perf_counter()
-    cnpj_dir = _get_cnpj_cache_dir(cnpj_alvo)
-    EXP_NODES_PATH = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_NODES_PARQUET)
-    EXP_EDGES_PATH = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL3_EDGES_PARQUET)
 
     sync_network(cnpj_alvo)
-    if not os.path.exists(EXP_NODES_PATH) or not os.path.exists(EXP_EDGES_PATH):
+    graph = get_teia_graph(cnpj_alvo)
+    level = graph.level(3)
+    if not level.has_nodes or not level.has_edges:
         return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
     try:
-        df_all_edges = pl.read_parquet(EXP_EDGES_PATH)
-        df_soc_edges = df_all_edges.filter(pl.col("target") == cnpj_para_expandir)
-        
-        if df_soc_edges.is_empty():
+        soc_rows = level.edges_to([cnpj_para_expandir])
+        if soc_rows.size == 0:
             return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
         # Pega os IDs dos sócios encontrados para esta expansão
-        cpfs_socios = df_soc_edges["source"].unique().to_list()
-        df_rep_edges = df_all_edges.filter(
-            (pl.col("type") == "representante") &
-            (pl.col("target").is_in(cpfs_socios))
+        cpfs_socios = level.edge_frame(soc_rows)["source"].unique().to_list()
+        rep_rows = level.edges_to(cpfs_socios, representante=True)
+        df_exp_edges = (
+            level.edge_frame(np.concatenate([soc_rows, rep_rows]))
+            .unique(subset=["id"], keep="first", maintain_order=True)
         )
-        df_exp_edges = pl.concat([df_soc_edges, df_rep_edges]).unique(subset=["id"], keep="first")
-        
+
         # Busca os detalhes destes nós no arquivo de expansão
         node_ids = set(df_exp_edges["source"].to_list()) | set(df_exp_edges["target"].to_list())
         node_ids.discard(cnpj_para_expandir)
-        df_exp_nodes = pl.read_parquet(EXP_NODES_PATH).filter(pl.col("id").is_in(list(node_ids)))
+        df_exp_nodes = level.node_frame(node_ids)
 
         nodes = _build_network_nodes(
             df_exp_nodes,
@@ -403,10 +362,10 @@ def get_teia_grafo_nivel3_expansao(
         edges = [_build_network_edge(row) for row in df_exp_edges.iter_rows(named=True)]
 
         return NetworkResponse(
-            cnpj=cnpj_alvo, 
-            nodes=nodes, 
+            cnpj=cnpj_alvo,
+            nodes=nodes,
             edges=edges,
-            summary=_build_network_summary(cnpj_alvo),
+            summary=_build_network_summary(graph),
             query_time_ms=round((time.perf_counter() - t0) * 1000, 1)
         )
 
@@ -424,35 +383,33 @@ def get_teia_grafo_nivel4_expansao(
 ) -> NetworkResponse:
     """
     Carrega os dados de expansão (Nível 4) para um SÓCIO específico.
-    Lê os arquivos de expansão N4 pré-gerados na pasta de cache do CNPJ alvo.
+    Consulta o grafo em memoria da teia do CNPJ alvo (adjacencia por `source`).
     """
     t0 = time.perf_counter()
-    cnpj_dir = _get_cnpj_cache_dir(cnpj_alvo)
-    N4_NODES_PATH = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_NODES_PARQUET)
-    N4_EDGES_PATH = os.path.join(cnpj_dir, TEIA_GRAFO_NIVEL4_EDGES_PARQUET)
 
     sync_network(cnpj_alvo)
-    if not os.path.exists(N4_NODES_PATH) or not os.path.exists(N4_EDGES_PATH):
+    graph = get_teia_graph(cnpj_alvo)
+    level = graph.level(4)
+    if not level.has_nodes or not level.has_edges:
         return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
     try:
-        df_all_edges = pl.read_parquet(N4_EDGES_PATH)
-        df_company_edges = df_all_edges.filter(pl.col("source") == cpf_para_expandir)
-        df_rep_edges = df_all_edges.filter(
-            (pl.col("type") == "representante") &
-            (pl.col("target") == cpf_para_expandir)
+        company_rows = level.edges_from([cpf_para_expandir])
+        rep_rows = level.edges_to([cpf_para_expandir], representante=True)
+        df_n4_edges = (
+            level.edge_frame(np.concatenate([company_rows, rep_rows]))
+            .unique(subset=["id"], keep="first", maintain_order=True)
         )
-        df_n4_edges = pl.concat([df_company_edges, df_rep_edges]).unique(subset=["id"], keep="first")
-        
+
         if df_n4_edges.is_empty():
             return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
         # Pega os IDs das empresas encontradas
         node_ids = set(df_n4_edges["source"].to_list()) | set(df_n4_edges["target"].to_list())
         node_ids.discard(cpf_para_expandir)
-        
+
         # Busca detalhes das empresas
-        df_n4_nodes = pl.read_parquet(N4_NODES_PATH).filter(pl.col("id").is_in(list(node_ids)))
+        df_n4_nodes = level.node_frame(node_ids)
 
         nodes = _build_network_nodes(
             df_n4_nodes,
@@ -464,10 +421,10 @@ def get_teia_grafo_nivel4_expansao(
         edges = [_build_network_edge(row) for row in df_n4_edges.iter_rows(named=True)]
 
         return NetworkResponse(
-            cnpj=cnpj_alvo, 
-            nodes=nodes, 
+            cnpj=cnpj_alvo,
+            nodes=nodes,
             edges=edges,
-            summary=_build_network_summary(cnpj_alvo),
+            summary=_build_network_summary(graph),
             query_time_ms=round((time.perf_counter() - t0) * 1000, 1)
         )
 
@@ -482,28 +439,26 @@ def get_teia_grafo_nivel3_full(
     data_fim: Optional[date] = None,
 ) -> NetworkResponse:
     """Retorna TODOS os sócios de nível 3 (Sócios de N2) em lote."""
-    CACHE_DIR = _get_cnpj_cache_dir(cnpj_alvo)
-    NODES_PATH = os.path.join(CACHE_DIR, TEIA_GRAFO_NIVEL3_NODES_PARQUET)
-    EDGES_PATH = os.path.join(CACHE_DIR, TEIA_GRAFO_NIVEL3_EDGES_PARQUET)
-
     sync_network(cnpj_alvo)
-    if not os.path.exists(NODES_PATH):
+    graph = get_teia_graph(cnpj_alvo)
+    level = graph.level(3)
+    if not level.has_nodes:
         return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
     try:
-        df_nodes = pl.read_parquet(NODES_PATH)
-        df_edges = pl.read_parquet(EDGES_PATH)
+        if not level.has_edges:
+            raise FileNotFoundError("arquivo de arestas N3 ausente")
 
         nodes = _build_network_nodes(
-            df_nodes,
+            level.nodes,
             data_inicio,
             data_fim,
             default_type="PF",
         )
-        
-        edges = [_build_network_edge(row) for row in df_edges.iter_rows(named=True)]
 
-        return NetworkResponse(cnpj=cnpj_alvo, nodes=nodes, edges=edges, summary=_build_network_summary(cnpj_alvo))
+        edges = [_build_network_edge(row) for row in level.edges.iter_rows(named=True)]
+
+        return NetworkResponse(cnpj=cnpj_alvo, nodes=nodes, edges=edges, summary=_build_network_summary(graph))
     except Exception as e:
         raise RuntimeError(f"Erro batch N3 na teia {cnpj_alvo}: {e}") from e
 
@@ -513,27 +468,62 @@ def get_teia_grafo_nivel4_full(
     data_fim: Optional[date] = None,
 ) -> NetworkResponse:
     """Retorna TODAS as empresas de nível 4 (Participações de N3) em lote."""
-    CACHE_DIR = _get_cnpj_cache_dir(cnpj_alvo)
-    NODES_PATH = os.path.join(CACHE_DIR, TEIA_GRAFO_NIVEL4_NODES_PARQUET)
-    EDGES_PATH = os.path.join(CACHE_DIR, TEIA_GRAFO_NIVEL4_EDGES_PARQUET)
-
     sync_network(cnpj_alvo)
-    if not os.path.exists(NODES_PATH):
+    graph = get_teia_graph(cnpj_alvo)
+    level = graph.level(4)
+    if not level.has_nodes:
         return NetworkResponse(cnpj=cnpj_alvo, nodes=[], edges=[])
 
     try:
-        df_nodes = pl.read_parquet(NODES_PATH)
-        df_edges = pl.read_parquet(EDGES_PATH)
+        if not level.has_edges:
+            raise FileNotFoundError("arquivo de arestas N4 ausente")
 
         nodes = _build_network_nodes(
-            df_nodes,
+            level.nodes,
             data_inicio,
             data_fim,
             default_type="PJ",
         )
-        
-        edges = [_build_network_edge(row) for row in df_edges.iter_rows(named=True)]
 
-        return NetworkResponse(cnpj=cnpj_alvo, nodes=nodes, edges=edges, summary=_build_network_summary(cnpj_alvo))
+        edges = [_build_network_edge(row) for row in level.edges.iter_rows(named=True)]
+
+        return NetworkResponse(cnpj=cnpj_alvo, nodes=nodes, edges=edges, summary=_build_network_summary(graph))
     except Exception as e:
         raise RuntimeError(f"Erro batch N4 na teia {cnpj_alvo}: {e}") from e
+
+
+# ── Consultas entre CNPJs (indice nacional da teia) ─────────────────────────
+def get_teia_vizinhanca(cnpj: str, max_saltos: int = 2) -> TeiaVizinhancaResponse:
+    """CPFs/CNPJs a ate `max_saltos` vinculos societarios do CNPJ na teia nacional."""
+    t0 = time.perf_counter()
+    df = teia_vizinhanca(_normalize_document(cnpj), max_saltos)
+    return TeiaVizinhancaResponse(
+        cnpj=cnpj,
+        max_saltos=max_saltos,
+        nodes=[TeiaIndiceNodeSchema(**row) for row in df.iter_rows(named=True)],
+        query_time_ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
+
+
+def get_teia_farmacias_socio_comum(cnpj: str) -> TeiaFarmaciasSocioComumResponse:
+    """Outras farmacias (alvo ou Farmacia Popular) com ao menos um socio em comum."""
+    t0 = time.perf_counter()
+    df = teia_farmacias_com_socio_em_comum(_normalize_document(cnpj))
+    return TeiaFarmaciasSocioComumResponse(
+        cnpj=cnpj,
+        farmacias=[TeiaFarmaciaSocioComumSchema(**row) for row in df.iter_rows(named=True)],
+        query_time_ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
+
+
+def get_teia_componente(cnpj: str) -> TeiaComponenteResponse:
+    """Tamanho da componente conexa do CNPJ e as farmacias que fazem parte dela."""
+    t0 = time.perf_counter()
+    total_nos, total_empresas, df = teia_componente(_normalize_document(cnpj))
+    return TeiaComponenteResponse(
+        cnpj=cnpj,
+        total_nos=total_nos,
+        total_empresas=total_empresas,
+        farmacias=[TeiaIndiceNodeSchema(**row) for row in df.iter_rows(named=True)],
+        query_time_ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
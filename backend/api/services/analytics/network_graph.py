@@ -0,0 +1,273 @@
+"""Grafo em memoria da teia societaria de um CNPJ (indice de adjacencia CSR).
+
+As expansoes da teia (clique em um no N2 ou N3) reliam os Parquets inteiros
+de nos e arestas do nivel a cada clique e filtravam por `target`/`source`;
+o resumo da rede relia os seis arquivos de novo. Em teias grandes isso passa
+de 100 ms por clique.
+
+`TeiaGraph` le os Parquets `teia_grafo_*` de um CNPJ uma vez e guarda, por
+nivel, os frames de nos e arestas (colunas de atributos) e indices no
+formato CSR: para cada id de no, o intervalo `indptr[i]:indptr[i + 1]` de
+`rows` lista as linhas das arestas que saem dele, que chegam nele e as linhas
+de no com esse id (na ordem do arquivo). Expansoes, niveis e o resumo viram
+consultas O(grau). Um arquivo ilegivel e registrado no log e tratado como
+ausente: o resumo e os demais niveis seguem funcionando e so `level(n)` do
+nivel afetado levanta erro. O grafo fica em um `ResultCache` por CNPJ, com a
+chave incluindo mtime/tamanho dos arquivos: uma teia regerada por
+`sync_network` monta um grafo novo. O orcamento de memoria e o mesmo dos demais caches
+(`SENTINELA_CACHE_MB_TEIA_GRAFO`).
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable
+
+import numpy as np
+import polars as pl
+
+from cache_files import (
+    TEIA_GRAFO_NIVEL2_EDGES_PARQUET,
+    TEIA_GRAFO_NIVEL2_NODES_PARQUET,
+    TEIA_GRAFO_NIVEL3_EDGES_PARQUET,
+    TEIA_GRAFO_NIVEL3_NODES_PARQUET,
+    TEIA_GRAFO_NIVEL4_EDGES_PARQUET,
+    TEIA_GRAFO_NIVEL4_NODES_PARQUET,
+)
+
+from ._cache import _get_cnpj_cache_dir
+from .result_cache import ResultCache
+
+
+TEIA_GRAFO_FILES = {
+    2: (TEIA_GRAFO_NIVEL2_NODES_PARQUET, TEIA_GRAFO_NIVEL2_EDGES_PARQUET),
+    3: (TEIA_GRAFO_NIVEL3_NODES_PARQUET, TEIA_GRAFO_NIVEL3_EDGES_PARQUET),
+    4: (TEIA_GRAFO_NIVEL4_NODES_PARQUET, TEIA_GRAFO_NIVEL4_EDGES_PARQUET),
+}
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+
+class _KeyIndex:
+    """Linhas de um frame agrupadas pelo codigo da chave (CSR)."""
+
+    def __init__(self, codes: np.ndarray, size: int):
+        valid = np.flatnonzero(codes >= 0)
+        valid_codes = codes[valid]
+        # argsort estavel: dentro de cada chave, as linhas ficam na ordem do arquivo.
+        self.rows = valid[np.argsort(valid_codes, kind="stable")]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(valid_codes, minlength=size), out=self.indptr[1:])
+
+    def lookup(self, code: int) -> np.ndarray:
+        return self.rows[self.indptr[code]:self.indptr[code + 1]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.indptr.nbytes
+
+
+class TeiaLevel:
+    """Nos e arestas de um arquivo de nivel da teia, indexados por id."""
+
+    def __init__(
+        self,
+        graph: "TeiaGraph",
+        nodes: pl.DataFrame | None,
+        edges: pl.DataFrame | None,
+        error: str | None = None,
+    ):
+        self._graph = graph
+        # Falha de leitura de algum arquivo do nivel (o arquivo conta como ausente).
+        self.error = error
+        self.has_nodes = nodes is not None
+        self.has_edges = edges is not None
+        self.nodes = nodes if nodes is not None else pl.DataFrame()
+        self.edges = edges if edges is not None else pl.DataFrame()
+        self._node_index = self._index(self.nodes, "id")
+        self._source_index = self._index(self.edges, "source")
+        self._target_index = self._index(self.edges, "target")
+        self._is_representante = (
+            (self.edges["type"] == "representante").fill_null(False).to_numpy()
+            if "type" in self.edges.columns
+            else np.zeros(self.edges.height, dtype=bool)
+        )
+
+    def _index(self, df: pl.DataFrame, column: str) -> _KeyIndex:
+        return _KeyIndex(self._graph._codes(df, column), len(self._graph._vocab))
+
+    def _rows(self, index: _KeyIndex, node_ids: Iterable[object]) -> np.ndarray:
+        codes = [self._graph._vocab.get(str(node_id)) for node_id in node_ids]
+        parts = [index.lookup(code) for code in codes if code is not None]
+        if not parts:
+            return _EMPTY_ROWS
+        return np.unique(np.concatenate(parts))
+
+    def edges_to(self, node_ids: Iterable[object], *, representante: bool = False) -> np.ndarray:
+        """Linhas (na ordem do arquivo) das arestas cujo `target` esta em `node_ids`."""
+        rows = self._rows(self._target_index, node_ids)
+        return rows[self._is_representante[rows]] if representante else rows
+
+    def edges_from(self, node_ids: Iterable[object]) -> np.ndarray:
+        """Linhas (na ordem do arquivo) das arestas cujo `source` esta em `node_ids`."""
+        return self._rows(self._source_index, node_ids)
+
+    def edge_frame(self, rows: np.ndarray) -> pl.DataFrame:
+        return self.edges[rows]
+
+    def node_frame(self, node_ids: Iterable[object]) -> pl.DataFrame:
+        """Nos com os ids pedidos, na ordem do arquivo."""
+        return self.nodes[self._rows(self._node_index, node_ids)]
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            int(self.nodes.estimated_size())
+            + int(self.edges.estimated_size())
+            + self._node_index.nbytes
+            + self._source_index.nbytes
+            + self._target_index.nbytes
+            + self._is_representante.nbytes
+        )
+
+
+def _read_level_file(path: str, errors: list[str]) -> pl.DataFrame | None:
+    """Le um arquivo de nivel; se ilegivel, anota o erro em `errors` e devolve None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pl.read_parquet(path)
+    except Exception as exc:
+        message = f"Erro ao ler Parquet de teia {path}: {exc}"
+        print(f"[ERRO] {message}")
+        errors.append(message)
+        return None
+
+
+def _string_column(df: pl.DataFrame, column: str) -> pl.Series | None:
+    if df.is_empty() or column not in df.columns:
+        return None
+    return df[column].cast(pl.String)
+
+
+class TeiaGraph:
+    """Teia de um CNPJ (niveis 2, 3 e 4) com adjacencia e resumo pre-calculados."""
+
+    def __init__(
+        self,
+        frames: dict[int, tuple[pl.DataFrame | None, pl.DataFrame | None]],
+        errors: dict[int, str] | None = None,
+    ):
+        errors = errors or {}
+        key_columns = [
+            series
+            for nodes, edges in frames.values()
+            for series in (
+                _string_column(nodes if nodes is not None else pl.DataFrame(), "id"),
+                _string_column(edges if edges is not None else pl.DataFrame(), "source"),
+                _string_column(edges if edges is not None else pl.DataFrame(), "target"),
+            )
+            if series is not None
+        ]
+        keys = (
+            pl.concat(key_columns).drop_nulls().unique(maintain_order=True)
+            if key_columns
+            else pl.Series(dtype=pl.String)
+        )
+        self._keys = keys
+        self._vocab: dict[str, int] = {key: code for code, key in enumerate(keys.to_list())}
+        self.levels = {
+            level: TeiaLevel(self, nodes, edges, errors.get(level))
+            for level, (nodes, edges) in frames.items()
+        }
+        self.level_counts, self.total_entities, self.total_links = self._summarize()
+
+    def _codes(self, df: pl.DataFrame, column: str) -> np.ndarray:
+        series = _string_column(df, column)
+        if series is None:
+            return np.full(df.height, -1, dtype=np.int64)
+        return series.replace_strict(
+            self._keys,
+            pl.Series(np.arange(len(self._keys), dtype=np.int64)),
+            default=-1,
+            return_dtype=pl.Int64,
+        ).to_numpy()
+
+    def _summarize(self) -> tuple[dict[str, tuple[int, int]], int, int]:
+        def count_by_level(frames: list[pl.DataFrame]) -> dict[str, int]:
+            counts: dict[str, int] = {}
+            for df in frames:
+                if df.is_empty() or "network_level" not in df.columns:
+                    continue
+                for level, count in df.group_by("network_level").len().iter_rows():
+                    counts[level] = counts.get(level, 0) + count
+            return counts
+
+        def unique_ids(frames: list[pl.DataFrame]) -> int:
+            ids = [_string_column(df, "id") for df in frames]
+            ids = [series for series in ids if series is not None]
+            return pl.concat(ids).drop_nulls().n_unique() if ids else 0
+
+        node_frames = [level.nodes for level in self.levels.values()]
+        edge_frames = [level.edges for level in self.levels.values()]
+        entities = count_by_level(node_frames)
+        links = count_by_level(edge_frames)
+        level_counts = {
+            level: (entities.get(level, 0), links.get(level, 0))
+            for level in set(entities) | set(links)
+        }
+        return level_counts, unique_ids(node_frames), unique_ids(edge_frames)
+
+    def level(self, level: int) -> TeiaLevel:
+        """Nivel pedido; levanta RuntimeError se algum arquivo dele estava ilegivel."""
+        teia_level = self.levels[level]
+        if teia_level.error:
+            raise RuntimeError(teia_level.error)
+        return teia_level
+
+    @property
+    def nbytes(self) -> int:
+        # ~100 bytes por chave do dicionario de ids (str + entrada do dict).
+        return sum(level.nbytes for level in self.levels.values()) + 100 * len(self._vocab)
+
+
+_TEIA_GRAPH_CACHE = ResultCache(
+    "teia_grafo",
+    ttl_seconds=3600,
+    max_entries=32,
+    max_mb=512,
+    sizer=lambda graph: graph.nbytes,
+)
+
+
+def _files_signature(cnpj_dir: str) -> tuple:
+    signature = []
+    for filenames in TEIA_GRAFO_FILES.values():
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(cnpj_dir, filename))
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _load_teia_graph(cnpj_dir: str) -> TeiaGraph:
+    frames = {}
+    errors = {}
+    for level, (nodes_file, edges_file) in TEIA_GRAFO_FILES.items():
+        level_errors: list[str] = []
+        frames[level] = (
+            _read_level_file(os.path.join(cnpj_dir, nodes_file), level_errors),
+            _read_level_file(os.path.join(cnpj_dir, edges_file), level_errors),
+        )
+        if level_errors:
+            errors[level] = "; ".join(level_errors)
+    return TeiaGraph(frames, errors)
+
+
+def get_teia_graph(cnpj: str) -> TeiaGraph:
+    """Grafo da teia do CNPJ a partir dos Parquets atuais (chame `sync_network` antes)."""
+    cnpj_dir = _get_cnpj_cache_dir(cnpj)
+    key = (cnpj, _files_signature(cnpj_dir))
+    return _TEIA_GRAPH_CACHE.get_or_compute(key, lambda: _load_teia_graph(cnpj_dir))
@@ -12,6 +12,8 @@ import copy
 from decimal import Decimal, ROUND_HALF_UP
 from data_cache import get_df, get_rede_df, get_localidades_df, get_df_perfil_estabelecimento, get_cache_dir
 from .matriz_risco_dinamica import build_dynamic_matriz_risco
+from .movimentacao_cube import cnpj_period_totals
+from ...utils.columnar import ColumnarPayload
 from ...schemas.analytics import (
     AnalyticsKPISchema,
     ResultadoSentinelaUFSchema,
@@ -236,6 +238,114 @@ def get_regional_benchmarking(uf: Optional[str] = None, data_inicio: Optional[da
         print(traceback.format_exc())
         return RegionalResponse(nome_regiao=nome_exibicao, municipios=[], farmacias=[])
 
+def _regional_animation_window(inicio: date, fim: date, idx: int) -> tuple[date, date]:
+    """Janela de 2 meses de índice `idx` a partir de `inicio` (limitada a `fim`)."""
+    def _add_months(d: date, n: int) -> date:
+        """Avança n meses a partir de d, retornando o dia 1 do novo mês."""
+        m = d.month - 1 + n
+        return date(d.year + m // 12, m % 12 + 1, 1)
+
+    q_start = _add_months(inicio, idx * 2)
+    q_end_first = _add_months(inicio, idx * 2 + 1)
+    last_day = calendar.monthrange(q_end_first.year, q_end_first.month)[1]
+    return q_start, min(date(q_end_first.year, q_end_first.month, last_day), fim)
+
+
+def _build_regional_animation_base(
+    uf: Optional[str],
+    data_inicio: Optional[date],
+    data_fim: Optional[date],
+    regiao_id: Optional[int],
+) -> tuple[str, date, date, pl.DataFrame | None]:
+    """Agregado (janela, CNPJ) da animação regional, ordenado por janela e risco.
+
+    Retorna (nome de exibição, início, fim, frame); o frame é None sem movimentação no escopo.
+    """
+    nome_exibicao = uf or ""
+    df_mov = get_df().join(get_df_perfil_estabelecimento(), on="id_cnpj", how="left")
+    df_loc = get_localidades_df()
+
+    # Resolução de Nome para Exibição
+    if regiao_id:
+        loc_row = df_loc.filter(pl.col("id_regiao_saude").cast(pl.String) == str(regiao_id)).limit(1)
+        if not loc_row.is_empty():
+            nome_exibicao = loc_row.get_column("no_regiao_saude")[0]
+            if not uf or uf == 'Todos':
+                uf = loc_row.get_column("sg_uf")[0]
+
+    MIN_DATA = date(2015, 7, 1)
+    MAX_DATA = date(2024, 12, 31)
+    inicio = (data_inicio if data_inicio and data_inicio >= MIN_DATA else MIN_DATA) if data_inicio else MIN_DATA
+    fim    = data_fim if data_fim else MAX_DATA
+
+    # ── Filtro geográfico + temporal diretamente por ID ou UF ─────────
+    mask = pl.col("periodo").is_between(inicio, fim)
+    if regiao_id:
+        mask = mask & (pl.col("id_regiao_saude") == str(regiao_id))
+    else:
+        mask = mask & (pl.col("uf") == uf)
+
+    df_filtered = df_mov.filter(mask)
+
+    if df_filtered.is_empty():
+        return nome_exibicao, inicio, fim, None
+
+    # ── Deriva índice de período relativo ao início do período ────
+    # period_idx = 0 → primeiros 2 meses, 1 → próximos 2 meses, etc.
+    # Janela de 2 meses para coincidir com PLAY_STEP=2 do slider de animação.
+    inicio_year  = inicio.year
+    inicio_month = inicio.month
+    df_q = df_filtered.with_columns([
+        (
+            (pl.col("periodo").dt.year() - inicio_year) * 12
+            + pl.col("periodo").dt.month()
+            - inicio_month
+        ).alias("_months_since_start")
+    ]).with_columns([
+        (pl.col("_months_since_start") // 2).alias("_quarter_idx")
+    ])
+
+    # ── Agrega por (trimestre, CNPJ) em uma única operação ──────────
+    cnpj_q = (
+        df_q
+        .group_by(["_quarter_idx", "id_cnpj"])
+        .agg([
+            pl.col("cnpj").first().alias("cnpj"),
+            pl.col("no_municipio").first().alias("municipio"),
+            pl.col("id_ibge7").first().alias("id_ibge7"),
+            pl.col("uf").first().alias("uf"),
+            pl.col("razao_social").first().alias("razao_social"),
+            pl.col("is_conexao_ativa").first().alias("is_conexao_ativa"),
+            pl.sum("total_vendas").alias("totalMov"),
+            pl.sum("total_sem_comprovacao").alias("valSemComp"),
+        ])
+        .with_columns([
+            (
+                pl.col("valSemComp")
+                / pl.when(pl.col("totalMov") > 0)
+                  .then(pl.col("totalMov"))
+                  .otherwise(pl.lit(1.0))
+                * 100
+            ).round(2).alias("percValSemComp")
+        ])
+    )
+
+    # ── Enriquece com score de risco dinâmico ───────────────────────
+    df_risco_slim = build_dynamic_matriz_risco(
+        data_inicio=inicio,
+        data_fim=fim,
+    ).select(["id_cnpj", "score_risco_final", "classificacao_risco"])
+    cnpj_q = cnpj_q.join(df_risco_slim, on="id_cnpj", how="left")
+
+    # Ordena por trimestre (asc) e risco (desc) para ranking correto
+    cnpj_q = cnpj_q.sort(
+        ["_quarter_idx", "score_risco_final"],
+        descending=[False, True],
+        nulls_last=True,
+    )
+    return nome_exibicao, inicio, fim, cnpj_q
+
+
 def get_regional_benchmarking_animation(
     uf: Optional[str] = None,
     data_inicio: Optional[date] = None,
@@ -248,105 +358,18 @@ def get_regional_benchmarking_animation(
     """
     nome_exibicao = uf or ""
     try:
-        df_mov = get_df().join(get_df_perfil_estabelecimento(), on="id_cnpj", how="left")
-        df_loc = get_localidades_df()
-        
-        # Resolução de Nome para Exibição
-        if regiao_id:
-            loc_row = df_loc.filter(pl.col("id_regiao_saude").cast(pl.String) == str(regiao_id)).limit(1)
-            if not loc_row.is_empty():
-                nome_exibicao = loc_row.get_column("no_regiao_saude")[0]
-                if not uf or uf == 'Todos':
-                    uf = loc_row.get_column("sg_uf")[0]
-
-        MIN_DATA = date(2015, 7, 1)
-        MAX_DATA = date(2024, 12, 31)
-        inicio = (data_inicio if data_inicio and data_inicio >= MIN_DATA else MIN_DATA) if data_inicio else MIN_DATA
-        fim    = data_fim if data_fim else MAX_DATA
-
-        # ── Filtro geográfico + temporal diretamente por ID ou UF ─────────
-        mask = pl.col("periodo").is_between(inicio, fim)
-        if regiao_id:
-            mask = mask & (pl.col("id_regiao_saude") == str(regiao_id))
-        else:
-            mask = mask & (pl.col("uf") == uf)
-
-        df_filtered = df_mov.filter(mask)
-        nome_escopo = nome_exibicao
-
-        if df_filtered.is_empty():
-            return RegionalAnimationResponse(nome_regiao=nome_escopo, quarters=[])
-
-        # ── Deriva índice de período relativo ao início do período ────
-        # period_idx = 0 → primeiros 2 meses, 1 → próximos 2 meses, etc.
-        # Janela de 2 meses para coincidir com PLAY_STEP=2 do slider de animação.
-        inicio_year  = inicio.year
-        inicio_month = inicio.month
-        df_q = df_filtered.with_columns([
-            (
-                (pl.col("periodo").dt.year() - inicio_year) * 12
-                + pl.col("periodo").dt.month()
-                - inicio_month
-            ).alias("_months_since_start")
-        ]).with_columns([
-            (pl.col("_months_since_start") // 2).alias("_quarter_idx")
-        ])
-
-        # ── Agrega por (trimestre, CNPJ) em uma única operação ──────────
-        cnpj_q = (
-            df_q
-            .group_by(["_quarter_idx", "id_cnpj"])
-            .agg([
-                pl.col("cnpj").first().alias("cnpj"),
-                pl.col("no_municipio").first().alias("municipio"),
-                pl.col("id_ibge7").first().alias("id_ibge7"),
-                pl.col("uf").first().alias("uf"),
-                pl.col("razao_social").first().alias("razao_social"),
-                pl.col("is_conexao_ativa").first().alias("is_conexao_ativa"),
-                pl.sum("total_vendas").alias("totalMov"),
-                pl.sum("total_sem_comprovacao").alias("valSemComp"),
-            ])
-            .with_columns([
-                (
-                    pl.col("valSemComp")
-                    / pl.when(pl.col("totalMov") > 0)
-                      .then(pl.col("totalMov"))
-                      .otherwise(pl.lit(1.0))
-                    * 100
-                ).round(2).alias("percValSemComp")
-            ])
-        )
-
-        # ── Enriquece com score de risco dinâmico ───────────────────────
-        df_risco_slim = build_dynamic_matriz_risco(
-            data_inicio=inicio,
-            data_fim=fim,
-        ).select(["id_cnpj", "score_risco_final", "classificacao_risco"])
-        cnpj_q = cnpj_q.join(df_risco_slim, on="id_cnpj", how="left")
-
-        # Ordena por trimestre (asc) e risco (desc) para ranking correto
-        cnpj_q = cnpj_q.sort(
-            ["_quarter_idx", "score_risco_final"],
-            descending=[False, True],
-            nulls_last=True,
-        )
+        nome_exibicao, inicio, fim, cnpj_q = _build_regional_animation_base(uf, data_inicio, data_fim, regiao_id)
+        if cnpj_q is None:
+            return RegionalAnimationResponse(nome_regiao=nome_exibicao, quarters=[])
 
         # ── Monta dicionário de trimestres ──────────────────────────────
-        def _add_months(d: date, n: int) -> date:
-            """Avança n meses a partir de d, retornando o dia 1 do novo mês."""
-            m = d.month - 1 + n
-            return date(d.year + m // 12, m % 12 + 1, 1)
-
         quarters_map: dict = {}
         rank_counter: dict = {}
 
         for r in cnpj_q.iter_rows(named=True):
             idx = r["_quarter_idx"]
             if idx not in quarters_map:
-                q_start = _add_months(inicio, idx * 2)
-                q_end_first = _add_months(inicio, idx * 2 + 1)
-                last_day = calendar.monthrange(q_end_first.year, q_end_first.month)[1]
-                q_end = min(date(q_end_first.year, q_end_first.month, last_day), fim)
+                q_start, q_end = _regional_animation_window(inicio, fim, idx)
                 quarters_map[idx] = {
                     "trimestre": f"{q_start.year}-{q_start.month:02d}",
                     "inicio": q_start,
@@ -390,6 +413,69 @@ def get_regional_benchmarking_animation(
         print(traceback.format_exc(), flush=True)
         return RegionalAnimationResponse(nome_regiao=nome_exibicao, quarters=[])
 
+
+def get_regional_benchmarking_animation_columnar(
+    uf: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    regiao_id: Optional[int] = None
+) -> ColumnarPayload:
+    """Animação regional em formato colunar: tabelas `quarters` e `farmacias` (com `trimestre`)."""
+    nome_exibicao = uf or ""
+    quarters_df = pl.DataFrame(schema={"trimestre": pl.Utf8, "inicio": pl.Date, "fim": pl.Date})
+    farmacias_df = pl.DataFrame()
+    try:
+        nome_exibicao, inicio, fim, cnpj_q = _build_regional_animation_base(uf, data_inicio, data_fim, regiao_id)
+        if cnpj_q is not None:
+            windows = [
+                (idx, *_regional_animation_window(inicio, fim, idx))
+                for idx in cnpj_q.get_column("_quarter_idx").unique().sort().to_list()
+            ]
+            quarters_df = pl.DataFrame(
+                {
+                    "_quarter_idx": [idx for idx, _, _ in windows],
+                    "trimestre": [f"{q_start.year}-{q_start.month:02d}" for _, q_start, _ in windows],
+                    "inicio": [q_start for _, q_start, _ in windows],
+                    "fim": [q_end for _, _, q_end in windows],
+                },
+                schema_overrides={"_quarter_idx": cnpj_q.schema["_quarter_idx"]},
+            )
+            farmacias_df = (
+                cnpj_q
+                # Posicao no trimestre pela ordem de cnpj_q, antes do join.
+                .with_columns(pl.int_range(1, pl.len() + 1, dtype=pl.Int32).over("_quarter_idx").alias("rank"))
+                .join(
+                    quarters_df.select(["_quarter_idx", "trimestre"]),
+                    on="_quarter_idx",
+                    how="left",
+                    maintain_order="left",
+                )
+                .select([
+                    "trimestre",
+                    pl.col("cnpj").cast(pl.Utf8),
+                    pl.col("razao_social").cast(pl.Utf8).fill_null("").str.to_titlecase(),
+                    pl.col("municipio").cast(pl.Utf8).fill_null("").str.to_titlecase(),
+                    pl.col("id_ibge7").cast(pl.Int64, strict=False),
+                    "uf",
+                    pl.col("score_risco_final").cast(pl.Float64).alias("score_risco"),
+                    "classificacao_risco",
+                    pl.col("valSemComp").cast(pl.Float64).fill_null(0.0),
+                    pl.col("totalMov").cast(pl.Float64).fill_null(0.0),
+                    pl.col("percValSemComp").cast(pl.Float64).fill_null(0.0),
+                    pl.col("is_conexao_ativa").cast(pl.Boolean).fill_null(False),
+                    "rank",
+                ])
+            )
+            quarters_df = quarters_df.drop("_quarter_idx")
+    except Exception as e:
+        import traceback
+        print(f"❌ ERRO NA ANIMAÇÃO REGIONAL: {e}", flush=True)
+        print(traceback.format_exc(), flush=True)
+    return ColumnarPayload(
+        tables={"quarters": quarters_df, "farmacias": farmacias_df},
+        meta={"nome_regiao": nome_exibicao},
+    )
+
 # Conjunto de diretórios de CNPJ já criados nesta sessão — evita syscalls redundantes.
 _known_cnpj_dirs: set[str] = set()
 
@@ -400,26 +486,23 @@ def get_metric_percentiles(scope: str, uf: Optional[str] = None, regiao_id: Opti
     try:
         # Se houver data e for percentual, calculamos do zero para ser dinâmico
         if (data_inicio or data_fim) and metric == "percentual_sem_comprovacao":
-            df_base = get_df().join(get_df_perfil_estabelecimento(), on="id_cnpj", how="left")
             MIN_DATA = date(2015, 7, 1)
             MAX_DATA = date(2024, 12, 31)
             inicio = (data_inicio if data_inicio and data_inicio >= MIN_DATA else MIN_DATA) if data_inicio else MIN_DATA
             fim = data_fim if data_fim else MAX_DATA
-            
-            mask = pl.col("periodo").is_between(inicio, fim)
-            
-            # Agrega por CNPJ primeiro
+
+            # Totais por CNPJ do cubo de movimentacao, com a geografia do perfil
+            perfil_geo = get_df_perfil_estabelecimento().select(
+                ["id_cnpj", "cnpj", "uf", "no_municipio", "id_regiao_saude"]
+            ).unique(subset="id_cnpj", keep="first")
             df_agg = (
-                df_base.filter(mask)
-                .group_by("id_cnpj")
-                .agg([
-                    pl.col("cnpj").first().alias("cnpj"),
-                    pl.col("uf").first().alias("uf"),
-                    pl.col("no_municipio").first().alias("no_municipio"),
-                    pl.col("id_regiao_saude").first().alias("id_regiao_saude"),
-                    pl.sum("total_vendas").alias("tv"),
-                    pl.sum("total_sem_comprovacao").alias("tsc")
+                cnpj_period_totals(inicio, fim)
+                .select([
+                    "id_cnpj",
+                    pl.col("total_vendas").alias("tv"),
+                    pl.col("total_sem_comprovacao").alias("tsc"),
                 ])
+                .join(perfil_geo, on="id_cnpj", how="left")
                 .with_columns([
                     (pl.col("tsc") / pl.when(pl.col("tv") > 0).then(pl.col("tv")).otherwise(pl.lit(1.0)) * 100).alias("pct_sem_comprovacao")
                 ])
@@ -587,6 +670,34 @@ def get_metric_percentiles_animation(
 
     return {"quarters": quarters}
 
+def get_metric_percentiles_animation_columnar(
+    scope: str,
+    uf: Optional[str] = None,
+    regiao_id: Optional[str] = None,
+    metric: str = 'score',
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+) -> ColumnarPayload:
+    """Percentis da animação em formato colunar: `quarters` (janelas) e `percentiles` (formato longo)."""
+    quarters = get_metric_percentiles_animation(scope, uf, regiao_id, metric, data_inicio, data_fim)["quarters"]
+    points = [
+        (q["inicio"], p["percentile"], p["score"])
+        for q in quarters
+        for p in q["percentiles"]
+    ]
+    return ColumnarPayload(tables={
+        "quarters": pl.DataFrame(
+            {"inicio": [q["inicio"] for q in quarters], "fim": [q["fim"] for q in quarters]},
+            schema={"inicio": pl.Date, "fim": pl.Date},
+        ),
+        "percentiles": pl.DataFrame(
+            points,
+            schema={"inicio": pl.Date, "percentile": pl.Int32, "score": pl.Float64},
+            orient="row",
+        ),
+    })
+
+
 def get_cnpj_lookup() -> list[dict]:
     """Retorna lista slim de {cnpj, razao_social, municipio, uf} para autocomplete no frontend.
     Usa get_rede_df() — DataFrame leve de cadastro, sem dados temporais."""
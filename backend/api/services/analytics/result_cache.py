@@ -0,0 +1,276 @@
+"""Cache em memoria de resultados analiticos (LRU + TTL + orcamento de memoria).
+
+Cada `ResultCache` guarda resultados prontos (DataFrames, tuplas de frames ou
+respostas Pydantic) por chave normalizada. As entradas pertencem a uma geracao
+dos dados globais (`data_cache.get_cache_generation`): quando uma
+sincronizacao termina, tudo o que foi calculado antes deixa de valer. Alem do
+TTL, cada cache tem limite de entradas e de memoria estimada; ao estourar,
+saem as entradas usadas ha mais tempo.
+
+O orcamento de memoria de cada namespace pode ser ajustado por
+`SENTINELA_CACHE_MB_<NOME>` (ex.: `SENTINELA_CACHE_MB_ANALYTICS_RESUMO=256`;
+0 desliga o limite). Requisicoes simultaneas pela mesma chave ausente sao
+coalescidas: uma calcula e as demais esperam o mesmo resultado.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+import os
+import sys
+import threading
+import time
+from typing import Any, TypeVar
+
+import polars as pl
+from pydantic import BaseModel
+
+from data_cache import get_cache_generation
+
+
+T = TypeVar("T")
+
+_MISSING = object()
+# Listas longas (ex.: resultado_cnpjs) sao estimadas por amostra.
+_SIZE_SAMPLE_ITEMS = 32
+
+
+def _budget_mb(name: str, default: float | None) -> float | None:
+    env_name = f"SENTINELA_CACHE_MB_{name.upper()}"
+    value = os.getenv(env_name)
+    if value is None or not value.strip():
+        return default
+    try:
+        budget = float(value)
+    except ValueError:
+        print(f"[AVISO] {env_name} invalido ({value!r}); usando {default}.")
+        return default
+    return budget if budget > 0 else None
+
+
+def estimate_size_bytes(value: Any) -> int:
+    """Estimativa barata da memoria ocupada por um resultado."""
+    if isinstance(value, (pl.DataFrame, pl.Series)):
+        return int(value.estimated_size())
+    if isinstance(value, BaseModel):
+        return 64 + sum(estimate_size_bytes(item) for item in value.__dict__.values())
+    if isinstance(value, dict):
+        return 64 + sum(
+            estimate_size_bytes(key) + estimate_size_bytes(item)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value) if not isinstance(value, (list, tuple)) else value
+        if not items:
+            return 56
+        if len(items) <= _SIZE_SAMPLE_ITEMS:
+            return 56 + 8 * len(items) + sum(estimate_size_bytes(item) for item in items)
+        step = len(items) // _SIZE_SAMPLE_ITEMS
+        sample = items[::step][:_SIZE_SAMPLE_ITEMS]
+        mean = sum(estimate_size_bytes(item) for item in sample) / len(sample)
+        return 56 + int(len(items) * (8 + mean))
+    return sys.getsizeof(value)
+
+
+def normalize_filter_value(value: Any) -> Hashable:
+    """Forma canonica de um filtro vindo da UI, para compor chaves de cache.
+
+    Vazio e "Todos" equivalem a ausencia de filtro; listas viram tuplas
+    ordenadas sem repeticao; datas viram ISO.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        return None if not text or text == "Todos" else text
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = {normalize_filter_value(item) for item in value}
+        items.discard(None)
+        return tuple(sorted(items, key=repr)) or None
+    return value
+
+
+def make_filter_key(**filters: Any) -> tuple[tuple[str, Hashable], ...]:
+    """Chave estavel para um conjunto de filtros; filtros inativos sao omitidos."""
+    normalized = ((name, normalize_filter_value(value)) for name, value in filters.items())
+    return tuple(sorted(
+        (name, value) for name, value in normalized
+        if value is not None and value is not False
+    ))
+
+
+class _InFlight:
+    """Calculo em andamento para uma chave; os demais interessados esperam."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+@dataclass
+class _Entry:
+    value: Any
+    generation: int
+    created_at: float
+    size_bytes: int
+
+
+class ResultCache:
+    """Cache LRU com TTL, orcamento de memoria e invalidacao por geracao."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ttl_seconds: float = 300,
+        max_entries: int = 64,
+        max_mb: float | None = None,
+        sizer: Callable[[Any], int] = estimate_size_bytes,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        max_mb = _budget_mb(name, max_mb)
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self._sizer = sizer
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._size_bytes = 0
+        self._generation: int | None = None
+        self._inflight: dict[Hashable, _InFlight] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected = 0
+        self.coalesced = 0
+        _CACHES[name] = self
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry.size_bytes
+
+    def _sync_generation(self, generation: int) -> None:
+        if self._generation == generation:
+            return
+        if self._entries:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._size_bytes = 0
+        self._generation = generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._sync_generation(get_cache_generation())
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created_at > self.ttl_seconds:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, generation: int | None = None) -> None:
+        """Guarda `value`; se `generation` ja nao for a atual, o valor e descartado."""
+        size_bytes = self._sizer(value)
+        with self._lock:
+            current = get_cache_generation()
+            self._sync_generation(current)
+            if generation is not None and generation != current:
+                return
+            if self.max_bytes is not None and size_bytes > self.max_bytes:
+                self.rejected += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, current, time.monotonic(), size_bytes)
+            self._size_bytes += size_bytes
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._size_bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Valor em cache ou `compute()`, executado uma unica vez por chave ausente."""
+        generation = get_cache_generation()
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self.put(key, flight.value, generation)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_mb": round(self._size_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes else None,
+                "ttl_seconds": self.ttl_seconds,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
+
+
+_CACHES: dict[str, ResultCache] = {}
+
+
+def result_cache_stats() -> dict[str, dict[str, Any]]:
+    """Estatisticas de todos os caches de resultados criados no processo."""
+    return {name: cache.stats() for name, cache in sorted(_CACHES.items())}
@@ -0,0 +1,534 @@
+"""Indice nacional da teia societaria (dados_socios + teia_fonte_nivel2-4).
+
+A teia de cada CNPJ alvo e materializada filtrando os Parquets nacionais
+`teia_fonte_nivel2/3/4` (sem indice: cada filtro percorre o arquivo todo), e
+perguntas entre CNPJs ("quais outras farmacias dividem um socio com esta")
+exigiriam refazer os mesmos joins. `TeiaIndex` le uma vez por geracao do
+cache apenas as colunas de chave e as flags das quatro fontes e guarda:
+
+- ids de no (CPF/CNPJ) codificados como inteiros: `keys` ordenado, com busca
+  binaria para traduzir documentos em codigos;
+- vinculos socio -> empresa deduplicados, em adjacencia CSR nos dois sentidos
+  (socios de uma empresa, empresas de um socio);
+- atributos por no em arrays: empresa, alvo, farmacia popular, falecido,
+  CadUnico;
+- por fonte teia_fonte_nivelN, as linhas do arquivo de cada chave usada na
+  geracao da teia por CNPJ (nivel 2 e 4 por socio, nivel 3 por empresa).
+
+Consultas de vizinhanca em k saltos, socios em comum e componente conexa
+rodam em milissegundos sobre os arrays (rotas /cnpj/{cnpj}/network/vizinhanca,
+/farmacias-socio-comum e /componente). `read_source_rows` le so os row
+groups que contem as linhas pedidas, em vez de varrer o arquivo (precisa de
+pyarrow; sem ele, ou com o arquivo trocado desde a montagem, devolve None e o
+chamador volta ao filtro por scan). `SENTINELA_TEIA_INDEX=0` desliga o uso
+do indice na geracao da teia.
+
+O indice e montado em uma thread de fundo, disparada ao fim de `load_cache`
+(boot e refresh) ou, se as fontes mudarem sem nova geracao, pela primeira
+consulta que o pedir. Nenhuma requisicao espera a montagem (~30 s nas bases
+nacionais): ate o indice ficar pronto, `get_teia_index` devolve None, a
+geracao da teia usa o scan e as consultas entre CNPJs respondem 503 com
+Retry-After.
+
+A montagem e registrada no log com tempo e memoria. O indice tem orcamento
+de `_TEIA_INDEX_MB` (ajustavel por `SENTINELA_CACHE_MB_TEIA_INDEX`). Antes de
+ler as fontes, o tamanho e estimado pelo numero de linhas (metadados dos
+Parquets); se a estimativa ou o indice montado passar do orcamento, ele nao
+fica em cache e nao e remontado na mesma geracao.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import numpy as np
+import polars as pl
+from fastapi import HTTPException
+
+from cache_registry import get_global_parquet_files_by_key
+from data_cache import (
+    get_cache_dir,
+    get_cache_generation,
+    get_df_dados_socios,
+    scan_teia_fonte_nivel2,
+    scan_teia_fonte_nivel3,
+    scan_teia_fonte_nivel4,
+)
+
+from .result_cache import ResultCache
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow e opcional
+    pq = None
+
+
+# Fonte -> (scan, coluna usada na busca de linhas pela geracao da teia).
+TEIA_FONTE_SOURCES = {
+    "teia_fonte_nivel2": (scan_teia_fonte_nivel2, "cpf_cnpj_socio"),
+    "teia_fonte_nivel3": (scan_teia_fonte_nivel3, "cnpj_empresa"),
+    "teia_fonte_nivel4": (scan_teia_fonte_nivel4, "cpf_cnpj_socio"),
+}
+_FLAG_COLUMNS = ("is_farmacia_fp", "is_falecido", "is_cadunico")
+_ROW = "_row"
+
+
+def teia_index_enabled() -> bool:
+    return (os.getenv("SENTINELA_TEIA_INDEX") or "1").strip().lower() not in {"0", "false", "nao", "off"}
+
+
+def _source_path(name: str) -> str:
+    return os.path.join(get_cache_dir(), get_global_parquet_files_by_key()[name])
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _Csr:
+    """Valores agrupados por codigo de origem: `values[indptr[i]:indptr[i + 1]]`."""
+
+    def __init__(self, origin: np.ndarray, values: np.ndarray, size: int):
+        order = np.argsort(origin, kind="stable")
+        self.values = values[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origin, minlength=size), out=self.indptr[1:])
+
+    def lookup(self, code: int) -> np.ndarray:
+        return self.values[self.indptr[code]:self.indptr[code + 1]]
+
+    def gather(self, codes: np.ndarray) -> np.ndarray:
+        """Concatenacao de `lookup(c)` para cada codigo, sem laco em Python."""
+        starts = self.indptr[codes]
+        lengths = self.indptr[codes + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return self.values[:0]
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.values[offsets + np.arange(total)]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.indptr.nbytes
+
+
+class _SourceRows:
+    """Linhas de um Parquet teia_fonte por codigo de chave, com os row groups do arquivo."""
+
+    def __init__(self, path: str, key_codes: np.ndarray, rows: np.ndarray, size: int):
+        self.path = path
+        self.signature = _signature(path)
+        self.rows = _Csr(key_codes, rows, size)
+        self.schema = pl.read_parquet_schema(path)
+        self.metadata = None
+        self.row_group_starts = np.zeros(0, dtype=np.int64)
+        if pq is not None:
+            self.metadata = pq.read_metadata(path)
+            sizes = [self.metadata.row_group(i).num_rows for i in range(self.metadata.num_row_groups)]
+            self.row_group_starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    def read(self, codes: np.ndarray) -> pl.DataFrame | None:
+        if self.metadata is None or _signature(self.path) != self.signature:
+            return None
+        rows = np.unique(self.rows.gather(codes))
+        if rows.size == 0:
+            return pl.DataFrame(schema=self.schema)
+        groups = np.unique(np.searchsorted(self.row_group_starts, rows, side="right") - 1)
+        group_sizes = np.array([self.metadata.row_group(int(g)).num_rows for g in groups], dtype=np.int64)
+        # Posicao de cada linha dentro da tabela formada so pelos row groups lidos.
+        base = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+        group_of_row = np.searchsorted(self.row_group_starts, rows, side="right") - 1
+        local = rows - self.row_group_starts[group_of_row] + base[np.searchsorted(groups, group_of_row)]
+        with pq.ParquetFile(self.path, metadata=self.metadata) as parquet_file:
+            table = parquet_file.read_row_groups([int(g) for g in groups])
+        df = pl.from_arrow(table.take(local))
+        # pyarrow nao preserva alguns tipos do Polars (ex.: Categorical).
+        return df.cast({col: self.schema[col] for col in df.columns if df.schema[col] != self.schema[col]})
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+
+class TeiaIndex:
+    """Grafo nacional socio <-> empresa com ids inteiros e adjacencia CSR."""
+
+    def __init__(self, socios: pl.DataFrame, fontes: dict[str, pl.DataFrame]):
+        """`socios`: dados_socios (cnpj, cpf_cnpj_socio); `fontes`: colunas de chave,
+        flags e `_row` (posicao no arquivo) de cada teia_fonte_nivelN."""
+        links = [socios.select(socio="cpf_cnpj_socio", empresa="cnpj")]
+        links += [df.select(socio="cpf_cnpj_socio", empresa="cnpj_empresa") for df in fontes.values()]
+        all_links = pl.concat(links)
+        # Chaves sem par (empresa ou socio nulo) tambem entram: a busca de
+        # linhas por chave precisa encontra-las como o filtro por scan.
+        self.keys = pl.concat([all_links["socio"], all_links["empresa"]]).drop_nulls().unique().sort()
+        all_links = all_links.drop_nulls()
+        self._key_frame = pl.DataFrame({
+            "_key": self.keys,
+            "_code": np.arange(len(self.keys), dtype=np.int32),
+        })
+        size = len(self.keys)
+
+        link_codes = self._encode(all_links, ["socio", "empresa"]).unique()
+        socio_codes = link_codes["socio"].to_numpy()
+        empresa_codes = link_codes["empresa"].to_numpy()
+        self.links = len(link_codes)
+        self._empresas_do_socio = _Csr(socio_codes, empresa_codes, size)
+        self._socios_da_empresa = _Csr(empresa_codes, socio_codes, size)
+
+        self.is_empresa = np.zeros(size, dtype=bool)
+        self.is_empresa[empresa_codes] = True
+        self.is_alvo = np.zeros(size, dtype=bool)
+        self.is_alvo[self._encode(socios.select(empresa="cnpj").drop_nulls(), ["empresa"])["empresa"].to_numpy()] = True
+        self.is_farmacia_fp = self.is_alvo.copy()
+        self.is_falecido = np.zeros(size, dtype=bool)
+        self.is_cadunico = np.zeros(size, dtype=bool)
+        flag_targets = (
+            ("is_farmacia_fp", "cnpj_empresa", self.is_farmacia_fp),
+            ("is_falecido", "cpf_cnpj_socio", self.is_falecido),
+            ("is_cadunico", "cpf_cnpj_socio", self.is_cadunico),
+        )
+        for df in fontes.values():
+            for flag, key_column, target in flag_targets:
+                if flag in df.columns:
+                    flagged = self._encode(df.filter(pl.col(flag)).select(key_column).drop_nulls(), [key_column])
+                    target[flagged[key_column].to_numpy()] = True
+
+        self._sources: dict[str, _SourceRows] = {}
+        for name, df in fontes.items():
+            key_column = TEIA_FONTE_SOURCES[name][1]
+            encoded = self._encode(df.select(key_column, _ROW).drop_nulls(key_column), [key_column])
+            self._sources[name] = _SourceRows(
+                _source_path(name),
+                encoded[key_column].to_numpy(),
+                encoded[_ROW].to_numpy(),
+                size,
+            )
+
+        self._components: np.ndarray | None = None
+        self._components_lock = threading.Lock()
+
+    # ── Codificacao ─────────────────────────────────────────────────────────
+    def _encode(self, df: pl.DataFrame, columns: list[str]) -> pl.DataFrame:
+        """Troca os documentos de `columns` pelos codigos inteiros (linhas sem codigo saem)."""
+        for column in columns:
+            df = (
+                df.join(self._key_frame, left_on=column, right_on="_key", how="inner", maintain_order="left")
+                .drop(column)
+                .rename({"_code": column})
+            )
+        return df
+
+    def codes(self, documents: list[str]) -> np.ndarray:
+        """Codigos dos documentos presentes no indice (os ausentes sao ignorados)."""
+        if not documents or not len(self.keys):
+            return np.zeros(0, dtype=np.int64)
+        query = pl.Series(documents, dtype=pl.String)
+        positions = self.keys.search_sorted(query).to_numpy()
+        positions = np.minimum(positions, len(self.keys) - 1)
+        found = self.keys.gather(positions).to_numpy() == query.to_numpy()
+        return np.unique(positions[found]).astype(np.int64)
+
+    def documents(self, codes: np.ndarray) -> list[str]:
+        return self.keys.gather(codes).to_list()
+
+    # ── Consultas ───────────────────────────────────────────────────────────
+    def neighbors(self, codes: np.ndarray) -> np.ndarray:
+        """Vizinhos diretos (empresas dos socios e socios das empresas), sem repeticao."""
+        return np.unique(np.concatenate([
+            self._empresas_do_socio.gather(codes),
+            self._socios_da_empresa.gather(codes),
+        ]))
+
+    def k_hop(self, codes: np.ndarray, max_hops: int) -> tuple[np.ndarray, np.ndarray]:
+        """(codigos, distancia) dos nos a ate `max_hops` vinculos de `codes` (inclusive)."""
+        distance = np.full(len(self.keys), -1, dtype=np.int16)
+        distance[codes] = 0
+        frontier = codes
+        for hop in range(1, max_hops + 1):
+            if frontier.size == 0:
+                break
+            reached = self.neighbors(frontier)
+            frontier = reached[distance[reached] < 0]
+            distance[frontier] = hop
+        found = np.flatnonzero(distance >= 0)
+        return found, distance[found]
+
+    def shared_partners(self, code: int) -> tuple[np.ndarray, np.ndarray]:
+        """Pares (empresa, socio em comum) das outras empresas que dividem socio com `code`."""
+        partners = self._socios_da_empresa.lookup(code)
+        if partners.size == 0:
+            return partners, partners
+        lengths = np.diff(self._empresas_do_socio.indptr)[partners]
+        empresas = self._empresas_do_socio.gather(partners)
+        socios = np.repeat(partners, lengths)
+        keep = empresas != code
+        return empresas[keep], socios[keep]
+
+    def components(self) -> np.ndarray:
+        """Rotulo da componente conexa de cada no (menor codigo da componente)."""
+        with self._components_lock:
+            if self._components is None:
+                self._components = self._label_components()
+            return self._components
+
+    def _label_components(self) -> np.ndarray:
+        # Propagacao do menor rotulo pelos vinculos + compressao de caminhos
+        # (ponteiro para o rotulo do rotulo) ate estabilizar.
+        labels = np.arange(len(self.keys), dtype=np.int64)
+        socios = np.repeat(
+            np.arange(len(self.keys), dtype=np.int64),
+            np.diff(self._empresas_do_socio.indptr),
+        )
+        empresas = self._empresas_do_socio.values.astype(np.int64)
+        while True:
+            smallest = np.minimum(labels[socios], labels[empresas])
+            updated = labels.copy()
+            np.minimum.at(updated, socios, smallest)
+            np.minimum.at(updated, empresas, smallest)
+            while True:
+                jumped = updated[updated]
+                if np.array_equal(jumped, updated):
+                    break
+                updated = jumped
+            if np.array_equal(updated, labels):
+                return labels
+            labels = updated
+
+    def read_source_rows(self, name: str, documents: list[str]) -> pl.DataFrame | None:
+        """Linhas de teia_fonte_nivelN com a chave em `documents`, na ordem do arquivo."""
+        return self._sources[name].read(self.codes(documents))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.is_empresa, self.is_alvo, self.is_farmacia_fp, self.is_falecido, self.is_cadunico)
+        return (
+            int(self.keys.estimated_size())
+            + int(self._key_frame.estimated_size())
+            + self._empresas_do_socio.nbytes
+            + self._socios_da_empresa.nbytes
+            + sum(array.nbytes for array in arrays)
+            + sum(source.nbytes for source in self._sources.values())
+            + (self._components.nbytes if self._components is not None else 0)
+        )
+
+
+_TEIA_INDEX_MB = 2048
+_TEIA_INDEX_CACHE = ResultCache(
+    "teia_index",
+    ttl_seconds=24 * 3600,
+    max_entries=1,
+    max_mb=_TEIA_INDEX_MB,
+    sizer=lambda index: index.nbytes,
+)
+# Bytes do indice por linha das fontes (medido ~52 B/linha com ~0,55 documento
+# distinto por linha); so serve para recusar a montagem antes de ler as fontes.
+_ESTIMATED_BYTES_PER_ROW = 64
+_RETRY_AFTER_S = 30
+
+_build_lock = threading.Lock()
+_build_thread: threading.Thread | None = None
+# (geracao, chave) sem indice: acima do orcamento ou montagem com erro.
+_unavailable: tuple | None = None
+_unavailable_reason = ""
+
+
+def _truthy(column: str) -> pl.Expr:
+    """Mesma regra de `_is_truthy_flag` (flags gravadas como bool, inteiro ou texto)."""
+    text = pl.col(column).cast(pl.String).str.strip_chars().str.to_lowercase()
+    return text.is_in(["1", "1.0", "true", "t", "sim", "yes"]).fill_null(False).alias(column)
+
+
+def _build_teia_index() -> TeiaIndex:
+    fontes = {}
+    for name, (scan, _key_column) in TEIA_FONTE_SOURCES.items():
+        lf = scan().with_row_index(_ROW)
+        available = lf.collect_schema().names()
+        fontes[name] = lf.select(
+            pl.col("cpf_cnpj_socio", "cnpj_empresa").cast(pl.String),
+            _ROW,
+            *(_truthy(flag) for flag in _FLAG_COLUMNS if flag in available),
+        ).collect()
+    socios = get_df_dados_socios().select(pl.col("cnpj", "cpf_cnpj_socio").cast(pl.String))
+    return TeiaIndex(socios, fontes)
+
+
+def _teia_index_key() -> tuple:
+    return tuple(_signature(_source_path(name)) for name in (*TEIA_FONTE_SOURCES, "dados_socios"))
+
+
+def _estimate_index_bytes() -> int:
+    """Tamanho provavel do indice pelas linhas das fontes (so metadados)."""
+    rows = 0
+    for name in (*TEIA_FONTE_SOURCES, "dados_socios"):
+        path = _source_path(name)
+        if os.path.exists(path):
+            rows += pl.scan_parquet(path).select(pl.len()).collect().item()
+    return rows * _ESTIMATED_BYTES_PER_ROW
+
+
+def _mark_unavailable(generation: int, key: tuple, reason: str) -> None:
+    global _unavailable, _unavailable_reason
+    with _build_lock:
+        _unavailable = (generation, key)
+        _unavailable_reason = reason
+
+
+def _build_logged(generation: int, key: tuple) -> TeiaIndex:
+    t0 = time.perf_counter()
+    index = _build_teia_index()
+    elapsed_ms = int((time.perf_counter() - t0) * 1000)
+    size_mb = index.nbytes / (1024 * 1024)
+    print(
+        f"[ CACHE ] GLOBAL - teia_index - montado em {elapsed_ms} ms "
+        f"({len(index.keys):,} nos, {index.links:,} vinculos, {size_mb:.0f} MB)."
+    )
+    max_bytes = _TEIA_INDEX_CACHE.max_bytes
+    if max_bytes is not None and index.nbytes > max_bytes:
+        _mark_unavailable(generation, key, "acima do orcamento de memoria")
+        print(
+            f"[AVISO] Indice da teia ({size_mb:.0f} MB) acima do orcamento "
+            f"({max_bytes / (1024 * 1024):.0f} MB); usando scan das fontes nesta geracao."
+        )
+    return index
+
+
+def _build_in_background(generation: int, key: tuple, reason: str) -> None:
+    try:
+        max_bytes = _TEIA_INDEX_CACHE.max_bytes
+        estimated = _estimate_index_bytes()
+        if max_bytes is not None and estimated > max_bytes:
+            _mark_unavailable(generation, key, "acima do orcamento de memoria")
+            print(
+                f"[AVISO] Indice da teia estimado em {estimated / (1024 * 1024):.0f} MB, acima do "
+                f"orcamento ({max_bytes / (1024 * 1024):.0f} MB); nao montado nesta geracao."
+            )
+            return
+        print(f"[ CACHE ] GLOBAL - teia_index - montagem em segundo plano ({reason}).")
+        _TEIA_INDEX_CACHE.get_or_compute(key, lambda: _build_logged(generation, key))
+    except Exception as exc:
+        _mark_unavailable(generation, key, f"falha na montagem ({exc})")
+        print(f"[ERRO] Falha ao montar o indice da teia: {exc}")
+
+
+def schedule_teia_index_build(reason: str) -> None:
+    """Inicia a montagem do indice da geracao atual em segundo plano, se preciso.
+
+    Uma montagem por vez: se outra (de uma geracao anterior) ainda estiver
+    rodando, a proxima consulta agenda de novo quando ela terminar.
+    """
+    global _build_thread
+    generation = get_cache_generation()
+    key = _teia_index_key()
+    # `get` tambem descarta o indice de uma geracao anterior antes da montagem.
+    if _TEIA_INDEX_CACHE.get(key) is not None:
+        return
+    with _build_lock:
+        if _unavailable == (generation, key):
+            return
+        if _build_thread is not None and _build_thread.is_alive():
+            return
+        _build_thread = threading.Thread(
+            target=_build_in_background,
+            args=(generation, key, reason),
+            name="teia-index",
+            daemon=True,
+        )
+        _build_thread.start()
+
+
+def get_teia_index() -> TeiaIndex | None:
+    """Indice da geracao atual, ou None enquanto nao estiver pronto.
+
+    Nunca monta o indice na thread de quem chama: sem indice em cache, agenda
+    a montagem em segundo plano e devolve None. A chave inclui mtime/tamanho
+    das fontes e de dados_socios: um Parquet trocado sem mudar a geracao monta
+    um indice novo.
+    """
+    index = _TEIA_INDEX_CACHE.get(_teia_index_key())
+    if index is None:
+        schedule_teia_index_build("primeiro uso")
+    return index
+
+
+def _require_teia_index() -> TeiaIndex:
+    index = get_teia_index()
+    if index is not None:
+        return index
+    with _build_lock:
+        unavailable = _unavailable == (get_cache_generation(), _teia_index_key())
+        reason = _unavailable_reason
+    if unavailable:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Indice nacional da teia indisponivel: {reason}.",
+        )
+    raise HTTPException(
+        status_code=503,
+        detail="Indice nacional da teia em montagem; tente novamente em instantes.",
+        headers={"Retry-After": str(_RETRY_AFTER_S)},
+    )
+
+
+# ── Consultas entre CNPJs ───────────────────────────────────────────────────
+def _node_frame(index: TeiaIndex, codes: np.ndarray, **extra) -> pl.DataFrame:
+    return pl.DataFrame({
+        "id": index.documents(codes),
+        **extra,
+        "is_empresa": index.is_empresa[codes],
+        "is_alvo": index.is_alvo[codes],
+        "is_farmacia_fp": index.is_farmacia_fp[codes],
+    })
+
+
+def teia_vizinhanca(documento: str, max_saltos: int = 2) -> pl.DataFrame:
+    """Nos a ate `max_saltos` vinculos societarios do documento (id, saltos, flags)."""
+    index = _require_teia_index()
+    codes = index.codes([documento])
+    found, distance = index.k_hop(codes, max_saltos)
+    return _node_frame(index, found, saltos=distance.astype(np.int8)).sort(["saltos", "id"])
+
+
+def teia_farmacias_com_socio_em_comum(cnpj: str) -> pl.DataFrame:
+    """Farmacias (alvo ou Farmacia Popular) que dividem ao menos um socio com o CNPJ."""
+    index = _require_teia_index()
+    codes = index.codes([cnpj])
+    if codes.size == 0:
+        return pl.DataFrame(schema={"cnpj": pl.String, "socios_em_comum": pl.List(pl.String)})
+    empresas, socios = index.shared_partners(int(codes[0]))
+    farmacia = index.is_alvo[empresas] | index.is_farmacia_fp[empresas]
+    return (
+        pl.DataFrame({
+            "cnpj": index.documents(empresas[farmacia]),
+            "socio": index.documents(socios[farmacia]),
+        })
+        .group_by("cnpj", maintain_order=True)
+        .agg(pl.col("socio").unique().sort().alias("socios_em_comum"))
+        .sort("cnpj")
+    )
+
+
+def teia_componente(documento: str) -> tuple[int, int, pl.DataFrame]:
+    """(total de nos, total de empresas, farmacias) da componente conexa do documento.
+
+    A componente pode ter milhoes de nos; so as farmacias (alvo ou Farmacia
+    Popular) saem como linhas.
+    """
+    index = _require_teia_index()
+    codes = index.codes([documento])
+    if codes.size == 0:
+        return 0, 0, _node_frame(index, codes)
+    labels = index.components()
+    members = np.flatnonzero(labels == labels[codes[0]])
+    farmacias = members[index.is_alvo[members] | index.is_farmacia_fp[members]]
+    return (
+        int(members.size),
+        int(index.is_empresa[members].sum()),
+        _node_frame(index, farmacias).sort("id"),
+    )
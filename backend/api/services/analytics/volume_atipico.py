@@ -6,15 +6,18 @@ import polars as pl
 from data_cache import get_df_dados_farmacia, get_df_volume_atipico_semestral
 
 from .indicator_rules import get_volume_atipico_aumento_minimo
+from .result_cache import ResultCache
 
 DEFAULT_VOLUME_ATIPICO_LIMITE = 50.0
 MIN_VOLUME_ATIPICO_LIMITE = 40.0
 MAX_VOLUME_ATIPICO_LIMITE = 2000.0
 STATUS_SEMESTRE_COMPARAVEL = 1
-_VOLUME_ATIPICO_ID_CNPJS_CACHE: dict[
-    tuple[int, Optional[int], Optional[int], float, float],
-    pl.DataFrame,
-] = {}
+_VOLUME_ATIPICO_ID_CNPJS_CACHE = ResultCache(
+    "volume_atipico",
+    ttl_seconds=300,
+    max_entries=64,
+    max_mb=64,
+)
 
 
 def normalize_volume_atipico_limite(value: Optional[float]) -> float:
@@ -192,33 +195,18 @@ def get_volume_atipico_id_cnpjs_df(
     """Retorna id_cnpj de estabelecimentos com ao menos um semestre acima do limite."""
     limite = normalize_volume_atipico_limite(limite_percentual)
     aumento_minimo = get_volume_atipico_aumento_minimo()
-    df = get_df_volume_atipico_semestral()
-    empty = pl.DataFrame({"id_cnpj": []}, schema={"id_cnpj": pl.Int32})
-
     inicio_key, fim_key = _period_to_semester_keys(data_inicio, data_fim)
-    cache_key = (
-        id(df),
-        inicio_key,
-        fim_key,
-        limite,
-        aumento_minimo,
-    )
-    cached = _VOLUME_ATIPICO_ID_CNPJS_CACHE.get(cache_key)
-    if cached is not None:
-        return cached
-
-    df_periodo = _volume_df_for_period(data_inicio, data_fim)
-    if df_periodo.is_empty():
-        return empty
-
-    result = (
-        df_periodo
-        .filter(volume_atipico_flag_expr(limite, aumento_minimo))
-        .select(pl.col("id_cnpj").cast(pl.Int32))
-        .unique()
-    )
+    cache_key = (inicio_key, fim_key, limite, aumento_minimo)
+
+    def build() -> pl.DataFrame:
+        df_periodo = _volume_df_for_period(data_inicio, data_fim)
+        if df_periodo.is_empty():
+            return pl.DataFrame({"id_cnpj": []}, schema={"id_cnpj": pl.Int32})
+        return (
+            df_periodo
+            .filter(volume_atipico_flag_expr(limite, aumento_minimo))
+            .select(pl.col("id_cnpj").cast(pl.Int32))
+            .unique()
+        )
 
-    if len(_VOLUME_ATIPICO_ID_CNPJS_CACHE) >= 64:
-        _VOLUME_ATIPICO_ID_CNPJS_CACHE.clear()
-    _VOLUME_ATIPICO_ID_CNPJS_CACHE[cache_key] = result
-    return result
+    return _VOLUME_ATIPICO_ID_CNPJS_CACHE.get_or_compute(cache_key, build)
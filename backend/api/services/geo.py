@@ -1,37 +1,24 @@
-from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from datetime import date
-from ..schemas.geo import LocalidadeSchema, LocalidadesResponseSchema, EstabelecimentoGeoSchema, EstabelecimentosGeoResponseSchema
-from data_cache import get_localidades_df, get_df_dados_farmacia, get_df
+from ..schemas.geo import LocalidadeSchema, EstabelecimentoGeoSchema
+from data_cache import get_localidades_df, get_df_dados_farmacia
 from .analytics.matriz_risco_dinamica import build_dynamic_matriz_risco
+from .analytics.movimentacao_cube import cnpj_period_totals
+from ..utils.columnar import ColumnarPayload
+from ..utils.frame_json import conform_frame, frame_json_body
 import polars as pl
 
 class GeoService:
     @staticmethod
-    def get_localidades(_db: Session) -> LocalidadesResponseSchema:
+    def get_localidades_body() -> bytes:
         """
-        Retorna a lista de localidades (UF, Município, Região) a partir do Cache Polars.
+        Retorna a lista de localidades (UF, Município, Região) a partir do Cache Polars,
+        já serializada no formato de `LocalidadesResponseSchema`.
         Isso permite funcionamento offline e maior velocidade.
         """
         try:
-            df = get_localidades_df()
-            
-            # Map Polars rows to Schema (convert to dicts first)
-            # no_regiao_saude, id_regiao_saude, no_municipio, id_ibge7, sg_uf
-            localidades = [
-                LocalidadeSchema(
-                    sg_uf=r["sg_uf"],
-                    no_regiao_saude=r["no_regiao_saude"],
-                    id_regiao_saude=r["id_regiao_saude"],
-                    no_municipio=r["no_municipio"],
-                    id_ibge7=r["id_ibge7"],
-                    nu_populacao=r["nu_populacao"],
-                    unidade_pf=r.get("unidade_pf")
-                )
-                for r in df.iter_rows(named=True)
-            ]
-            
-            return LocalidadesResponseSchema(localidades=localidades)
+            df = conform_frame(get_localidades_df(), LocalidadeSchema)
+            return frame_json_body("localidades", df)
         except Exception as e:
             import traceback
             print("❌ ERRO AO BUSCAR LOCALIDADES DO CACHE:")
@@ -42,71 +29,88 @@ class GeoService:
             ) from e
 
     @staticmethod
-    def get_estabelecimentos_geo(
+    def _build_estabelecimentos_geo_frame(
         data_inicio: date | None = None,
         data_fim: date | None = None,
-    ) -> EstabelecimentosGeoResponseSchema:
-        """
-        Retorna coordenadas e indicadores de risco dinâmicos de todos os estabelecimentos.
-        O score e a classificação são calculados a partir da matriz anual de componentes.
-        """
-        try:
-            df = get_df_dados_farmacia()
-            risco_df = build_dynamic_matriz_risco(
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-            ).select([
+    ) -> pl.DataFrame:
+        """Estabelecimentos com coordenadas, ja com as colunas de `EstabelecimentoGeoSchema`."""
+        df = get_df_dados_farmacia()
+        risco_df = build_dynamic_matriz_risco(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+        ).select([
+            "id_cnpj",
+            "score_risco_final",
+            "classificacao_risco",
+        ])
+        mov_df = (
+            cnpj_period_totals(data_inicio, data_fim)
+            .select([
                 "id_cnpj",
-                "score_risco_final",
-                "classificacao_risco",
+                pl.col("total_vendas").alias("total_mov"),
+                pl.col("total_sem_comprovacao").alias("val_sem_comp"),
             ])
-            mov_base = get_df()
-            if data_inicio is not None:
-                mov_base = mov_base.filter(pl.col("periodo") >= pl.lit(data_inicio).cast(pl.Date))
-            if data_fim is not None:
-                mov_base = mov_base.filter(pl.col("periodo") <= pl.lit(data_fim).cast(pl.Date))
-
-            mov_df = (
-                mov_base
-                .group_by("id_cnpj")
-                .agg([
-                    pl.col("total_vendas").sum().alias("total_mov"),
-                    pl.col("total_sem_comprovacao").sum().alias("val_sem_comp"),
-                ])
-                .with_columns(
-                    pl.when(pl.col("total_mov") > 0)
-                    .then(pl.col("val_sem_comp") / pl.col("total_mov") * 100)
-                    .otherwise(pl.lit(None, dtype=pl.Float64))
-                    .alias("perc_val_sem_comp")
-                )
+            .with_columns(
+                pl.when(pl.col("total_mov") > 0)
+                .then(pl.col("val_sem_comp") / pl.col("total_mov") * 100)
+                .otherwise(pl.lit(None, dtype=pl.Float64))
+                .alias("perc_val_sem_comp")
             )
+        )
 
-            # Filtra apenas quem tem coordenadas (necessário para o mapa)
-            df = df.join(risco_df, on="id_cnpj", how="left").join(mov_df, on="id_cnpj", how="left").filter(
-                pl.col("latitude").is_not_null() & pl.col("longitude").is_not_null()
-            )
+        # Filtra apenas quem tem coordenadas (necessário para o mapa)
+        df = df.join(risco_df, on="id_cnpj", how="left").join(mov_df, on="id_cnpj", how="left").filter(
+            pl.col("latitude").is_not_null() & pl.col("longitude").is_not_null()
+        )
+        def optional(col: str, dtype) -> pl.Expr:
+            return (pl.col(col) if col in df.columns else pl.lit(None)).cast(dtype).alias(col)
 
-            estabelecimentos = [
-                EstabelecimentoGeoSchema(
-                    cnpj=r["cnpj"],
-                    razao_social=r.get("razao_social"),
-                    lat=r["latitude"],
-                    lon=r["longitude"],
-                    id_ibge7=r.get("id_ibge7"),
-                    uf=r.get("uf"),
-                    municipio=r.get("municipio"),
-                    score_risco=r.get("score_risco_final"),
-                    classificacao_risco=r.get("classificacao_risco"),
-                    percValSemComp=r.get("perc_val_sem_comp"),
-                    totalMov=r.get("total_mov"),
-                    valSemComp=r.get("val_sem_comp"),
-                )
-                for r in df.iter_rows(named=True)
-            ]
+        return df.select([
+            pl.col("cnpj").cast(pl.Utf8),
+            optional("razao_social", pl.Utf8),
+            pl.col("latitude").cast(pl.Float64).alias("lat"),
+            pl.col("longitude").cast(pl.Float64).alias("lon"),
+            optional("id_ibge7", pl.Utf8),
+            optional("uf", pl.Utf8),
+            optional("municipio", pl.Utf8),
+            pl.col("score_risco_final").cast(pl.Float64).alias("score_risco"),
+            pl.col("classificacao_risco").cast(pl.Utf8),
+            pl.col("perc_val_sem_comp").alias("percValSemComp"),
+            pl.col("total_mov").alias("totalMov"),
+            pl.col("val_sem_comp").alias("valSemComp"),
+        ])
 
-            return EstabelecimentosGeoResponseSchema(estabelecimentos=estabelecimentos)
+    @staticmethod
+    def _estabelecimentos_geo_error(e: Exception) -> HTTPException:
+        import traceback
+        print("❌ ERRO AO BUSCAR ESTABELECIMENTOS GEO:")
+        print(traceback.format_exc())
+        return HTTPException(status_code=503, detail="Estabelecimentos georreferenciados indisponiveis: matriz dinamica de risco nao carregada ou invalida.")
+
+    @staticmethod
+    def get_estabelecimentos_geo_body(
+        data_inicio: date | None = None,
+        data_fim: date | None = None,
+    ) -> bytes:
+        """
+        Retorna coordenadas e indicadores de risco dinâmicos de todos os estabelecimentos,
+        já serializados no formato de `EstabelecimentosGeoResponseSchema`.
+        O score e a classificação são calculados a partir da matriz anual de componentes.
+        """
+        try:
+            df = GeoService._build_estabelecimentos_geo_frame(data_inicio, data_fim)
+            return frame_json_body("estabelecimentos", conform_frame(df, EstabelecimentoGeoSchema))
         except Exception as e:
-            import traceback
-            print("❌ ERRO AO BUSCAR ESTABELECIMENTOS GEO:")
-            print(traceback.format_exc())
-            raise HTTPException(status_code=503, detail="Estabelecimentos georreferenciados indisponiveis: matriz dinamica de risco nao carregada ou invalida.") from e
+            raise GeoService._estabelecimentos_geo_error(e) from e
+
+    @staticmethod
+    def get_estabelecimentos_geo_columnar(
+        data_inicio: date | None = None,
+        data_fim: date | None = None,
+    ) -> ColumnarPayload:
+        """Mesmos dados de `get_estabelecimentos_geo`, como tabela colunar (sem Pydantic por linha)."""
+        try:
+            df = GeoService._build_estabelecimentos_geo_frame(data_inicio, data_fim)
+            return ColumnarPayload(tables={"estabelecimentos": df})
+        except Exception as e:
+            raise GeoService._estabelecimentos_geo_error(e) from e
@@ -0,0 +1,113 @@
+"""Respostas colunares opcionais para endpoints analiticos pesados.
+
+O formato padrao continua sendo o JSON dos schemas Pydantic. Um cliente que
+envie `Accept: application/vnd.sentinela.columnar+json` (JSON por colunas)
+ou `Accept: application/vnd.apache.arrow.stream` (Arrow IPC, requer pyarrow)
+recebe as tabelas direto dos DataFrames Polars, sem montar um objeto
+Pydantic por linha.
+
+JSON colunar:
+
+    {"format": "sentinela.columnar.v1",
+     "meta": {...escalares da resposta...},
+     "tables": {"<nome>": {"rows": N, "columns": {"<coluna>": [...], ...}}}}
+
+Arrow: um stream IPC com a tabela principal; `meta` e os nomes das tabelas
+vao em JSON nos metadados do schema (`sentinela:meta`). Respostas com mais de
+uma tabela sao sempre enviadas em JSON colunar.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import io
+import json
+from typing import Any
+
+import polars as pl
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pragma: no cover - pyarrow e opcional
+    pa = None
+    pa_ipc = None
+
+
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.sentinela.columnar+json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_FORMAT = "sentinela.columnar.v1"
+_ARROW_META_KEY = b"sentinela:meta"
+
+
+@dataclass
+class ColumnarPayload:
+    """Tabelas (DataFrames) e escalares de uma resposta em formato colunar."""
+
+    tables: dict[str, pl.DataFrame]
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+def negotiate_columnar(accept: str | None) -> str | None:
+    """Media type colunar pedido no header Accept, ou None para o JSON padrao."""
+    if not accept:
+        return None
+    requested = {part.split(";", 1)[0].strip().lower() for part in accept.split(",")}
+    if ARROW_STREAM_MEDIA_TYPE in requested and pa is not None:
+        return ARROW_STREAM_MEDIA_TYPE
+    if COLUMNAR_JSON_MEDIA_TYPE in requested:
+        return COLUMNAR_JSON_MEDIA_TYPE
+    return None
+
+
+def columnar_format(request: Request, response: Response) -> str | None:
+    """Negocia o formato de um endpoint que aceita resposta colunar (marca `Vary: Accept`)."""
+    response.headers["Vary"] = "Accept"
+    return negotiate_columnar(request.headers.get("accept"))
+
+
+def _table_json(df: pl.DataFrame) -> str:
+    if not df.width:
+        return '{"rows":0,"columns":{}}'
+    # implode + write_json serializa cada coluna como lista inteira no Rust.
+    columns = df.select(pl.all().implode()).write_json()[1:-1]
+    return f'{{"rows":{df.height},"columns":{columns}}}'
+
+
+def encode_columnar_json(payload: ColumnarPayload) -> bytes:
+    tables = ",".join(
+        f"{json.dumps(name)}:{_table_json(df)}" for name, df in payload.tables.items()
+    )
+    meta = json.dumps(jsonable_encoder(payload.meta), ensure_ascii=False, separators=(",", ":"))
+    return (
+        f'{{"format":"{COLUMNAR_FORMAT}","meta":{meta},"tables":{{{tables}}}}}'
+    ).encode("utf-8")
+
+
+def encode_arrow_stream(payload: ColumnarPayload) -> bytes:
+    if pa is None:
+        raise RuntimeError("pyarrow nao instalado: formato Arrow indisponivel.")
+    if len(payload.tables) != 1:
+        raise ValueError("Arrow IPC suporta uma unica tabela por resposta.")
+    name, df = next(iter(payload.tables.items()))
+    table = df.to_arrow()
+    meta = {"format": COLUMNAR_FORMAT, "table": name, "meta": jsonable_encoder(payload.meta)}
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _ARROW_META_KEY: json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+    })
+    sink = io.BytesIO()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def columnar_response(payload: ColumnarPayload, media_type: str) -> Response:
+    """Resposta no formato negociado; varias tabelas caem para o JSON colunar."""
+    headers = {"Vary": "Accept"}
+    if media_type == ARROW_STREAM_MEDIA_TYPE and len(payload.tables) == 1:
+        return Response(encode_arrow_stream(payload), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+    return Response(encode_columnar_json(payload), media_type=COLUMNAR_JSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,67 @@
+"""Corpo JSON gerado direto das colunas Polars, validado uma vez pelo schema.
+
+Listas com milhares de linhas (municipios, estabelecimentos do mapa) nao
+precisam de um objeto Pydantic por linha: `conform_frame` confere o frame
+inteiro contra os campos do schema (colunas, tipos, obrigatorios sem nulos)
+e `frame_json_body` serializa as linhas no Rust, no mesmo formato que o
+`response_model` produziria.
+"""
+
+from __future__ import annotations
+
+import types
+import typing
+from typing import Any
+
+import polars as pl
+from pydantic import BaseModel
+
+
+_FIELD_DTYPES: dict[type, pl.DataType] = {
+    str: pl.Utf8,
+    int: pl.Int64,
+    float: pl.Float64,
+    bool: pl.Boolean,
+}
+
+
+def _field_dtype(annotation: Any) -> tuple[pl.DataType, bool]:
+    """Dtype Polars e se o campo aceita None."""
+    optional = False
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        optional = len(args) < len(typing.get_args(annotation))
+        if len(args) != 1:
+            raise TypeError(f"Campo com tipo nao suportado na serializacao colunar: {annotation!r}")
+        annotation = args[0]
+    dtype = _FIELD_DTYPES.get(annotation)
+    if dtype is None:
+        raise TypeError(f"Campo com tipo nao suportado na serializacao colunar: {annotation!r}")
+    return dtype, optional
+
+
+def conform_frame(df: pl.DataFrame, model: type[BaseModel]) -> pl.DataFrame:
+    """Seleciona e converte as colunas na ordem dos campos de `model`.
+
+    Coluna ausente recebe o default do campo; campo obrigatorio ausente, ou
+    campo nao opcional com nulos, levanta ValueError (como o Pydantic faria
+    na primeira linha invalida).
+    """
+    exprs = []
+    for name, info in model.model_fields.items():
+        dtype, optional = _field_dtype(info.annotation)
+        if name in df.columns:
+            exprs.append(pl.col(name).cast(dtype, strict=True))
+        elif not info.is_required():
+            exprs.append(pl.lit(info.get_default(call_default_factory=True), dtype=dtype).alias(name))
+        else:
+            raise ValueError(f"{model.__name__}: coluna obrigatoria '{name}' ausente.")
+        if not optional and name in df.columns and df.get_column(name).null_count():
+            raise ValueError(f"{model.__name__}: coluna '{name}' nao aceita valores nulos.")
+    return df.select(exprs)
+
+
+def frame_json_body(key: str, df: pl.DataFrame) -> bytes:
+    """`{"<key>": [linhas]}` com as linhas serializadas pelo Polars."""
+    rows = df.write_json() if df.width else "[]"
+    return f'{{"{key}":{rows}}}'.encode("utf-8")
@@ -0,0 +1,59 @@
+"""GET condicional (ETag / If-None-Match) para respostas derivadas do cache.
+
+As respostas servidas a partir dos frames globais sao funcao pura dos
+parametros da requisicao e de `data_cache.get_cache_generation()`. A ETag
+combina esses valores com um identificador do processo (a geracao recomeca
+a cada boot, entao so ela nao distinguiria dados de sincronizacoes
+diferentes). O middleware de `conditional_get` usa estas funcoes para
+responder 304 sem executar o servico quando o cliente reenvia a ETag atual.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import uuid
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from data_cache import get_cache_generation
+
+
+_PROCESS_TAG = uuid.uuid4().hex[:12]
+# Sufixos que o middleware de compressao acrescenta a ETag (`"...-gzip"`).
+_ENCODING_SUFFIXES = ('-gzip"', '-br"', '-zstd"')
+# Obriga o navegador a revalidar sempre: com a ETag, a revalidacao custa um 304.
+CACHE_CONTROL_REVALIDATE = "private, no-cache"
+
+
+def generation_etag(scope: str, *parts: object) -> str:
+    """ETag forte para `scope` com os parametros `parts` na geracao atual do cache."""
+    digest = hashlib.blake2b(
+        repr((_PROCESS_TAG, get_cache_generation(), scope, parts)).encode("utf-8"),
+        digest_size=12,
+    ).hexdigest()
+    return f'"{scope}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True se o If-None-Match contem `etag` (ou `*`), com ou sem sufixo de codificacao."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = set()
+    for part in header.split(","):
+        candidate = part.strip().removeprefix("W/")
+        for suffix in _ENCODING_SUFFIXES:
+            if candidate.endswith(suffix):
+                candidate = candidate[: -len(suffix)] + '"'
+                break
+        candidates.add(candidate)
+    return "*" in candidates or etag in candidates
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL_REVALIDATE}
+
+
+def not_modified_response(etag: str, headers: dict[str, str] | None = None) -> Response:
+    return Response(status_code=304, headers={**(headers or {}), **etag_headers(etag)})
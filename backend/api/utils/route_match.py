@@ -0,0 +1,37 @@
+"""Casamento de caminhos com templates de rota declarados fora do roteador.
+
+Usado pelos middlewares que precisam da rota antes do roteamento (ETag,
+classes de execucao). Os templates sao os caminhos completos como
+registrados no FastAPI (ex.: `/api/v1/analytics/cnpj/{cnpj}/crm-data`).
+"""
+
+from __future__ import annotations
+
+from typing import Generic, Iterable, TypeVar
+
+from starlette.routing import compile_path
+
+
+T = TypeVar("T")
+
+
+class RouteTemplateMatcher(Generic[T]):
+    """Primeiro template (na ordem declarada) que casa com o caminho."""
+
+    def __init__(self, templates: Iterable[tuple[str, T]]):
+        self._patterns = []
+        for template, value in templates:
+            regex, _path_format, convertors = compile_path(template)
+            self._patterns.append((regex, convertors, template, value))
+
+    def match(self, path: str) -> tuple[str, T, dict] | None:
+        """(template, valor, path_params) ou None."""
+        for regex, convertors, template, value in self._patterns:
+            found = regex.match(path)
+            if found:
+                path_params = {
+                    key: convertors[key].convert(raw)
+                    for key, raw in found.groupdict().items()
+                }
+                return template, value, path_params
+        return None
@@ -3,6 +3,9 @@ import unicodedata
 import polars as pl
 
 
+SEARCH_TEXT_COLUMN = "_token_search"
+
+
 def normalize_search_text(value: object) -> str:
     if value is None:
         return ""
@@ -11,32 +14,78 @@ def normalize_search_text(value: object) -> str:
     return " ".join(without_accents.lower().split())
 
 
+def normalize_search_expr(expr: pl.Expr) -> pl.Expr:
+    """Versao vetorizada de `normalize_search_text` (sem callback Python por linha)."""
+    return (
+        expr.cast(pl.Utf8)
+        .fill_null("")
+        .str.normalize("NFKD")
+        .str.replace_all(r"\p{Mn}", "")
+        .str.to_lowercase()
+        .str.replace_all(r"\s+", " ")
+        .str.strip_chars()
+    )
+
+
 def tokenize_search_text(value: str | None, min_length: int = 2) -> list[str]:
     normalized = normalize_search_text(value)
     return [token for token in normalized.split(" ") if len(token) >= min_length]
 
 
+def search_text_expr(columns: tuple[str, ...] | list[str]) -> pl.Expr:
+    return normalize_search_expr(pl.concat_str(
+        [pl.col(col).cast(pl.Utf8).fill_null("") for col in columns],
+        separator=" ",
+    ))
+
+
+def build_search_index(
+    df: pl.DataFrame,
+    columns: tuple[str, ...] | list[str],
+    key: str = "id_cnpj",
+) -> pl.DataFrame:
+    """Texto de busca ja normalizado por `key`, para reaproveitar entre requisicoes."""
+    search_cols = [col for col in columns if col in df.columns]
+    if not search_cols:
+        return df.select(key).with_columns(pl.lit("").alias(SEARCH_TEXT_COLUMN))
+    return df.select([key, search_text_expr(search_cols).alias(SEARCH_TEXT_COLUMN)])
+
+
+def _token_mask(tokens: list[str]) -> pl.Expr:
+    mask = pl.lit(True)
+    for token in tokens:
+        mask = mask & pl.col(SEARCH_TEXT_COLUMN).str.contains(token, literal=True)
+    return mask
+
+
 def apply_token_search(
     df: pl.DataFrame,
     query: str | None,
     columns: tuple[str, ...] | list[str],
     *,
     min_token_length: int = 2,
+    index: pl.DataFrame | None = None,
+    key: str = "id_cnpj",
 ) -> pl.DataFrame:
+    """Mantem as linhas cujo texto (colunas concatenadas) contem todos os tokens.
+
+    Com `index` (ver `build_search_index`), a busca roda sobre o texto ja
+    normalizado e `df` e filtrado pelas chaves encontradas.
+    """
     tokens = tokenize_search_text(query, min_token_length)
     if not tokens or df.is_empty():
         return df
 
+    if index is not None and key in df.columns:
+        matches = index.filter(_token_mask(tokens)).get_column(key)
+        return df.filter(pl.col(key).is_in(matches))
+
     search_cols = [col for col in columns if col in df.columns]
     if not search_cols:
         return df
 
-    search_expr = pl.concat_str(
-        [pl.col(col).cast(pl.Utf8).fill_null("") for col in search_cols],
-        separator=" ",
-    ).map_elements(normalize_search_text, return_dtype=pl.Utf8)
-
-    filtered = df.with_columns(search_expr.alias("_token_search"))
-    for token in tokens:
-        filtered = filtered.filter(pl.col("_token_search").str.contains(token, literal=True))
-    return filtered.drop("_token_search")
+    return (
+        df.with_columns(search_text_expr(search_cols).alias(SEARCH_TEXT_COLUMN))
+        .filter(_token_mask(tokens))
+        .drop(SEARCH_TEXT_COLUMN)
+    )
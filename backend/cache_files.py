@@ -5,6 +5,8 @@ CRM_RAIOX_TX_CACHE_VERSION = 3
 CRM_PRESCRITORES_CACHE_VERSION = 3
 MEMORIA_CALCULO_CACHE_VERSION = 1
 PAGAMENTOS_CONSOLIDADOS_FARMACIA_POPULAR_CACHE_VERSION = 1
+# Incrementar ao mudar o schema dos Parquets teia_grafo_* (invalida os manifestos).
+TEIA_GRAFO_CACHE_VERSION = 1
 
 
 def _module(name: str) -> str:
@@ -70,3 +72,4 @@ TEIA_GRAFO_NIVEL3_NODES_PARQUET = _module("teia_grafo_nivel3_nodes")
 TEIA_GRAFO_NIVEL3_EDGES_PARQUET = _module("teia_grafo_nivel3_edges")
 TEIA_GRAFO_NIVEL4_NODES_PARQUET = _module("teia_grafo_nivel4_nodes")
 TEIA_GRAFO_NIVEL4_EDGES_PARQUET = _module("teia_grafo_nivel4_edges")
+TEIA_GRAFO_MANIFEST_JSON = "teia_grafo_manifest.json"
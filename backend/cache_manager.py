@@ -1,11 +1,26 @@
 """Orquestracao central dos caches por CNPJ."""
 
 from collections.abc import Callable, Iterable
+import functools
+import hashlib
 import importlib
 import os
+import threading
+import time
 from typing import Any
 
 import cache_registry
+from cnpj_sync import (
+    KIND_CPU,
+    KIND_DB,
+    CnpjSyncExecutor,
+    CnpjSyncReport,
+    CnpjSyncUnit,
+    PermanentUnitError,
+    cpu_slots,
+    db_slots,
+    max_retries,
+)
 
 
 CacheProducer = Callable[[str, Any], Any]
@@ -25,6 +40,111 @@ def _get_cnpj_cache_dir(cnpj: str) -> str:
     return cnpj_dir
 
 
+class _CnpjFlight:
+    """Producao em andamento de um (cache, CNPJ); os demais pedidos aguardam."""
+
+    def __init__(self):
+        self.owner = threading.get_ident()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.elapsed_ms = 0.0
+
+
+_CNPJ_FLIGHTS: dict[tuple, _CnpjFlight] = {}
+_CNPJ_FLIGHTS_LOCK = threading.Lock()
+_CNPJ_FLIGHT_STATS: dict[str, dict[str, float]] = {}
+
+
+def _flight_stats(key: str) -> dict[str, float]:
+    return _CNPJ_FLIGHT_STATS.setdefault(
+        key, {"runs": 0, "coalesced": 0, "saved_ms": 0.0, "waited_ms": 0.0}
+    )
+
+
+def run_cnpj_single_flight(key: str, cnpj: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Executa `func` uma unica vez por (cache, CNPJ) entre pedidos simultaneos.
+
+    Quem chega enquanto o produtor do mesmo par esta rodando espera e recebe o
+    mesmo resultado (ou a mesma excecao), em vez de repetir a consulta e
+    disputar os mesmos arquivos `.tmp`. Argumentos nomeados que mudam o
+    comportamento (ex.: `check_cache`) fazem parte da chave; `engine` nao.
+    """
+    options = tuple(sorted((name, value) for name, value in kwargs.items() if name != "engine"))
+    flight_key = (key, cnpj, options)
+    with _CNPJ_FLIGHTS_LOCK:
+        flight = _CNPJ_FLIGHTS.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _CNPJ_FLIGHTS[flight_key] = _CnpjFlight()
+            _flight_stats(key)["runs"] += 1
+
+    if not leader and flight.owner == threading.get_ident():
+        # Chamada reentrante do proprio produtor: esperar seria deadlock.
+        return func(cnpj, *args, **kwargs)
+
+    if not leader:
+        t0 = time.perf_counter()
+        flight.done.wait()
+        waited_ms = (time.perf_counter() - t0) * 1000
+        with _CNPJ_FLIGHTS_LOCK:
+            stats = _flight_stats(key)
+            stats["coalesced"] += 1
+            stats["saved_ms"] += flight.elapsed_ms
+            stats["waited_ms"] += waited_ms
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    t0 = time.perf_counter()
+    try:
+        flight.result = func(cnpj, *args, **kwargs)
+        return flight.result
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        flight.elapsed_ms = (time.perf_counter() - t0) * 1000
+        with _CNPJ_FLIGHTS_LOCK:
+            _CNPJ_FLIGHTS.pop(flight_key, None)
+        flight.done.set()
+
+
+def cnpj_single_flight(key: str):
+    """Decorador de produtores `(cnpj, ...)`: ver `run_cnpj_single_flight`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(cnpj: str, *args, **kwargs):
+            return run_cnpj_single_flight(key, cnpj, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def cnpj_single_flight_stats() -> dict[str, Any]:
+    """Execucoes, pedidos coalescidos e tempo de producao poupado por cache."""
+    with _CNPJ_FLIGHTS_LOCK:
+        by_key = {
+            key: {
+                "runs": int(stats["runs"]),
+                "coalesced": int(stats["coalesced"]),
+                "saved_ms": round(stats["saved_ms"], 1),
+                "waited_ms": round(stats["waited_ms"], 1),
+            }
+            for key, stats in sorted(_CNPJ_FLIGHT_STATS.items())
+        }
+        in_flight = sorted(f"{cnpj}/{key}" for key, cnpj, _options in _CNPJ_FLIGHTS)
+    return {
+        "runs": sum(stats["runs"] for stats in by_key.values()),
+        "coalesced": sum(stats["coalesced"] for stats in by_key.values()),
+        "saved_ms": round(sum(stats["saved_ms"] for stats in by_key.values()), 1),
+        "in_flight": in_flight,
+        "by_key": by_key,
+    }
+
+
 def sync_cnpj_cache(key: str, cnpj: str, engine) -> Any:
     definition = cache_registry.get_cnpj_cache_definition(key)
     if not definition.producer:
@@ -32,6 +152,10 @@ def sync_cnpj_cache(key: str, cnpj: str, engine) -> Any:
     result = _load_callable(definition.producer)(cnpj, engine)
     result_error = getattr(result, "error", None)
     if result_error:
+        # Derivado do global em disco: a mesma entrada falha de novo; so o
+        # banco justifica nova tentativa.
+        if _producer_kind(definition) == KIND_CPU:
+            raise PermanentUnitError(f"{key}: {result_error}")
         raise RuntimeError(f"{key}: {result_error}")
     return result
 
@@ -68,26 +192,136 @@ def list_missing_cnpj_modules(cnpj: str) -> list[str]:
     ]
 
 
-def sync_cnpj_caches(engine, cnpjs: Iterable[str], progress_callback=None) -> None:
+def _producer_kind(definition: cache_registry.CacheDefinition) -> str:
+    """Produtores com o global de origem em disco derivam em Polars; os demais vao ao banco."""
+    if definition.global_source:
+        from data_cache import get_cache_dir
+
+        filename = cache_registry.get_global_parquet_files_by_key().get(definition.global_source)
+        if filename and os.path.exists(os.path.join(get_cache_dir(), filename)):
+            return KIND_CPU
+    return KIND_DB
+
+
+def _producer_definitions(keys: Iterable[str] | None = None) -> list[cache_registry.CacheDefinition]:
+    wanted = set(keys) if keys is not None else None
+    definitions: list[cache_registry.CacheDefinition] = []
+    seen_producers: set[str] = set()
+    for definition in cache_registry.CNPJ_CACHE_DEFINITIONS:
+        producer = definition.producer
+        if not producer or producer in seen_producers:
+            continue
+        if wanted is not None and definition.key not in wanted:
+            continue
+        seen_producers.add(producer)
+        definitions.append(definition)
+    return definitions
+
+
+def build_cnpj_sync_units(
+    engine,
+    cnpjs: Iterable[str],
+    keys: Iterable[str] | None = None,
+) -> list[CnpjSyncUnit]:
+    definitions = _producer_definitions(keys)
+    kinds = {definition.key: _producer_kind(definition) for definition in definitions}
+    return [
+        CnpjSyncUnit(
+            cnpj=cnpj,
+            key=definition.key,
+            kind=kinds[definition.key],
+            func=lambda _key=definition.key, _cnpj=cnpj: sync_cnpj_cache(_key, _cnpj, engine),
+        )
+        for cnpj in cnpjs
+        for definition in definitions
+    ]
+
+
+def _global_sources_signature() -> str:
+    """Assinatura (mtime, tamanho) dos globais em disco; muda a cada carga nova."""
+    from data_cache import get_cache_dir
+
+    digest = hashlib.sha1()
+    cache_dir = get_cache_dir()
+    for filename in sorted(set(cache_registry.get_global_parquet_files_by_key().values())):
+        try:
+            stat = os.stat(os.path.join(cache_dir, filename))
+        except OSError:
+            continue
+        digest.update(f"{filename}:{stat.st_mtime_ns}:{stat.st_size}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def run_cnpj_sync_units(
+    name: str,
+    units: list[CnpjSyncUnit],
+    engine=None,
+    progress_callback=None,
+) -> CnpjSyncReport:
+    """Executa as unidades no pool concorrente; falhas sao reportadas ao final.
+
+    Unidades com falha sao listadas no log e no `CnpjSyncReport` devolvido, sem
+    interromper o chamador. O manifesto do job fica em disco e a proxima
+    execucao com as mesmas unidades retoma de onde parou, desde que os globais
+    de origem nao tenham sido recarregados nesse meio tempo.
+    """
+    from data_cache import _sync_worker_count, get_cnpj_cache_root
+
+    executor = CnpjSyncExecutor(
+        name,
+        units,
+        manifest_dir=os.path.join(get_cnpj_cache_root(), ".jobs"),
+        db_workers=db_slots(_sync_worker_count(engine) if engine is not None else 1),
+        cpu_workers=cpu_slots(),
+        retries=max_retries(),
+        progress_callback=progress_callback,
+        sources=_global_sources_signature(),
+    )
+    print(
+        f"[ CACHE ] Job {executor.job_id}: {len(units)} unidade(s), "
+        f"{executor.db_workers} slot(s) de banco, {executor.cpu_workers} de CPU."
+    )
+    report = executor.run()
+    print(
+        f"[{report.elapsed_s:.1f}s] Job {report.job_id}: {report.done} concluida(s), "
+        f"{report.skipped} retomada(s), {len(report.failed)} com falha."
+    )
+    if report.failed:
+        print(
+            f"[ERRO] {len(report.failed)} unidade(s) por CNPJ falharam (ex.: "
+            + "; ".join(f"{unit}: {error}" for unit, error in list(report.failed.items())[:3])
+            + f"). Rode novamente para retomar o job {report.job_id}."
+        )
+    return report
+
+
+def sync_cnpj_caches(
+    engine,
+    cnpjs: Iterable[str],
+    progress_callback=None,
+    keys: Iterable[str] | None = None,
+    job_name: str = "cnpj",
+) -> CnpjSyncReport | None:
     cnpjs = [cnpj.strip() for cnpj in cnpjs if cnpj.strip()]
+    keys = list(keys) if keys is not None else None
     total = len(cnpjs)
-    print(f"Sincronizando todos os modulos por CNPJ para {total} estabelecimento(s)...")
+    modules = "todos os modulos" if keys is None else f"{len(keys)} modulo(s)"
+    print(f"Sincronizando {modules} por CNPJ para {total} estabelecimento(s)...")
 
     if total == 0:
         if progress_callback:
             progress_callback(100)
-        return
+        return None
 
-    for index, cnpj in enumerate(cnpjs, 1):
-        print(f"\n  [{index}/{total}] CNPJ {cnpj}")
+    units = build_cnpj_sync_units(engine, cnpjs, keys)
+    report = run_cnpj_sync_units(job_name, units, engine, progress_callback)
 
-        sync_cnpj_producers(cnpj, engine)
-        still_missing = list_missing_cnpj_modules(cnpj)
-        if still_missing:
-            print(f"    Aviso: modulos faltantes: {', '.join(still_missing)}")
-
-        if progress_callback:
-            progress_callback(int((index / total) * 100))
+    if keys is None:
+        for cnpj in cnpjs:
+            still_missing = list_missing_cnpj_modules(cnpj)
+            if still_missing:
+                print(f"    Aviso: {cnpj} com modulos faltantes: {', '.join(still_missing)}")
 
     if progress_callback:
         progress_callback(100)
+    return report
@@ -0,0 +1,205 @@
+"""Aquecimento em segundo plano dos caches por CNPJ da watchlist.
+
+Depois do boot, de cada `refresh_cache` e de cada alteracao da watchlist, um
+unico thread de baixa prioridade percorre os CNPJs acompanhados e executa os
+produtores registrados em `cache_registry` mais a teia societaria. A primeira
+abertura de um CNPJ acompanhado passa a ler Parquets prontos.
+
+O prefetch nunca disputa com o uso interativo: cada unidade so comeca quando
+a API esta ociosa ha `SENTINELA_PREFETCH_IDLE_S` segundos, e ha uma pausa
+(`SENTINELA_PREFETCH_PAUSE_S`) entre unidades. Como os produtores passam por
+`cache_manager.run_cnpj_single_flight`, uma tela aberta durante o prefetch
+espera a mesma producao em vez de repeti-la. Uma nova geracao dos dados
+reinicia o ciclo. `SENTINELA_WATCHLIST_PREFETCH=0` desliga o recurso.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import os
+import re
+import threading
+import time
+from typing import Any
+
+
+TEIA_KEY = "teia_grafo"
+
+_DEFAULT_IDLE_S = 2.0
+_DEFAULT_PAUSE_S = 0.5
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        print(f"[AVISO] {name} invalido ({value!r}); usando {default}.")
+        return default
+
+
+def prefetch_enabled() -> bool:
+    return (os.getenv("SENTINELA_WATCHLIST_PREFETCH") or "1").strip().lower() not in {"0", "false", "nao", "off"}
+
+
+def watchlist_cnpjs() -> list[str]:
+    """CNPJs (14 digitos, sem mascara) da watchlist persistida, sem repeticao."""
+    from api.services.preferences import PreferencesService
+
+    cnpjs: list[str] = []
+    for item in PreferencesService.read().get("watchlist") or []:
+        raw = item.get("cnpj") if isinstance(item, dict) else item
+        cnpj = re.sub(r"\D", "", str(raw or ""))
+        if len(cnpj) == 14 and cnpj not in cnpjs:
+            cnpjs.append(cnpj)
+    return cnpjs
+
+
+@dataclass(frozen=True)
+class _PrefetchUnit:
+    cnpj: str
+    key: str
+    func: Callable[[], Any]
+
+
+def _build_units(engine, cnpjs: list[str]) -> list[_PrefetchUnit]:
+    import cache_manager
+    from api.services.analytics._cache import sync_network
+
+    definitions = cache_manager._producer_definitions()
+    units: list[_PrefetchUnit] = []
+    for cnpj in cnpjs:
+        for definition in definitions:
+            units.append(_PrefetchUnit(
+                cnpj,
+                definition.key,
+                lambda _key=definition.key, _cnpj=cnpj: cache_manager.sync_cnpj_cache(_key, _cnpj, engine),
+            ))
+        units.append(_PrefetchUnit(cnpj, TEIA_KEY, lambda _cnpj=cnpj: sync_network(_cnpj)))
+    return units
+
+
+class WatchlistPrefetcher:
+    """Thread unico que aquece os caches por CNPJ da watchlist quando a API esta ociosa."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._engine = None
+        self._requested = 0
+        self._status: dict[str, Any] = {"status": "idle"}
+
+    def schedule(self, engine, reason: str) -> None:
+        if not prefetch_enabled():
+            return
+        with self._lock:
+            self._engine = engine
+            self._requested += 1
+            self._status = {**self._status, "reason": reason}
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="watchlist-prefetch", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def _set_status(self, **fields) -> None:
+        with self._lock:
+            self._status = {**self._status, **fields}
+
+    def _stale(self, request: int, generation: int) -> bool:
+        from data_cache import get_cache_generation
+
+        return request != self._requested or generation != get_cache_generation()
+
+    def _wait_for_idle(self, request: int, generation: int) -> bool:
+        """Espera a API ociosa; False se o ciclo ficou obsoleto enquanto esperava."""
+        from request_logging import api_idle_for
+
+        idle_s = _env_float("SENTINELA_PREFETCH_IDLE_S", _DEFAULT_IDLE_S)
+        waiting = False
+        while not self._stale(request, generation):
+            if api_idle_for() >= idle_s:
+                if waiting:
+                    self._set_status(status="running")
+                return True
+            if not waiting:
+                self._set_status(status="waiting_idle")
+                waiting = True
+            time.sleep(0.25)
+        return False
+
+    def _loop(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self._run_cycle()
+            except Exception as exc:
+                print(f"[ERRO] Prefetch da watchlist interrompido: {exc}")
+                self._set_status(status="error", error=str(exc))
+
+    def _run_cycle(self) -> None:
+        from data_cache import get_cache_generation, get_cache_status
+
+        request = self._requested
+        generation = get_cache_generation()
+        if not get_cache_status()["is_ready"]:
+            self._set_status(status="waiting_cache")
+            return
+        cnpjs = watchlist_cnpjs()
+        units = _build_units(self._engine, cnpjs)
+        t0 = time.perf_counter()
+        self._set_status(
+            status="running", generation=generation, cnpjs=len(cnpjs), total=len(units),
+            done=0, failed=0, current=None, progress=0 if units else 100, elapsed_s=0.0, error=None,
+        )
+        if not units:
+            self._set_status(status="done")
+            return
+        print(f"[ CACHE ] Prefetch da watchlist: {len(cnpjs)} CNPJ(s), {len(units)} unidade(s).")
+
+        pause_s = _env_float("SENTINELA_PREFETCH_PAUSE_S", _DEFAULT_PAUSE_S)
+        done = failed = 0
+        for unit in units:
+            if not self._wait_for_idle(request, generation):
+                # Watchlist alterada ou nova geracao: o proximo ciclo recomeca.
+                self._set_status(status="restarting", current=None)
+                self._wakeup.set()
+                return
+            self._set_status(current=f"{unit.cnpj}/{unit.key}")
+            try:
+                unit.func()
+                done += 1
+            except Exception as exc:
+                failed += 1
+                print(f"[AVISO] Prefetch {unit.cnpj}/{unit.key} falhou: {exc}")
+            self._set_status(
+                done=done, failed=failed, progress=int((done + failed) * 100 / len(units)),
+                elapsed_s=round(time.perf_counter() - t0, 1),
+            )
+            time.sleep(pause_s)
+
+        self._set_status(status="done", current=None)
+        print(
+            f"[ CACHE ] Prefetch da watchlist concluido em {time.perf_counter() - t0:.1f}s "
+            f"({done} ok, {failed} com falha)."
+        )
+
+
+_PREFETCHER = WatchlistPrefetcher()
+
+
+def schedule_watchlist_prefetch(engine, reason: str) -> None:
+    """Agenda (ou reinicia) o aquecimento dos caches da watchlist."""
+    _PREFETCHER.schedule(engine, reason)
+
+
+def get_prefetch_status() -> dict[str, Any]:
+    status = _PREFETCHER.status()
+    status["enabled"] = prefetch_enabled()
+    return status
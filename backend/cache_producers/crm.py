@@ -25,12 +25,19 @@ from cache_files import (
     CRM_TIMELINE_HORA_GLOBAL_PARQUET,
     CRM_TIMELINE_EVENTOS_GLOBAL_PARQUET,
 )
+from cache_manager import cnpj_single_flight
 from cache_producers.types import CacheLoadResult
+from parquet_index import CLUSTER_ROW_GROUP_SIZE, index_path, write_key_index
+from sql_extract import read_sql_polars
 
 _CRM_ALERTS_CACHE_VERSION = 4
 _CRM_PRESCRITORES_CACHE_VERSION = CRM_PRESCRITORES_CACHE_VERSION
 _CRM_UNICO_RHYTHM_WINDOWS = (5, 10, 15, 20, 25, 30, 60)
 _CRM_MULTIPLO_RHYTHM_WINDOWS = (5, 10, 15, 20, 25, 30, 60)
+# Raio-X por CNPJ: ordenado por janela, com dt_janela como Date e indice
+# lateral dia -> linhas (ver parquet_index), para o drill-down de um dia/hora
+# ler so o proprio trecho.
+_RAIOX_TX_SORT = ["dt_janela", "hr_janela", "data_hora", "num_autorizacao"]
 
 
 def _get_cnpj_cache_dir(cnpj: str) -> str:
@@ -81,6 +88,7 @@ def _empty_schema(filename: str) -> dict:
     return schemas[filename]
 
 
+@cnpj_single_flight("crm_prescritores")
 def load_or_sync_crm_data(cnpj: str, engine=None) -> CacheLoadResult:
     parquet_path = _path(cnpj, CRM_PRESCRITORES_PARQUET)
     from data_cache import get_cache_dir
@@ -121,7 +129,7 @@ def load_or_sync_crm_data(cnpj: str, engine=None) -> CacheLoadResult:
 
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_prescritores_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
 
             global_version = pl.read_parquet(
                 global_path,
@@ -162,10 +170,8 @@ def load_or_sync_crm_data(cnpj: str, engine=None) -> CacheLoadResult:
 
             started_at = time.perf_counter()
             df_global_base = (
-                scan_crm_prescritores_global()
-                .filter(pl.col("id_cnpj") == id_cnpj)
+                read_on_demand_global_slice("crm_prescritores_global", id_cnpj)
                 .drop("id_cnpj")
-                .collect()
                 .sort(["competencia", "id_medico"])
             )
             if df_global_base.is_empty():
@@ -284,6 +290,7 @@ def load_or_sync_crm_data(cnpj: str, engine=None) -> CacheLoadResult:
         return CacheLoadResult(pl.DataFrame(), from_cache=False, error="Arquivo Parquet local nao encontrado e Banco Offline.")
 
 
+@cnpj_single_flight("geografico")
 def load_or_sync_geografico(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(GEOGRAFICO_PARQUET)
     required = set(schema)
@@ -347,6 +354,7 @@ def load_or_sync_geografico(cnpj: str, engine=None) -> CacheLoadResult:
     return result
 
 
+@cnpj_single_flight("crm_timeline_dia")
 def load_or_sync_crm_timeline_dia(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_TIMELINE_DIA_PARQUET)
     required = set(schema)
@@ -367,17 +375,15 @@ def load_or_sync_crm_timeline_dia(cnpj: str, engine=None) -> CacheLoadResult:
 
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_timeline_dia_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
             perfil = get_df_perfil_estabelecimento()
             perfil_cnpj = perfil.filter(pl.col("cnpj").cast(pl.Utf8) == cnpj).select("id_cnpj").unique()
             if perfil_cnpj.height == 1:
                 id_cnpj = int(perfil_cnpj.item(0, "id_cnpj"))
                 started_at = time.perf_counter()
                 df_global = (
-                    scan_crm_timeline_dia_global()
-                    .filter(pl.col("id_cnpj") == id_cnpj)
+                    read_on_demand_global_slice("crm_timeline_dia_global", id_cnpj)
                     .drop("id_cnpj")
-                    .collect()
                 )
                 df_global = df_global.select(list(schema.keys()))
                 source_time_ms = round((time.perf_counter() - started_at) * 1000, 1)
@@ -410,6 +416,7 @@ def load_or_sync_crm_timeline_dia(cnpj: str, engine=None) -> CacheLoadResult:
     )
 
 
+@cnpj_single_flight("crm_timeline_hora")
 def load_or_sync_crm_timeline_hora(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_TIMELINE_HORA_PARQUET)
     required = set(schema)
@@ -430,17 +437,15 @@ def load_or_sync_crm_timeline_hora(cnpj: str, engine=None) -> CacheLoadResult:
 
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_timeline_hora_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
             perfil = get_df_perfil_estabelecimento()
             perfil_cnpj = perfil.filter(pl.col("cnpj").cast(pl.Utf8) == cnpj).select("id_cnpj").unique()
             if perfil_cnpj.height == 1:
                 id_cnpj = int(perfil_cnpj.item(0, "id_cnpj"))
                 started_at = time.perf_counter()
                 df_global = (
-                    scan_crm_timeline_hora_global()
-                    .filter(pl.col("id_cnpj") == id_cnpj)
+                    read_on_demand_global_slice("crm_timeline_hora_global", id_cnpj)
                     .drop("id_cnpj")
-                    .collect()
                 )
                 df_global = df_global.select(list(schema.keys()))
                 source_time_ms = round((time.perf_counter() - started_at) * 1000, 1)
@@ -471,6 +476,7 @@ def load_or_sync_crm_timeline_hora(cnpj: str, engine=None) -> CacheLoadResult:
     )
 
 
+@cnpj_single_flight("crm_timeline_eventos")
 def load_or_sync_crm_timeline_eventos(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_TIMELINE_EVENTOS_PARQUET)
     required = set(schema)
@@ -491,17 +497,15 @@ def load_or_sync_crm_timeline_eventos(cnpj: str, engine=None) -> CacheLoadResult
 
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_timeline_eventos_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
             perfil = get_df_perfil_estabelecimento()
             perfil_cnpj = perfil.filter(pl.col("cnpj").cast(pl.Utf8) == cnpj).select("id_cnpj").unique()
             if perfil_cnpj.height == 1:
                 id_cnpj = int(perfil_cnpj.item(0, "id_cnpj"))
                 started_at = time.perf_counter()
                 df_global = (
-                    scan_crm_timeline_eventos_global()
-                    .filter(pl.col("id_cnpj") == id_cnpj)
+                    read_on_demand_global_slice("crm_timeline_eventos_global", id_cnpj)
                     .drop("id_cnpj")
-                    .collect()
                 )
                 df_global = df_global.select(list(schema.keys()))
                 source_time_ms = round((time.perf_counter() - started_at) * 1000, 1)
@@ -532,6 +536,7 @@ def load_or_sync_crm_timeline_eventos(cnpj: str, engine=None) -> CacheLoadResult
 
 
 
+@cnpj_single_flight("crm_concentracao_unico_alertas")
 def load_or_sync_crm_unico_alertas(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_CONCENTRACAO_UNICO_ALERTAS_PARQUET)
     required = set(schema)
@@ -554,17 +559,15 @@ def load_or_sync_crm_unico_alertas(cnpj: str, engine=None) -> CacheLoadResult:
 
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_concentracao_unico_alertas_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
             perfil = get_df_perfil_estabelecimento()
             perfil_cnpj = perfil.filter(pl.col("cnpj").cast(pl.Utf8) == cnpj).select("id_cnpj").unique()
             if perfil_cnpj.height == 1:
                 id_cnpj = int(perfil_cnpj.item(0, "id_cnpj"))
                 started_at = time.perf_counter()
                 df_global = (
-                    scan_crm_concentracao_unico_alertas_global()
-                    .filter(pl.col("id_cnpj") == id_cnpj)
+                    read_on_demand_global_slice("crm_concentracao_unico_alertas_global", id_cnpj)
                     .drop("id_cnpj")
-                    .collect()
                 )
                 df_global = df_global.with_columns(
                     pl.lit(_CRM_ALERTS_CACHE_VERSION).alias("_crm_alerts_cache_version")
@@ -607,6 +610,7 @@ def load_or_sync_crm_unico_alertas(cnpj: str, engine=None) -> CacheLoadResult:
     return CacheLoadResult(df, result.from_cache, result.read_time_ms, result.query_time_ms, result.save_time_ms, result.error)
 
 
+@cnpj_single_flight("crm_concentracao_multiplo_alertas")
 def load_or_sync_crm_multi_alertas(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_CONCENTRACAO_MULTIPLO_ALERTAS_PARQUET)
     required = set(schema)
@@ -635,17 +639,14 @@ def load_or_sync_crm_multi_alertas(cnpj: str, engine=None) -> CacheLoadResult:
 
     if df is None and os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_concentracao_multiplo_alertas_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
             perfil = get_df_perfil_estabelecimento()
             perfil_cnpj = perfil.filter(pl.col("cnpj").cast(pl.Utf8) == cnpj).select("id_cnpj").unique()
             if perfil_cnpj.height == 1:
                 id_cnpj = int(perfil_cnpj.item(0, "id_cnpj"))
                 started_at = time.perf_counter()
                 df_global = (
-                    scan_crm_concentracao_multiplo_alertas_global()
-                    .filter(pl.col("id_cnpj") == id_cnpj)
-                    
-                    .collect()
+                    read_on_demand_global_slice("crm_concentracao_multiplo_alertas_global", id_cnpj)
                 )
                 df_global = df_global.with_columns(pl.lit(_CRM_ALERTS_CACHE_VERSION).alias("_crm_alerts_cache_version"))
                 df_global = df_global.select(list(schema.keys()))
@@ -688,6 +689,44 @@ def load_or_sync_crm_multi_alertas(cnpj: str, engine=None) -> CacheLoadResult:
     return CacheLoadResult(df, result.from_cache, result.read_time_ms, result.query_time_ms, result.save_time_ms, result.error)
 
 
+def _raiox_tx_layout(df: pl.DataFrame) -> pl.DataFrame:
+    """dt_janela como Date e linhas ordenadas por (dia, hora, data_hora)."""
+    if df.schema.get("dt_janela") != pl.Date:
+        df = df.with_columns(
+            pl.col("dt_janela").cast(pl.Utf8).str.slice(0, 10).str.to_date("%Y-%m-%d")
+        )
+    return df.sort(_RAIOX_TX_SORT, maintain_order=True)
+
+
+def _raiox_tx_cached_layout(parquet_path: str, global_path: str, required_columns: set[str]) -> str | None:
+    """Estado do Raio-X local sem ler as linhas: None (regerar), "legado"
+    (dados validos no layout antigo), "sem_indice" ou "ok"."""
+    if not os.path.exists(parquet_path):
+        return None
+    try:
+        file_schema = pl.read_parquet_schema(parquet_path)
+        if (
+            not required_columns.issubset(file_schema)
+            or "codigo_barra" in file_schema
+        ):
+            return None
+        version = pl.read_parquet(parquet_path, columns=["_crm_raiox_tx_cache_version"], n_rows=1)
+    except Exception as exc:
+        print(f"[ CACHE ] erro de leitura ({exc})")
+        return None
+    if not version.is_empty() and _to_int(version.item(0, 0)) < CRM_RAIOX_TX_CACHE_VERSION:
+        return None
+    if os.path.exists(global_path) and os.path.getmtime(global_path) > os.path.getmtime(parquet_path):
+        return None
+    if file_schema["dt_janela"] != pl.Date:
+        return "legado"
+    index_file = index_path(parquet_path)
+    if not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(parquet_path):
+        return "sem_indice"
+    return "ok"
+
+
+@cnpj_single_flight("crm_raiox_tx")
 def sync_crm_raiox_tx(cnpj: str, engine=None) -> CacheLoadResult:
     parquet_path = _path(cnpj, CRM_RAIOX_TX_PARQUET)
     from data_cache import get_cache_dir
@@ -696,23 +735,6 @@ def sync_crm_raiox_tx(cnpj: str, engine=None) -> CacheLoadResult:
     schema = _empty_schema(CRM_RAIOX_TX_PARQUET)
     required_columns = set(schema)
 
-    df, read_time_ms = _read_parquet(parquet_path)
-    if df is not None:
-        version_ok = "_crm_raiox_tx_cache_version" in df.columns and (
-            df.height == 0 or _to_int(df["_crm_raiox_tx_cache_version"].max()) >= CRM_RAIOX_TX_CACHE_VERSION
-        )
-        global_is_newer = (
-            os.path.exists(global_path)
-            and os.path.getmtime(global_path) > os.path.getmtime(parquet_path)
-        )
-        if (
-            required_columns.issubset(set(df.columns))
-            and "codigo_barra" not in df.columns
-            and version_ok
-            and not global_is_newer
-        ):
-            return CacheLoadResult(df, from_cache=True, read_time_ms=read_time_ms)
-
     def write_final(df_final: pl.DataFrame) -> float:
         missing_columns = sorted(required_columns - set(df_final.columns))
         if missing_columns:
@@ -720,16 +742,43 @@ def sync_crm_raiox_tx(cnpj: str, engine=None) -> CacheLoadResult:
                 f"Contrato invalido de {CRM_RAIOX_TX_PARQUET}: "
                 f"colunas ausentes {', '.join(missing_columns)}."
             )
-        df_final = df_final.select(list(schema.keys()))
+        df_final = _raiox_tx_layout(df_final).select(list(schema.keys()))
         tmp_final_path = parquet_path + ".tmp"
         started_at = time.perf_counter()
-        df_final.write_parquet(tmp_final_path, compression="zstd")
+        df_final.write_parquet(tmp_final_path, compression="zstd", row_group_size=CLUSTER_ROW_GROUP_SIZE)
         os.replace(tmp_final_path, parquet_path)
+        write_key_index(parquet_path, "dt_janela")
         return round((time.perf_counter() - started_at) * 1000, 1)
 
+    cached = _raiox_tx_cached_layout(parquet_path, global_path, required_columns)
+    if cached is not None:
+        # Cache valido: nao le o arquivo inteiro a cada clique no Raio-X; os
+        # consumidores leem o Parquet direto (ver get_crm_raio_x).
+        started_at = time.perf_counter()
+        save_time_ms = None
+        try:
+            if cached == "legado":
+                # Mesmo conteudo no layout antigo (dt_janela texto, sem indice).
+                save_time_ms = write_final(pl.read_parquet(parquet_path))
+            elif cached == "sem_indice":
+                write_key_index(parquet_path, "dt_janela")
+        except Exception as exc:
+            # Ex.: dt_janela malformado no arquivo antigo. Regenera da fonte.
+            if os.path.exists(parquet_path + ".tmp"):
+                os.remove(parquet_path + ".tmp")
+            print(f"[ CACHE ] {cnpj} - Raio-X - falha ao migrar layout ({exc}); regenerando parquet.")
+            cached = None
+        if cached is not None:
+            return CacheLoadResult(
+                None,
+                from_cache=True,
+                read_time_ms=round((time.perf_counter() - started_at) * 1000, 1),
+                save_time_ms=save_time_ms,
+            )
+
     if os.path.exists(global_path):
         try:
-            from data_cache import get_df_perfil_estabelecimento, scan_crm_raiox_tx_global
+            from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
 
             global_version = pl.read_parquet(
                 global_path,
@@ -770,11 +819,9 @@ def sync_crm_raiox_tx(cnpj: str, engine=None) -> CacheLoadResult:
 
             started_at = time.perf_counter()
             df_global = (
-                scan_crm_raiox_tx_global()
-                .filter(pl.col("id_cnpj") == id_cnpj)
+                read_on_demand_global_slice("crm_raiox_tx_global", id_cnpj)
                 .drop("id_cnpj")
-                .collect()
-                .sort(["data_hora", "num_autorizacao"])
+                .pipe(_raiox_tx_layout)
                 .select(list(schema.keys()))
             )
             source_time_ms = round((time.perf_counter() - started_at) * 1000, 1)
@@ -835,7 +882,7 @@ def sync_crm_raiox_tx(cnpj: str, engine=None) -> CacheLoadResult:
                     pl.lit(CRM_RAIOX_TX_CACHE_VERSION)
                     .alias("_crm_raiox_tx_cache_version"),
                 ])
-                .sort(["data_hora", "num_autorizacao"])
+                .pipe(_raiox_tx_layout)
             )
         save_time_ms = write_final(df_final)
 
@@ -881,10 +928,11 @@ def _load_or_sync_sql_cache(
         engine = _engine_or_default(engine)
         with engine.connect() as conn:
             t0 = time.perf_counter()
-            pdf = pd.read_sql(query, conn, params=params)
+            df = read_sql_polars(conn, query, params=params, source=f"{cnpj} - {filename}")
             query_time_ms = round((time.perf_counter() - t0) * 1000, 1)
 
-        df = pl.from_pandas(pdf) if not pdf.empty else pl.DataFrame(schema=_empty_schema(filename))
+        if df.is_empty():
+            df = pl.DataFrame(schema=_empty_schema(filename))
         t1 = time.perf_counter()
         df.write_parquet(parquet_path, compression="zstd")
         save_time_ms = round((time.perf_counter() - t1) * 1000, 1)
@@ -15,6 +15,7 @@ from cache_files import (
     MEMORIA_CALCULO_GLOBAL_PARQUET,
     MEMORIA_CALCULO_PARQUET,
 )
+from cache_manager import cnpj_single_flight
 from cache_producers.types import CacheLoadResult
 
 
@@ -446,18 +447,17 @@ def _load_memoria_from_global(cnpj: str) -> tuple[pl.DataFrame | None, float | N
     if not os.path.exists(global_path):
         return None, None
 
-    from data_cache import scan_memoria_calculo_global
+    from data_cache import read_on_demand_global_slice
 
     t0 = _time.perf_counter()
-    row_df = (
-        scan_memoria_calculo_global()
-        .filter(pl.col("cnpj") == cnpj)
-        .select([
+    row_df = read_on_demand_global_slice(
+        "memoria_calculo_global",
+        cnpj,
+        columns=[
             "cnpj",
             "memoria_calculo_payload",
             "_memoria_calculo_cache_version",
-        ])
-        .collect()
+        ],
     )
     read_time_ms = round((_time.perf_counter() - t0) * 1000, 1)
 
@@ -477,6 +477,7 @@ def _load_memoria_from_global(cnpj: str) -> tuple[pl.DataFrame | None, float | N
     return _build_memoria_calculo_df(dados, medicamentos_map), read_time_ms
 
 
+@cnpj_single_flight("memoria_calculo")
 def load_or_sync_memoria_calculo(cnpj: str, engine, check_cache: bool = False) -> CacheLoadResult:
     cache_path = _cache_path(cnpj)
 
@@ -6,6 +6,7 @@ import polars as pl
 from sqlalchemy import text
 
 from cache_files import MOVIMENTACAO_MENSAL_GTIN_PARQUET
+from cache_manager import cnpj_single_flight
 from cache_producers.types import CacheLoadResult
 
 
@@ -22,7 +23,7 @@ def _cache_path(cnpj: str) -> str:
 
 
 def _load_from_global(cnpj: str) -> tuple[pl.DataFrame, float] | None:
-    from data_cache import get_df_perfil_estabelecimento, scan_movimentacao_mensal_gtin_global
+    from data_cache import get_df_perfil_estabelecimento, read_on_demand_global_slice
 
     perfil = get_df_perfil_estabelecimento()
     row = (
@@ -37,10 +38,10 @@ def _load_from_global(cnpj: str) -> tuple[pl.DataFrame, float] | None:
 
     id_cnpj = int(row.item(0, "id_cnpj"))
     t0 = time.perf_counter()
-    df = (
-        scan_movimentacao_mensal_gtin_global()
-        .filter(pl.col("id_cnpj") == id_cnpj)
-        .select([
+    df = read_on_demand_global_slice(
+        "movimentacao_mensal_gtin_global",
+        id_cnpj,
+        columns=[
             "codigo_barra",
             "periodo",
             "qnt_caixas_vendidas",
@@ -48,13 +49,13 @@ def _load_from_global(cnpj: str) -> tuple[pl.DataFrame, float] | None:
             "num_autorizacoes",
             "valor_vendas",
             "valor_sem_comprovacao",
-        ])
-        .collect()
+        ],
     )
     read_time_ms = round((time.perf_counter() - t0) * 1000, 1)
     return df, read_time_ms
 
 
+@cnpj_single_flight("movimentacao_mensal_gtin")
 def load_or_sync_movimentacao_mensal_gtin(cnpj: str, engine=None) -> CacheLoadResult:
     parquet_path = _cache_path(cnpj)
     df: pl.DataFrame | None = None
@@ -23,6 +23,8 @@ class CacheDefinition:
     scope: str
     schema: dict | None = None
     producer: str | None = None
+    # Global do qual o produtor deriva o cache por CNPJ (sem SQL) quando existe.
+    global_source: str | None = None
 
 
 def _falecidos_schema() -> dict:
@@ -522,6 +524,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.MEMORIA_CALCULO_PARQUET,
             scope="cnpj",
             producer="cache_producers.farmacia.load_or_sync_memoria_calculo",
+            global_source="memoria_calculo_global",
             schema={
                 "tipo_linha": pl.Utf8,
                 "gtin": pl.Utf8,
@@ -543,6 +546,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.MOVIMENTACAO_MENSAL_GTIN_PARQUET,
             scope="cnpj",
             producer="cache_producers.financeiro.load_or_sync_movimentacao_mensal_gtin",
+            global_source="movimentacao_mensal_gtin_global",
             schema={
                 "codigo_barra": pl.Utf8,
                 "periodo": pl.Date,
@@ -558,6 +562,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_PRESCRITORES_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_data",
+            global_source="crm_prescritores_global",
             schema=_crm_prescritores_schema(),
         ),
         CacheDefinition(
@@ -565,6 +570,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.GEOGRAFICO_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_geografico",
+            global_source="geografico_global",
             schema={
                 "id_medico": pl.Utf8,
                 "competencia": pl.Int32,
@@ -591,8 +597,9 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_RAIOX_TX_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.sync_crm_raiox_tx",
+            global_source="crm_raiox_tx_global",
             schema={
-                "dt_janela": pl.Utf8,
+                "dt_janela": pl.Date,
                 "hr_janela": pl.Int32,
                 "data_hora": pl.Utf8,
                 "num_autorizacao": pl.Utf8,
@@ -606,6 +613,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_CONCENTRACAO_UNICO_ALERTAS_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_unico_alertas",
+            global_source="crm_concentracao_unico_alertas_global",
             schema={
                 "id_medico": pl.Utf8,
                 "competencia": pl.Int32,
@@ -635,6 +643,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_CONCENTRACAO_MULTIPLO_ALERTAS_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_multi_alertas",
+            global_source="crm_concentracao_multiplo_alertas_global",
             schema={
                 "id_cnpj": pl.Int32,
                 "competencia": pl.Int32,
@@ -667,6 +676,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_TIMELINE_DIA_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_timeline_dia",
+            global_source="crm_timeline_dia_global",
             schema={
                 "dt_janela": pl.Utf8,
                 "competencia": pl.Int32,
@@ -691,6 +701,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_TIMELINE_HORA_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_timeline_hora",
+            global_source="crm_timeline_hora_global",
             schema={
                 "dt_janela": pl.Utf8,
                 "hr_janela": pl.Int32,
@@ -709,6 +720,7 @@ def _build_cnpj_cache_definitions() -> tuple[CacheDefinition, ...]:
             filename=cache_files.CRM_TIMELINE_EVENTOS_PARQUET,
             scope="cnpj",
             producer="cache_producers.crm.load_or_sync_crm_timeline_eventos",
+            global_source="crm_timeline_eventos_global",
             schema={
                 "dt_janela": pl.Utf8,
                 "tipo": pl.Utf8,
@@ -794,3 +806,99 @@ def get_cnpj_parquet_schemas() -> dict[str, dict]:
             raise RuntimeError(f"Cache CNPJ sem schema registrado: {definition.key}")
         schemas[definition.filename] = definition.schema
     return schemas
+
+
+# =============================================================================
+# DEPENDENCIAS DAS ROTAS GET (ETag / GET condicional)
+# =============================================================================
+@dataclass(frozen=True)
+class EndpointCacheDependency:
+    """Rota GET cuja resposta e funcao apenas dos parametros, da geracao do
+    cache global e dos parquets por CNPJ listados (chaves de CNPJ_CACHE_DEFINITIONS)."""
+    path: str
+    cnpj_caches: tuple[str, ...] = ()
+    # Parametro de rota com o CNPJ cujo diretorio guarda os parquets.
+    cnpj_param: str = "cnpj"
+
+
+_TEIA_CACHES = (
+    "teia_nivel2_nodes",
+    "teia_nivel2_edges",
+    "teia_nivel3_nodes",
+    "teia_nivel3_edges",
+    "teia_nivel4_nodes",
+    "teia_nivel4_edges",
+)
+_CRM_ALERTAS_CACHES = (
+    "crm_concentracao_unico_alertas",
+    "crm_concentracao_multiplo_alertas",
+    "geografico",
+    "crm_raiox_tx",
+)
+
+ENDPOINT_CACHE_DEPENDENCIES = (
+    EndpointCacheDependency("/api/v1/geo/localidades"),
+    EndpointCacheDependency("/api/v1/geo/estabelecimentos"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/bootstrap"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/cadastro"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/socios"),
+    EndpointCacheDependency("/api/v1/analytics/alertas-panorama"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/alertas-integridade"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network", _TEIA_CACHES),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/expand/{target_id}", _TEIA_CACHES),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/level/3", _TEIA_CACHES),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/level/4", _TEIA_CACHES),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/vizinhanca"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/farmacias-socio-comum"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/network/componente"),
+    EndpointCacheDependency("/api/v1/analytics/resumo"),
+    EndpointCacheDependency("/api/v1/analytics/producao-semestral"),
+    EndpointCacheDependency("/api/v1/analytics/faixas-risco"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/evolucao"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/evolucao-mensal-gtin", ("movimentacao_mensal_gtin",)),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/repasses"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/gtin-detalhamento-mensal", ("movimentacao_mensal_gtin",)),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/indicadores"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/indicadores/{indicador}/benchmark-local"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/indicadores/{indicador}/evolucao-benchmark"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/geografico/origem-uf"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/geografico/benchmark-local"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/clinico/incompatibilidades"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/falecidos"),
+    EndpointCacheDependency("/api/v1/analytics/rede/{cnpj_raiz}"),
+    EndpointCacheDependency("/api/v1/analytics/cpf/{cpf}/timeline"),
+    EndpointCacheDependency("/api/v1/analytics/regional-benchmarking"),
+    EndpointCacheDependency("/api/v1/analytics/regional-benchmarking-animation"),
+    EndpointCacheDependency(
+        "/api/v1/analytics/cnpj/{cnpj}/crm-data",
+        ("crm_prescritores", *_CRM_ALERTAS_CACHES, "crm_timeline_hora"),
+    ),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/crm/medico-alertas/{id_medico:path}", _CRM_ALERTAS_CACHES),
+    EndpointCacheDependency(
+        "/api/v1/analytics/cnpj/{cnpj}/crm/timeline-dataset",
+        ("crm_timeline_dia", "crm_timeline_hora", "crm_timeline_eventos", "crm_raiox_tx"),
+    ),
+    EndpointCacheDependency(
+        "/api/v1/analytics/cnpj/{cnpj}/crm/raio-x",
+        ("crm_raiox_tx", "crm_concentracao_unico_alertas", "crm_concentracao_multiplo_alertas"),
+    ),
+    EndpointCacheDependency("/api/v1/analytics/indicadores-analise"),
+    EndpointCacheDependency("/api/v1/analytics/indicadores-analise/cnpjs"),
+    EndpointCacheDependency("/api/v1/analytics/cnpj/{cnpj}/movimentacao", ("memoria_calculo",)),
+    EndpointCacheDependency("/api/v1/analytics/cnpj-lookup"),
+    EndpointCacheDependency("/api/v1/analytics/metric-percentiles-animation"),
+    EndpointCacheDependency("/api/v1/analytics/metric-percentiles"),
+)
+
+
+def get_endpoint_cache_dependencies() -> dict[str, EndpointCacheDependency]:
+    cnpj_keys = {definition.key for definition in CNPJ_CACHE_DEFINITIONS}
+    dependencies: dict[str, EndpointCacheDependency] = {}
+    for dependency in ENDPOINT_CACHE_DEPENDENCIES:
+        unknown = set(dependency.cnpj_caches) - cnpj_keys
+        if unknown:
+            raise RuntimeError(
+                f"Rota {dependency.path} depende de cache CNPJ nao registrado: {', '.join(sorted(unknown))}"
+            )
+        dependencies[dependency.path] = dependency
+    return dependencies
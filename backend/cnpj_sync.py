@@ -0,0 +1,273 @@
+"""Execucao concorrente e retomavel de produtores de cache por CNPJ.
+
+Cada unidade de trabalho e um par (CNPJ, cache). Unidades que consultam o
+banco (`KIND_DB`) e unidades derivadas de globais em Polars (`KIND_CPU`)
+rodam em pools separados, com limites proprios. Uma falha so afeta a propria
+unidade: erros transitorios (banco, rede, disco) sao repetidos com backoff
+exponencial; erros de dados (decodificacao, esquema, `PermanentUnitError`)
+falham na primeira tentativa. Em ambos os casos a unidade e registrada como
+falha sem interromper os demais CNPJs.
+
+O progresso de cada job vai para um manifesto JSONL em
+`modules/cnpjs/.jobs/`. Se o lote for interrompido (ou terminar com falhas),
+rodar o mesmo job de novo pula as unidades ja concluidas. A primeira linha do
+manifesto guarda a assinatura das fontes (ex.: mtimes dos globais); se as
+fontes mudaram desde entao, o manifesto e descartado e o job recomeca do zero.
+Um job que termina sem falhas apaga o proprio manifesto.
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any
+import zlib
+
+import polars as pl
+
+
+KIND_DB = "db"
+KIND_CPU = "cpu"
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_S = 2.0
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return max(minimum, int(value))
+    except ValueError:
+        print(f"[AVISO] {name} invalido ({value!r}); usando {default}.")
+        return default
+
+
+def db_slots(default: int = 1) -> int:
+    """Produtores simultaneos que consultam o banco (SENTINELA_CNPJ_SYNC_DB_SLOTS)."""
+    return _env_int("SENTINELA_CNPJ_SYNC_DB_SLOTS", default, minimum=1)
+
+
+def cpu_slots() -> int:
+    """Produtores simultaneos derivados de globais (SENTINELA_CNPJ_SYNC_CPU_SLOTS)."""
+    # O Polars ja paraleliza cada operacao; poucos produtores bastam para
+    # esconder a latencia de disco sem disputar os mesmos nucleos.
+    default = max(1, min(4, (os.cpu_count() or 2) // 2))
+    return _env_int("SENTINELA_CNPJ_SYNC_CPU_SLOTS", default, minimum=1)
+
+
+def max_retries() -> int:
+    return _env_int("SENTINELA_CNPJ_SYNC_RETRIES", DEFAULT_RETRIES)
+
+
+@dataclass(frozen=True)
+class CnpjSyncUnit:
+    cnpj: str
+    key: str
+    kind: str
+    func: Callable[[], Any]
+
+    @property
+    def unit_id(self) -> str:
+        return f"{self.cnpj}/{self.key}"
+
+
+@dataclass
+class CnpjSyncReport:
+    job_id: str
+    total: int
+    skipped: int = 0
+    done: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+
+class PermanentUnitError(RuntimeError):
+    """Falha deterministica da unidade: repetir nao muda o resultado."""
+
+
+# Erros de dados/decodificacao: a mesma entrada falha de novo em qualquer tentativa.
+_PERMANENT_ERRORS = (
+    PermanentUnitError,
+    ValueError,
+    TypeError,
+    KeyError,
+    zlib.error,
+    pl.exceptions.PolarsError,
+)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    return not isinstance(exc, _PERMANENT_ERRORS)
+
+
+class _UnitFailed(Exception):
+    def __init__(self, attempts: int, cause: BaseException):
+        super().__init__(str(cause))
+        self.attempts = attempts
+        self.cause = cause
+
+
+class _JobManifest:
+    """Log JSONL append-only das unidades concluidas de um job.
+
+    A primeira linha e um cabecalho com a assinatura das fontes; um manifesto
+    gravado contra outras fontes (ou sem cabecalho) nao e retomado.
+    """
+
+    def __init__(self, path: str, sources: str = ""):
+        self.path = path
+        self.sources = sources
+        self._lock = threading.Lock()
+
+    def completed(self) -> set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        done: set[str] = set()
+        header_sources = None
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Linha truncada por interrupcao no meio da escrita.
+                    continue
+                if "header" in entry:
+                    header_sources = entry["header"].get("sources")
+                    continue
+                if entry.get("status") == "done":
+                    done.add(entry["unit"])
+                else:
+                    done.discard(entry.get("unit"))
+        if header_sources != self.sources:
+            print(
+                f"[ CACHE ] Manifesto {os.path.basename(self.path)} descartado: "
+                "fontes alteradas desde a execucao anterior."
+            )
+            self.discard()
+            return set()
+        return done
+
+    def record(self, unit_id: str, status: str, attempts: int, error: str | None = None) -> None:
+        entry = {"unit": unit_id, "status": status, "attempts": attempts, "at": time.time()}
+        if error:
+            entry["error"] = error
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if not os.path.exists(self.path):
+                line = json.dumps({"header": {"sources": self.sources}}) + "\n" + line
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(line)
+
+    def discard(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def job_id_for(name: str, units: Iterable[CnpjSyncUnit]) -> str:
+    """Identificador estavel de um job: mesmo nome e mesmas unidades, mesmo id."""
+    digest = hashlib.sha1()
+    for unit_id in sorted(unit.unit_id for unit in units):
+        digest.update(unit_id.encode("utf-8"))
+        digest.update(b"\n")
+    return f"{name}-{digest.hexdigest()[:12]}"
+
+
+class CnpjSyncExecutor:
+    """Roda `CnpjSyncUnit`s em pools por tipo, com retentativas e manifesto."""
+
+    def __init__(
+        self,
+        name: str,
+        units: Iterable[CnpjSyncUnit],
+        manifest_dir: str,
+        db_workers: int = 1,
+        cpu_workers: int = 1,
+        retries: int = DEFAULT_RETRIES,
+        backoff_s: float = DEFAULT_BACKOFF_S,
+        progress_callback: Callable[[int], None] | None = None,
+        sources: str = "",
+    ):
+        self.units = list(units)
+        unknown = sorted({unit.kind for unit in self.units} - {KIND_DB, KIND_CPU})
+        if unknown:
+            raise ValueError(f"Tipo de produtor CNPJ desconhecido: {', '.join(unknown)}")
+        self.job_id = job_id_for(name, self.units)
+        self.manifest = _JobManifest(os.path.join(manifest_dir, f"{self.job_id}.jsonl"), sources)
+        self.db_workers = max(1, db_workers)
+        self.cpu_workers = max(1, cpu_workers)
+        self.retries = max(0, retries)
+        self.backoff_s = backoff_s
+        self._progress_callback = progress_callback
+
+    def _run_unit(self, unit: CnpjSyncUnit) -> int:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                unit.func()
+                return attempt
+            except Exception as exc:
+                if attempt > self.retries or not _is_transient(exc):
+                    raise _UnitFailed(attempt, exc) from exc
+                delay = self.backoff_s * (2 ** (attempt - 1))
+                print(
+                    f"[AVISO] {unit.unit_id} falhou (tentativa {attempt}/{self.retries + 1}): "
+                    f"{exc}; nova tentativa em {delay:.0f}s."
+                )
+                time.sleep(delay)
+
+    def run(self) -> CnpjSyncReport:
+        t0 = time.perf_counter()
+        report = CnpjSyncReport(job_id=self.job_id, total=len(self.units))
+        completed = self.manifest.completed()
+        pending = [unit for unit in self.units if unit.unit_id not in completed]
+        report.skipped = report.total - len(pending)
+        if report.skipped:
+            print(
+                f"[ CACHE ] Job {self.job_id} retomado: {report.skipped} de "
+                f"{report.total} unidade(s) ja concluida(s)."
+            )
+
+        finished = report.skipped
+        with ThreadPoolExecutor(self.db_workers, thread_name_prefix="cnpj-db") as db_pool, \
+                ThreadPoolExecutor(self.cpu_workers, thread_name_prefix="cnpj-cpu") as cpu_pool:
+            pools = {KIND_DB: db_pool, KIND_CPU: cpu_pool}
+            futures: dict[Future, CnpjSyncUnit] = {
+                pools[unit.kind].submit(self._run_unit, unit): unit
+                for unit in pending
+            }
+            try:
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit = futures.pop(future)
+                        error = future.exception()
+                        if error is None:
+                            self.manifest.record(unit.unit_id, "done", future.result())
+                            report.done += 1
+                        else:
+                            attempts = error.attempts if isinstance(error, _UnitFailed) else 1
+                            cause = error.cause if isinstance(error, _UnitFailed) else error
+                            print(f"[ERRO] {unit.unit_id} falhou apos {attempts} tentativa(s): {cause}")
+                            self.manifest.record(unit.unit_id, "failed", attempts, str(cause))
+                            report.failed[unit.unit_id] = str(cause)
+                        finished += 1
+                        if self._progress_callback and report.total:
+                            self._progress_callback(int(finished * 100 / report.total))
+            except BaseException:
+                # Interrupcao: nada novo comeca; o manifesto ja tem o que terminou.
+                for future in futures:
+                    future.cancel()
+                raise
+
+        report.elapsed_s = time.perf_counter() - t0
+        if not report.failed:
+            self.manifest.discard()
+        return report
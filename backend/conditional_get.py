@@ -0,0 +1,144 @@
+"""GET condicional (ETag / If-None-Match) para as rotas analiticas puras.
+
+As rotas declaradas em `cache_registry.ENDPOINT_CACHE_DEPENDENCIES` sao
+funcao apenas de (parametros, `get_cache_generation()`, parquets por CNPJ).
+O middleware calcula uma ETag forte a partir dessas entradas antes de rotear:
+se o cliente ja tem a versao atual responde 304 sem executar o servico; senao
+executa a rota e anexa a ETag (recalculada, pois a primeira requisicao de um
+CNPJ costuma gerar os parquets dele) a resposta 200.
+
+SENTINELA_HTTP_ETAG=0 desliga o mecanismo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+from fastapi import FastAPI, Request
+
+import cache_registry
+from data_cache import get_cache_generation, get_cnpj_cache_root
+from api.utils.columnar import negotiate_columnar
+from api.utils.http_cache import etag_headers, etag_matches, generation_etag, not_modified_response
+from api.utils.route_match import RouteTemplateMatcher
+
+
+_ETAG_ENABLED = os.getenv("SENTINELA_HTTP_ETAG", "1").strip().lower() not in {"0", "false", "off", "nao"}
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _record(path: str, outcome: str) -> None:
+    with _stats_lock:
+        route_stats = _stats.setdefault(path, {"not_modified": 0, "served": 0, "sem_etag": 0})
+        route_stats[outcome] += 1
+
+
+def conditional_get_stats() -> dict:
+    """Respostas 304, respostas completas e respostas sem ETag por rota declarada."""
+    with _stats_lock:
+        routes = {path: dict(values) for path, values in _stats.items()}
+    return {
+        "enabled": _ETAG_ENABLED,
+        "not_modified": sum(values["not_modified"] for values in routes.values()),
+        "served": sum(values["served"] for values in routes.values()),
+        "routes": routes,
+    }
+
+
+class _RouteDependencies:
+    """Casa o caminho da requisicao com os templates declarados em cache_registry."""
+
+    def __init__(self, dependencies: dict[str, cache_registry.EndpointCacheDependency]):
+        self._matcher = RouteTemplateMatcher(dependencies.items())
+        self._warned: set[str] = set()
+
+    def resolve(self, path: str):
+        matched = self._matcher.match(path)
+        if matched is None:
+            return None
+        _template, dependency, path_params = matched
+        return dependency, path_params
+
+    def confirm(self, request: Request, dependency: cache_registry.EndpointCacheDependency) -> bool:
+        """Confere, depois do roteamento, se a rota executada e a declarada."""
+        route_path = getattr(request.scope.get("route"), "path", "")
+        if route_path and dependency.path.endswith(route_path):
+            return True
+        if dependency.path not in self._warned:
+            self._warned.add(dependency.path)
+            print(f"[AVISO] ETag: {request.url.path} casou com {dependency.path} mas foi atendida por {route_path or '?'}; sem ETag.")
+        return False
+
+
+def _cnpj_files_state(
+    dependency: cache_registry.EndpointCacheDependency,
+    path_params: dict,
+) -> tuple:
+    cnpj = path_params.get(dependency.cnpj_param)
+    if not dependency.cnpj_caches or not cnpj:
+        return ()
+    cnpj_dir = os.path.join(get_cnpj_cache_root(), str(cnpj))
+    state = []
+    for key in dependency.cnpj_caches:
+        path = os.path.join(cnpj_dir, cache_registry.get_cnpj_cache_definition(key).filename)
+        try:
+            stat = os.stat(path)
+            state.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            state.append(None)
+    return tuple(state)
+
+
+def _request_etag(
+    request: Request,
+    dependency: cache_registry.EndpointCacheDependency,
+    path_params: dict,
+) -> str:
+    return generation_etag(
+        "api",
+        dependency.path,
+        tuple(sorted(request.query_params.multi_items())),
+        tuple(sorted((key, str(value)) for key, value in path_params.items())),
+        negotiate_columnar(request.headers.get("accept")),
+        _cnpj_files_state(dependency, path_params),
+    )
+
+
+def configure_conditional_get(app: FastAPI) -> None:
+    """Registra o middleware de ETag (deve ficar dentro do CORS para o 304 levar os headers)."""
+    if not _ETAG_ENABLED:
+        print("[INFO] ETag HTTP desativado (SENTINELA_HTTP_ETAG=0).")
+        return
+    resolver = _RouteDependencies(cache_registry.get_endpoint_cache_dependencies())
+
+    @app.middleware("http")
+    async def conditional_get_middleware(request: Request, call_next):
+        if request.method != "GET" or not request.url.path.startswith("/api/"):
+            return await call_next(request)
+        resolved = resolver.resolve(request.url.path)
+        if resolved is None:
+            return await call_next(request)
+        dependency, path_params = resolved
+
+        generation = get_cache_generation()
+        etag = _request_etag(request, dependency, path_params)
+        if etag_matches(request, etag):
+            _record(dependency.path, "not_modified")
+            return not_modified_response(etag, {"Vary": "Accept"})
+
+        response = await call_next(request)
+        # Sem ETag se a geracao mudou durante a requisicao: o corpo pode ser da anterior.
+        if (
+            response.status_code != 200
+            or "etag" in response.headers
+            or generation != get_cache_generation()
+            or not resolver.confirm(request, dependency)
+        ):
+            _record(dependency.path, "sem_etag")
+            return response
+        response.headers.update(etag_headers(_request_etag(request, dependency, path_params)))
+        _record(dependency.path, "served")
+        return response
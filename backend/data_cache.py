@@ -15,6 +15,17 @@ from cache_files import (
 from datetime import date
 from pathlib import Path
 from typing import Any
+from cache_prefetch import get_prefetch_status, schedule_watchlist_prefetch
+from external_sort import SortedParquetWriter
+from global_frames import (
+    MODE_EAGER,
+    MODE_MMAP,
+    GlobalFrameRegistry,
+    current_rss_mb,
+    global_frames_mode,
+)
+from parquet_index import CLUSTER_ROW_GROUP_SIZE, read_key_slice, write_clustered_parquet
+from sql_extract import iter_sql_batches, sql_to_parquet
 
 # --- LÓGICA DE CAMINHO PARA CACHE ---
 # Se rodando via EXE (PyInstaller), sys.frozen é True
@@ -355,6 +366,26 @@ _ON_DEMAND_GLOBAL_REQUIRED_COLUMNS = {
     },
 }
 
+# Globais lidos por CNPJ: gravados ordenados por estas colunas, com indice
+# lateral pela primeira (ver parquet_index). Valor: (ordem, linhas por row group).
+_GLOBAL_CLUSTERED = {
+    "crm_prescritores_global": (["id_cnpj", "competencia", "id_medico"], CLUSTER_ROW_GROUP_SIZE),
+    # Uma linha por CNPJ com payload JSON grande: row groups bem menores.
+    "memoria_calculo_global": (["cnpj"], 256),
+    "crm_raiox_tx_global": (["id_cnpj", "data_hora", "num_autorizacao"], CLUSTER_ROW_GROUP_SIZE),
+    "crm_timeline_dia_global": (["id_cnpj", "dt_janela"], CLUSTER_ROW_GROUP_SIZE),
+    "crm_timeline_hora_global": (["id_cnpj", "dt_janela", "hr_janela"], CLUSTER_ROW_GROUP_SIZE),
+    "crm_timeline_eventos_global": (["id_cnpj", "dt_janela"], CLUSTER_ROW_GROUP_SIZE),
+    "crm_concentracao_unico_alertas_global": (["id_cnpj", "dt_alerta", "hr_janela"], CLUSTER_ROW_GROUP_SIZE),
+    "crm_concentracao_multiplo_alertas_global": (["id_cnpj", "dt_alerta"], CLUSTER_ROW_GROUP_SIZE),
+    "movimentacao_mensal_gtin_global": (["id_cnpj", "periodo", "codigo_barra"], CLUSTER_ROW_GROUP_SIZE),
+}
+# Lotes lidos da fonte por modulo de linhas largas (padrao: 250 mil linhas);
+# os runs da ordenacao externa ja sao limitados em MB (ver external_sort).
+_GLOBAL_CLUSTERED_CHUNK_ROWS = {
+    "memoria_calculo_global": 128,
+}
+
 
 def _global_cache_path(key: str) -> str:
     return os.path.join(_CACHE_DIR, _GLOBAL_PARQUETS[key])
@@ -401,6 +432,20 @@ def _scan_on_demand_global_parquet(name: str, path: str) -> pl.LazyFrame:
     return pl.scan_parquet(path)
 
 
+def _write_clustered_global(name: str, source: pl.LazyFrame, path: str) -> int:
+    sort_by, row_group_size = _GLOBAL_CLUSTERED[name]
+    t0 = time.perf_counter()
+    rows = write_clustered_parquet(
+        source,
+        path,
+        sort_by,
+        row_group_size=row_group_size,
+        chunk_size=_GLOBAL_CLUSTERED_CHUNK_ROWS.get(name, 250_000),
+    )
+    print(f"[{time.perf_counter() - t0:.1f}s] {name} agrupado por {sort_by[0]} e indexado ({rows:,} linhas).")
+    return rows
+
+
 _PARQUET_PATH = _global_cache_path("movimentacao")
 _LOCALIDADES_PARQUET_PATH = _global_cache_path("localidades")
 _REDE_PARQUET_PATH = _global_cache_path("rede")
@@ -487,6 +532,8 @@ _cache_progress: int = 0
 _cache_status: str = "idle"
 _cache_error_message: str = ""
 _cache_generation: int = 0
+_GLOBAL_FRAMES = GlobalFrameRegistry()
+_boot_stats: dict[str, Any] = {}
 
 def _get_cache_module_status(loaded: bool, exists: bool) -> str:
     if loaded:
@@ -836,34 +883,30 @@ def _sync_geografico_origem_uf(engine, progress_callback=None):
     """
 
     print(f"   -> Registros geografico origem UF: {total_rows:,}")
-    chunk_list = []
     rows_processed = 0
     chunk_size = 50_000
 
-    for chunk in pd.read_sql(sql, engine, chunksize=chunk_size):
-        chunk_df = pl.from_pandas(chunk).with_columns([
-            pl.col("id_cnpj").cast(pl.Int32),
-            pl.col("ano_base").cast(pl.Int16),
-            pl.col("uf_farmacia").cast(pl.String),
-            pl.col("uf_paciente").cast(pl.String),
-            pl.col("is_outra_uf").cast(pl.Boolean),
-            pl.col("qtd_autorizacoes").cast(pl.Int32),
-            pl.col("valor_autorizado").cast(pl.Float64),
-        ])
-        chunk_list.append(chunk_df)
-        rows_processed += len(chunk)
-        p = int((rows_processed / total_rows) * 100) if total_rows > 0 else 100
-        print(f"   -> Progresso Geografico Origem UF: {p}% ({rows_processed:,} / {total_rows:,})")
-        if progress_callback:
-            progress_callback(p)
-
-    df_geografico_origem_uf = (
-        pl.concat(chunk_list).sort(["id_cnpj", "ano_base", "uf_paciente"])
-    )
-    df_geografico_origem_uf.write_parquet(
+    with SortedParquetWriter(
         _GEOGRAFICO_ORIGEM_UF_PARQUET_PATH,
-        compression="zstd",
-    )
+        ["id_cnpj", "ano_base", "uf_paciente"],
+    ) as writer:
+        for chunk in iter_sql_batches(engine, sql, batch_size=chunk_size, source="geografico_origem_uf"):
+            chunk_df = chunk.with_columns([
+                pl.col("id_cnpj").cast(pl.Int32),
+                pl.col("ano_base").cast(pl.Int16),
+                pl.col("uf_farmacia").cast(pl.String),
+                pl.col("uf_paciente").cast(pl.String),
+                pl.col("is_outra_uf").cast(pl.Boolean),
+                pl.col("qtd_autorizacoes").cast(pl.Int32),
+                pl.col("valor_autorizado").cast(pl.Float64),
+            ])
+            writer.write(chunk_df)
+            rows_processed += chunk_df.height
+            p = int((rows_processed / total_rows) * 100) if total_rows > 0 else 100
+            print(f"   -> Progresso Geografico Origem UF: {p}% ({rows_processed:,} / {total_rows:,})")
+            if progress_callback:
+                progress_callback(p)
+
     _mark_on_demand_global_cache_ready(
         "geografico_origem_uf",
         _GEOGRAFICO_ORIGEM_UF_PARQUET_PATH,
@@ -1020,9 +1063,7 @@ def _sync_crm_prescritores_global(engine, progress_callback=None):
         pl.scan_parquet([str(path) for path in part_paths])
         .select(list(schema.keys()))
     )
-    tmp_final = final_path + ".tmp"
-    final_scan.sink_parquet(tmp_final, compression="zstd")
-    os.replace(tmp_final, final_path)
+    _write_clustered_global("crm_prescritores_global", final_scan, final_path)
 
     manifest["status"] = "done"
     manifest["final_rows"] = sum(
@@ -1195,9 +1236,7 @@ def _sync_memoria_calculo_global(engine, progress_callback=None):
         pl.scan_parquet([str(path) for path in part_paths])
         .select(list(schema.keys()))
     )
-    tmp_final = final_path + ".tmp"
-    final_scan.sink_parquet(tmp_final, compression="zstd")
-    os.replace(tmp_final, final_path)
+    _write_clustered_global("memoria_calculo_global", final_scan, final_path)
 
     manifest["status"] = "done"
     manifest["final_rows"] = sum(
@@ -1434,9 +1473,7 @@ def _sync_crm_timeline_dia_global(engine, progress_callback=None):
         pl.scan_parquet([str(path) for path in part_paths])
         .select(list(schema.keys()))
     )
-    tmp_final = final_path + ".tmp"
-    final_scan.sink_parquet(tmp_final, compression="zstd")
-    os.replace(tmp_final, final_path)
+    _write_clustered_global("crm_timeline_dia_global", final_scan, final_path)
 
     manifest["status"] = "done"
     manifest["final_rows"] = sum(
@@ -1638,9 +1675,7 @@ def _sync_movimentacao_mensal_gtin_global(engine, progress_callback=None):
         pl.scan_parquet([str(path) for path in part_paths])
         .select(list(schema.keys()))
     )
-    tmp_final = final_path + ".tmp"
-    final_scan.sink_parquet(tmp_final, compression="zstd")
-    os.replace(tmp_final, final_path)
+    _write_clustered_global("movimentacao_mensal_gtin_global", final_scan, final_path)
 
     manifest["status"] = "done"
     manifest["final_rows"] = sum(
@@ -1654,32 +1689,19 @@ def _sync_movimentacao_mensal_gtin_global(engine, progress_callback=None):
         progress_callback(100)
 
 def _load_or_sync_global_cache_simple(name, filepath, query, engine, progress_callback=None, extra_columns=None):
-    import pandas as pd
     t0 = time.perf_counter()
-    with engine.connect() as conn:
-        pdf = pd.read_sql(query, conn)
-
-    df = pl.from_pandas(pdf)
-
-    if extra_columns:
-        df = df.with_columns([pl.lit(v).alias(k) for k, v in extra_columns.items()])
-
-    schema = _GLOBAL_PARQUET_SCHEMAS.get(name)
-    if schema:
-        missing_schema_cols = [k for k in schema if k not in df.columns]
-        if missing_schema_cols:
-            raise ValueError(
-                f"[ CACHE ] _load_or_sync_global_cache_simple ({name}): "
-                f"colunas obrigatorias ausentes no resultado SQL: {', '.join(missing_schema_cols)}"
-            )
-        df = df.with_columns([pl.col(k).cast(v) for k, v in schema.items() if k in df.columns])
-        df = df.select(list(schema.keys()))
-
-    tmp_path = filepath + ".tmp"
-    df.write_parquet(tmp_path, compression="zstd")
-    os.replace(tmp_path, filepath)
+    rows = sql_to_parquet(
+        engine,
+        query,
+        filepath,
+        schema=_GLOBAL_PARQUET_SCHEMAS.get(name),
+        extra_columns=extra_columns,
+        source=f"_load_or_sync_global_cache_simple ({name})",
+    )
+    if name in _GLOBAL_CLUSTERED:
+        _write_clustered_global(name, pl.scan_parquet(filepath), filepath)
     _mark_on_demand_global_cache_ready(name, filepath)
-    print(f"[{time.perf_counter() - t0:.1f}s] {name} salvo com {df.height} linhas.")
+    print(f"[{time.perf_counter() - t0:.1f}s] {name} salvo com {rows} linhas.")
     if progress_callback:
         progress_callback(100)
 
@@ -1838,9 +1860,7 @@ def _sync_crm_raiox_tx_global(engine, progress_callback=None):
         pl.scan_parquet([str(path) for path in part_paths])
         .select(list(schema.keys()))
     )
-    tmp_final = final_path + ".tmp"
-    final_scan.sink_parquet(tmp_final, compression="zstd")
-    os.replace(tmp_final, final_path)
+    _write_clustered_global("crm_raiox_tx_global", final_scan, final_path)
 
     manifest["status"] = "done"
     manifest["final_rows"] = sum(
@@ -2179,39 +2199,35 @@ def _sync_esocial(engine, progress_callback=None):
             dt_processamento
         FROM [temp_CGUSC].[fp].[esocial_cnpj_trabalhador_ano]
     """
-    trabalhador_chunks = []
     rows_processed = 0
-    for chunk in pd.read_sql(trabalhador_sql, engine, chunksize=50_000):
-        chunk_df = pl.from_pandas(chunk).with_columns([
-            pl.col("id_cnpj").cast(pl.Int32),
-            pl.col("ano_base").cast(pl.Int16),
-            pl.col("mes_base").cast(pl.Int8),
-            pl.col("competencia_base").cast(pl.Int32),
-            pl.col("cpf_trabalhador").cast(pl.String),
-            pl.col("matricula").cast(pl.String),
-            pl.col("cbo").cast(pl.Int32, strict=False),
-            pl.col("titulo_cbo").cast(pl.String),
-            pl.col("dt_admissao").cast(pl.Date, strict=False),
-            pl.col("dt_rescisao").cast(pl.Date, strict=False),
-            pl.col("is_farmaceutico").cast(pl.Boolean),
-            pl.col("is_cbo_sem_titulo").cast(pl.Boolean),
-            pl.col("dt_carga_fonte").cast(pl.Date, strict=False),
-            pl.col("dt_processamento").cast(pl.Datetime, strict=False),
-        ])
-        trabalhador_chunks.append(chunk_df)
-        rows_processed += len(chunk)
-        p = int((rows_processed / total_trabalhador) * 50)
-        print(f"   -> Progresso eSocial trabalhador/ano: {p * 2}% ({rows_processed:,} / {total_trabalhador:,})")
-        if progress_callback:
-            progress_callback(p)
-
-    df_esocial_cnpj_trabalhador_ano = (
-        pl.concat(trabalhador_chunks).sort(["id_cnpj", "ano_base", "cpf_trabalhador", "matricula"])
-    )
-    df_esocial_cnpj_trabalhador_ano.write_parquet(
+    with SortedParquetWriter(
         _ESOCIAL_CNPJ_TRABALHADOR_ANO_PARQUET_PATH,
-        compression="zstd",
-    )
+        ["id_cnpj", "ano_base", "cpf_trabalhador", "matricula"],
+    ) as writer:
+        for chunk in iter_sql_batches(engine, trabalhador_sql, batch_size=50_000, source="esocial_cnpj_trabalhador_ano"):
+            chunk_df = chunk.with_columns([
+                pl.col("id_cnpj").cast(pl.Int32),
+                pl.col("ano_base").cast(pl.Int16),
+                pl.col("mes_base").cast(pl.Int8),
+                pl.col("competencia_base").cast(pl.Int32),
+                pl.col("cpf_trabalhador").cast(pl.String),
+                pl.col("matricula").cast(pl.String),
+                pl.col("cbo").cast(pl.Int32, strict=False),
+                pl.col("titulo_cbo").cast(pl.String),
+                pl.col("dt_admissao").cast(pl.Date, strict=False),
+                pl.col("dt_rescisao").cast(pl.Date, strict=False),
+                pl.col("is_farmaceutico").cast(pl.Boolean),
+                pl.col("is_cbo_sem_titulo").cast(pl.Boolean),
+                pl.col("dt_carga_fonte").cast(pl.Date, strict=False),
+                pl.col("dt_processamento").cast(pl.Datetime, strict=False),
+            ])
+            writer.write(chunk_df)
+            rows_processed += chunk_df.height
+            p = int((rows_processed / total_trabalhador) * 50)
+            print(f"   -> Progresso eSocial trabalhador/ano: {p * 2}% ({rows_processed:,} / {total_trabalhador:,})")
+            if progress_callback:
+                progress_callback(p)
+
     _df_esocial_cnpj_trabalhador_ano = None
     _mark_on_demand_global_cache_ready(
         "esocial_cnpj_trabalhador_ano",
@@ -3613,24 +3629,97 @@ def _sync_dados_ibge_demografia(engine, progress_callback=None):
     _df_dados_ibge_demografia = df_dados_ibge_demografia
 
 
-def _sync_movimentacao(engine, progress_callback):
-    """Tarefa 2: Sincroniza a movimentação mensal (Tabela Grande)."""
+_MOVIMENTACAO_LOOKBACK_MESES_PADRAO = 3
+_MOVIMENTACAO_SCHEMA = {
+    "id_cnpj": pl.Int32,
+    "periodo": pl.Date,
+    "total_vendas": pl.Float64,
+    "total_sem_comprovacao": pl.Float64,
+    "total_qnt_caixas_vendidas": pl.Int64,
+    "total_qnt_caixas_sem_comprovacao": pl.Int64,
+    "total_num_autorizacoes": pl.Int64,
+}
+
+
+def _movimentacao_lookback_meses() -> int:
+    """Meses ja baixados que o sync incremental rele para captar correcoes tardias."""
+    value = os.getenv("SENTINELA_MOVIMENTACAO_LOOKBACK_MESES")
+    if value is None or not value.strip():
+        return _MOVIMENTACAO_LOOKBACK_MESES_PADRAO
+    try:
+        return max(0, int(value))
+    except ValueError:
+        print(f"[AVISO] SENTINELA_MOVIMENTACAO_LOOKBACK_MESES invalido ({value!r}); usando {_MOVIMENTACAO_LOOKBACK_MESES_PADRAO}.")
+        return _MOVIMENTACAO_LOOKBACK_MESES_PADRAO
+
+
+def _movimentacao_incremental_habilitado() -> bool:
+    value = os.getenv("SENTINELA_MOVIMENTACAO_INCREMENTAL")
+    return (value or "1").strip().lower() not in {"0", "false", "no", "off", "nao"}
+
+
+def _movimentacao_watermark() -> date | None:
+    """Retorna o maior periodo ja presente no Parquet local, se ele for reaproveitavel."""
+    if not os.path.exists(_PARQUET_PATH):
+        return None
+    try:
+        lf = pl.scan_parquet(_PARQUET_PATH)
+        schema = lf.collect_schema()
+        if schema.get("periodo") != pl.Date or schema.get("id_cnpj") != pl.Int32:
+            print("   -> Parquet local de movimentacao com schema antigo; refazendo carga completa.")
+            return None
+        return lf.select(pl.col("periodo").max()).collect().item()
+    except Exception as e:
+        print(f"   -> Parquet local de movimentacao ilegivel ({e}); refazendo carga completa.")
+        return None
+
+
+def _subtract_months(value: date, months: int) -> date:
+    index = value.year * 12 + (value.month - 1) - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _sync_movimentacao(engine, progress_callback, full_refresh: bool = False):
+    """Tarefa 2: Sincroniza a movimentação mensal (Tabela Grande).
+
+    Por padrao o sync e incremental: le o maior `periodo` do Parquet local e
+    baixa somente as competencias a partir de `watermark - lookback`, trocando
+    essa janela no arquivo ordenado por (id_cnpj, periodo). Sem Parquet local
+    valido, com `full_refresh=True` ou `SENTINELA_MOVIMENTACAO_INCREMENTAL=0`,
+    refaz a carga completa.
+    """
     global _df_movimentacao
+    watermark = None
+    if not full_refresh and _movimentacao_incremental_habilitado():
+        watermark = _movimentacao_watermark()
+
+    dt_corte = None
+    if watermark is not None:
+        dt_corte = _subtract_months(watermark, _movimentacao_lookback_meses())
+        print(
+            f"   -> Modo incremental: ultimo periodo local {watermark:%Y-%m}, "
+            f"rebaixando a partir de {dt_corte:%Y-%m}."
+        )
+
+    where_corte = "WHERE M.periodo >= :dt_corte" if dt_corte is not None else ""
+    params = {"dt_corte": dt_corte} if dt_corte is not None else {}
+
     with engine.connect() as conn:
-        total_rows = conn.execute(text("SELECT COUNT(*) FROM [temp_CGUSC].[fp].[movimentacao_mensal_cnpj]")).scalar()
-        missing_id_cnpj = conn.execute(text("""
+        total_rows = conn.execute(text(f"SELECT COUNT(*) FROM [temp_CGUSC].[fp].[movimentacao_mensal_cnpj] M {where_corte}"), params).scalar()
+        missing_id_cnpj = conn.execute(text(f"""
             SELECT TOP 1 1
             FROM [temp_CGUSC].[fp].[movimentacao_mensal_cnpj] M
             LEFT JOIN [temp_CGUSC].[fp].[dados_farmacia] DF
                 ON DF.cnpj = M.cnpj
             WHERE DF.id IS NULL
-        """)).scalar()
+            {"AND M.periodo >= :dt_corte" if dt_corte is not None else ""}
+        """), params).scalar()
 
     if missing_id_cnpj:
         raise RuntimeError("movimentacao_mensal_cnpj possui CNPJs sem id correspondente em dados_farmacia.")
     
     # Tabela fato mensal enxuta. Perfil/geografia ficam no modulo perfil_estabelecimento.
-    sql = """
+    sql = text(f"""
         SELECT DF.id AS id_cnpj,
                M.periodo,
                CAST(M.total_vendas AS FLOAT) AS total_vendas,
@@ -3640,33 +3729,48 @@ def _sync_movimentacao(engine, progress_callback):
                M.total_num_autorizacoes
         FROM [temp_CGUSC].[fp].[movimentacao_mensal_cnpj] M
         INNER JOIN [temp_CGUSC].[fp].[dados_farmacia] DF ON DF.cnpj = M.cnpj
-    """
+        {where_corte}
+    """)
     
-    chunk_list = []
     rows_processed = 0
     CHUNK_SIZE = 250_000
-    
+    schema = _MOVIMENTACAO_SCHEMA
+
     print(f"Total de registros a baixar: {total_rows:,}")
-    
-    for chunk in pd.read_sql(sql, engine, chunksize=CHUNK_SIZE):
-        chunk_list.append(pl.from_pandas(chunk))
-        rows_processed += len(chunk)
-        p = int((rows_processed / total_rows) * 100) if total_rows > 0 else 100
-        print(f"   -> Progresso Movimentação: {p}% ({rows_processed:,} / {total_rows:,})")
-        progress_callback(p)
 
-    print("   -> Organizando e otimizando dados (Polars)...")
-    df_movimentacao = pl.concat(chunk_list).with_columns([
-        pl.col("id_cnpj").cast(pl.Int32),
-        pl.col("periodo").cast(pl.Date),
-        pl.col("total_qnt_caixas_vendidas").cast(pl.Int64),
-        pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64),
-        pl.col("total_num_autorizacoes").cast(pl.Int64),
-        pl.col("total_vendas").cast(pl.Float64),
-        pl.col("total_sem_comprovacao").cast(pl.Float64),
-    ]).sort(["id_cnpj", "periodo"])  # ORDENAÇÃO é a chave para compressão Parquet
-    df_movimentacao.write_parquet(_PARQUET_PATH, compression="zstd")
-    _df_movimentacao = df_movimentacao
+    # Lotes ordenados vao para disco e sao intercalados no Parquet final, sem
+    # concatenar a tabela inteira em memoria. ORDENAÇÃO por (id_cnpj, periodo)
+    # é a chave para compressão e para o pushdown de filtros por CNPJ.
+    with SortedParquetWriter(_PARQUET_PATH, ["id_cnpj", "periodo"]) as writer:
+        if dt_corte is not None:
+            # Janela rebaixada substitui integralmente os periodos >= corte.
+            historico = (
+                pl.scan_parquet(_PARQUET_PATH)
+                .filter(pl.col("periodo") < dt_corte)
+                .select(list(schema.keys()))
+            )
+            for batch in historico.collect_batches(chunk_size=CHUNK_SIZE):
+                writer.write(batch)
+            print(f"   -> {writer.rows:,} registros historicos preservados.")
+        rows_historicos = writer.rows
+
+        for chunk in iter_sql_batches(engine, sql, params, schema, CHUNK_SIZE, "movimentacao"):
+            writer.write(chunk)
+            rows_processed += chunk.height
+            p = int((rows_processed / total_rows) * 100) if total_rows > 0 else 100
+            print(f"   -> Progresso Movimentação: {p}% ({rows_processed:,} / {total_rows:,})")
+            progress_callback(int(p * 0.9))
+
+        if rows_processed == 0 and dt_corte is None:
+            raise RuntimeError("movimentacao_mensal_cnpj nao retornou linhas para sincronizacao.")
+
+        print(
+            f"   -> Gravando {writer.rows:,} registros ordenados "
+            f"({rows_processed:,} novos, {rows_historicos:,} historicos)..."
+        )
+
+    _df_movimentacao = pl.read_parquet(_PARQUET_PATH)
+    progress_callback(100)
 
 def _sync_crm_benchmarks(engine, progress_callback=None):
     """Tarefa 5: Gera bench_uf, bench_regiao e bench_br como parquets a partir das tabelas de indicadores do banco."""
@@ -3850,44 +3954,56 @@ def _sync_crm_parquets(engine, progress_callback=None, cnpjs: list[str] | None =
             print(f"[ERRO] Erro ao buscar lista de CNPJs: {e}")
             return
 
-    total = len(cnpjs)
-    print(f"Sincronizando parquets de CRMs para {total} estabelecimento(s)...")
-
-    for i, cnpj in enumerate(cnpjs, 1):
-        try:
+    print(f"Sincronizando parquets de CRMs para {len(cnpjs)} estabelecimento(s)...")
+    cache_manager.sync_cnpj_caches(
+        engine,
+        cnpjs,
+        progress_callback,
+        keys=[
             # 1. Alertas associados a CRMs.
-            cache_manager.sync_cnpj_cache("geografico", cnpj, engine)
-            cache_manager.sync_cnpj_cache("crm_concentracao_unico_alertas", cnpj, engine)
-            cache_manager.sync_cnpj_cache("crm_concentracao_multiplo_alertas", cnpj, engine)
+            "geografico",
+            "crm_concentracao_unico_alertas",
+            "crm_concentracao_multiplo_alertas",
+            "crm_timeline_dia",
+            "crm_timeline_hora",
+            "crm_timeline_eventos",
+            # 2. Transacoes Raio-X
+            "crm_raiox_tx",
+        ],
+        job_name="crm",
+    )
 
-            cache_manager.sync_cnpj_cache("crm_timeline_dia", cnpj, engine)
-            cache_manager.sync_cnpj_cache("crm_timeline_hora", cnpj, engine)
-            cache_manager.sync_cnpj_cache("crm_timeline_eventos", cnpj, engine)
 
-            # 2. Transacoes Raio-X
-            cache_manager.sync_cnpj_cache("crm_raiox_tx", cnpj, engine)
+# --- GERENCIADOR DE CACHE ---
 
-            if progress_callback:
-                p = int((i / total) * 100)
-                progress_callback(p)
-        except Exception as e:
-            print(f"\n[AVISO]  Erro ao sincronizar CNPJ {cnpj}: {e}")
-            raise
+def _sync_worker_count(engine) -> int:
+    """Limita as tarefas simultaneas do sync ao pool fixo do SQLAlchemy (database.POOL_SIZE)."""
+    pool_size = getattr(getattr(engine, "pool", None), "size", None)
+    try:
+        return max(1, int(pool_size())) if callable(pool_size) else 1
+    except Exception:
+        return 1
 
-    if progress_callback:
-        progress_callback(100)
 
+def _schedule_teia_index_build(reason: str) -> None:
+    """Monta o indice nacional da teia em segundo plano para a geracao nova."""
+    # Import tardio: o indice vive na camada de servicos, que importa este modulo.
+    from api.services.analytics.teia_index import schedule_teia_index_build, teia_index_enabled
+
+    if teia_index_enabled():
+        schedule_teia_index_build(reason)
 
-# --- GERENCIADOR DE CACHE ---
 
 def load_cache(engine, force_refresh: bool = False) -> None:
-    global _df_movimentacao, _df_localidades, _df_rede, _df_matriz_risco, _df_bench_crm_uf, _df_bench_crm_regiao, _df_bench_crm_br, _df_dados_farmacia, _df_dados_farmacia_cnaes_secundarios, _df_perfil_estabelecimento, _df_dados_socios, _df_teia_fonte_nivel2, _df_teia_fonte_nivel3, _df_teia_fonte_nivel4, _df_medicamentos, _df_falecidos, _df_analise_gtin_inconsistencia_clinica, _df_analise_gtin_inconsistencia_clinica_municipio, _df_analise_gtin_inconsistencia_clinica_regiao, _df_dados_ibge_demografia, _df_volume_atipico_semestral, _df_esocial_cnpj_ano, _df_esocial_cnpj_trabalhador_ano, _df_esocial_cnpj_movimentacao_ano, _df_esocial_cnpj_ultima_movimentacao, _df_sentinela_metadados_base, _df_dados_par, _df_par_teia_alvos, _cache_progress, _cache_status, _cache_error_message, _cache_generation
-    import time
+    global _df_movimentacao, _df_localidades, _df_rede, _df_matriz_risco, _df_bench_crm_uf, _df_bench_crm_regiao, _df_bench_crm_br, _df_dados_farmacia, _df_dados_farmacia_cnaes_secundarios, _df_perfil_estabelecimento, _df_dados_socios, _df_teia_fonte_nivel2, _df_teia_fonte_nivel3, _df_teia_fonte_nivel4, _df_medicamentos, _df_falecidos, _df_analise_gtin_inconsistencia_clinica, _df_analise_gtin_inconsistencia_clinica_municipio, _df_analise_gtin_inconsistencia_clinica_regiao, _df_dados_ibge_demografia, _df_volume_atipico_semestral, _df_esocial_cnpj_ano, _df_esocial_cnpj_trabalhador_ano, _df_esocial_cnpj_movimentacao_ano, _df_esocial_cnpj_ultima_movimentacao, _df_sentinela_metadados_base, _df_dados_par, _df_par_teia_alvos, _cache_progress, _cache_status, _cache_error_message, _cache_generation, _boot_stats
     _ON_DEMAND_GLOBAL_CACHE_READY.clear()
+    _GLOBAL_FRAMES.clear()
 
     # 1. Boot Rápido (carrega cada Parquet individualmente)
     if not force_refresh:
         _cache_status = "loading_parquet"
+        boot_started = time.perf_counter()
+        frames_mode = global_frames_mode()
         missing = []
         required_columns = {
             "movimentacao": {
@@ -4209,11 +4325,19 @@ def load_cache(engine, force_refresh: bool = False) -> None:
                 missing.append(name)
                 return None
             try:
-                df = pl.read_parquet(path)
+                if frames_mode != MODE_EAGER:
+                    # So valida o schema; o Parquet e lido no primeiro get_df_*.
+                    columns = set(pl.read_parquet_schema(path))
+                else:
+                    df = pl.read_parquet(path)
+                    columns = set(df.columns)
                 required = required_columns.get(name)
-                if required and not required.issubset(set(df.columns)):
-                    missing_cols = ", ".join(sorted(required - set(df.columns)))
+                if required and not required.issubset(columns):
+                    missing_cols = ", ".join(sorted(required - columns))
                     raise ValueError(f"schema antigo sem colunas obrigatorias: {missing_cols}")
+                if frames_mode != MODE_EAGER:
+                    _GLOBAL_FRAMES.register(name, path, memory_map=frames_mode == MODE_MMAP)
+                    return None
                 return df
             except Exception as e:
                 print(f"[ CACHE ] GLOBAL - {name} - [AVISO] ERRO DE LEITURA ({e})")
@@ -4288,6 +4412,15 @@ def load_cache(engine, force_refresh: bool = False) -> None:
         par_teia_alvos_loaded = _try_load("par_teia_alvos", _PAR_TEIA_ALVOS_PARQUET_PATH)
         _df_par_teia_alvos = par_teia_alvos_loaded
 
+        boot_s = time.perf_counter() - boot_started
+        rss_mb = current_rss_mb()
+        _boot_stats = {
+            "mode": frames_mode,
+            "boot_time_s": round(boot_s, 2),
+            "rss_mb_after_boot": round(rss_mb, 1) if rss_mb is not None else None,
+        }
+        print(f"[INFO]  Boot dos caches globais ({frames_mode}) em {boot_s:.1f}s.")
+
         if missing:
             print(f"[AVISO]  Cache incompleto — módulos ausentes: {', '.join(missing)}")
             print("[INFO]  Sistema iniciado em modo degradado. Sincronize pela interface para carregar os dados.")
@@ -4298,69 +4431,80 @@ def load_cache(engine, force_refresh: bool = False) -> None:
             _cache_status = "ready"
             _cache_generation += 1
             print(f"[OK] Caches carregados via Parquet.")
+            schedule_watchlist_prefetch(engine, "boot")
+            _schedule_teia_index_build("boot")
         return
 
-    from typing import TypedDict, Callable, List
-
-    class SyncTask(TypedDict):
-        name: str
-        weight: int
-        func: Callable[[Callable[[int], None]], None]
-
-    TASKS: List[SyncTask] = [
-        {"name": "Cadastro Medicamentos", "weight": 5,  "func": lambda cb: _sync_medicamentos(engine, cb)},
-        {"name": "Localidades",           "weight": 2,  "func": lambda cb: _sync_localidades(engine, cb)},
-        {"name": "Rede Estabelecimentos", "weight": 3,  "func": lambda cb: _sync_rede(engine, cb)},
-        {"name": "Matriz de Risco",       "weight": 11, "func": lambda cb: _sync_matriz_risco(engine, cb)},
-        {"name": "Analise Clinica por Patologia", "weight": 2, "func": lambda cb: _sync_analise_gtin_inconsistencia_clinica(engine, cb)},
-        {"name": "Analise Clinica Municipal", "weight": 2, "func": lambda cb: _sync_analise_gtin_inconsistencia_clinica_municipio(engine, cb)},
-        {"name": "Analise Clinica Regiao", "weight": 2, "func": lambda cb: _sync_analise_gtin_inconsistencia_clinica_regiao(engine, cb)},
-        {"name": "Demografia IBGE",       "weight": 2,  "func": lambda cb: _sync_dados_ibge_demografia(engine, cb)},
-        {"name": "Volume Atipico Semestral", "weight": 5, "func": lambda cb: _sync_volume_atipico_semestral(engine, cb)},
-        {"name": "CRM Brasil Semestral",    "weight": 1,  "func": lambda cb: _sync_crm_prescricoes_brasil_semestre(engine, cb)},
-        {"name": "Dados Medico",            "weight": 1,  "func": lambda cb: _sync_dados_medico(engine, cb)},
-        {"name": "Geografico Origem UF",  "weight": 2,  "func": lambda cb: _sync_geografico_origem_uf(engine, cb)},
-        {"name": "Contexto eSocial",      "weight": 3,  "func": lambda cb: _sync_esocial(engine, cb)},
-        {"name": "Metadados das Bases",   "weight": 1,  "func": lambda cb: _sync_sentinela_metadados_base(engine, cb)},
-        {"name": "Falecidos",             "weight": 2,  "func": lambda cb: _sync_falecidos(engine, cb)},
-        {"name": "Indicadores PAR",       "weight": 1,  "func": lambda cb: _sync_dados_par(engine, cb)},
-        {"name": "Dados das Farmácias",   "weight": 5,  "func": lambda cb: _sync_dados_farmacia(engine, cb)},
-        {"name": "Perfil Estabelecimentos", "weight": 5, "func": lambda cb: _sync_perfil_estabelecimento(engine, cb)},
-        {"name": "Dados dos Sócios",      "weight": 5,  "func": lambda cb: _sync_dados_socios(engine, cb)},
-        {"name": "Participações e Representantes", "weight": 5, "func": lambda cb: _sync_teia_fonte_nivel2(engine, cb)},
-        {"name": "Sócios Indiretos (Expansão)", "weight": 4, "func": lambda cb: _sync_teia_fonte_nivel3(engine, cb)},
-        {"name": "Expansão Nacional (N4)",  "weight": 8, "func": lambda cb: _sync_teia_fonte_nivel4(engine, cb)},
-        {"name": "PAR na Teia dos Alvos",   "weight": 1,  "func": lambda cb: _sync_par_teia_alvos(engine, cb)},
-        {"name": "Movimentação (Vendas)", "weight": 42, "func": lambda cb: _sync_movimentacao(engine, cb)},
-        {"name": "CRM Geografico Global", "weight": 2, "func": lambda cb: _sync_geografico_global(engine, cb)},
-        {"name": "CRM Conc. Unico Global", "weight": 2, "func": lambda cb: _sync_crm_concentracao_unico_alertas_global(engine, cb)},
-        {"name": "CRM Conc. Multiplo Global", "weight": 2, "func": lambda cb: _sync_crm_concentracao_multiplo_alertas_global(engine, cb)},
-        {"name": "CRM Timeline Hora Global", "weight": 2, "func": lambda cb: _sync_crm_timeline_hora_global(engine, cb)},
-        {"name": "CRM Timeline Eventos Global", "weight": 2, "func": lambda cb: _sync_crm_timeline_eventos_global(engine, cb)},
-        {"name": "Movimentacao Mensal GTIN Global", "weight": 5, "func": lambda cb: _sync_movimentacao_mensal_gtin_global(engine, cb)},
+    from sync_scheduler import SyncScheduler, SyncTask, print_sync_report
+
+    crm_globais_deps = ("dados_medico",)
+    TASKS: list[SyncTask] = [
+        SyncTask("medicamentos", "Cadastro Medicamentos", 5, lambda cb: _sync_medicamentos(engine, cb)),
+        SyncTask("localidades", "Localidades", 2, lambda cb: _sync_localidades(engine, cb)),
+        SyncTask("rede", "Rede Estabelecimentos", 3, lambda cb: _sync_rede(engine, cb)),
+        SyncTask("matriz_risco", "Matriz de Risco", 11, lambda cb: _sync_matriz_risco(engine, cb)),
+        SyncTask("analise_gtin_inconsistencia_clinica", "Analise Clinica por Patologia", 2, lambda cb: _sync_analise_gtin_inconsistencia_clinica(engine, cb)),
+        SyncTask("analise_gtin_inconsistencia_clinica_municipio", "Analise Clinica Municipal", 2, lambda cb: _sync_analise_gtin_inconsistencia_clinica_municipio(engine, cb)),
+        SyncTask("analise_gtin_inconsistencia_clinica_regiao", "Analise Clinica Regiao", 2, lambda cb: _sync_analise_gtin_inconsistencia_clinica_regiao(engine, cb)),
+        SyncTask("dados_ibge_demografia", "Demografia IBGE", 2, lambda cb: _sync_dados_ibge_demografia(engine, cb)),
+        SyncTask("volume_atipico_semestral", "Volume Atipico Semestral", 5, lambda cb: _sync_volume_atipico_semestral(engine, cb)),
+        SyncTask("crm_prescricoes_brasil_semestre", "CRM Brasil Semestral", 1, lambda cb: _sync_crm_prescricoes_brasil_semestre(engine, cb)),
+        SyncTask("dados_medico", "Dados Medico", 1, lambda cb: _sync_dados_medico(engine, cb)),
+        SyncTask("geografico_origem_uf", "Geografico Origem UF", 2, lambda cb: _sync_geografico_origem_uf(engine, cb)),
+        SyncTask("esocial", "Contexto eSocial", 3, lambda cb: _sync_esocial(engine, cb)),
+        SyncTask("sentinela_metadados_base", "Metadados das Bases", 1, lambda cb: _sync_sentinela_metadados_base(engine, cb)),
+        SyncTask("falecidos", "Falecidos", 2, lambda cb: _sync_falecidos(engine, cb)),
+        SyncTask("dados_par", "Indicadores PAR", 1, lambda cb: _sync_dados_par(engine, cb)),
+        SyncTask("dados_farmacia", "Dados das Farmácias", 5, lambda cb: _sync_dados_farmacia(engine, cb)),
+        SyncTask("perfil_estabelecimento", "Perfil Estabelecimentos", 5, lambda cb: _sync_perfil_estabelecimento(engine, cb)),
+        SyncTask("dados_socios", "Dados dos Sócios", 5, lambda cb: _sync_dados_socios(engine, cb)),
+        SyncTask("teia_fonte_nivel2", "Participações e Representantes", 5, lambda cb: _sync_teia_fonte_nivel2(engine, cb)),
+        SyncTask("teia_fonte_nivel3", "Sócios Indiretos (Expansão)", 4, lambda cb: _sync_teia_fonte_nivel3(engine, cb)),
+        SyncTask("teia_fonte_nivel4", "Expansão Nacional (N4)", 8, lambda cb: _sync_teia_fonte_nivel4(engine, cb)),
+        SyncTask(
+            "par_teia_alvos", "PAR na Teia dos Alvos", 1,
+            lambda cb: _sync_par_teia_alvos(engine, cb),
+            depends_on=("dados_par", "dados_socios", "teia_fonte_nivel2", "teia_fonte_nivel3", "teia_fonte_nivel4"),
+        ),
+        SyncTask("movimentacao", "Movimentação (Vendas)", 42, lambda cb: _sync_movimentacao(engine, cb)),
+        SyncTask("geografico_global", "CRM Geografico Global", 2, lambda cb: _sync_geografico_global(engine, cb), depends_on=crm_globais_deps),
+        SyncTask("crm_concentracao_unico_alertas_global", "CRM Conc. Unico Global", 2, lambda cb: _sync_crm_concentracao_unico_alertas_global(engine, cb), depends_on=crm_globais_deps),
+        SyncTask("crm_concentracao_multiplo_alertas_global", "CRM Conc. Multiplo Global", 2, lambda cb: _sync_crm_concentracao_multiplo_alertas_global(engine, cb), depends_on=crm_globais_deps),
+        SyncTask("crm_timeline_hora_global", "CRM Timeline Hora Global", 2, lambda cb: _sync_crm_timeline_hora_global(engine, cb), depends_on=crm_globais_deps),
+        SyncTask("crm_timeline_eventos_global", "CRM Timeline Eventos Global", 2, lambda cb: _sync_crm_timeline_eventos_global(engine, cb), depends_on=crm_globais_deps),
+        SyncTask("movimentacao_mensal_gtin_global", "Movimentacao Mensal GTIN Global", 5, lambda cb: _sync_movimentacao_mensal_gtin_global(engine, cb)),
     ]
 
-    t0 = time.perf_counter()
-    acumulado_weight = 0
+    def update_global_progress(p_int: int) -> None:
+        global _cache_progress
+        _cache_progress = p_int
 
-    try:
-        for task in TASKS:
-            _cache_status = task["name"]
-            current_weight = task["weight"]
-            print(f"[*] {task['name']}...")
+    def update_global_status(running: list[str]) -> None:
+        global _cache_status
+        if running:
+            _cache_status = " | ".join(running)
 
-            def update_global_progress(p_int: int, _base=acumulado_weight, _w=current_weight):
-                global _cache_progress
-                _cache_progress = int(_base + (p_int / 100 * _w))
+    _cache_progress = 0
+    _cache_status = "syncing"
+    workers = _sync_worker_count(engine)
+    print(f"[INFO] Sincronizando {len(TASKS)} modulos com ate {workers} tarefa(s) simultanea(s)...")
 
-            task["func"](update_global_progress)
-            acumulado_weight += current_weight
+    try:
+        report = SyncScheduler(
+            TASKS,
+            max_workers=workers,
+            on_progress=update_global_progress,
+            on_status=update_global_status,
+        ).run()
 
         _cache_progress = 100
         _cache_status = "ready"
-        print(f"[OK] Sincronização concluída em {time.perf_counter() - t0:.1f}s")
+        print(f"[OK] Sincronização concluída em {report.total_s:.1f}s")
+        print_sync_report(report)
 
         _cache_generation += 1
+        schedule_watchlist_prefetch(engine, "refresh")
+        _schedule_teia_index_build("refresh")
 
     except Exception as e:
         _cache_status = "error"
@@ -4378,59 +4522,59 @@ def get_cache_generation() -> int:
     """Retorna a geracao dos dados globais carregados em memoria."""
     return _cache_generation
 
+def _global_df(name: str, df: pl.DataFrame | None, error_message: str) -> pl.DataFrame:
+    """Devolve o frame global em memoria ou, nos modos lazy/mmap, materializa-o."""
+    if df is not None:
+        return df
+    if name in _GLOBAL_FRAMES:
+        return _GLOBAL_FRAMES.get(name)
+    raise RuntimeError(error_message)
+
+
+def _is_global_df_available(name: str, df: pl.DataFrame | None) -> bool:
+    return df is not None or name in _GLOBAL_FRAMES
+
+
+def evict_global_frames(name: str | None = None) -> list[str]:
+    """Descarta da memoria frames globais sob demanda (modos lazy/mmap)."""
+    return _GLOBAL_FRAMES.evict(name)
+
+
 def get_df() -> pl.DataFrame:
-    if _df_movimentacao is None: 
-        raise RuntimeError("Cache de Movimentação não carregado. Verifique a sincronização.")
-    return _df_movimentacao
+    return _global_df("movimentacao", _df_movimentacao, "Cache de Movimentação não carregado. Verifique a sincronização.")
 
 def get_rede_df() -> pl.DataFrame:
-    if _df_rede is None:
-        raise RuntimeError("Cache de Rede de Estabelecimentos não carregado. Verifique a sincronização.")
-    return _df_rede
+    return _global_df("rede", _df_rede, "Cache de Rede de Estabelecimentos não carregado. Verifique a sincronização.")
 
 def get_localidades_df() -> pl.DataFrame:
-    if _df_localidades is None:
-        raise RuntimeError("Cache de Localidades não carregado. Verifique a sincronização.")
-    return _df_localidades
+    return _global_df("localidades", _df_localidades, "Cache de Localidades não carregado. Verifique a sincronização.")
 
 def get_df_matriz_risco() -> pl.DataFrame:
-    if _df_matriz_risco is None:
-        raise RuntimeError("Cache de Matriz de Risco não carregado. Execute uma sincronização.")
-    return _df_matriz_risco
+    return _global_df("matriz_risco", _df_matriz_risco, "Cache de Matriz de Risco não carregado. Execute uma sincronização.")
 
 
 def get_df_bench_crm_regiao() -> pl.DataFrame:
-    if _df_bench_crm_regiao is None:
-        raise RuntimeError("Cache de Benchmark CRM (Região) não carregado. Execute uma sincronização.")
-    return _df_bench_crm_regiao
+    return _global_df("bench_crm_regiao", _df_bench_crm_regiao, "Cache de Benchmark CRM (Região) não carregado. Execute uma sincronização.")
 
 def get_df_bench_crm_br() -> pl.DataFrame:
-    if _df_bench_crm_br is None:
-        raise RuntimeError("Cache de Benchmark CRM (Brasil) não carregado. Execute uma sincronização.")
-    return _df_bench_crm_br
+    return _global_df("bench_crm_br", _df_bench_crm_br, "Cache de Benchmark CRM (Brasil) não carregado. Execute uma sincronização.")
 
 def get_df_dados_farmacia() -> pl.DataFrame:
-    if _df_dados_farmacia is None:
-        raise RuntimeError("Cache de Dados das Farmácias não carregado. Execute uma sincronização.")
-    return _df_dados_farmacia
+    return _global_df("dados_farmacia", _df_dados_farmacia, "Cache de Dados das Farmácias não carregado. Execute uma sincronização.")
 
 def get_df_dados_farmacia_cnaes_secundarios() -> pl.DataFrame:
-    if _df_dados_farmacia_cnaes_secundarios is None:
-        raise RuntimeError(
-            "Cache de CNAEs secundarios das farmacias nao carregado. "
-            "Execute uma sincronizacao."
-        )
-    return _df_dados_farmacia_cnaes_secundarios
+    return _global_df(
+        "dados_farmacia_cnaes_secundarios",
+        _df_dados_farmacia_cnaes_secundarios,
+        "Cache de CNAEs secundarios das farmacias nao carregado. "
+        "Execute uma sincronizacao.",
+    )
 
 def get_df_perfil_estabelecimento() -> pl.DataFrame:
-    if _df_perfil_estabelecimento is None:
-        raise RuntimeError("Cache de Perfil dos Estabelecimentos nao carregado. Execute uma sincronizacao.")
-    return _df_perfil_estabelecimento
+    return _global_df("perfil_estabelecimento", _df_perfil_estabelecimento, "Cache de Perfil dos Estabelecimentos nao carregado. Execute uma sincronizacao.")
 
 def get_df_dados_socios() -> pl.DataFrame:
-    if _df_dados_socios is None:
-        raise RuntimeError("Cache de Dados dos Sócios não carregado. Execute uma sincronização.")
-    return _df_dados_socios
+    return _global_df("dados_socios", _df_dados_socios, "Cache de Dados dos Sócios não carregado. Execute uma sincronização.")
 
 def scan_teia_fonte_nivel2() -> pl.LazyFrame:
     return _scan_on_demand_global_parquet("teia_fonte_nivel2", _TEIA_FONTE_NIVEL2_PARQUET_PATH)
@@ -4453,8 +4597,27 @@ def scan_dados_medico() -> pl.LazyFrame:
     return _scan_on_demand_global_parquet("dados_medico", _DADOS_MEDICO_PARQUET_PATH)
 
 
+def read_on_demand_global_slice(name: str, value, columns: list[str] | None = None) -> pl.DataFrame:
+    """Linhas de um global agrupado (ver `_GLOBAL_CLUSTERED`) com a chave igual a `value`.
+
+    Usa o indice lateral quando ele corresponde ao Parquet atual; senao cai no
+    filtro por scan (ex.: cache gerado antes do agrupamento).
+    """
+    path = _global_cache_path(name)
+    key = _GLOBAL_CLUSTERED[name][0][0]
+    if name not in _ON_DEMAND_GLOBAL_CACHE_READY or not os.path.exists(path):
+        _mark_on_demand_global_cache_ready(name, path)
+    df = read_key_slice(path, key, value, columns)
+    if df is not None:
+        return df
+    lf = pl.scan_parquet(path).filter(pl.col(key) == value)
+    return (lf.select(columns) if columns else lf).collect()
+
+
 def get_medicamentos_df() -> pl.DataFrame:
     global _df_medicamentos
+    if _df_medicamentos is None and "medicamentos" in _GLOBAL_FRAMES:
+        return _GLOBAL_FRAMES.get("medicamentos")
     if _df_medicamentos is None:
         # Se não carregado, tentamos ler do parquet direto se existir
         if os.path.exists(_MEDICAMENTOS_PARQUET_PATH):
@@ -4486,14 +4649,10 @@ def scan_analise_gtin_inconsistencia_clinica_regiao() -> pl.LazyFrame:
 
 
 def get_df_dados_ibge_demografia() -> pl.DataFrame:
-    if _df_dados_ibge_demografia is None:
-        raise RuntimeError("Cache de Demografia IBGE nao carregado. Execute uma sincronizacao.")
-    return _df_dados_ibge_demografia
+    return _global_df("dados_ibge_demografia", _df_dados_ibge_demografia, "Cache de Demografia IBGE nao carregado. Execute uma sincronizacao.")
 
 def get_df_volume_atipico_semestral() -> pl.DataFrame:
-    if _df_volume_atipico_semestral is None:
-        raise RuntimeError("Cache de Volume Atipico Semestral nao carregado. Execute uma sincronizacao.")
-    return _df_volume_atipico_semestral
+    return _global_df("volume_atipico_semestral", _df_volume_atipico_semestral, "Cache de Volume Atipico Semestral nao carregado. Execute uma sincronizacao.")
 
 def scan_esocial_cnpj_ano() -> pl.LazyFrame:
     return _scan_on_demand_global_parquet("esocial_cnpj_ano", _ESOCIAL_CNPJ_ANO_PARQUET_PATH)
@@ -4572,24 +4731,16 @@ def scan_esocial_cnpj_ultima_movimentacao() -> pl.LazyFrame:
 
 
 def get_df_sentinela_metadados_base() -> pl.DataFrame:
-    if _df_sentinela_metadados_base is None:
-        raise RuntimeError("Cache de metadados das bases Sentinela nao carregado. Execute uma sincronizacao.")
-    return _df_sentinela_metadados_base
+    return _global_df("sentinela_metadados_base", _df_sentinela_metadados_base, "Cache de metadados das bases Sentinela nao carregado. Execute uma sincronizacao.")
 
 def get_df_falecidos() -> pl.DataFrame:
-    if _df_falecidos is None:
-        raise RuntimeError("Cache global de falecidos nao carregado. Execute uma sincronizacao.")
-    return _df_falecidos
+    return _global_df("falecidos", _df_falecidos, "Cache global de falecidos nao carregado. Execute uma sincronizacao.")
 
 def get_df_dados_par() -> pl.DataFrame:
-    if _df_dados_par is None:
-        raise RuntimeError("Cache de Indicadores PAR nao carregado. Execute uma sincronizacao.")
-    return _df_dados_par
+    return _global_df("dados_par", _df_dados_par, "Cache de Indicadores PAR nao carregado. Execute uma sincronizacao.")
 
 def get_df_par_teia_alvos() -> pl.DataFrame:
-    if _df_par_teia_alvos is None:
-        raise RuntimeError("Cache de PAR na Teia dos Alvos nao carregado. Execute uma sincronizacao.")
-    return _df_par_teia_alvos
+    return _global_df("par_teia_alvos", _df_par_teia_alvos, "Cache de PAR na Teia dos Alvos nao carregado. Execute uma sincronizacao.")
 
 
 def get_cache_status() -> dict:
@@ -4607,13 +4758,13 @@ def get_cache_status() -> dict:
         "movimentacao_mensal_gtin_global",
     }
     modules = {
-        "movimentacao":   {"label": "Movimentação Mensal",     "path": _PARQUET_PATH,             "loaded": _df_movimentacao is not None},
-        "localidades":    {"label": "Localidades (IBGE)",      "path": _LOCALIDADES_PARQUET_PATH, "loaded": _df_localidades is not None},
-        "rede":           {"label": "Rede de Estabelecimentos","path": _REDE_PARQUET_PATH,        "loaded": _df_rede is not None},
-        "matriz_risco":   {"label": "Matriz de Risco",         "path": _MATRIZ_PARQUET_PATH,      "loaded": _df_matriz_risco is not None},
-        "bench_crm_uf":    {"label": "Benchmark CRM (UF)",      "path": _BENCH_CRM_UF_PATH,        "loaded": _df_bench_crm_uf is not None},
-        "bench_crm_regiao":{"label": "Benchmark CRM (Região)", "path": _BENCH_CRM_REGIAO_PATH,    "loaded": _df_bench_crm_regiao is not None},
-        "bench_crm_br":    {"label": "Benchmark CRM (Brasil)", "path": _BENCH_CRM_BR_PATH,        "loaded": _df_bench_crm_br is not None},
+        "movimentacao":   {"label": "Movimentação Mensal",     "path": _PARQUET_PATH,             "loaded": _is_global_df_available("movimentacao", _df_movimentacao)},
+        "localidades":    {"label": "Localidades (IBGE)",      "path": _LOCALIDADES_PARQUET_PATH, "loaded": _is_global_df_available("localidades", _df_localidades)},
+        "rede":           {"label": "Rede de Estabelecimentos","path": _REDE_PARQUET_PATH,        "loaded": _is_global_df_available("rede", _df_rede)},
+        "matriz_risco":   {"label": "Matriz de Risco",         "path": _MATRIZ_PARQUET_PATH,      "loaded": _is_global_df_available("matriz_risco", _df_matriz_risco)},
+        "bench_crm_uf":    {"label": "Benchmark CRM (UF)",      "path": _BENCH_CRM_UF_PATH,        "loaded": _is_global_df_available("bench_crm_uf", _df_bench_crm_uf)},
+        "bench_crm_regiao":{"label": "Benchmark CRM (Região)", "path": _BENCH_CRM_REGIAO_PATH,    "loaded": _is_global_df_available("bench_crm_regiao", _df_bench_crm_regiao)},
+        "bench_crm_br":    {"label": "Benchmark CRM (Brasil)", "path": _BENCH_CRM_BR_PATH,        "loaded": _is_global_df_available("bench_crm_br", _df_bench_crm_br)},
         "crm_prescricoes_brasil_semestre": {"label": "CRM Brasil Semestral", "path": _CRM_PRESCRICOES_BRASIL_SEMESTRE_PATH, "loaded": _is_on_demand_global_cache_ready("crm_prescricoes_brasil_semestre", _CRM_PRESCRICOES_BRASIL_SEMESTRE_PATH)},
         "dados_medico": {"label": "Dados Medico", "path": _DADOS_MEDICO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("dados_medico", _DADOS_MEDICO_PARQUET_PATH)},
         "crm_prescritores_global": {"label": "CRM Prescritores Global", "path": _CRM_PRESCRITORES_GLOBAL_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("crm_prescritores_global", _CRM_PRESCRITORES_GLOBAL_PARQUET_PATH)},
@@ -4634,32 +4785,35 @@ def get_cache_status() -> dict:
         "crm_timeline_hora_global": {"label": "CRM Timeline Hora Global", "path": _CRM_TIMELINE_HORA_GLOBAL_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("crm_timeline_hora_global", _CRM_TIMELINE_HORA_GLOBAL_PARQUET_PATH)},
         "crm_timeline_eventos_global": {"label": "CRM Timeline Eventos Global", "path": _CRM_TIMELINE_EVENTOS_GLOBAL_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("crm_timeline_eventos_global", _CRM_TIMELINE_EVENTOS_GLOBAL_PARQUET_PATH)},
         "movimentacao_mensal_gtin_global": {"label": "GTIN Mensal Global", "path": _MOVIMENTACAO_MENSAL_GTIN_GLOBAL_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("movimentacao_mensal_gtin_global", _MOVIMENTACAO_MENSAL_GTIN_GLOBAL_PARQUET_PATH)},
-        "dados_farmacia": {"label": "Dados das Farmácias",     "path": _DADOS_FARMACIA_PARQUET_PATH,  "loaded": _df_dados_farmacia is not None},
+        "dados_farmacia": {"label": "Dados das Farmácias",     "path": _DADOS_FARMACIA_PARQUET_PATH,  "loaded": _is_global_df_available("dados_farmacia", _df_dados_farmacia)},
         "dados_farmacia_cnaes_secundarios": {
             "label": "CNAEs Secundarios das Farmacias",
             "path": _DADOS_FARMACIA_CNAES_SECUNDARIOS_PARQUET_PATH,
-            "loaded": _df_dados_farmacia_cnaes_secundarios is not None,
+            "loaded": _is_global_df_available(
+                "dados_farmacia_cnaes_secundarios",
+                _df_dados_farmacia_cnaes_secundarios,
+            ),
         },
-        "perfil_estabelecimento": {"label": "Perfil Estabelecimentos", "path": _PERFIL_ESTABELECIMENTO_PARQUET_PATH, "loaded": _df_perfil_estabelecimento is not None},
-        "dados_socios":   {"label": "Dados dos Sócios",        "path": _DADOS_SOCIOS_PARQUET_PATH,    "loaded": _df_dados_socios is not None},
+        "perfil_estabelecimento": {"label": "Perfil Estabelecimentos", "path": _PERFIL_ESTABELECIMENTO_PARQUET_PATH, "loaded": _is_global_df_available("perfil_estabelecimento", _df_perfil_estabelecimento)},
+        "dados_socios":   {"label": "Dados dos Sócios",        "path": _DADOS_SOCIOS_PARQUET_PATH,    "loaded": _is_global_df_available("dados_socios", _df_dados_socios)},
         "teia_fonte_nivel2":{"label": "Participações Externas",  "path": _TEIA_FONTE_NIVEL2_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("teia_fonte_nivel2", _TEIA_FONTE_NIVEL2_PARQUET_PATH)},
         "teia_fonte_nivel3":{"label": "Sócios Indiretos",        "path": _TEIA_FONTE_NIVEL3_PARQUET_PATH,   "loaded": _is_on_demand_global_cache_ready("teia_fonte_nivel3", _TEIA_FONTE_NIVEL3_PARQUET_PATH)},
         "teia_fonte_nivel4":{"label": "Expansão Nacional (N4)",  "path": _TEIA_FONTE_NIVEL4_PARQUET_PATH,   "loaded": _is_on_demand_global_cache_ready("teia_fonte_nivel4", _TEIA_FONTE_NIVEL4_PARQUET_PATH)},
-        "medicamentos":   {"label": "Cadastro Medicamentos",   "path": _MEDICAMENTOS_PARQUET_PATH,    "loaded": _df_medicamentos is not None},
+        "medicamentos":   {"label": "Cadastro Medicamentos",   "path": _MEDICAMENTOS_PARQUET_PATH,    "loaded": _is_global_df_available("medicamentos", _df_medicamentos)},
         "analise_gtin_inconsistencia_clinica": {"label": "Analise Clinica por Patologia", "path": _ANALISE_GTIN_INCONSISTENCIA_CLINICA_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("analise_gtin_inconsistencia_clinica", _ANALISE_GTIN_INCONSISTENCIA_CLINICA_PARQUET_PATH)},
         "analise_gtin_inconsistencia_clinica_municipio": {"label": "Analise Clinica Municipal", "path": _ANALISE_GTIN_INCONSISTENCIA_CLINICA_MUNICIPIO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("analise_gtin_inconsistencia_clinica_municipio", _ANALISE_GTIN_INCONSISTENCIA_CLINICA_MUNICIPIO_PARQUET_PATH)},
         "analise_gtin_inconsistencia_clinica_regiao": {"label": "Analise Clinica Regiao", "path": _ANALISE_GTIN_INCONSISTENCIA_CLINICA_REGIAO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("analise_gtin_inconsistencia_clinica_regiao", _ANALISE_GTIN_INCONSISTENCIA_CLINICA_REGIAO_PARQUET_PATH)},
-        "dados_ibge_demografia": {"label": "Demografia IBGE", "path": _DADOS_IBGE_DEMOGRAFIA_PARQUET_PATH, "loaded": _df_dados_ibge_demografia is not None},
-        "volume_atipico_semestral": {"label": "Volume Atipico Semestral", "path": _VOLUME_ATIPICO_SEMESTRAL_PARQUET_PATH, "loaded": _df_volume_atipico_semestral is not None},
+        "dados_ibge_demografia": {"label": "Demografia IBGE", "path": _DADOS_IBGE_DEMOGRAFIA_PARQUET_PATH, "loaded": _is_global_df_available("dados_ibge_demografia", _df_dados_ibge_demografia)},
+        "volume_atipico_semestral": {"label": "Volume Atipico Semestral", "path": _VOLUME_ATIPICO_SEMESTRAL_PARQUET_PATH, "loaded": _is_global_df_available("volume_atipico_semestral", _df_volume_atipico_semestral)},
         "geografico_origem_uf": {"label": "Geografico Origem UF", "path": _GEOGRAFICO_ORIGEM_UF_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("geografico_origem_uf", _GEOGRAFICO_ORIGEM_UF_PARQUET_PATH)},
         "esocial_cnpj_ano": {"label": "eSocial CNPJ/Ano", "path": _ESOCIAL_CNPJ_ANO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("esocial_cnpj_ano", _ESOCIAL_CNPJ_ANO_PARQUET_PATH)},
         "esocial_cnpj_trabalhador_ano": {"label": "eSocial Trabalhador/Ano", "path": _ESOCIAL_CNPJ_TRABALHADOR_ANO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("esocial_cnpj_trabalhador_ano", _ESOCIAL_CNPJ_TRABALHADOR_ANO_PARQUET_PATH)},
         "esocial_cnpj_movimentacao_ano": {"label": "eSocial Movimentacao/Ano", "path": _ESOCIAL_CNPJ_MOVIMENTACAO_ANO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("esocial_cnpj_movimentacao_ano", _ESOCIAL_CNPJ_MOVIMENTACAO_ANO_PARQUET_PATH)},
         "esocial_cnpj_ultima_movimentacao": {"label": "eSocial Ultima Movimentacao", "path": _ESOCIAL_CNPJ_ULTIMA_MOVIMENTACAO_PARQUET_PATH, "loaded": _is_on_demand_global_cache_ready("esocial_cnpj_ultima_movimentacao", _ESOCIAL_CNPJ_ULTIMA_MOVIMENTACAO_PARQUET_PATH)},
-        "sentinela_metadados_base": {"label": "Metadados das Bases", "path": _SENTINELA_METADADOS_BASE_PARQUET_PATH, "loaded": _df_sentinela_metadados_base is not None},
-        "falecidos": {"label": "Falecidos", "path": _FALECIDOS_PARQUET_PATH, "loaded": _df_falecidos is not None},
-        "dados_par":      {"label": "Indicadores PAR",          "path": _DADOS_PAR_PARQUET_PATH,       "loaded": _df_dados_par is not None},
-        "par_teia_alvos": {"label": "PAR na Teia dos Alvos",     "path": _PAR_TEIA_ALVOS_PARQUET_PATH,  "loaded": _df_par_teia_alvos is not None},
+        "sentinela_metadados_base": {"label": "Metadados das Bases", "path": _SENTINELA_METADADOS_BASE_PARQUET_PATH, "loaded": _is_global_df_available("sentinela_metadados_base", _df_sentinela_metadados_base)},
+        "falecidos": {"label": "Falecidos", "path": _FALECIDOS_PARQUET_PATH, "loaded": _is_global_df_available("falecidos", _df_falecidos)},
+        "dados_par":      {"label": "Indicadores PAR",          "path": _DADOS_PAR_PARQUET_PATH,       "loaded": _is_global_df_available("dados_par", _df_dados_par)},
+        "par_teia_alvos": {"label": "PAR na Teia dos Alvos",     "path": _PAR_TEIA_ALVOS_PARQUET_PATH,  "loaded": _is_global_df_available("par_teia_alvos", _df_par_teia_alvos)},
     }
     modules_status = {}
     for key, v in modules.items():
@@ -4695,4 +4849,19 @@ def get_cache_status() -> dict:
         "modules_summary_label": f"{loaded_required_modules}/{total_required_modules} modulos obrigatorios carregados",
         "error_message": _cache_error_message if _cache_status == "error" else "",
         "modules": modules_status,
+        "memory": _get_memory_status(),
+        "prefetch": get_prefetch_status(),
+    }
+
+
+def _get_memory_status() -> dict:
+    """Tempo de boot, RSS e frames sob demanda para o `/cache/status`."""
+    rss_mb = current_rss_mb()
+    frames = _GLOBAL_FRAMES.status()
+    return {
+        **_boot_stats,
+        "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        "materialized_frames": sum(1 for frame in frames.values() if frame["materialized"]),
+        "materialized_mb": round(sum(frame["size_mb"] for frame in frames.values()), 1),
+        "frames": frames,
     }
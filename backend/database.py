@@ -18,10 +18,13 @@ params = (
 DATABASE_URL = f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(params)}"
 
 # Engine com Pool de Conexões para suportar múltiplos usuários simultâneos no BI/Web
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
 engine = create_engine(
     DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
     pool_recycle=3600,
     echo=False  # Mude para True se quiser ver os SQLs reais no console (útil para debug)
 )
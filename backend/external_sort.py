@@ -0,0 +1,239 @@
+"""Ordenacao externa (fora da RAM) para gravar modulos globais grandes.
+
+Os syncs globais acumulavam todos os lotes em memoria para um
+`pl.concat(...).sort(...)` final, com pico de 2-3x o tamanho da tabela. O
+`SortedParquetWriter` ordena cada bloco de ate `run_rows` linhas ou `run_mb`
+MB (o que vier primeiro) e o despeja em disco (um "run"); no `close()` os
+runs sao intercalados (k-way merge) em blocos pequenos direto no Parquet
+final. O pico fica em torno de um run mais um bloco por run, independente do
+tamanho da tabela. O limite em MB vale para tabelas de linhas largas (ex.:
+payload JSON por CNPJ), em que `run_rows` linhas nao cabem na RAM; os blocos
+do merge tambem sao reduzidos para que a soma deles caiba em `run_mb`.
+"""
+
+import os
+import shutil
+import tempfile
+
+import polars as pl
+
+from sql_extract import ParquetBatchWriter
+
+
+DEFAULT_RUN_ROWS = 1_000_000
+DEFAULT_RUN_MB = 256
+# Piso do bloco de merge quando reduzido pelo orcamento em MB.
+_MIN_BLOCK_ROWS = 64
+DEFAULT_BLOCK_ROWS = 65_536
+# Row groups menores que o default do Polars deixam as estatisticas min/max de
+# `id_cnpj` estreitas o bastante para o `scan_parquet` pular a maior parte do
+# arquivo em filtros por estabelecimento.
+DEFAULT_ROW_GROUP_SIZE = 131_072
+
+_RUN_COL = "__run"
+_BOUND_COL = "__bound"
+
+
+class _RunCursor:
+    """Le um run ordenado bloco a bloco."""
+
+    def __init__(self, path: str, block_rows: int):
+        self.path = path
+        self.block_rows = block_rows
+        self.total = pl.scan_parquet(path).select(pl.len()).collect().item()
+        self.offset = 0
+        self.block: pl.DataFrame | None = None
+        self._load()
+
+    def _load(self) -> None:
+        if self.offset >= self.total:
+            self.block = None
+            return
+        self.block = pl.scan_parquet(self.path).slice(self.offset, self.block_rows).collect()
+        self.offset += self.block.height
+
+    def consume(self, n: int) -> None:
+        self.block = self.block.slice(n)
+        if self.block.height == 0:
+            self._load()
+
+
+class SortedParquetWriter:
+    """Recebe lotes em qualquer ordem e grava um Parquet ordenado por `sort_by`.
+
+    O arquivo e montado em `path + ".tmp"` e so substitui `path` quando o
+    `close()` termina; usado como context manager, um erro dentro do bloco
+    descarta tudo e preserva o Parquet anterior. A ordem dos nulos segue o `sort` padrao do Polars (nulos
+    primeiro); como no `sort` sem `maintain_order`, a ordem entre linhas de
+    chave igual nao e garantida.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sort_by: list[str],
+        run_rows: int = DEFAULT_RUN_ROWS,
+        block_rows: int = DEFAULT_BLOCK_ROWS,
+        run_mb: float | None = DEFAULT_RUN_MB,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = "zstd",
+    ):
+        self.path = path
+        self.sort_by = list(sort_by)
+        self.run_rows = run_rows
+        self.block_rows = block_rows
+        self.run_bytes = int(run_mb * 1024 * 1024) if run_mb else None
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows = 0
+        self.schema: dict | None = None
+        self._buffer: list[pl.DataFrame] = []
+        self._buffered = 0
+        self._buffered_bytes = 0
+        self._row_bytes = 0.0
+        self._runs: list[str] = []
+        self._runs_dir: str | None = None
+
+    def __enter__(self) -> "SortedParquetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, df: pl.DataFrame) -> None:
+        if self.schema is None:
+            self.schema = {
+                col: (pl.Utf8 if dtype == pl.Null else dtype)
+                for col, dtype in df.schema.items()
+            }
+        if dict(df.schema) != self.schema:
+            df = df.select([pl.col(col).cast(dtype) for col, dtype in self.schema.items()])
+        self.rows += df.height
+        if df.height == 0:
+            return
+        self._buffer.append(df)
+        self._buffered += df.height
+        self._buffered_bytes += df.estimated_size()
+        if self._buffered >= self.run_rows or (
+            self.run_bytes is not None and self._buffered_bytes >= self.run_bytes
+        ):
+            self._spill()
+
+    def _spill(self) -> None:
+        if not self._buffer:
+            return
+        if self._runs_dir is None:
+            self._runs_dir = tempfile.mkdtemp(
+                prefix=".runs_", dir=os.path.dirname(os.path.abspath(self.path))
+            )
+        run = pl.concat(self._buffer).sort(self.sort_by)
+        self._row_bytes = max(self._row_bytes, self._buffered_bytes / max(self._buffered, 1))
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_bytes = 0
+        run_path = os.path.join(self._runs_dir, f"{len(self._runs):06d}.smod")
+        # Row groups do tamanho do bloco: o merge le cada run por fatias alinhadas.
+        run.write_parquet(run_path, compression="lz4", row_group_size=self._merge_block_rows())
+        self._runs.append(run_path)
+
+    def _merge_block_rows(self) -> int:
+        """Linhas por bloco no merge: `block_rows`, reduzido para linhas largas.
+
+        Os blocos de todos os runs ficam em memoria ao mesmo tempo; com o
+        orcamento em MB, cada um recebe uma fatia dele (supondo ate 16 runs).
+        """
+        if self.run_bytes is None or not self._row_bytes:
+            return self.block_rows
+        by_bytes = int(self.run_bytes / 16 / self._row_bytes)
+        return max(_MIN_BLOCK_ROWS, min(self.block_rows, by_bytes))
+
+    def close(self) -> None:
+        tmp_path = self.path + ".tmp"
+        writer = ParquetBatchWriter(tmp_path, self.compression, self.row_group_size)
+        try:
+            if not self._runs:
+                # Tudo coube em um run: ordena em memoria e grava direto.
+                if self._buffer:
+                    writer.write(pl.concat(self._buffer).sort(self.sort_by))
+                elif self.schema is not None:
+                    writer.write(pl.DataFrame(schema=self.schema))
+                self._buffer = []
+                self._buffered = 0
+                self._buffered_bytes = 0
+            else:
+                self._spill()
+                self._merge_runs(writer)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            self._discard_runs()
+        os.replace(tmp_path, self.path)
+
+    def _merge_runs(self, writer: ParquetBatchWriter) -> None:
+        block_rows = self._merge_block_rows()
+        cursors = [_RunCursor(path, block_rows) for path in self._runs]
+        while True:
+            active = [(i, cursor) for i, cursor in enumerate(cursors) if cursor.block is not None]
+            if not active:
+                break
+            if len(active) == 1:
+                _, cursor = active[0]
+                while cursor.block is not None:
+                    writer.write(cursor.block)
+                    cursor.consume(cursor.block.height)
+                break
+
+            # Limite seguro: a menor entre as ultimas chaves dos blocos atuais.
+            # Tudo que for <= a ele pode ser emitido, pois nenhum run tem
+            # linha menor ainda nao lida.
+            last_keys = pl.concat([cursor.block.select(self.sort_by).tail(1) for _, cursor in active])
+            bound = last_keys.sort(self.sort_by).head(1)
+
+            merged = pl.concat(
+                [
+                    cursor.block.with_columns(
+                        pl.lit(i, dtype=pl.Int32).alias(_RUN_COL),
+                        pl.lit(False).alias(_BOUND_COL),
+                    )
+                    for i, cursor in active
+                ]
+                + [
+                    bound.with_columns(
+                        [pl.lit(None, dtype=dtype).alias(col)
+                         for col, dtype in self.schema.items() if col not in self.sort_by]
+                    )
+                    .select(list(self.schema))
+                    .with_columns(
+                        pl.lit(-1, dtype=pl.Int32).alias(_RUN_COL),
+                        pl.lit(True).alias(_BOUND_COL),
+                    )
+                ]
+            ).sort(self.sort_by + [_BOUND_COL], maintain_order=True)
+
+            cut = merged[_BOUND_COL].arg_max()
+            emitted = merged.slice(0, cut)
+            writer.write(emitted.drop(_RUN_COL, _BOUND_COL))
+
+            consumed = emitted.group_by(_RUN_COL).len()
+            for run_idx, count in consumed.iter_rows():
+                cursors[run_idx].consume(count)
+
+    def abort(self) -> None:
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_bytes = 0
+        self._discard_runs()
+        tmp_path = self.path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def _discard_runs(self) -> None:
+        if self._runs_dir is not None:
+            shutil.rmtree(self._runs_dir, ignore_errors=True)
+            self._runs_dir = None
+            self._runs = []
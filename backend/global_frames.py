@@ -0,0 +1,218 @@
+"""DataFrames globais materializados sob demanda.
+
+No modo padrao (`eager`) o `load_cache` le todos os Parquets globais no boot.
+Com `SENTINELA_GLOBAL_FRAMES=lazy` o boot so valida o schema e registra cada
+modulo aqui; o Parquet e lido no primeiro `get_df_*` que precisar dele. Com
+`SENTINELA_GLOBAL_FRAMES=mmap` o primeiro uso converte o Parquet (em
+streaming) para um Arrow IPC sem compressao ao lado do cache, que o Polars
+abre mapeado em memoria: as paginas passam a ser do page cache do sistema,
+que pode descarta-las sob pressao de memoria sem custo para o processo.
+
+Com `SENTINELA_GLOBAL_FRAMES_BUDGET_MB`, frames materializados alem do
+orcamento sao descartados (LRU) e relidos no proximo uso.
+"""
+
+import glob
+import os
+import sys
+import threading
+import time
+
+import polars as pl
+
+
+MODE_EAGER = "eager"
+MODE_LAZY = "lazy"
+MODE_MMAP = "mmap"
+_MODES = {MODE_EAGER, MODE_LAZY, MODE_MMAP}
+
+
+def global_frames_mode() -> str:
+    value = (os.getenv("SENTINELA_GLOBAL_FRAMES") or MODE_EAGER).strip().lower()
+    if value not in _MODES:
+        print(f"[AVISO] SENTINELA_GLOBAL_FRAMES invalido ({value!r}); usando {MODE_EAGER}.")
+        return MODE_EAGER
+    return value
+
+
+def global_frames_budget_mb() -> float | None:
+    value = os.getenv("SENTINELA_GLOBAL_FRAMES_BUDGET_MB")
+    if value is None or not value.strip():
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        print(f"[AVISO] SENTINELA_GLOBAL_FRAMES_BUDGET_MB invalido ({value!r}); sem limite.")
+        return None
+    return budget if budget > 0 else None
+
+
+def current_rss_mb() -> float | None:
+    """RSS atual do processo em MB (None se a plataforma nao expuser)."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Sem RSS atual disponivel: usa o pico (Linux em KB, macOS em bytes).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _ipc_path(path: str, signature: tuple[int, int]) -> str:
+    ipc_dir = os.path.join(os.path.dirname(path), ".ipc")
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(ipc_dir, f"{base}.{signature[0]}.arrow")
+
+
+def _ensure_ipc(path: str, signature: tuple[int, int]) -> str:
+    ipc_path = _ipc_path(path, signature)
+    if os.path.exists(ipc_path):
+        return ipc_path
+    os.makedirs(os.path.dirname(ipc_path), exist_ok=True)
+    tmp_path = ipc_path + ".tmp"
+    pl.scan_parquet(path).sink_ipc(tmp_path, compression="uncompressed")
+    os.replace(tmp_path, ipc_path)
+    # Versoes antigas podem continuar mapeadas por outro frame (Windows nao
+    # remove arquivo aberto); ficam para a proxima limpeza.
+    base = os.path.splitext(os.path.basename(path))[0]
+    for old in glob.glob(os.path.join(os.path.dirname(ipc_path), f"{base}.*.arrow")):
+        if old != ipc_path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return ipc_path
+
+
+class LazyGlobalFrame:
+    """Um Parquet global lido no primeiro uso e relido se o arquivo mudar."""
+
+    def __init__(self, name: str, path: str, memory_map: bool = False):
+        self.name = name
+        self.path = path
+        self.memory_map = memory_map
+        self.loads = 0
+        self.evictions = 0
+        self.last_used = 0.0
+        self.load_time_ms: float | None = None
+        self._df: pl.DataFrame | None = None
+        self._signature: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def materialized(self) -> bool:
+        return self._df is not None
+
+    def size_mb(self) -> float:
+        df = self._df
+        return df.estimated_size("mb") if df is not None else 0.0
+
+    def get(self) -> pl.DataFrame:
+        with self._lock:
+            signature = _file_signature(self.path)
+            if self._df is None or signature != self._signature:
+                t0 = time.perf_counter()
+                if self.memory_map:
+                    # IPC local sem compressao e lido pelo Polars via mmap.
+                    self._df = pl.read_ipc(_ensure_ipc(self.path, signature))
+                else:
+                    self._df = pl.read_parquet(self.path)
+                self._signature = signature
+                self.loads += 1
+                self.load_time_ms = round((time.perf_counter() - t0) * 1000, 1)
+                print(f"[ CACHE ] GLOBAL - {self.name} - materializado em {self.load_time_ms} ms.")
+            self.last_used = time.monotonic()
+            return self._df
+
+    def evict(self) -> bool:
+        with self._lock:
+            if self._df is None:
+                return False
+            self._df = None
+            self.evictions += 1
+            return True
+
+    def status(self) -> dict:
+        return {
+            "materialized": self.materialized,
+            "memory_mapped": self.memory_map,
+            "size_mb": round(self.size_mb(), 1),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "last_load_ms": self.load_time_ms,
+        }
+
+
+class GlobalFrameRegistry:
+    """Conjunto de frames sob demanda com orcamento de memoria LRU."""
+
+    def __init__(self):
+        self._frames: dict[str, LazyGlobalFrame] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path: str, memory_map: bool = False) -> None:
+        with self._lock:
+            self._frames[name] = LazyGlobalFrame(name, path, memory_map)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._frames
+
+    def get(self, name: str) -> pl.DataFrame:
+        frame = self._frames[name]
+        df = frame.get()
+        self._enforce_budget(keep=name)
+        return df
+
+    def evict(self, name: str | None = None) -> list[str]:
+        """Descarta um frame (ou todos) da memoria; retorna os nomes descartados."""
+        with self._lock:
+            if name is None:
+                frames = list(self._frames.values())
+            else:
+                frames = [self._frames[name]] if name in self._frames else []
+        return [frame.name for frame in frames if frame.evict()]
+
+    def _enforce_budget(self, keep: str) -> None:
+        budget = global_frames_budget_mb()
+        if budget is None:
+            return
+        with self._lock:
+            frames = sorted(
+                (frame for frame in self._frames.values() if frame.materialized),
+                key=lambda frame: frame.last_used,
+            )
+        total = sum(frame.size_mb() for frame in frames)
+        for frame in frames:
+            if total <= budget:
+                break
+            if frame.name == keep:
+                continue
+            size = frame.size_mb()
+            if frame.evict():
+                total -= size
+                print(f"[ CACHE ] GLOBAL - {frame.name} - descartado da memoria ({size:.0f} MB, orcamento {budget:.0f} MB).")
+
+    def status(self) -> dict[str, dict]:
+        with self._lock:
+            frames = list(self._frames.values())
+        return {frame.name: frame.status() for frame in frames}
@@ -4,6 +4,9 @@ import mimetypes
 mimetypes.add_type('application/javascript', '.js')
 mimetypes.add_type('text/css', '.css')
 
+# Fixa o pool de threads do Polars antes de qualquer import que o carregue.
+import thread_budget  # noqa: F401
+
 import asyncio
 import json
 import pathlib
@@ -16,6 +19,9 @@ from api.router import api_router
 from fastapi.middleware.cors import CORSMiddleware
 from data_cache import load_cache
 from request_logging import configure_request_timing_logger
+from conditional_get import configure_conditional_get
+from request_pools import configure_request_pools
+from response_compression import ResponseCompressionMiddleware, compression_enabled
 from api.services.system_update import initialize_update_check, check_for_updates
 
 
@@ -63,6 +69,16 @@ origins = [
     "*"
 ]
 
+# Classes de execucao leve/pesada/documento (mais interno: 304 do ETag nao entra na fila).
+configure_request_pools(app)
+
+# ETag / 304 das rotas analiticas (registrado antes do CORS para ficar dentro dele).
+configure_conditional_get(app)
+
+# Compressao gzip/zstd/br (fora do ETag, para sufixar a ETag da representacao comprimida).
+if compression_enabled():
+    app.add_middleware(ResponseCompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -0,0 +1,174 @@
+"""Parquets globais agrupados por chave, com indice lateral chave -> linhas.
+
+Os derivados por CNPJ (CRM, GTIN mensal, memoria de calculo) fazem
+`scan_*_global().filter(pl.col("id_cnpj") == id)`. Se o arquivo nao estiver
+agrupado pela chave, cada filtro percorre o Parquet inteiro. Aqui o global e
+regravado ordenado pela chave (`SortedParquetWriter`), em row groups pequenos,
+e ganha um indice lateral (`<arquivo>.idx`) com a primeira linha e a
+quantidade de linhas de cada valor da chave. A leitura de um CNPJ vira a
+leitura de um ou dois row groups.
+
+O indice guarda o tamanho e o mtime do Parquet de origem; se o arquivo for
+substituido sem regenerar o indice, `read_key_slice` devolve None e o chamador
+volta ao filtro por scan.
+"""
+
+from bisect import bisect_right
+import os
+import threading
+import time
+
+import polars as pl
+
+from external_sort import SortedParquetWriter
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow e opcional
+    pq = None
+
+
+CLUSTER_ROW_GROUP_SIZE = 16_384
+INDEX_SUFFIX = ".idx"
+
+_OFFSET_COL = "row_offset"
+_ROWS_COL = "rows"
+_META_KEY = "sentinela_key"
+_META_SIGNATURE = "sentinela_source_signature"
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def _signature(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def write_clustered_parquet(
+    source: pl.LazyFrame,
+    path: str,
+    sort_by: list[str],
+    row_group_size: int = CLUSTER_ROW_GROUP_SIZE,
+    chunk_size: int = 250_000,
+) -> int:
+    """Grava `source` em `path` ordenado por `sort_by` e indexa por `sort_by[0]`.
+
+    A escrita e atomica (ver `SortedParquetWriter`) e o pico de memoria nao
+    depende do tamanho de `source`. Retorna o numero de linhas gravadas.
+    """
+    with SortedParquetWriter(path, sort_by, row_group_size=row_group_size) as writer:
+        for batch in source.collect_batches(chunk_size=chunk_size):
+            writer.write(batch)
+        if writer.schema is None:
+            writer.write(pl.DataFrame(schema=source.collect_schema()))
+    write_key_index(path, sort_by[0])
+    return writer.rows
+
+
+def write_key_index(path: str, key: str) -> pl.DataFrame:
+    """Gera o indice lateral de um Parquet ja ordenado por `key`."""
+    index = (
+        pl.scan_parquet(path)
+        .select(key)
+        .with_row_index(_OFFSET_COL)
+        .group_by(key)
+        .agg(pl.col(_OFFSET_COL).min(), pl.len().alias(_ROWS_COL))
+        .sort(_OFFSET_COL)
+        .collect(engine="streaming")
+    )
+    tmp_path = index_path(path) + ".tmp"
+    index.write_parquet(
+        tmp_path,
+        metadata={_META_KEY: key, _META_SIGNATURE: _signature(path)},
+    )
+    os.replace(tmp_path, index_path(path))
+    return index
+
+
+class _KeyIndex:
+    def __init__(self, path: str, signature: str, key: str, index: pl.DataFrame):
+        self.path = path
+        self.signature = signature
+        self.key = key
+        self.ranges = dict(
+            zip(
+                index[key].to_list(),
+                zip(index[_OFFSET_COL].to_list(), index[_ROWS_COL].to_list()),
+            )
+        )
+        self.schema = pl.read_parquet_schema(path)
+        self.metadata = None
+        self.row_group_starts: list[int] = []
+        if pq is not None:
+            # O footer e lido uma vez; cada leitura so abre o arquivo e busca
+            # os row groups necessarios.
+            self.metadata = pq.read_metadata(path)
+            start = 0
+            for i in range(self.metadata.num_row_groups):
+                self.row_group_starts.append(start)
+                start += self.metadata.row_group(i).num_rows
+
+    def read(self, offset: int, rows: int, columns: list[str] | None) -> pl.DataFrame:
+        if self.metadata is None:
+            lf = pl.scan_parquet(self.path)
+            if columns:
+                lf = lf.select(columns)
+            return lf.slice(offset, rows).collect()
+        first = bisect_right(self.row_group_starts, offset) - 1
+        last = bisect_right(self.row_group_starts, offset + rows - 1) - 1
+        with pq.ParquetFile(self.path, metadata=self.metadata) as parquet_file:
+            table = parquet_file.read_row_groups(range(first, last + 1), columns=columns)
+        df = pl.from_arrow(table).slice(offset - self.row_group_starts[first], rows)
+        # pyarrow nao preserva alguns tipos do Polars (ex.: Categorical).
+        return df.cast({col: self.schema[col] for col in df.columns if df.schema[col] != self.schema[col]})
+
+
+_INDEXES: dict[str, _KeyIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _load_index(path: str, key: str) -> _KeyIndex | None:
+    idx_path = index_path(path)
+    if not os.path.exists(path) or not os.path.exists(idx_path):
+        return None
+    signature = _signature(path)
+    cached = _INDEXES.get(path)
+    if cached is not None and cached.signature == signature and cached.key == key:
+        return cached
+    with _INDEXES_LOCK:
+        cached = _INDEXES.get(path)
+        if cached is not None and cached.signature == signature and cached.key == key:
+            return cached
+        try:
+            metadata = pl.read_parquet_metadata(idx_path)
+            if metadata.get(_META_KEY) != key or metadata.get(_META_SIGNATURE) != signature:
+                return None
+            t0 = time.perf_counter()
+            loaded = _KeyIndex(path, signature, key, pl.read_parquet(idx_path))
+        except Exception as exc:
+            print(f"[ CACHE ] {os.path.basename(idx_path)} - [AVISO] indice ignorado ({exc})")
+            return None
+        print(
+            f"[ CACHE ] {os.path.basename(idx_path)} - indice carregado "
+            f"({len(loaded.ranges):,} chaves, {(time.perf_counter() - t0) * 1000:.0f} ms)."
+        )
+        _INDEXES[path] = loaded
+        return loaded
+
+
+def read_key_slice(path: str, key: str, value, columns: list[str] | None = None) -> pl.DataFrame | None:
+    """Le as linhas de `path` com `key == value` usando o indice lateral.
+
+    Retorna None se nao houver indice valido para o arquivo atual.
+    """
+    index = _load_index(path, key)
+    if index is None:
+        return None
+    found = index.ranges.get(value)
+    if found is None:
+        schema = index.schema if not columns else {col: index.schema[col] for col in columns}
+        return pl.DataFrame(schema=schema)
+    offset, rows = found
+    return index.read(offset, rows, columns)
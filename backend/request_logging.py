@@ -11,6 +11,12 @@ from pydantic import BaseModel, Field
 _REQUEST_SINK_ID: int | None = None
 _FRONTEND_SINK_ID: int | None = None
 
+# Requisicoes interativas em andamento (o polling de /cache/status nao conta);
+# tarefas de fundo como o prefetch da watchlist esperam a API ficar ociosa.
+_IDLE_EXEMPT_PATHS = {"/api/v1/cache/status"}
+_active_api_requests = 0
+_last_api_request_at = 0.0
+
 
 class FrontendPerformanceEvent(BaseModel):
     cnpj: str = Field(..., min_length=1)
@@ -78,31 +84,53 @@ def configure_request_timing_logger(app: FastAPI) -> None:
 
     @app.middleware("http")
     async def request_timing_middleware(request: Request, call_next):
-        if not _should_log_request(request):
-            return await call_next(request)
+        global _active_api_requests, _last_api_request_at
 
-        started = time.perf_counter()
-        status_code = 500
-        error_text = None
+        path = request.url.path
+        if not path.startswith("/api/") or path in _IDLE_EXEMPT_PATHS:
+            return await call_next(request)
+        _active_api_requests += 1
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            return response
-        except Exception as exc:
-            error_text = f"{type(exc).__name__}: {exc}"
-            raise
+            if not _should_log_request(request):
+                return await call_next(request)
+            return await _timed_call(request, call_next)
         finally:
-            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
-            logger.bind(sentinela_log="request_timing").info(
-                "cnpj={} | {} {} | params={} | status={} | tempo_ms={}{}",
-                _extract_cnpj(request),
-                request.method,
-                request.url.path,
-                _query_params(request),
-                status_code,
-                elapsed_ms,
-                f" | erro={error_text}" if error_text else "",
-            )
+            _active_api_requests -= 1
+            _last_api_request_at = time.monotonic()
+
+
+def api_idle_for() -> float:
+    """Segundos desde a ultima requisicao interativa (0 se houver alguma em curso)."""
+    if _active_api_requests > 0:
+        return 0.0
+    if not _last_api_request_at:
+        return float("inf")
+    return time.monotonic() - _last_api_request_at
+
+
+async def _timed_call(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    error_text = None
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    except Exception as exc:
+        error_text = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.bind(sentinela_log="request_timing").info(
+            "cnpj={} | {} {} | params={} | status={} | tempo_ms={}{}",
+            _extract_cnpj(request),
+            request.method,
+            request.url.path,
+            _query_params(request),
+            status_code,
+            elapsed_ms,
+            f" | erro={error_text}" if error_text else "",
+        )
 
 
 def configure_frontend_performance_logger() -> None:
@@ -0,0 +1,310 @@
+"""Classes de execucao das rotas da API: leve, pesada e documento.
+
+Os handlers analiticos sao `def` sincronos e rodam no threadpool padrao do
+Starlette, sem prioridade: uma consulta nacional de `/indicadores-analise`
+ou a geracao de uma Nota Tecnica podia ocupar as threads e atrasar chamadas
+baratas como `/cnpj/{cnpj}/status`. O middleware abaixo classifica cada
+requisicao pelo template da rota (`ROUTE_CLASSES`) e exige uma vaga do
+limitador da classe antes de executa-la:
+
+    leve       -> demais rotas /api (cadastro, status, preferencias, ...)
+    pesada     -> agregacoes nacionais/regionais e datasets grandes por CNPJ
+    documento  -> preparo e geracao da Nota Tecnica / relatorio PDF
+
+Quando a fila de uma classe limitada esta cheia, ou a espera passa do
+limite, a resposta e 503 com Retry-After, em vez de empilhar trabalho.
+
+Configuracao por classe (variaveis de ambiente, CLASSE em maiusculas):
+    SENTINELA_POOL_<CLASSE>_WORKERS   execucoes simultaneas
+    SENTINELA_POOL_<CLASSE>_FILA      requisicoes aguardando (0 = sem limite)
+    SENTINELA_POOL_<CLASSE>_ESPERA_S  espera maxima na fila (0 = sem limite)
+    SENTINELA_POOL_<CLASSE>_THREADS   fatia do pool do Polars contada por execucao
+                                      (pesada/documento); so muda as vagas padrao,
+                                      nao limita as threads de cada consulta
+
+As vagas padrao de pesada/documento saem do orcamento de threads do Polars
+(ver `thread_budget`): vagas x threads por execucao cabem no pool do processo.
+A classe pesada tem no minimo 2 vagas, para que duas requisicoes do painel
+nao fiquem em fila em maquinas de poucos nucleos.
+
+Metricas (fila, espera, execucao, rejeicoes) em `request_pool_stats()` /
+GET /api/v1/cache/request-pools.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+import math
+import os
+import threading
+import time
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from api.utils.route_match import RouteTemplateMatcher
+from thread_budget import POLARS_THREADS, default_heavy_threads, workers_for_budget
+
+
+CLASS_LEVE = "leve"
+CLASS_PESADA = "pesada"
+CLASS_DOCUMENTO = "documento"
+
+# Vagas padrao minimas da classe pesada (o painel dispara varias em paralelo).
+_MIN_PESADA_WORKERS = 2
+
+_API = "/api/v1"
+
+ROUTE_CLASSES: tuple[tuple[str, str], ...] = (
+    # Documentos (docx/pdf): minutos de CPU e I/O por requisicao.
+    (f"{_API}/analytics/cnpj/{{cnpj}}/nota-tecnica/prepare", CLASS_DOCUMENTO),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/relatorio-pdf/prepare", CLASS_DOCUMENTO),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/nota-tecnica", CLASS_DOCUMENTO),
+    # Agregacoes sobre a base inteira ou datasets grandes.
+    (f"{_API}/analytics/resumo", CLASS_PESADA),
+    (f"{_API}/analytics/producao-semestral", CLASS_PESADA),
+    (f"{_API}/analytics/faixas-risco", CLASS_PESADA),
+    (f"{_API}/analytics/alertas-panorama", CLASS_PESADA),
+    (f"{_API}/analytics/indicadores-analise", CLASS_PESADA),
+    (f"{_API}/analytics/indicadores-analise/cnpjs", CLASS_PESADA),
+    (f"{_API}/analytics/regional-benchmarking", CLASS_PESADA),
+    (f"{_API}/analytics/regional-benchmarking-animation", CLASS_PESADA),
+    (f"{_API}/analytics/metric-percentiles", CLASS_PESADA),
+    (f"{_API}/analytics/metric-percentiles-animation", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/network/level/3", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/network/level/4", CLASS_PESADA),
+    # Consultas sobre o indice nacional da teia (componente conexa: varre o grafo).
+    (f"{_API}/analytics/cnpj/{{cnpj}}/network/vizinhanca", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/network/farmacias-socio-comum", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/network/componente", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/crm-data", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/crm/timeline-dataset", CLASS_PESADA),
+    (f"{_API}/analytics/cnpj/{{cnpj}}/movimentacao", CLASS_PESADA),
+    (f"{_API}/geo/estabelecimentos", CLASS_PESADA),
+    (f"{_API}/targets/parkinson-menor-50", CLASS_PESADA),
+    (f"{_API}/targets/diabetes-menor-20", CLASS_PESADA),
+)
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    workers: int
+    max_queue: int | None
+    max_wait_s: float | None
+    retry_after_s: int
+    # Threads do pool do Polars por execucao (None = classe fora do orcamento).
+    threads: int | None = None
+
+
+def _env_number(name: str, default, cast):
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return max(0, cast(value))
+    except ValueError:
+        print(f"[AVISO] {name} invalido ({value!r}); usando {default}.")
+        return default
+
+
+def _pool_config(
+    name: str,
+    default: PoolConfig,
+    budget_threads: int | None = None,
+    min_workers: int = 1,
+) -> PoolConfig:
+    """Aplica as variaveis de ambiente; com `budget_threads`, as vagas saem do orcamento."""
+    prefix = f"SENTINELA_POOL_{name.upper()}"
+    threads = default.threads
+    if threads is not None:
+        threads = min(POLARS_THREADS, _env_number(f"{prefix}_THREADS", threads, int) or threads)
+    default_workers = default.workers
+    if threads is not None and budget_threads is not None:
+        default_workers = max(min_workers, workers_for_budget(budget_threads, threads))
+    workers = _env_number(f"{prefix}_WORKERS", default_workers, int) or default_workers
+    max_queue = _env_number(f"{prefix}_FILA", default.max_queue, int)
+    max_wait_s = _env_number(f"{prefix}_ESPERA_S", default.max_wait_s, float)
+    return PoolConfig(
+        workers=workers,
+        max_queue=max_queue or None,
+        max_wait_s=max_wait_s or None,
+        retry_after_s=default.retry_after_s,
+        threads=threads,
+    )
+
+
+def _build_configs() -> dict[str, PoolConfig]:
+    heavy_threads = default_heavy_threads()
+    leve = _pool_config(CLASS_LEVE, PoolConfig(workers=16, max_queue=None, max_wait_s=None, retry_after_s=1))
+    documento = _pool_config(
+        CLASS_DOCUMENTO,
+        PoolConfig(workers=1, max_queue=4, max_wait_s=300.0, retry_after_s=15, threads=heavy_threads),
+    )
+    # A classe pesada fica com o pool do Polars menos o reservado aos documentos.
+    pesada = _pool_config(
+        CLASS_PESADA,
+        PoolConfig(workers=1, max_queue=16, max_wait_s=60.0, retry_after_s=5, threads=heavy_threads),
+        budget_threads=POLARS_THREADS - documento.workers * documento.threads,
+        min_workers=_MIN_PESADA_WORKERS,
+    )
+    committed = sum(config.workers * config.threads for config in (pesada, documento))
+    # As vagas minimas (2 pesadas, 1 documento) valem mesmo em maquinas com
+    # poucos nucleos; so avisa quando a configuracao passa disso.
+    minimum = _MIN_PESADA_WORKERS * pesada.threads + documento.threads
+    if committed > max(POLARS_THREADS, minimum):
+        print(
+            f"[AVISO] Classes pesada/documento reservam {committed} threads do Polars, "
+            f"acima do pool ({POLARS_THREADS}); execucoes simultaneas vao disputar nucleos."
+        )
+    return {CLASS_LEVE: leve, CLASS_PESADA: pesada, CLASS_DOCUMENTO: documento}
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+class RequestPool:
+    """Limitador de execucoes simultaneas de uma classe, com fila medida."""
+
+    _SAMPLES = 1000
+
+    def __init__(self, name: str, config: PoolConfig):
+        self.name = name
+        self.config = config
+        self._limiter: anyio.CapacityLimiter | None = None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.peak_waiting = 0
+        self.served = 0
+        self.rejected_queue = 0
+        self.rejected_timeout = 0
+        self._wait_ms: deque[float] = deque(maxlen=self._SAMPLES)
+        self._run_ms: deque[float] = deque(maxlen=self._SAMPLES)
+
+    def _get_limiter(self) -> anyio.CapacityLimiter:
+        # Criado no event loop (anyio exige backend ativo).
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.config.workers)
+        return self._limiter
+
+    def saturated(self) -> bool:
+        limiter = self._get_limiter()
+        return (
+            self.config.max_queue is not None
+            and limiter.available_tokens == 0
+            and self.waiting >= self.config.max_queue
+        )
+
+    async def acquire(self) -> float | None:
+        """Espera uma vaga; devolve a espera em ms, ou None se estourou o limite."""
+        limiter = self._get_limiter()
+        with self._lock:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = time.perf_counter()
+        try:
+            with anyio.move_on_after(self.config.max_wait_s) as scope:
+                await limiter.acquire()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        wait_ms = (time.perf_counter() - started) * 1000
+        if scope.cancelled_caught:
+            with self._lock:
+                self.rejected_timeout += 1
+            return None
+        with self._lock:
+            self.running += 1
+            self._wait_ms.append(wait_ms)
+        return wait_ms
+
+    def release(self, run_ms: float) -> None:
+        self._get_limiter().release()
+        with self._lock:
+            self.running -= 1
+            self.served += 1
+            self._run_ms.append(run_ms)
+
+    def reject_full(self) -> None:
+        with self._lock:
+            self.rejected_queue += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            wait_ms = list(self._wait_ms)
+            run_ms = list(self._run_ms)
+            return {
+                "workers": self.config.workers,
+                "threads_polars": self.config.threads,
+                "fila_max": self.config.max_queue,
+                "espera_max_s": self.config.max_wait_s,
+                "em_execucao": self.running,
+                "na_fila": self.waiting,
+                "pico_fila": self.peak_waiting,
+                "atendidas": self.served,
+                "rejeitadas_fila_cheia": self.rejected_queue,
+                "rejeitadas_espera": self.rejected_timeout,
+                "espera_ms": {"p50": _percentile(wait_ms, 50), "p95": _percentile(wait_ms, 95), "max": _percentile(wait_ms, 100)},
+                "execucao_ms": {"p50": _percentile(run_ms, 50), "p95": _percentile(run_ms, 95), "max": _percentile(run_ms, 100)},
+            }
+
+
+_POOLS: dict[str, RequestPool] = {
+    name: RequestPool(name, config) for name, config in _build_configs().items()
+}
+_matcher = RouteTemplateMatcher(ROUTE_CLASSES)
+
+
+def classify_request_path(path: str) -> str | None:
+    """Classe de execucao de um caminho da API (None fora de /api)."""
+    if not path.startswith("/api/"):
+        return None
+    matched = _matcher.match(path)
+    return matched[1] if matched else CLASS_LEVE
+
+
+def request_pool_stats() -> dict:
+    return {
+        "polars_threads": POLARS_THREADS,
+        "classes": {name: pool.stats() for name, pool in _POOLS.items()},
+    }
+
+
+def _busy_response(pool: RequestPool) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Servidor ocupado (fila '{pool.name}' cheia). Tente novamente em instantes."},
+        headers={"Retry-After": str(pool.config.retry_after_s)},
+    )
+
+
+def configure_request_pools(app: FastAPI) -> None:
+    """Registra o middleware de classes de execucao (mais interno que ETag/CORS)."""
+    summary = ", ".join(
+        f"{name}={pool.config.workers}" + (f"x{pool.config.threads}t" if pool.config.threads else "")
+        for name, pool in _POOLS.items()
+    )
+    print(f"[INFO] Classes de execucao da API: {summary} (pool Polars: {POLARS_THREADS} threads).")
+
+    @app.middleware("http")
+    async def request_pool_middleware(request: Request, call_next):
+        pool = _POOLS.get(classify_request_path(request.url.path))
+        if pool is None:
+            return await call_next(request)
+        if pool.saturated():
+            pool.reject_full()
+            return _busy_response(pool)
+        if await pool.acquire() is None:
+            return _busy_response(pool)
+        started = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            pool.release((time.perf_counter() - started) * 1000)
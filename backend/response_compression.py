@@ -0,0 +1,327 @@
+"""Compressao negociada das respostas HTTP (zstd, brotli ou gzip).
+
+Respostas como o dataset da timeline CRM, a teia no nivel 4, os quadros da
+animacao regional e as paginas de indicadores chegam a varios MB de JSON
+muito repetitivo. O middleware ASGI abaixo comprime conforme o
+Accept-Encoding do cliente, na ordem de preferencia zstd > br > gzip (zstd e
+brotli so quando os pacotes opcionais `zstandard` / `brotli` estao
+instalados; gzip vem da biblioteca padrao).
+
+- Respostas menores que `SENTINELA_COMPRESS_MIN_BYTES` (padrao 1024) seguem
+  sem compressao; corpos grandes sao comprimidos fora do event loop.
+- `StreamingResponse` e comprimida em fluxo, pedaco a pedaco.
+- Tipos ja comprimidos (docx, pdf, imagens) e respostas com
+  Content-Encoding sao repassados intactos.
+- A ETag recebe o sufixo da codificacao (`"...-gzip"`), pois o corpo
+  comprimido e outra representacao; `api.utils.http_cache.etag_matches`
+  ignora o sufixo ao comparar.
+
+Estatisticas por rota (bytes antes/depois, razao, CPU gasto) em
+`compression_stats()` / GET /api/v1/cache/compression.
+SENTINELA_COMPRESS=0 desliga o mecanismo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import zlib
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard e opcional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli e opcional
+    brotli = None
+
+
+_DEFAULT_MIN_BYTES = 1024
+# Acima disso a compressao roda em thread para nao travar o event loop.
+_THREAD_MIN_BYTES = 256 * 1024
+# Niveis rapidos: o cliente desktop fala com a API em loopback, entao o CPU
+# gasto comprimindo pesa mais que os ultimos pontos percentuais de razao
+# (JSON de 30 MB: gzip 1 ~350 ms / 28%; gzip 6 ~1080 ms / 25%).
+_GZIP_LEVEL = 1
+_BROTLI_QUALITY = 4
+_ZSTD_LEVEL = 3
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/vnd.apache.arrow.stream",
+    "image/svg+xml",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return max(0, int(value))
+    except ValueError:
+        print(f"[AVISO] {name} invalido ({value!r}); usando {default}.")
+        return default
+
+
+def compression_enabled() -> bool:
+    return (os.getenv("SENTINELA_COMPRESS") or "1").strip().lower() not in {"0", "false", "nao", "off"}
+
+
+class _Compressor:
+    """Interface unica (compress/finish) sobre zlib, brotli e zstandard."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compressobj()
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=_BROTLI_QUALITY)
+        else:
+            self._obj = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.cpu_s = 0.0
+
+    def compress(self, data: bytes) -> bytes:
+        started = time.thread_time()
+        try:
+            if self.encoding == "br":
+                return self._obj.process(data)
+            return self._obj.compress(data)
+        finally:
+            self.cpu_s += time.thread_time() - started
+
+    def finish(self) -> bytes:
+        started = time.thread_time()
+        try:
+            return self._obj.finish() if self.encoding == "br" else self._obj.flush()
+        finally:
+            self.cpu_s += time.thread_time() - started
+
+    def compress_all(self, data: bytes) -> bytes:
+        return self.compress(data) + self.finish()
+
+
+def available_encodings() -> tuple[str, ...]:
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Melhor codificacao disponivel aceita pelo cliente (q > 0), ou None."""
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[token.lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in available_encodings():
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def _is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type.endswith("+json")
+        or media_type in _COMPRESSIBLE_TYPES
+    )
+
+
+# -----------------------------------------------------------------------------
+# Estatisticas
+# -----------------------------------------------------------------------------
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, float]] = {}
+
+
+def _route_key(scope) -> str:
+    """Template completo da rota: `route.path` e relativo ao app/Mount que a atende."""
+    route_path = getattr(scope.get("route"), "path", None)
+    if not route_path:
+        return scope.get("path", "?")
+    root_path = scope.get("root_path", "")
+    if root_path and route_path.startswith(root_path):
+        return route_path
+    return root_path + route_path
+
+
+def _record(scope, encoding: str | None, bytes_in: int, bytes_out: int, cpu_s: float) -> None:
+    key = _route_key(scope)
+    with _stats_lock:
+        stats = _stats.setdefault(key, {
+            "comprimidas": 0,
+            "abaixo_limite": 0,
+            "bytes_originais": 0,
+            "bytes_enviados": 0,
+            "cpu_ms": 0.0,
+        })
+        if encoding is None:
+            stats["abaixo_limite"] += 1
+            return
+        stats["comprimidas"] += 1
+        stats["bytes_originais"] += bytes_in
+        stats["bytes_enviados"] += bytes_out
+        stats["cpu_ms"] += cpu_s * 1000
+        stats[encoding] = stats.get(encoding, 0) + 1
+
+
+def compression_stats() -> dict:
+    """Razao de compressao e CPU gasto por rota."""
+    with _stats_lock:
+        routes = {key: dict(values) for key, values in _stats.items()}
+    for values in routes.values():
+        original = values["bytes_originais"]
+        values["razao"] = round(values["bytes_enviados"] / original, 4) if original else None
+        values["cpu_ms"] = round(values["cpu_ms"], 2)
+        values["cpu_ms_por_mb"] = round(values["cpu_ms"] / (original / 1_048_576), 2) if original else None
+    return {
+        "enabled": compression_enabled(),
+        "encodings": list(available_encodings()),
+        "min_bytes": _env_int("SENTINELA_COMPRESS_MIN_BYTES", _DEFAULT_MIN_BYTES),
+        "routes": routes,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Middleware
+# -----------------------------------------------------------------------------
+class ResponseCompressionMiddleware:
+    def __init__(self, app, minimum_size: int | None = None):
+        self.app = app
+        self.minimum_size = (
+            minimum_size
+            if minimum_size is not None
+            else _env_int("SENTINELA_COMPRESS_MIN_BYTES", _DEFAULT_MIN_BYTES)
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(scope, send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Decide, pelo primeiro corpo, entre repassar, comprimir inteiro ou em fluxo.
+
+    Os pedacos sao retidos ate o fim da resposta ou ate haver mais de um pedaco
+    com `minimum_size` bytes: um corpo unico (mesmo entregue como
+    `more_body` + pedaco final vazio, como faz o BaseHTTPMiddleware) e
+    comprimido de uma vez e recebe Content-Length.
+    """
+
+    def __init__(self, scope, send, encoding: str, minimum_size: int):
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.headers: MutableHeaders | None = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+        self.pending: list[bytes] = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.headers = MutableHeaders(raw=message["headers"])
+            if (
+                "content-encoding" in self.headers
+                or not _is_compressible(self.headers.get("content-type", ""))
+                or message["status"] in (204, 304)
+            ):
+                self.passthrough = True
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+        if self.compressor is not None:
+            await self._stream_body(message.get("body", b""), message.get("more_body", False))
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if body:
+            self.pending.append(body)
+        buffered = sum(len(chunk) for chunk in self.pending)
+        if not more_body:
+            await self._send_whole(b"".join(self.pending))
+        elif len(self.pending) > 1 and buffered >= self.minimum_size:
+            await self._start_stream()
+
+    def _mark_encoded(self) -> None:
+        self.compressor = _Compressor(self.encoding)
+        self.headers["Content-Encoding"] = self.encoding
+        self.headers.add_vary_header("Accept-Encoding")
+        etag = self.headers.get("etag")
+        if etag and etag.endswith('"'):
+            self.headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+
+    async def _send_whole(self, body: bytes) -> None:
+        if len(body) < self.minimum_size:
+            _record(self.scope, None, len(body), len(body), 0.0)
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        self._mark_encoded()
+        compressed = await self._run(self.compressor.compress_all, body)
+        self.headers["Content-Length"] = str(len(compressed))
+        _record(self.scope, self.encoding, len(body), len(compressed), self.compressor.cpu_s)
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _start_stream(self) -> None:
+        self._mark_encoded()
+        if "content-length" in self.headers:
+            del self.headers["Content-Length"]
+        await self._send(self.start_message)
+        body, self.pending = b"".join(self.pending), []
+        await self._stream_body(body, True)
+
+    async def _stream_body(self, body: bytes, more_body: bool) -> None:
+        self.bytes_in += len(body)
+        chunk = await self._run(self.compressor.compress, body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+            _record(self.scope, self.encoding, self.bytes_in, self.bytes_out + len(chunk), self.compressor.cpu_s)
+        self.bytes_out += len(chunk)
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    @staticmethod
+    async def _run(func, data: bytes) -> bytes:
+        if len(data) >= _THREAD_MIN_BYTES:
+            return await anyio.to_thread.run_sync(func, data)
+        return func(data)
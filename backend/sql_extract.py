@@ -0,0 +1,295 @@
+"""Extracao SQL -> Polars/Parquet em lotes, sem passar por pandas.
+
+`pd.read_sql` + `pl.from_pandas` materializa cada linha como objeto Python no
+pandas e depois copia tudo de novo para o Polars. Aqui o cursor do driver e
+lido em lotes direto para DataFrames Polars (`pl.read_database` com
+`iter_batches`), ja convertidos para o schema do `cache_registry`, e cada lote
+vira um row group do Parquet final. O pico de memoria passa a depender do
+tamanho do lote, nao do tamanho da tabela.
+"""
+
+from collections.abc import Callable, Iterator
+import os
+import shutil
+import tempfile
+import time
+
+import polars as pl
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow e opcional
+    pq = None
+
+
+DEFAULT_BATCH_SIZE = 100_000
+
+
+def _as_query(query):
+    return text(query) if isinstance(query, str) else query
+
+
+def _is_text_date(source_dtype, dtype) -> bool:
+    # Drivers ODBC antigos (e o SQLite) devolvem DATE/DATETIME como texto.
+    return source_dtype == pl.Utf8 and (dtype == pl.Date or dtype == pl.Datetime)
+
+
+def _cast_expr(col: str, source_dtype, dtype) -> pl.Expr:
+    if _is_text_date(source_dtype, dtype):
+        # Nao estrito para poder apontar as linhas invalidas em cast_to_schema.
+        if dtype == pl.Date:
+            return pl.col(col).str.to_date(strict=False).alias(col)
+        return pl.col(col).str.to_datetime(strict=False).alias(col)
+    return pl.col(col).cast(dtype)
+
+
+def _check_text_dates(df: pl.DataFrame, out: pl.DataFrame, schema: dict, source: str) -> None:
+    """Falha se alguma data em texto nao pode ser convertida (viraria nulo em silencio)."""
+    for col, dtype in schema.items():
+        if not _is_text_date(df.schema[col], dtype):
+            continue
+        invalid = df[col].is_not_null() & out[col].is_null()
+        n_invalid = int(invalid.sum())
+        if n_invalid:
+            samples = df[col].filter(invalid).head(3).to_list()
+            raise ValueError(
+                f"[ CACHE ] {source}: {n_invalid:,} valor(es) invalido(s) na coluna de data '{col}' "
+                f"(ex.: {samples})."
+            )
+
+
+def cast_to_schema(df: pl.DataFrame, schema: dict, source: str = "SQL") -> pl.DataFrame:
+    """Converte `df` para o schema do registro, na ordem declarada.
+
+    Datas recebidas como texto sao convertidas de forma estrita: um valor que
+    nao e data gera ValueError com a coluna e exemplos, em vez de nulo.
+    """
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise ValueError(
+            f"[ CACHE ] {source}: colunas obrigatorias ausentes no resultado SQL: {', '.join(missing)}"
+        )
+    out = df.select([_cast_expr(col, df.schema[col], dtype) for col, dtype in schema.items()])
+    _check_text_dates(df, out, schema, source)
+    return out
+
+
+def iter_sql_batches(
+    connectable,
+    query,
+    params: dict | None = None,
+    schema: dict | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    source: str = "SQL",
+) -> Iterator[pl.DataFrame]:
+    """Itera o resultado de `query` em DataFrames Polars de ate `batch_size` linhas.
+
+    `connectable` pode ser um Engine ou uma Connection do SQLAlchemy. Com
+    `schema`, cada lote e convertido (e recortado) para ele, garantindo que
+    todos os lotes tenham exatamente os mesmos tipos.
+    """
+    execute_options = {"parameters": params} if params else None
+
+    def _batches(conn):
+        for batch in pl.read_database(
+            _as_query(query),
+            conn,
+            iter_batches=True,
+            batch_size=batch_size,
+            # Inferencia sobre o lote inteiro: colunas nulas nas primeiras
+            # linhas nao podem travar o tipo do lote.
+            infer_schema_length=None,
+            execute_options=execute_options,
+        ):
+            yield cast_to_schema(batch, schema, source) if schema else batch
+
+    if isinstance(connectable, Engine):
+        with connectable.connect() as conn:
+            yield from _batches(conn)
+    else:
+        yield from _batches(connectable)
+
+
+def read_sql_polars(
+    connectable,
+    query,
+    params: dict | None = None,
+    schema: dict | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    source: str = "SQL",
+) -> pl.DataFrame:
+    """Le o resultado inteiro em um DataFrame Polars (vazio com `schema` se nao houver linhas)."""
+    batches = list(iter_sql_batches(connectable, query, params, schema, batch_size, source))
+    if not batches:
+        return pl.DataFrame(schema=schema) if schema else pl.DataFrame()
+    if schema:
+        return pl.concat(batches, how="vertical", rechunk=False)
+    return pl.concat(batches, how="vertical_relaxed", rechunk=False)
+
+
+class ParquetBatchWriter:
+    """Grava lotes Polars de schema fixo como row groups de um unico Parquet.
+
+    Usa `pyarrow.parquet.ParquetWriter` quando disponivel. Sem pyarrow, cada
+    lote vai para um arquivo parcial e, no `close()`, os parciais sao unidos
+    em streaming com `scan_parquet(...).sink_parquet(...)`.
+
+    Com `row_group_size`, os lotes sao reagrupados em row groups desse
+    tamanho, independente do tamanho de cada `write()`.
+    """
+
+    def __init__(self, path: str, compression: str = "zstd", row_group_size: int | None = None):
+        self.path = path
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self.schema: dict | None = None
+        self._writer = None
+        self._parts_dir: str | None = None
+        self._parts: list[str] = []
+        self._pending: list[pl.DataFrame] = []
+        self._pending_rows = 0
+
+    def _conform(self, df: pl.DataFrame) -> pl.DataFrame:
+        if self.schema is None:
+            # Coluna toda nula no primeiro lote nao define tipo; assume texto.
+            self.schema = {
+                col: (pl.Utf8 if dtype == pl.Null else dtype)
+                for col, dtype in df.schema.items()
+            }
+        if dict(df.schema) == self.schema:
+            return df
+        return cast_to_schema(df, self.schema, os.path.basename(self.path))
+
+    def write(self, df: pl.DataFrame) -> None:
+        df = self._conform(df)
+        self.rows += df.height
+        if not self.row_group_size:
+            self._write_group(df)
+            return
+        if df.height:
+            self._pending.append(df)
+            self._pending_rows += df.height
+        while self._pending_rows >= self.row_group_size:
+            pending = pl.concat(self._pending)
+            self._write_group(pending.slice(0, self.row_group_size))
+            rest = pending.slice(self.row_group_size)
+            self._pending = [rest] if rest.height else []
+            self._pending_rows = rest.height
+
+    def _flush_pending(self) -> None:
+        if self._pending:
+            self._write_group(pl.concat(self._pending))
+            self._pending = []
+            self._pending_rows = 0
+
+    def _write_group(self, df: pl.DataFrame) -> None:
+        if df.height == 0 and (self._writer is not None or self._parts):
+            return
+        if pq is not None:
+            table = df.to_arrow()
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(
+                    self.path,
+                    table.schema,
+                    compression=self.compression,
+                    # Mesmo nivel do write_parquet do Polars.
+                    compression_level=3 if self.compression == "zstd" else None,
+                )
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            if self._parts_dir is None:
+                self._parts_dir = tempfile.mkdtemp(
+                    prefix=".parts_", dir=os.path.dirname(os.path.abspath(self.path))
+                )
+            part_path = os.path.join(self._parts_dir, f"{len(self._parts):06d}.smod")
+            df.write_parquet(part_path, compression=self.compression)
+            self._parts.append(part_path)
+
+    def close(self) -> None:
+        try:
+            self._flush_pending()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            elif self._parts:
+                pl.scan_parquet(self._parts).sink_parquet(
+                    self.path,
+                    compression=self.compression,
+                    row_group_size=self.row_group_size,
+                )
+            elif self.schema is not None:
+                pl.DataFrame(schema=self.schema).write_parquet(
+                    self.path,
+                    compression=self.compression,
+                    row_group_size=self.row_group_size,
+                )
+        finally:
+            self._discard_parts()
+
+    def abort(self) -> None:
+        """Descarta o que ja foi gravado (arquivo de destino e parciais)."""
+        self._pending = []
+        self._pending_rows = 0
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._discard_parts()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _discard_parts(self) -> None:
+        if self._parts_dir is not None:
+            shutil.rmtree(self._parts_dir, ignore_errors=True)
+            self._parts_dir = None
+            self._parts = []
+
+
+def sql_to_parquet(
+    connectable,
+    query,
+    path: str,
+    params: dict | None = None,
+    schema: dict | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    extra_columns: dict | None = None,
+    total_rows: int | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+    source: str | None = None,
+) -> int:
+    """Grava o resultado de `query` em `path` lote a lote; retorna o numero de linhas.
+
+    A escrita e atomica: o Parquet e montado em `path + ".tmp"` e so substitui
+    o arquivo final ao terminar. `extra_columns` acrescenta colunas constantes
+    (ex.: versao de cache) antes da conversao para `schema`. Com `total_rows`,
+    `progress_callback` recebe o percentual baixado.
+    """
+    source = source or os.path.basename(path)
+    tmp_path = path + ".tmp"
+    writer = ParquetBatchWriter(tmp_path)
+    t0 = time.perf_counter()
+    try:
+        for batch in iter_sql_batches(connectable, query, params, None, batch_size, source):
+            if extra_columns:
+                batch = batch.with_columns([pl.lit(v).alias(k) for k, v in extra_columns.items()])
+            if schema:
+                batch = cast_to_schema(batch, schema, source)
+            writer.write(batch)
+            if progress_callback and total_rows:
+                progress_callback(min(int(writer.rows * 100 / total_rows), 99))
+        if writer.schema is None and schema:
+            writer.write(pl.DataFrame(schema=schema))
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    if writer.schema is None:
+        # Sem schema e sem linhas nao ha como montar um Parquet valido.
+        raise ValueError(f"[ CACHE ] {source}: consulta sem linhas e sem schema de destino.")
+
+    os.replace(tmp_path, path)
+    print(f"[{time.perf_counter() - t0:.1f}s] {source}: {writer.rows:,} linhas gravadas em lotes de {batch_size:,}.")
+    return writer.rows
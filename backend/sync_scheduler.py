@@ -0,0 +1,216 @@
+"""Agendamento paralelo, com dependencias, das tarefas de sincronizacao global."""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import threading
+import time
+
+
+ProgressCallback = Callable[[int], None]
+
+
+@dataclass(frozen=True)
+class SyncTask:
+    key: str
+    name: str
+    weight: int
+    func: Callable[[ProgressCallback], None]
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass
+class SyncTaskTiming:
+    key: str
+    name: str
+    started_at: float
+    finished_at: float
+    critical_path_s: float
+    critical_path: tuple[str, ...]
+
+    @property
+    def elapsed_s(self) -> float:
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class SyncReport:
+    total_s: float
+    timings: dict[str, SyncTaskTiming] = field(default_factory=dict)
+
+    @property
+    def critical_path(self) -> SyncTaskTiming | None:
+        if not self.timings:
+            return None
+        return max(self.timings.values(), key=lambda timing: timing.critical_path_s)
+
+
+def _validate_tasks(tasks: list[SyncTask]) -> None:
+    keys = [task.key for task in tasks]
+    duplicated = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicated:
+        raise ValueError(f"Tarefas de sincronizacao duplicadas: {', '.join(duplicated)}")
+
+    known = set(keys)
+    for task in tasks:
+        unknown = [dep for dep in task.depends_on if dep not in known]
+        if unknown:
+            raise ValueError(
+                f"Tarefa {task.key} depende de tarefas inexistentes: {', '.join(unknown)}"
+            )
+
+    # Kahn: se sobrar tarefa sem grau zero, existe ciclo.
+    pending = {task.key: set(task.depends_on) for task in tasks}
+    while pending:
+        ready = [key for key, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(
+                "Ciclo de dependencias entre tarefas de sincronizacao: "
+                + ", ".join(sorted(pending))
+            )
+        for key in ready:
+            del pending[key]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+class SyncScheduler:
+    """Executa tarefas independentes em paralelo respeitando `depends_on`.
+
+    O progresso global e a soma ponderada do progresso de cada tarefa, de modo
+    que tarefas concorrentes contribuem ao mesmo tempo para a barra exibida em
+    `/cache/status`. Na primeira falha nenhuma tarefa nova e iniciada; as que ja
+    estao em execucao terminam e o erro original e propagado.
+    """
+
+    def __init__(
+        self,
+        tasks: Iterable[SyncTask],
+        max_workers: int,
+        on_progress: ProgressCallback | None = None,
+        on_status: Callable[[list[str]], None] | None = None,
+    ):
+        self.tasks = list(tasks)
+        _validate_tasks(self.tasks)
+        self.max_workers = max(1, min(max_workers, len(self.tasks) or 1))
+        self._on_progress = on_progress
+        self._on_status = on_status
+        self._lock = threading.Lock()
+        self._task_progress: dict[str, int] = {task.key: 0 for task in self.tasks}
+        self._total_weight = sum(task.weight for task in self.tasks) or 1
+        self._last_progress = 0
+        self._running: dict[str, SyncTask] = {}
+
+    def _report_progress(self, key: str, value: int) -> None:
+        with self._lock:
+            self._task_progress[key] = max(self._task_progress[key], min(max(int(value), 0), 100))
+            done_weight = sum(
+                task.weight * self._task_progress[task.key] / 100
+                for task in self.tasks
+            )
+            progress = int(done_weight * 100 / self._total_weight)
+            # Nunca regredir a barra por arredondamento entre tarefas concorrentes.
+            progress = max(self._last_progress, min(progress, 99))
+            self._last_progress = progress
+        if self._on_progress:
+            self._on_progress(progress)
+
+    def _report_status(self) -> None:
+        if not self._on_status:
+            return
+        with self._lock:
+            names = [task.name for task in self._running.values()]
+        self._on_status(names)
+
+    def _run_task(self, task: SyncTask) -> tuple[float, float]:
+        started = time.perf_counter()
+        task.func(lambda p, _key=task.key: self._report_progress(_key, p))
+        finished = time.perf_counter()
+        self._report_progress(task.key, 100)
+        return started, finished
+
+    def run(self) -> SyncReport:
+        t0 = time.perf_counter()
+        by_key = {task.key: task for task in self.tasks}
+        remaining_deps = {task.key: set(task.depends_on) for task in self.tasks}
+        dependents: dict[str, list[str]] = {task.key: [] for task in self.tasks}
+        for task in self.tasks:
+            for dep in task.depends_on:
+                dependents[dep].append(task.key)
+
+        # Mantem a ordem declarada como prioridade entre tarefas prontas.
+        ready = [task.key for task in self.tasks if not task.depends_on]
+        report = SyncReport(total_s=0.0)
+        futures: dict[Future, SyncTask] = {}
+        first_error: BaseException | None = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync") as executor:
+            while ready or futures:
+                while ready and first_error is None and len(futures) < self.max_workers:
+                    task = by_key[ready.pop(0)]
+                    print(f"[*] {task.name}...")
+                    with self._lock:
+                        self._running[task.key] = task
+                    futures[executor.submit(self._run_task, task)] = task
+                self._report_status()
+
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    with self._lock:
+                        self._running.pop(task.key, None)
+
+                    error = future.exception()
+                    if error is not None:
+                        print(f"[ERRO] {task.name} falhou: {error}")
+                        if first_error is None:
+                            first_error = error
+                        continue
+
+                    started, finished = future.result()
+                    slowest_dep = max(
+                        (report.timings[dep] for dep in task.depends_on),
+                        key=lambda timing: timing.critical_path_s,
+                        default=None,
+                    )
+                    elapsed = finished - started
+                    report.timings[task.key] = SyncTaskTiming(
+                        key=task.key,
+                        name=task.name,
+                        started_at=started - t0,
+                        finished_at=finished - t0,
+                        critical_path_s=elapsed + (slowest_dep.critical_path_s if slowest_dep else 0.0),
+                        critical_path=(*(slowest_dep.critical_path if slowest_dep else ()), task.key),
+                    )
+                    print(f"[OK] {task.name} concluida em {elapsed:.1f}s")
+
+                    for dependent in dependents[task.key]:
+                        remaining_deps[dependent].discard(task.key)
+                        if not remaining_deps[dependent]:
+                            ready.append(dependent)
+
+                if first_error is not None:
+                    ready.clear()
+
+        report.total_s = time.perf_counter() - t0
+        if first_error is not None:
+            raise first_error
+        return report
+
+
+def print_sync_report(report: SyncReport) -> None:
+    """Imprime o tempo por tarefa e o caminho critico da sincronizacao."""
+    print("[INFO] Tempo por tarefa (wall-clock):")
+    for timing in sorted(report.timings.values(), key=lambda item: item.elapsed_s, reverse=True):
+        print(
+            f"   -> {timing.name}: {timing.elapsed_s:.1f}s "
+            f"(inicio +{timing.started_at:.1f}s, fim +{timing.finished_at:.1f}s)"
+        )
+
+    critical = report.critical_path
+    if critical is not None:
+        names = " -> ".join(report.timings[key].name for key in critical.critical_path)
+        print(f"[INFO] Caminho critico ({critical.critical_path_s:.1f}s de {report.total_s:.1f}s): {names}")
@@ -0,0 +1,76 @@
+"""Orcamento de threads do Polars para as classes de execucao da API.
+
+O pool de threads do Polars e global ao processo e dimensionado uma unica vez,
+no primeiro `import polars` (POLARS_MAX_THREADS, padrao = todos os nucleos).
+Nao existe limite de threads por consulta: duas consultas pesadas simultaneas
+dividem o mesmo pool e cada uma passa a andar na metade da velocidade, quatro
+em um quarto, e assim por diante, ate a latencia de cauda explodir.
+
+O orcamento e aplicado em duas pontas:
+
+1. `configure_polars_threads()` fixa POLARS_MAX_THREADS antes do import do
+   Polars (SENTINELA_POLARS_THREADS; padrao = nucleos da maquina). Este modulo
+   precisa ser importado antes de qualquer modulo que importe o Polars (ver o
+   topo de `main.py`).
+2. Cada classe limitada de `request_pools` declara quantas threads do pool uma
+   execucao deve ocupar (SENTINELA_POOL_<CLASSE>_THREADS); as vagas padrao da
+   classe saem de `pool // threads`, de modo que execucoes simultaneas x
+   threads nao passem do pool.
+
+Esse valor por execucao e so aritmetica de vagas: nada limita as threads que
+uma consulta Polars usa de fato. Uma consulta sozinha continua usando o pool
+inteiro; o orcamento decide apenas quantas consultas pesadas o dividem ao
+mesmo tempo. Mudar SENTINELA_POOL_<CLASSE>_THREADS so muda o numero padrao de
+vagas da classe (o mesmo efeito de SENTINELA_POOL_<CLASSE>_WORKERS).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+
+_POLARS_ENV = "POLARS_MAX_THREADS"
+
+
+def _env_threads(name: str) -> int | None:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return None
+    try:
+        threads = int(value)
+    except ValueError:
+        print(f"[AVISO] {name} invalido ({value!r}); usando o padrao.")
+        return None
+    return threads if threads > 0 else None
+
+
+def configure_polars_threads() -> int:
+    """Fixa o tamanho do pool do Polars (antes do import) e devolve o valor efetivo."""
+    if "polars" in sys.modules:
+        import polars as pl
+
+        requested = _env_threads("SENTINELA_POLARS_THREADS")
+        if requested is not None and requested != pl.thread_pool_size():
+            print(
+                f"[AVISO] Polars ja importado com {pl.thread_pool_size()} threads; "
+                f"SENTINELA_POLARS_THREADS={requested} ignorado."
+            )
+        return pl.thread_pool_size()
+
+    threads = _env_threads(_POLARS_ENV) or _env_threads("SENTINELA_POLARS_THREADS") or (os.cpu_count() or 1)
+    os.environ[_POLARS_ENV] = str(threads)
+    return threads
+
+
+POLARS_THREADS = configure_polars_threads()
+
+
+def default_heavy_threads(pool_threads: int = POLARS_THREADS) -> int:
+    """Fatia do pool por execucao pesada (para contar vagas): um quarto, no minimo 2."""
+    return max(1, min(pool_threads, max(2, pool_threads // 4)))
+
+
+def workers_for_budget(budget_threads: int, threads_per_execution: int) -> int:
+    """Execucoes simultaneas que cabem em `budget_threads` (no minimo 1)."""
+    return max(1, budget_threads // max(1, threads_per_execution))
@@ -80,15 +80,17 @@ export const useGeoStore = defineStore('geo', () => {
     }
   }
 
-  // Lista slim [{cnpj, razao_social}] para autocomplete na sidebar
-  const cnpjLookup = ref([]);
-
-  async function fetchCnpjLookup() {
+  // Autocomplete de estabelecimentos: o backend devolve só o top-k ranqueado
+  // [{cnpj, razao_social, municipio, uf}] para o texto digitado.
+  async function searchCnpjLookup(query, limit = 40) {
     try {
-      const response = await axios.get(API_ENDPOINTS.analyticsCnpjLookup);
-      cnpjLookup.value = response.data;
+      const response = await axios.get(API_ENDPOINTS.analyticsCnpjLookup, {
+        params: { q: query, limit },
+      });
+      return response.data;
     } catch (err) {
       console.error('Erro ao buscar lookup de CNPJs:', err);
+      return [];
     }
   }
 
@@ -227,7 +229,6 @@ export const useGeoStore = defineStore('geo', () => {
     estabelecimentos,
     fetchEstabelecimentos,
     estabelecimentosPorIbge7,
-    cnpjLookup,
-    fetchCnpjLookup,
+    searchCnpjLookup,
   };
 })
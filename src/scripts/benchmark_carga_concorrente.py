@@ -0,0 +1,159 @@
+"""
+benchmark_carga_concorrente.py
+------------------------------
+Teste de carga da API em execucao: N usuarios simultaneos disparam uma mistura
+de requisicoes de dashboard, indicadores e CRM, e o script reporta p50/p99 por
+tipo de requisicao para cada nivel de concorrencia (padrao 1, 4 e 16).
+
+    dashboard   -> /analytics/resumo, /faixas-risco, /producao-semestral
+    indicadores -> /analytics/indicadores-analise
+    crm         -> /analytics/cnpj/{cnpj}/crm-data e /crm/timeline-dataset
+
+Por padrao os filtros (UF, indicador, CNPJ) variam a cada requisicao, para
+que os caches de resultado nao respondam tudo; use --sem-variacao para medir
+o caminho quente. Respostas 503 (fila cheia, ver request_pools) sao contadas a
+parte e ficam fora dos percentis. Rode com o backend ja carregado e compare os
+numeros variando SENTINELA_POLARS_THREADS / SENTINELA_POOL_PESADA_* no servidor;
+a distribuicao das classes pode ser conferida em GET /api/v1/cache/request-pools.
+
+Uso:
+    python src/scripts/benchmark_carga_concorrente.py --cnpj 12345678000190 --cnpj 98765432000110
+    python src/scripts/benchmark_carga_concorrente.py --usuarios 1 4 16 --requisicoes 20 --url http://127.0.0.1:8002
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+UFS = ["SP", "MG", "RJ", "BA", "PR", "RS", "PE", "CE", "PA", "SC", "GO", "MA", "AM"]
+INDICADORES = ["auditado", "teto", "vendas_rapidas"]
+API = "/api/v1/analytics"
+
+
+def _montar_mistura(cnpjs: list[str], peso_crm: int) -> list[tuple[str, int]]:
+    mistura = [("dashboard", 3), ("indicadores", 2)]
+    if cnpjs:
+        mistura.append(("crm", peso_crm))
+    return mistura
+
+
+def _requisicao(tipo: str, rng: random.Random, cnpjs: list[str], variar: bool) -> tuple[str, dict]:
+    """(caminho, parametros) de uma requisicao do tipo pedido."""
+    uf = rng.choice(UFS) if variar else UFS[0]
+    if tipo == "dashboard":
+        rota = rng.choice(["resumo", "faixas-risco", "producao-semestral"])
+        return f"{API}/{rota}", {"uf": uf}
+    if tipo == "indicadores":
+        indicador = rng.choice(INDICADORES) if variar else INDICADORES[0]
+        return f"{API}/indicadores-analise", {"indicador": indicador, "uf": uf}
+    cnpj = rng.choice(cnpjs) if variar else cnpjs[0]
+    rota = rng.choice(["crm-data", "crm/timeline-dataset"])
+    return f"{API}/cnpj/{cnpj}/{rota}", {}
+
+
+def _usuario(
+    cliente: httpx.Client,
+    semente: int,
+    requisicoes: int,
+    mistura: list[tuple[str, int]],
+    cnpjs: list[str],
+    variar: bool,
+    inicio: threading.Barrier,
+) -> list[tuple[str, int, float]]:
+    rng = random.Random(semente)
+    tipos = [tipo for tipo, _ in mistura]
+    pesos = [peso for _, peso in mistura]
+    resultados = []
+    inicio.wait()
+    for _ in range(requisicoes):
+        tipo = rng.choices(tipos, pesos)[0]
+        caminho, params = _requisicao(tipo, rng, cnpjs, variar)
+        t0 = time.perf_counter()
+        try:
+            status = cliente.get(caminho, params=params).status_code
+        except httpx.HTTPError:
+            status = 0
+        resultados.append((tipo, status, (time.perf_counter() - t0) * 1000))
+    return resultados
+
+
+def _rodada(args, usuarios: int, mistura: list[tuple[str, int]]) -> tuple[list[tuple[str, int, float]], float]:
+    limites = httpx.Limits(max_connections=usuarios, max_keepalive_connections=usuarios)
+    inicio = threading.Barrier(usuarios)
+    with httpx.Client(
+        base_url=args.url,
+        timeout=args.timeout,
+        limits=limites,
+        headers={"Accept-Encoding": "gzip"},
+    ) as cliente:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=usuarios) as executor:
+            futuros = [
+                executor.submit(
+                    _usuario, cliente, args.semente + i, args.requisicoes,
+                    mistura, args.cnpj, not args.sem_variacao, inicio,
+                )
+                for i in range(usuarios)
+            ]
+            resultados = [r for futuro in futuros for r in futuro.result()]
+        return resultados, time.perf_counter() - t0
+
+
+def _percentis(tempos: list[float]) -> tuple[float, float]:
+    if not tempos:
+        return float("nan"), float("nan")
+    return float(np.percentile(tempos, 50)), float(np.percentile(tempos, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8002")
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requisicoes", type=int, default=10, help="requisicoes por usuario em cada rodada")
+    parser.add_argument("--cnpj", action="append", default=[], help="CNPJ usado nas rotas de CRM (repetivel)")
+    parser.add_argument("--peso-crm", type=int, default=2)
+    parser.add_argument("--sem-variacao", action="store_true", help="repete os mesmos filtros (caches quentes)")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    try:
+        httpx.get(f"{args.url}/api/v1/cache/status", timeout=10).raise_for_status()
+    except httpx.HTTPError as exc:
+        print(f"[ERRO] API indisponivel em {args.url}: {exc}")
+        sys.exit(1)
+    if not args.cnpj:
+        print("[AVISO] Nenhum --cnpj informado; a mistura roda sem as rotas de CRM.")
+    mistura = _montar_mistura(args.cnpj, args.peso_crm)
+    tipos = [tipo for tipo, _ in mistura]
+
+    print("\n" + "=" * 86)
+    print(f"API: {args.url} | {args.requisicoes} requisicoes/usuario | mistura: "
+          + ", ".join(f"{tipo}={peso}" for tipo, peso in mistura)
+          + (" | filtros fixos" if args.sem_variacao else " | filtros variados"))
+    print("-" * 86)
+    print(f"{'Usuarios':>8} {'Tipo':<12} {'n':>6} {'p50 ms':>10} {'p99 ms':>10} {'503':>6} {'erros':>6} {'req/s':>8}")
+    print("-" * 86)
+    for usuarios in args.usuarios:
+        resultados, duracao_s = _rodada(args, usuarios, mistura)
+        vazao = len(resultados) / duracao_s if duracao_s else 0.0
+        for tipo in tipos + ["total"]:
+            linhas = [r for r in resultados if tipo == "total" or r[0] == tipo]
+            ok = [ms for _, status, ms in linhas if status == 200]
+            ocupado = sum(1 for _, status, _ in linhas if status == 503)
+            erros = len(linhas) - len(ok) - ocupado
+            p50, p99 = _percentis(ok)
+            print(f"{usuarios:>8} {tipo:<12} {len(linhas):>6} {p50:>10.1f} {p99:>10.1f} {ocupado:>6} {erros:>6} "
+                  + (f"{vazao:>8.1f}" if tipo == "total" else f"{'':>8}"))
+        print("-" * 86)
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    main()
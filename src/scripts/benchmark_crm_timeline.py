@@ -0,0 +1,170 @@
+"""
+benchmark_crm_timeline.py
+-------------------------
+Latencia da Linha do tempo CRM (/crm/timeline-dataset) para um CNPJ sintetico
+de alto volume: nove anos de movimento diario, atividade em quase todas as
+horas e milhares de eventos de concentracao.
+
+    montagem  -> CrmTimeline a partir dos tres frames (uma vez por Parquet)
+    colunar   -> tabelas days/hours/events do periodo (artefato em cache)
+    aninhado  -> dias com listas hours/events + CrmTimelineDatasetResponse
+    sem cache -> montagem + recorte a cada requisicao (SENTINELA_CRM_TIMELINE_CACHE=0)
+
+Periodos medidos: tudo, o ultimo ano e o ultimo mes do fixture. Com
+--salvar DIR os tres Parquets do fixture sao gravados com os nomes dos caches
+por CNPJ, para copiar em modules/cnpjs/<cnpj>/ e medir a API de ponta a ponta
+(ver benchmark_carga_concorrente.py).
+
+Uso:
+    python src/scripts/benchmark_crm_timeline.py
+    python src/scripts/benchmark_crm_timeline.py --anos 9 --repeticoes 5 --salvar /tmp/timeline_fixture
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+
+def _fixture(anos: int, eventos_por_dia: float, semente: int) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Frames dia/hora/eventos no contrato dos Parquets crm_timeline_* por CNPJ."""
+    rng = np.random.default_rng(semente)
+    inicio = date(2025 - anos, 1, 1)
+    dias = [inicio + timedelta(days=d) for d in range(anos * 365)]
+    dias = [d for d in dias if d.weekday() < 6 or rng.random() < 0.5]
+    n_dias = len(dias)
+    dt_janela = [d.isoformat() for d in dias]
+    daily = pl.DataFrame({
+        "dt_janela": dt_janela,
+        "competencia": np.array([d.year * 100 + d.month for d in dias], dtype=np.int32),
+        "nu_prescricoes_dia": rng.integers(200, 1_500, n_dias).astype(np.int32),
+        "nu_crms_distintos": rng.integers(10, 120, n_dias).astype(np.int32),
+        "mediana_diaria": rng.random(n_dias) * 60,
+        "is_dia_com_volume_horario_anomalo": (rng.random(n_dias) < 0.08).astype(np.int8),
+        "is_anomalo_unico": (rng.random(n_dias) < 0.05).astype(np.int8),
+        "is_crm_multiplo": (rng.random(n_dias) < 0.04).astype(np.int8),
+        "score_crm_unico_hora": rng.random(n_dias) * 30,
+        "score_crm_unico_qtd": rng.integers(0, 60, n_dias).astype(np.int32),
+        "score_crm_unico_minutos": rng.integers(0, 240, n_dias).astype(np.int32),
+        "score_crm_unico_medico": [f"CRM{i % 400:05d}" for i in range(n_dias)],
+        "score_crm_multiplo_hora": rng.random(n_dias) * 30,
+        "score_crm_multiplo_qtd": rng.integers(0, 60, n_dias).astype(np.int32),
+        "score_crm_multiplo_minutos": rng.integers(0, 240, n_dias).astype(np.int32),
+        "score_crm_multiplo_crms": rng.integers(0, 12, n_dias).astype(np.int32),
+    })
+
+    # Farmacia 24h: atividade em ~90% das horas.
+    horas = np.tile(np.arange(24, dtype=np.int32), n_dias)
+    dia_da_hora = np.repeat(np.arange(n_dias), 24)
+    ativa = rng.random(n_dias * 24) < 0.9
+    horas, dia_da_hora = horas[ativa], dia_da_hora[ativa]
+    n_horas = len(horas)
+    hourly = pl.DataFrame({
+        "dt_janela": np.array(dt_janela)[dia_da_hora],
+        "hr_janela": horas,
+        "nu_prescricoes": rng.integers(1, 120, n_horas).astype(np.int32),
+        "nu_crms_diferentes": rng.integers(1, 25, n_horas).astype(np.int32),
+        "mediana_hora": rng.random(n_horas) * 40,
+        "mad_hora": rng.random(n_horas) * 10,
+        "is_hora_com_alerta": np.zeros(n_horas, dtype=np.int8),
+        "is_volume_horario_anomalo": (rng.random(n_horas) < 0.02).astype(np.int8),
+        "is_crm_unico": (rng.random(n_horas) < 0.02).astype(np.int8),
+        "is_crm_multiplo": (rng.random(n_horas) < 0.01).astype(np.int8),
+    })
+
+    n_eventos = int(n_dias * eventos_por_dia)
+    minuto_inicio = rng.integers(0, 1_380, n_eventos).astype(np.int32)
+    minuto_fim = minuto_inicio + rng.integers(5, 60, n_eventos).astype(np.int32)
+    events = pl.DataFrame({
+        "dt_janela": np.array(dt_janela)[rng.integers(0, n_dias, n_eventos)],
+        "tipo": rng.choice(["crm_unico", "crm_multiplo"], n_eventos),
+        "hora_inicio": [f"{m // 60:02d}:{m % 60:02d}" for m in minuto_inicio],
+        "hora_fim": [f"{m // 60:02d}:{m % 60:02d}" for m in minuto_fim],
+        "minuto_inicio": minuto_inicio,
+        "minuto_fim": minuto_fim,
+        "severidade": rng.choice(["MEDIA", "ALTA", "CRITICA"], n_eventos),
+        "id_medico": [f"CRM{i % 400:05d}" for i in range(n_eventos)],
+        "nu_crms_distintos": rng.integers(1, 6, n_eventos).astype(np.int32),
+    })
+    return daily, hourly, events
+
+
+def _salvar(diretorio: str, daily: pl.DataFrame, hourly: pl.DataFrame, events: pl.DataFrame) -> None:
+    from cache_files import CRM_TIMELINE_DIA_PARQUET, CRM_TIMELINE_EVENTOS_PARQUET, CRM_TIMELINE_HORA_PARQUET
+
+    os.makedirs(diretorio, exist_ok=True)
+    for nome, df in (
+        (CRM_TIMELINE_DIA_PARQUET, daily),
+        (CRM_TIMELINE_HORA_PARQUET, hourly),
+        (CRM_TIMELINE_EVENTOS_PARQUET, events),
+    ):
+        df.write_parquet(os.path.join(diretorio, nome), compression="zstd")
+    print(f"[INFO] Fixture gravado em {diretorio}")
+
+
+def _medir(func, repeticoes: int) -> float:
+    func()
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(tempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--anos", type=int, default=9)
+    parser.add_argument("--eventos-por-dia", type=float, default=6.0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--salvar", metavar="DIR", help="grava os Parquets do fixture neste diretorio")
+    args = parser.parse_args()
+
+    from api.schemas.analytics import CrmTimelineDatasetResponse
+    from api.services.analytics.crm_timeline import CrmTimeline
+
+    daily, hourly, events = _fixture(args.anos, args.eventos_por_dia, args.semente)
+    if args.salvar:
+        _salvar(args.salvar, daily, hourly, events)
+
+    montagem_ms = _medir(lambda: CrmTimeline(daily, hourly, events), args.repeticoes)
+    timeline = CrmTimeline(daily, hourly, events)
+    ultimo = timeline.days["dt_janela"].max()
+    periodos = {
+        "tudo": (None, None),
+        "ultimo ano": (f"{ultimo[:4]}-01", ultimo[:7]),
+        "ultimo mes": (ultimo[:7], ultimo[:7]),
+    }
+
+    def aninhado(inicio, fim, artefato):
+        dias = artefato.nested_days(inicio, fim).to_dicts()
+        return CrmTimelineDatasetResponse(cnpj="00000000000000", days=dias)
+
+    print("\n" + "=" * 84)
+    print(f"Fixture: {args.anos} anos | {daily.height:,} dias | {hourly.height:,} horas | "
+          f"{events.height:,} eventos | montagem do artefato {montagem_ms:.1f} ms")
+    print("-" * 84)
+    print(f"{'Periodo':<12} {'Dias':>7} {'Colunar ms':>11} {'Aninhado ms':>12} "
+          f"{'Sem cache col.':>15} {'Sem cache aninh.':>17}")
+    print("-" * 84)
+    for nome, (inicio, fim) in periodos.items():
+        dias = timeline.tables(inicio, fim)["days"].height
+        colunar_ms = _medir(lambda: timeline.tables(inicio, fim), args.repeticoes)
+        aninhado_ms = _medir(lambda: aninhado(inicio, fim, timeline), args.repeticoes)
+        sem_cache_col_ms = _medir(lambda: CrmTimeline(daily, hourly, events).tables(inicio, fim), args.repeticoes)
+        sem_cache_aninh_ms = _medir(lambda: aninhado(inicio, fim, CrmTimeline(daily, hourly, events)), args.repeticoes)
+        print(f"{nome:<12} {dias:>7,} {colunar_ms:>11.2f} {aninhado_ms:>12.1f} "
+              f"{sem_cache_col_ms:>15.1f} {sem_cache_aninh_ms:>17.1f}")
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
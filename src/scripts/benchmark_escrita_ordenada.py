@@ -0,0 +1,149 @@
+"""
+benchmark_escrita_ordenada.py
+-----------------------------
+Mede o pico de memoria (RSS) da gravacao de um modulo global grande ordenado
+por (id_cnpj, periodo) nos dois modos:
+
+    memoria  -> acumula os lotes, pl.concat(...).sort(...) e write_parquet (modo antigo)
+    externo  -> external_sort.SortedParquetWriter (runs ordenados em disco + k-way merge)
+
+Os lotes sinteticos chegam na ordem em que o SQL Server costuma devolver a
+movimentacao (por periodo), isto e, fora da ordem final. Cada modo roda em um
+subprocesso separado; ao final tambem e medido o tempo de um filtro por
+id_cnpj via scan_parquet no arquivo gerado (efeito do tamanho dos row groups).
+
+Uso:
+    python src/scripts/benchmark_escrita_ordenada.py                  # 20.000.000 linhas
+    python src/scripts/benchmark_escrita_ordenada.py --linhas 5000000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+MODOS = ("memoria", "externo")
+PERIODOS = 120
+LOTE = 250_000
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes.
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def _gerar_lotes(linhas: int):
+    """Gera lotes da movimentacao sintetica agrupados por periodo."""
+    from datetime import date
+
+    import numpy as np
+    import polars as pl
+
+    rng = np.random.default_rng(42)
+    cnpjs = max(linhas // PERIODOS, 1)
+    gerado = 0
+    for m in range(PERIODOS):
+        periodo = date(2015 + m // 12, m % 12 + 1, 1)
+        ids = np.arange(1, cnpjs + 1, dtype=np.int32)
+        rng.shuffle(ids)
+        for inicio in range(0, cnpjs, LOTE):
+            n = min(LOTE, cnpjs - inicio, linhas - gerado)
+            if n <= 0:
+                return
+            vendas = rng.random(n) * 50_000
+            yield pl.DataFrame({
+                "id_cnpj": ids[inicio:inicio + n],
+                "periodo": pl.Series([periodo] * n, dtype=pl.Date),
+                "total_vendas": vendas,
+                "total_sem_comprovacao": vendas * rng.random(n) * 0.3,
+                "total_qnt_caixas_vendidas": rng.integers(0, 5_000, n),
+                "total_qnt_caixas_sem_comprovacao": rng.integers(0, 500, n),
+                "total_num_autorizacoes": rng.integers(0, 2_000, n),
+            })
+            gerado += n
+
+
+def executar_modo(modo: str, saida: str, linhas: int) -> None:
+    import polars as pl
+
+    from external_sort import SortedParquetWriter
+
+    chaves = ["id_cnpj", "periodo"]
+    t0 = time.perf_counter()
+    if modo == "memoria":
+        df = pl.concat(list(_gerar_lotes(linhas))).sort(chaves)
+        df.write_parquet(saida, compression="zstd")
+        total = df.height
+    else:
+        with SortedParquetWriter(saida, chaves) as writer:
+            for lote in _gerar_lotes(linhas):
+                writer.write(lote)
+        total = writer.rows
+    elapsed = time.perf_counter() - t0
+    pico = _peak_rss_mb()
+
+    alvo = linhas // PERIODOS // 2
+    t1 = time.perf_counter()
+    for _ in range(20):
+        pl.scan_parquet(saida).filter(pl.col("id_cnpj") == alvo).collect()
+    filtro_ms = (time.perf_counter() - t1) * 1000 / 20
+
+    pico_txt = f"{pico:.0f}" if pico is not None else "n/d"
+    print(f"RESULTADO {modo} {total} {elapsed:.2f} {pico_txt} {filtro_ms:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=20_000_000)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--saida", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        executar_modo(args.modo, args.saida, args.linhas)
+        return
+
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="sentinela_bench_") as tmp_dir:
+        for modo in MODOS:
+            saida = os.path.join(tmp_dir, f"{modo}.smod")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--modo", modo,
+                 "--saida", saida, "--linhas", str(args.linhas)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            linha = next(l for l in proc.stdout.splitlines() if l.startswith("RESULTADO"))
+            _, _, total, elapsed, pico, filtro_ms = linha.split()
+            resultados[modo] = (int(total), float(elapsed), pico, float(filtro_ms), os.path.getsize(saida))
+
+    print("\n" + "=" * 84)
+    print(f"{'Modo':<9} {'Linhas':>12} {'Tempo (s)':>10} {'Pico RSS (MB)':>14} "
+          f"{'Parquet (MB)':>13} {'Filtro id_cnpj (ms)':>20}")
+    print("-" * 84)
+    for modo, (total, elapsed, pico, filtro_ms, tamanho) in resultados.items():
+        print(f"{modo:<9} {total:>12,} {elapsed:>10.2f} {pico:>14} "
+              f"{tamanho / (1024 * 1024):>13.1f} {filtro_ms:>20.1f}")
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
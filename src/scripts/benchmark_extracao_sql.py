@@ -0,0 +1,168 @@
+"""
+benchmark_extracao_sql.py
+-------------------------
+Compara a extracao SQL -> Parquet antiga (pd.read_sql + pl.from_pandas) com a
+extracao em lotes do backend (sql_extract.sql_to_parquet), usando uma tabela
+sintetica no formato da movimentacao mensal em um SQLite local.
+
+Cada modo roda em um subprocesso separado para que o pico de memoria (RSS)
+medido seja so dele.
+
+Uso:
+    python src/scripts/benchmark_extracao_sql.py                  # 2.000.000 linhas
+    python src/scripts/benchmark_extracao_sql.py --linhas 500000
+    python src/scripts/benchmark_extracao_sql.py --lote 50000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+MODOS = ("pandas", "lotes")
+
+QUERY = """
+    SELECT id_cnpj, periodo, total_vendas, total_sem_comprovacao,
+           total_qnt_caixas_vendidas, total_qnt_caixas_sem_comprovacao,
+           total_num_autorizacoes
+    FROM movimentacao_mensal_cnpj
+"""
+
+
+def _schema():
+    import polars as pl
+
+    return {
+        "id_cnpj": pl.Int32,
+        "periodo": pl.Date,
+        "total_vendas": pl.Float64,
+        "total_sem_comprovacao": pl.Float64,
+        "total_qnt_caixas_vendidas": pl.Int64,
+        "total_qnt_caixas_sem_comprovacao": pl.Int64,
+        "total_num_autorizacoes": pl.Int64,
+    }
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes.
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def criar_base(db_path: str, linhas: int) -> None:
+    print(f"Gerando base sintetica com {linhas:,} linhas em {db_path}...")
+    rng = random.Random(42)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE movimentacao_mensal_cnpj (
+            id_cnpj INTEGER, periodo TEXT, total_vendas REAL, total_sem_comprovacao REAL,
+            total_qnt_caixas_vendidas INTEGER, total_qnt_caixas_sem_comprovacao INTEGER,
+            total_num_autorizacoes INTEGER
+        )
+    """)
+    periodos = [date(2015 + m // 12, m % 12 + 1, 1).isoformat() for m in range(120)]
+    lote = []
+    for i in range(linhas):
+        vendas = rng.random() * 50_000
+        lote.append((
+            i // len(periodos) + 1,
+            periodos[i % len(periodos)],
+            vendas,
+            vendas * rng.random() * 0.3,
+            rng.randint(0, 5_000),
+            rng.randint(0, 500),
+            rng.randint(0, 2_000),
+        ))
+        if len(lote) == 100_000:
+            conn.executemany("INSERT INTO movimentacao_mensal_cnpj VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+            lote.clear()
+    if lote:
+        conn.executemany("INSERT INTO movimentacao_mensal_cnpj VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+    conn.commit()
+    conn.close()
+
+
+def executar_modo(modo: str, db_path: str, saida: str, lote: int) -> None:
+    import pandas as pd
+    import polars as pl
+    from sqlalchemy import create_engine
+
+    from sql_extract import sql_to_parquet
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    schema = _schema()
+    t0 = time.perf_counter()
+    if modo == "pandas":
+        chunks = [pl.from_pandas(chunk) for chunk in pd.read_sql(QUERY, engine, chunksize=lote)]
+        df = pl.concat(chunks).with_columns(pl.col("periodo").str.to_date())
+        df = df.select([pl.col(col).cast(dtype) for col, dtype in schema.items()])
+        df.write_parquet(saida, compression="zstd")
+        linhas = df.height
+    else:
+        linhas = sql_to_parquet(engine, QUERY, saida, schema=schema, batch_size=lote, source="benchmark")
+    elapsed = time.perf_counter() - t0
+    pico = _peak_rss_mb()
+    pico_txt = f"{pico:.0f}" if pico is not None else "n/d"
+    print(f"RESULTADO {modo} {linhas} {elapsed:.2f} {pico_txt}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--lote", type=int, default=100_000)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--saida", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        executar_modo(args.modo, args.db, args.saida, args.lote)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="sentinela_bench_") as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.sqlite")
+        criar_base(db_path, args.linhas)
+
+        resultados = {}
+        for modo in MODOS:
+            saida = os.path.join(tmp_dir, f"{modo}.smod")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--modo", modo,
+                 "--db", db_path, "--saida", saida, "--lote", str(args.lote)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            linha = next(l for l in proc.stdout.splitlines() if l.startswith("RESULTADO"))
+            _, _, linhas, elapsed, pico = linha.split()
+            resultados[modo] = (int(linhas), float(elapsed), pico, os.path.getsize(saida))
+
+    print("\n" + "=" * 72)
+    print(f"{'Modo':<10} {'Linhas':>12} {'Tempo (s)':>10} {'Pico RSS (MB)':>14} {'Parquet (MB)':>13}")
+    print("-" * 72)
+    for modo, (linhas, elapsed, pico, tamanho) in resultados.items():
+        print(f"{modo:<10} {linhas:>12,} {elapsed:>10.2f} {pico:>14} {tamanho / (1024 * 1024):>13.1f}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+benchmark_resposta_colunar.py
+-----------------------------
+Compara tempo de serializacao e tamanho do payload das respostas pesadas nos
+tres formatos aceitos pelos endpoints analiticos:
+
+    pydantic -> um schema Pydantic por linha + JSON (caminho padrao do FastAPI)
+    colunar  -> application/vnd.sentinela.columnar+json, direto do DataFrame
+    arrow    -> application/vnd.apache.arrow.stream (se pyarrow estiver instalado)
+
+Cenarios sinteticos:
+    geo       -> /geo/estabelecimentos nacional (uma linha por farmacia)
+    animacao  -> /regional-benchmarking-animation de uma UF (farmacias x janelas)
+
+O tempo do modo pydantic inclui montar os schemas e serializa-los como o
+FastAPI faz (jsonable_encoder + json.dumps); o dos modos colunares inclui
+apenas a codificacao a partir do DataFrame pronto.
+
+Uso:
+    python src/scripts/benchmark_resposta_colunar.py
+    python src/scripts/benchmark_resposta_colunar.py --farmacias 20000 --repeticoes 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import polars as pl
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+UFS = ["SP", "MG", "RJ", "BA", "PR", "RS", "PE", "CE", "PA", "SC", "GO", "MA", "AM"]
+CLASSES = ["BAIXO", "MEDIO", "ALTO", "CRITICO"]
+
+
+def _frame_geo(farmacias: int) -> pl.DataFrame:
+    rng = np.random.default_rng(42)
+    total = rng.random(farmacias) * 5_000_000
+    sem_comp = total * rng.random(farmacias) * 0.3
+    return pl.DataFrame({
+        "cnpj": [f"{i:014d}" for i in range(farmacias)],
+        "razao_social": [f"FARMACIA EXEMPLO {i} LTDA" for i in range(farmacias)],
+        "lat": rng.uniform(-33, 5, farmacias),
+        "lon": rng.uniform(-73, -34, farmacias),
+        "id_ibge7": [str(1_100_000 + i % 5_570) for i in range(farmacias)],
+        "uf": [UFS[i % len(UFS)] for i in range(farmacias)],
+        "municipio": [f"MUNICIPIO {i % 5_570}" for i in range(farmacias)],
+        "score_risco": rng.random(farmacias) * 100,
+        "classificacao_risco": [CLASSES[i % len(CLASSES)] for i in range(farmacias)],
+        "percValSemComp": sem_comp / total * 100,
+        "totalMov": total,
+        "valSemComp": sem_comp,
+    })
+
+
+def _frame_animacao(farmacias: int, janelas: int) -> tuple[pl.DataFrame, pl.DataFrame]:
+    rng = np.random.default_rng(7)
+    n = farmacias * janelas
+    trimestres = [f"{2015 + (6 + 2 * j) // 12}-{(6 + 2 * j) % 12 + 1:02d}" for j in range(janelas)]
+    total = rng.random(n) * 500_000
+    farmacias_df = pl.DataFrame({
+        "trimestre": np.repeat(trimestres, farmacias),
+        "cnpj": [f"{i % farmacias:014d}" for i in range(n)],
+        "razao_social": [f"Farmacia Exemplo {i % farmacias} Ltda" for i in range(n)],
+        "municipio": [f"Municipio {i % 300}" for i in range(n)],
+        "id_ibge7": (1_100_000 + np.arange(n) % 300).astype(np.int64),
+        "uf": ["SP"] * n,
+        "score_risco": rng.random(n) * 100,
+        "classificacao_risco": [CLASSES[i % len(CLASSES)] for i in range(n)],
+        "valSemComp": total * 0.1,
+        "totalMov": total,
+        "percValSemComp": np.full(n, 10.0),
+        "is_conexao_ativa": rng.random(n) > 0.5,
+        "rank": np.tile(np.arange(1, farmacias + 1, dtype=np.int32), janelas),
+    })
+    quarters_df = pl.DataFrame({
+        "trimestre": trimestres,
+        "inicio": [date(int(t[:4]), int(t[5:]), 1) for t in trimestres],
+        "fim": [date(int(t[:4]), int(t[5:]), 28) for t in trimestres],
+    })
+    return quarters_df, farmacias_df
+
+
+def _pydantic_geo(df: pl.DataFrame) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+
+    from api.schemas.geo import EstabelecimentoGeoSchema, EstabelecimentosGeoResponseSchema
+
+    resposta = EstabelecimentosGeoResponseSchema(
+        estabelecimentos=[EstabelecimentoGeoSchema(**r) for r in df.iter_rows(named=True)]
+    )
+    return json.dumps(jsonable_encoder(resposta)).encode("utf-8")
+
+
+def _pydantic_animacao(quarters_df: pl.DataFrame, farmacias_df: pl.DataFrame) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+
+    from api.schemas.analytics import (
+        RegionalAnimationQuarterSchema,
+        RegionalAnimationResponse,
+        RegionalFarmaciaSchema,
+    )
+
+    por_trimestre: dict[str, list] = {}
+    for r in farmacias_df.iter_rows(named=True):
+        trimestre = r.pop("trimestre")
+        por_trimestre.setdefault(trimestre, []).append(RegionalFarmaciaSchema(**r))
+    resposta = RegionalAnimationResponse(
+        nome_regiao="SP",
+        quarters=[
+            RegionalAnimationQuarterSchema(**q, farmacias=por_trimestre.get(q["trimestre"], []))
+            for q in quarters_df.iter_rows(named=True)
+        ],
+    )
+    return json.dumps(jsonable_encoder(resposta)).encode("utf-8")
+
+
+def _medir(func, repeticoes: int) -> tuple[float, int]:
+    corpo = func()
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(tempos)), len(corpo)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farmacias", type=int, default=90_000)
+    parser.add_argument("--farmacias-uf", type=int, default=5_000)
+    parser.add_argument("--janelas", type=int, default=57)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    from api.utils.columnar import ColumnarPayload, encode_arrow_stream, encode_columnar_json, pa
+
+    geo_df = _frame_geo(args.farmacias)
+    quarters_df, farmacias_df = _frame_animacao(args.farmacias_uf, args.janelas)
+    cenarios = {
+        "geo": (
+            lambda: _pydantic_geo(geo_df),
+            ColumnarPayload(tables={"estabelecimentos": geo_df}),
+        ),
+        "animacao": (
+            lambda: _pydantic_animacao(quarters_df, farmacias_df),
+            ColumnarPayload(tables={"quarters": quarters_df, "farmacias": farmacias_df}, meta={"nome_regiao": "SP"}),
+        ),
+    }
+
+    print("\n" + "=" * 78)
+    print(f"{'Cenario':<10} {'Formato':<9} {'Linhas':>10} {'Tempo (ms)':>12} {'Payload (MB)':>13} {'Ganho':>8}")
+    print("-" * 78)
+    for nome, (pydantic_func, payload) in cenarios.items():
+        linhas = sum(df.height for df in payload.tables.values())
+        base_ms, base_bytes = _medir(pydantic_func, args.repeticoes)
+        resultados = [("pydantic", base_ms, base_bytes)]
+        resultados.append(("colunar", *_medir(lambda: encode_columnar_json(payload), args.repeticoes)))
+        if pa is not None and len(payload.tables) == 1:
+            resultados.append(("arrow", *_medir(lambda: encode_arrow_stream(payload), args.repeticoes)))
+        for formato, ms, tamanho in resultados:
+            print(f"{nome:<10} {formato:<9} {linhas:>10,} {ms:>12.1f} "
+                  f"{tamanho / (1024 * 1024):>13.2f} {base_ms / ms:>7.1f}x")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+benchmark_resumo_cubo.py
+------------------------
+Mede p50/p95 da agregacao da movimentacao usada pelo /analytics/resumo
+(KPIs + detalhamento por UF, municipio e CNPJ) nos dois modos:
+
+    group_by -> filtra a movimentacao mensal pelo periodo, junta o perfil e
+                agrupa por UF, municipio e CNPJ a cada requisicao (modo antigo)
+    cubo     -> totais por CNPJ do MovimentacaoCube (somas acumuladas por
+                geracao) + agrupamentos sobre uma linha por CNPJ
+
+Cada modo roda nos escopos nacional, uma UF e uma regiao de saude, com o
+periodo completo e com um recorte de 12 meses. O tempo de montagem do cubo
+(pago uma vez por geracao do cache) e reportado a parte.
+
+Uso:
+    python src/scripts/benchmark_resumo_cubo.py                     # 90.000 CNPJs x 114 meses
+    python src/scripts/benchmark_resumo_cubo.py --cnpjs 20000 --repeticoes 10
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import polars as pl
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+PERIODOS = 114
+UFS = ["SP", "MG", "RJ", "BA", "PR", "RS", "PE", "CE", "PA", "SC", "GO", "MA", "AM"]
+
+
+def _gerar_dados(cnpjs: int) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Movimentacao mensal sintetica (ordenada por id_cnpj, periodo) e perfil."""
+    rng = np.random.default_rng(42)
+    meses = pl.date_range(date(2015, 7, 1), date(2024, 12, 1), "1mo", eager=True)[:PERIODOS]
+    ids = np.repeat(np.arange(1, cnpjs + 1, dtype=np.int32), PERIODOS)
+    vendas = rng.random(ids.size) * 50_000
+    movimentacao = pl.DataFrame({
+        "id_cnpj": ids,
+        "periodo": pl.Series(np.tile(meses.to_numpy(), cnpjs)).cast(pl.Date),
+        "total_vendas": vendas,
+        "total_sem_comprovacao": vendas * rng.random(ids.size) * 0.3,
+        "total_qnt_caixas_vendidas": rng.integers(0, 5_000, ids.size, dtype=np.int32),
+        "total_qnt_caixas_sem_comprovacao": rng.integers(0, 500, ids.size, dtype=np.int32),
+    })
+    municipios = rng.integers(0, 3_000, cnpjs)
+    perfil = pl.DataFrame({
+        "id_cnpj": np.arange(1, cnpjs + 1, dtype=np.int32),
+        "cnpj": [f"{i:014d}" for i in range(1, cnpjs + 1)],
+        "uf": [UFS[m % len(UFS)] for m in municipios],
+        "id_regiao_saude": [str(m // 25) for m in municipios],
+        "no_municipio": [f"MUNICIPIO {m}" for m in municipios],
+        "id_ibge7": (municipios + 1_100_000).astype(np.int64),
+    })
+    return movimentacao, perfil
+
+
+def _perc_cols() -> list[pl.Expr]:
+    return [
+        (pl.col("valSemComp") / pl.when(pl.col("totalMov") > 0).then(pl.col("totalMov")).otherwise(None) * 100).alias("percValSemComp"),
+        (pl.col("qtdeSemComp") / pl.when(pl.col("totalQtde") > 0).then(pl.col("totalQtde")).otherwise(None) * 100).alias("percQtdeSemComp"),
+    ]
+
+
+def resumo_group_by(movimentacao: pl.DataFrame, perfil: pl.DataFrame, inicio: date, fim: date):
+    period_df = (
+        movimentacao.filter(pl.col("periodo").is_between(inicio, fim))
+        .join(perfil.select("id_cnpj"), on="id_cnpj", how="semi")
+    )
+    enriched = period_df.join(perfil, on="id_cnpj", how="inner")
+    aggs = [
+        pl.n_unique("id_cnpj").alias("cnpjs"),
+        pl.sum("total_vendas").alias("totalMov"),
+        pl.sum("total_sem_comprovacao").alias("valSemComp"),
+        pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("totalQtde"),
+        pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("qtdeSemComp"),
+    ]
+    uf_df = enriched.group_by("uf").agg(aggs).with_columns(_perc_cols())
+    muni_df = enriched.group_by(["uf", "no_municipio", "id_ibge7"]).agg(aggs).with_columns(_perc_cols())
+    cnpj_df = enriched.group_by("id_cnpj").agg([
+        pl.col("cnpj").first(),
+        pl.col("uf").first(),
+        pl.sum("total_vendas").alias("totalMov"),
+        pl.sum("total_sem_comprovacao").alias("valSemComp"),
+        pl.col("total_qnt_caixas_vendidas").cast(pl.Int64).sum().alias("totalQtde"),
+        pl.col("total_qnt_caixas_sem_comprovacao").cast(pl.Int64).sum().alias("qtdeSemComp"),
+    ]).with_columns(_perc_cols())
+    return uf_df, muni_df, cnpj_df
+
+
+def resumo_cubo(cube, perfil: pl.DataFrame, inicio: date, fim: date):
+    enriched = (
+        cube.totals(inicio, fim)
+        .join(perfil, on="id_cnpj", how="inner")
+        .rename({
+            "total_vendas": "totalMov",
+            "total_sem_comprovacao": "valSemComp",
+            "total_qnt_caixas_vendidas": "totalQtde",
+            "total_qnt_caixas_sem_comprovacao": "qtdeSemComp",
+        })
+    )
+    aggs = [
+        pl.n_unique("id_cnpj").alias("cnpjs"),
+        pl.sum("totalMov"),
+        pl.sum("valSemComp"),
+        pl.sum("totalQtde"),
+        pl.sum("qtdeSemComp"),
+    ]
+    uf_df = enriched.group_by("uf").agg(aggs).with_columns(_perc_cols())
+    muni_df = enriched.group_by(["uf", "no_municipio", "id_ibge7"]).agg(aggs).with_columns(_perc_cols())
+    cnpj_df = enriched.select(
+        ["id_cnpj", "cnpj", "uf", "totalMov", "valSemComp", "totalQtde", "qtdeSemComp"]
+    ).with_columns(_perc_cols())
+    return uf_df, muni_df, cnpj_df
+
+
+def _conferir(antes, depois) -> None:
+    for chave, a, b in zip(("uf", "id_ibge7", "id_cnpj"), antes, depois):
+        a = a.sort(chave).select(["totalMov", "valSemComp", "totalQtde", "qtdeSemComp"])
+        b = b.sort(chave).select(["totalMov", "valSemComp", "totalQtde", "qtdeSemComp"])
+        if a.height != b.height:
+            raise AssertionError(f"Quantidade de linhas diverge em {chave}: {a.height} x {b.height}")
+        for col in a.columns:
+            if not np.allclose(a[col].to_numpy(), b[col].to_numpy(), rtol=1e-9):
+                raise AssertionError(f"Totais divergem em {chave}/{col}")
+
+
+def _medir(func, repeticoes: int) -> tuple[float, float]:
+    func()
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(tempos, 50)), float(np.percentile(tempos, 95))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cnpjs", type=int, default=90_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    from api.services.analytics.movimentacao_cube import MovimentacaoCube
+
+    movimentacao, perfil = _gerar_dados(args.cnpjs)
+    t0 = time.perf_counter()
+    cube = MovimentacaoCube(movimentacao)
+    montagem_s = time.perf_counter() - t0
+
+    escopos = {
+        "nacional": perfil,
+        "uf=SP": perfil.filter(pl.col("uf") == "SP"),
+        "regiao=7": perfil.filter(pl.col("id_regiao_saude") == "7"),
+    }
+    periodos = {
+        "completo": (date(2015, 7, 1), date(2024, 12, 31)),
+        "12 meses": (date(2023, 1, 1), date(2023, 12, 31)),
+    }
+
+    print("\n" + "=" * 86)
+    print(f"Movimentacao: {movimentacao.height:,} linhas | cubo: {cube.nbytes / (1024 * 1024):.0f} MB, "
+          f"montado em {montagem_s:.2f}s")
+    print("-" * 86)
+    print(f"{'Escopo':<10} {'Periodo':<9} {'group_by p50':>13} {'p95':>8} {'cubo p50':>10} {'p95':>8} {'Ganho p50':>10}")
+    print("-" * 86)
+    for nome_escopo, perfil_escopo in escopos.items():
+        for nome_periodo, (inicio, fim) in periodos.items():
+            _conferir(
+                resumo_group_by(movimentacao, perfil_escopo, inicio, fim),
+                resumo_cubo(cube, perfil_escopo, inicio, fim),
+            )
+            antes = _medir(lambda: resumo_group_by(movimentacao, perfil_escopo, inicio, fim), args.repeticoes)
+            depois = _medir(lambda: resumo_cubo(cube, perfil_escopo, inicio, fim), args.repeticoes)
+            print(f"{nome_escopo:<10} {nome_periodo:<9} {antes[0]:>10.1f} ms {antes[1]:>8.1f} "
+                  f"{depois[0]:>7.1f} ms {depois[1]:>8.1f} {antes[0] / depois[0]:>9.1f}x")
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    main()
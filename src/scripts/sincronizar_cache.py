@@ -92,12 +92,6 @@ def _buscar_cnpjs_crm(engine) -> list[str]:
         return [str(r[0]).strip() for r in res if str(r[0]).strip()]
 
 
-def _sync_crm_cnpj_unit(cache_key: str, cnpj: str, engine) -> None:
-    import cache_manager
-
-    cache_manager.sync_cnpj_cache(cache_key, cnpj, engine)
-
-
 def _ensure_crm_runtime_caches_loaded() -> None:
     """Carrega em memoria os caches globais minimos exigidos pelos producers CRM por CNPJ."""
     import polars as pl
@@ -144,21 +138,15 @@ def _sync_crm_cnpj_completo(engine, progress_callback=None) -> None:
         f"{len(CRM_CNPJ_CACHE_KEYS)} modulo(s), {total} estabelecimento(s)..."
     )
 
-    total_steps = total * len(CRM_CNPJ_CACHE_KEYS)
-    step = 0
-    for cnpj in cnpjs_sync:
-        for cache_key, label in CRM_CNPJ_CACHE_KEYS:
-            try:
-                _sync_crm_cnpj_unit(cache_key, cnpj, engine)
-                step += 1
-                if progress_callback:
-                    progress_callback(int((step / total_steps) * 100))
-            except Exception as e:
-                print(f"\n[AVISO] Erro ao sincronizar {label} para CNPJ {cnpj}: {e}")
-                raise
+    import cache_manager
 
-    if progress_callback:
-        progress_callback(100)
+    cache_manager.sync_cnpj_caches(
+        engine,
+        cnpjs_sync,
+        progress_callback,
+        keys=[cache_key for cache_key, _label in CRM_CNPJ_CACHE_KEYS],
+        job_name="crm_cnpj",
+    )
 
 
 def _sync_clinica_anual_completa(engine, progress_callback=None):
@@ -183,6 +171,11 @@ def _sync_clinica_anual_completa(engine, progress_callback=None):
         progress_callback(100)
 
 
+def _sync_movimentacao_completa(engine, progress_callback=None):
+    """Refaz o movimentacao.smod inteiro, ignorando o watermark incremental."""
+    _sync_movimentacao(engine, progress_callback or (lambda _p: None), full_refresh=True)
+
+
 def _buscar_cnpjs_por_uf(engine, ufs: list[str]) -> list[str]:
     """Retorna os CNPJs elegiveis para uma lista de UFs."""
     with engine.connect() as conn:
@@ -257,31 +250,26 @@ def _sync_memoria_calculo_ufs(engine, progress_callback=None) -> None:
     medicamentos_map = _load_medicamentos_map_from_cache()
 
     print("Processando e salvando parquet por CNPJ...")
-    step = 0
-    total_found = df_global.height
-    
-    for row in df_global.iter_rows(named=True):
+    import cache_manager
+    from cnpj_sync import KIND_CPU, CnpjSyncUnit
+
+    def processar(row: dict) -> None:
         cnpj = row["cnpj"]
         version = int(row["_memoria_calculo_cache_version"] or 0)
-        
         if version < MEMORIA_CALCULO_CACHE_VERSION:
             print(f"\n[AVISO] {cnpj} ignorado. Versao do cache global ({version}) inferior a {MEMORIA_CALCULO_CACHE_VERSION}.")
-            continue
-            
-        payload = row["memoria_calculo_payload"]
-        try:
-            dados = _decode_memoria_payload(payload)
-            df_result = _build_memoria_calculo_df(dados, medicamentos_map)
-            
-            if not df_result.is_empty():
-                cache_path = _cache_path(cnpj)
-                df_result.write_parquet(cache_path, compression="zstd")
-        except Exception as e:
-            print(f"\n[AVISO] Erro ao processar memoria de calculo para {cnpj}: {e}")
-            
-        step += 1
-        if progress_callback:
-            progress_callback(int((step / total_found) * 100))
+            return
+
+        dados = _decode_memoria_payload(row["memoria_calculo_payload"])
+        df_result = _build_memoria_calculo_df(dados, medicamentos_map)
+        if not df_result.is_empty():
+            df_result.write_parquet(_cache_path(cnpj), compression="zstd")
+
+    units = [
+        CnpjSyncUnit(cnpj=row["cnpj"], key="memoria_calculo", kind=KIND_CPU, func=lambda _row=row: processar(_row))
+        for row in df_global.iter_rows(named=True)
+    ]
+    cache_manager.run_cnpj_sync_units("memoria_uf", units, engine, progress_callback)
 
     if progress_callback:
         progress_callback(100)
@@ -315,21 +303,15 @@ def _sync_crm_ufs(engine, progress_callback=None) -> None:
         f"{len(CRM_UF_CACHE_KEYS)} modulo(s), {total} estabelecimento(s)..."
     )
 
-    total_steps = total * len(CRM_UF_CACHE_KEYS)
-    step = 0
-    for cnpj in cnpjs_sync:
-        for cache_key, label in CRM_UF_CACHE_KEYS:
-            try:
-                _sync_crm_cnpj_unit(cache_key, cnpj, engine)
-                step += 1
-                if progress_callback:
-                    progress_callback(int((step / total_steps) * 100))
-            except Exception as e:
-                print(f"\n[AVISO] Erro ao sincronizar {label} para CNPJ {cnpj}: {e}")
-                raise
+    import cache_manager
 
-    if progress_callback:
-        progress_callback(100)
+    cache_manager.sync_cnpj_caches(
+        engine,
+        cnpjs_sync,
+        progress_callback,
+        keys=[cache_key for cache_key, _label in CRM_UF_CACHE_KEYS],
+        job_name="crm_uf",
+    )
 
 
 MODULOS = sorted([
@@ -346,7 +328,8 @@ MODULOS = sorted([
     {"id": 43, "name": "Pagamentos FP global", "func": _sync_pagamentos_consolidados_farmacia_popular, "peso": "muito pesado", "ordem": 43},
     {"id": 17, "name": "Farmacias e CNAEs", "func": _sync_dados_farmacia, "peso": "medio", "ordem": 17},
     {"id": 18, "name": "Perfil estab.", "func": _sync_perfil_estabelecimento, "peso": "medio", "ordem": 18},
-    {"id": 19, "name": "Movimentacao", "func": _sync_movimentacao, "peso": "muito pesado", "ordem": 19},
+    {"id": 19, "name": "Movimentacao", "func": _sync_movimentacao, "peso": "pesado", "ordem": 19},
+    {"id": 44, "name": "Movimentacao (carga completa)", "func": _sync_movimentacao_completa, "peso": "muito pesado", "ordem": 19},
     {"id": 20, "name": "Medicamentos", "func": _sync_medicamentos, "peso": "rapido", "ordem": 20},
     {"id": 21, "name": "Memoria calculo global", "func": _sync_memoria_calculo_global, "peso": "muito pesado", "ordem": 21},
     {"id": 22, "name": "Socios", "func": _sync_dados_socios, "peso": "medio", "ordem": 22},